@@ -78,6 +78,10 @@ def create_app(config_name=None):
                 template_folder=template_dir,
                 static_folder=static_dir)
     
+    # orjson tabanlı JSON provider (jsonify / request.get_json)
+    from app.utils.serialization import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    
     # Load configuration
     if config_name is None:
         config_name = os.getenv('FLASK_ENV', 'development')
@@ -105,7 +109,7 @@ def create_app(config_name=None):
     
     # Initialize cache
     cache.init_app(app, config={
-        'CACHE_TYPE': 'redis' if app.config.get('REDIS_URL') else 'simple',
+        'CACHE_TYPE': app.config.get('CACHE_TYPE', 'redis' if app.config.get('REDIS_URL') else 'simple'),
         'CACHE_REDIS_URL': app.config.get('REDIS_URL'),
         'CACHE_DEFAULT_TIMEOUT': 300
     })
@@ -124,6 +128,55 @@ def create_app(config_name=None):
         from app.models.audit import AuditTrail
         from app.models.session import Session
         from app.models.notification_log import NotificationLog  # Notification tracking
+        from app.models.outbox import OutboxEvent  # Transactional outbox
+        from app.models.request_rollup import RequestHourlyRollup  # Report rollups
+        from app.models.access_metric import AccessMetric  # Read-access counters
+        
+        # Keep hourly report rollups in step with every request change
+        from app.services.request_rollup_service import RequestRollupService
+        RequestRollupService.register_listeners()
+        
+        # Invalidate cached report results on request lifecycle commits
+        from app.services.report_cache import ReportCache
+        ReportCache.register_listeners()
+        
+        # Keep the in-memory fleet state in step with committed changes
+        from app.services.fleet_state_service import FleetStateService
+        FleetStateService.reset()
+        FleetStateService.register_listeners()
+        FleetStateService.init_broker(app)
+        
+        # Arm/disarm request timeout timers on request commits
+        from app.services.request_expiry_service import RequestExpiryService
+        RequestExpiryService.init_app(app)
+        
+        # Wake long-polling drivers when a hotel's PENDING set changes
+        from app.services.pending_request_notifier import PendingRequestNotifier
+        PendingRequestNotifier.register_listeners()
+        
+        # Drop cached auth principals when users or buggy assignments change
+        from app.utils.principal import PrincipalCache
+        PrincipalCache.register_listeners()
+        
+        # Drop cached dispatch rosters when buggies, assignments or drivers change
+        from app.services.fcm_notification_service import FCMNotificationService
+        FCMNotificationService.register_roster_listeners()
+    
+    # Shared background task pool (reuses this app, no create_app() per task)
+    from app.services.task_executor import BackgroundTaskExecutor
+    BackgroundTaskExecutor.init_app(app)
+    
+    # Audit records are written in batches by a background writer
+    from app.services.audit_writer import AuditWriter
+    AuditWriter.init_app(app)
+    
+    # Read-only endpoint hits are counted in memory, not audited
+    from app.services.access_metrics_service import AccessMetricsService
+    AccessMetricsService.init_app(app)
+    
+    # Chunk limits for scheduled set-based cleanup jobs
+    from app.services.maintenance_service import MaintenanceService
+    MaintenanceService.init_app(app)
     
     # Initialize CORS
     CORS(app, 
@@ -171,6 +224,26 @@ def create_app(config_name=None):
     
     # Initialize background jobs (skip during migrations and testing)
     if not os.getenv('SKIP_BACKGROUND_JOBS') and not app.config['TESTING']:
+        try:
+            from app.services.outbox_service import OutboxService
+            OutboxService.init_worker(app)
+            app.logger.info("✅ Outbox worker initialized")
+        except Exception as e:
+            app.logger.error(f"❌ Failed to initialize outbox worker: {e}")
+        
+        try:
+            with app.app_context():
+                FleetStateService.warm_up()
+        except Exception as e:
+            app.logger.error(f"❌ Failed to load fleet state (loads lazily): {e}")
+        
+        try:
+            # Timers live in memory: re-arm PENDING requests after a restart
+            with app.app_context():
+                RequestExpiryService.reconcile()
+        except Exception as e:
+            app.logger.error(f"❌ Failed to re-arm request timeout timers: {e}")
+        
         try:
             from app.services.background_jobs import BackgroundJobsService
             BackgroundJobsService.init_scheduler(app)
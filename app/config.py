@@ -92,6 +92,19 @@ class Config:
     
     # Redis Configuration (Optional for caching - uses memory if not available)
     REDIS_URL = os.getenv('REDIS_URL', None)  # None = use simple cache
+    CACHE_TYPE = 'redis' if REDIS_URL else 'simple'
+    PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', 60))  # Logged-in user snapshot (seconds)
+    
+    # SSE fan-out broker: Redis pub/sub across workers/nodes (None = in-process, single worker)
+    SSE_BROKER_URL = os.getenv('SSE_BROKER_URL', REDIS_URL)
+    SSE_BROKER_CHANNEL = os.getenv('SSE_BROKER_CHANNEL', 'buggycall:sse')
+    
+    # Socket.IO emit throttling: token bucket per room (shared via Redis when set)
+    EMIT_THROTTLE_URL = os.getenv('EMIT_THROTTLE_URL', REDIS_URL)
+    EMIT_THROTTLE_RATE = float(os.getenv('EMIT_THROTTLE_RATE', 10))  # events/second per room
+    EMIT_THROTTLE_BURST = int(os.getenv('EMIT_THROTTLE_BURST', 10))
+    EMIT_QUEUE_MAX_PER_ROOM = 100  # coalesced events waiting per room
+    EMIT_QUEUE_MAX_TOTAL = 2000
     
     # Rate Limiting (uses memory if Redis not available)
     RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
@@ -122,6 +135,51 @@ class Config:
     # System Reset
     SYSTEM_RESET_PASSWORD = os.getenv('SYSTEM_RESET_PASSWORD', 'change-me-in-production')
     
+    # Transactional Outbox (request lifecycle side effects)
+    OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 4))
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))
+    OUTBOX_DRAIN_INTERVAL = int(os.getenv('OUTBOX_DRAIN_INTERVAL', 10))  # seconds (retry sweep)
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5))
+    
+    # Notification log buffering (multi-row INSERTs)
+    NOTIFICATION_LOG_FLUSH_SIZE = int(os.getenv('NOTIFICATION_LOG_FLUSH_SIZE', 50))
+    NOTIFICATION_LOG_FLUSH_INTERVAL = float(os.getenv('NOTIFICATION_LOG_FLUSH_INTERVAL', 2.0))  # seconds
+    NOTIFICATION_LOG_TOKEN_INDEX = True  # in-memory fcm_token -> user_id index
+    
+    # Shared background task pool (disconnect/logout cleanup)
+    BACKGROUND_TASK_WORKERS = int(os.getenv('BACKGROUND_TASK_WORKERS', 4))
+    BACKGROUND_TASK_QUEUE_MAX = int(os.getenv('BACKGROUND_TASK_QUEUE_MAX', 200))  # then caller runs the task
+    BACKGROUND_TASKS_INLINE = False
+    
+    # Group-commit audit writer (batched multi-row INSERTs)
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 200))  # records per INSERT
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0))  # seconds
+    AUDIT_BUFFER_MAX = int(os.getenv('AUDIT_BUFFER_MAX', 5000))  # then the caller writes
+    AUDIT_WRITER_INLINE = False
+    AUDIT_HOT_RETENTION_DAYS = int(os.getenv('AUDIT_HOT_RETENTION_DAYS', 90))  # older entries are archived
+    
+    # Driver pending-requests long-poll (?since=<version>&wait=<seconds>)
+    DRIVER_LONG_POLL_MAX_WAIT = int(os.getenv('DRIVER_LONG_POLL_MAX_WAIT', 25))  # seconds, below proxy timeouts
+    
+    # Read-access counters (driver polls) flushed as hourly aggregate rows
+    ACCESS_METRICS_FLUSH_INTERVAL = int(os.getenv('ACCESS_METRICS_FLUSH_INTERVAL', 60))  # seconds
+    ACCESS_METRICS_MAX_KEYS = int(os.getenv('ACCESS_METRICS_MAX_KEYS', 10000))  # then the caller flushes
+    
+    # Scheduled maintenance (chunked bulk UPDATE/DELETE)
+    MAINTENANCE_BATCH_SIZE = int(os.getenv('MAINTENANCE_BATCH_SIZE', 500))  # rows per statement
+    MAINTENANCE_MAX_ROWS = int(os.getenv('MAINTENANCE_MAX_ROWS', 5000))  # rows per job pass
+    GUEST_TOKEN_CLEANUP_INTERVAL = int(os.getenv('GUEST_TOKEN_CLEANUP_INTERVAL', 15))  # minutes
+    
+    # Request timeout timer wheel resolution
+    REQUEST_EXPIRY_TICK = int(os.getenv('REQUEST_EXPIRY_TICK', 10))  # seconds
+    
+    # In-memory live fleet state (periodic DB reconciliation)
+    # State lives in each worker; committed changes are broadcast on this channel of the
+    # SSE broker (SSE_BROKER_URL). Without a broker run a single worker, or other
+    # workers serve stale fleet data until the next reconcile.
+    FLEET_STATE_RECONCILE_INTERVAL = int(os.getenv('FLEET_STATE_RECONCILE_INTERVAL', 60))  # seconds
+    FLEET_STATE_CHANNEL = os.getenv('FLEET_STATE_CHANNEL', 'buggycall:fleet')
+    
     # Pagination
     ITEMS_PER_PAGE = 20
     MAX_ITEMS_PER_PAGE = 100
@@ -244,6 +302,26 @@ class TestingConfig(Config):
     # Disable rate limiting for testing
     RATELIMIT_ENABLED = False
 
+    # No cross-test caching (test transactions are rolled back, IDs are reused)
+    CACHE_TYPE = 'NullCache'
+
+    # In-process SSE broker and emit buckets (no Redis)
+    SSE_BROKER_URL = None
+    EMIT_THROTTLE_URL = None
+    # Tests assert on direct emits: practically no throttling
+    EMIT_THROTTLE_RATE = 1000.0
+    EMIT_THROTTLE_BURST = 1000
+
+    # Run background tasks synchronously (no worker threads in tests)
+    BACKGROUND_TASKS_INLINE = True
+
+    # Write audit records immediately so tests can assert on them
+    AUDIT_WRITER_INLINE = True
+
+    # Write notification logs immediately so tests can assert on them
+    NOTIFICATION_LOG_FLUSH_SIZE = 1
+    NOTIFICATION_LOG_TOKEN_INDEX = False
+
     # Faster password hashing for tests
     BCRYPT_LOG_ROUNDS = 4
 
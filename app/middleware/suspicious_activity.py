@@ -109,21 +109,14 @@ def log_suspicious_activity(action, details, user_id=None, ip_address=None):
     """Log suspicious activity to audit trail"""
     try:
         from app.services.audit_service import AuditService
-        from app.models.user import SystemUser
-        
-        hotel_id = None
-        if user_id:
-            user = SystemUser.query.get(user_id)
-            if user:
-                hotel_id = user.hotel_id
         
+        # hotel_id is resolved from the user by the audit writer
         AuditService.log_action(
             action=action,
             entity_type='security',
             entity_id=None,
             new_values={'details': details, 'ip_address': ip_address},
-            user_id=user_id,
-            hotel_id=hotel_id
+            user_id=user_id
         )
     except Exception as e:
         # Don't fail the request if logging fails
@@ -3,10 +3,15 @@ Buggy Call - Models Package
 """
 from app import db
 from datetime import datetime
+from functools import lru_cache
 import pytz
 import os
 
 
+# Hotel timezone (Europe/Nicosia - GMT+2/+3), built once per process
+CYPRUS_TZ = pytz.timezone('Europe/Nicosia')
+
+
 def get_current_timestamp():
     """
     Get current Cyprus timezone timestamp (timezone-naive for DB storage)
@@ -18,11 +23,35 @@ def get_current_timestamp():
         datetime: Current Cyprus timestamp (naive datetime)
     """
     # ✅ Use Cyprus timezone for database storage (matches hotel operations)
-    cyprus_tz = pytz.timezone('Europe/Nicosia')
-    cyprus_time = datetime.now(cyprus_tz)
+    cyprus_time = datetime.now(CYPRUS_TZ)
     return cyprus_time.replace(tzinfo=None)
 
 
+@lru_cache(maxsize=16384)
+def _cyprus_offset_suffix(hour_start):
+    """ISO offset ('+02:00' / '+03:00') of a naive Cyprus local hour"""
+    return CYPRUS_TZ.localize(hour_start).isoformat()[-6:]
+
+
+def format_cyprus_datetime(dt):
+    """
+    Format a naive Cyprus-local datetime as ISO 8601 with its UTC offset
+
+    Same output as CYPRUS_TZ.localize(dt).isoformat(). DST transitions fall
+    on whole hours, so the offset is memoized per local hour and localize()
+    runs once per hour instead of once per timestamp.
+
+    Args:
+        dt: timezone-naive datetime (stored as Cyprus time in DB)
+
+    Returns:
+        str: ISO format string with +02:00 or +03:00 offset (None for None)
+    """
+    if not dt:
+        return None
+    return dt.isoformat() + _cyprus_offset_suffix(dt.replace(minute=0, second=0, microsecond=0))
+
+
 # Base model class
 class BaseModel:
     """Base model with common fields"""
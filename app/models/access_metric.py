@@ -0,0 +1,55 @@
+"""
+Buggy Call - Access Metric Model
+Hourly read-access counters per (hotel, user, endpoint)
+"""
+from app import db
+from sqlalchemy import Column, Integer, String, DateTime, Index, UniqueConstraint
+
+
+class AccessMetric(db.Model):
+    """
+    Hourly access metric
+
+    One row per (hotel, user, endpoint, hour). Read-only endpoints (driver
+    polls) are counted in memory by AccessMetricsService and flushed here
+    periodically instead of writing an audit trail row per call.
+    """
+
+    __tablename__ = 'access_metrics'
+
+    # Counter columns (incremented by upserts)
+    COUNTERS = ('request_count', 'item_count')
+
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # Dimensions
+    hotel_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)
+    endpoint = Column(String(100), nullable=False)
+    hour_start = Column(DateTime, nullable=False)  # Cyprus time, truncated to the hour
+
+    # Counters
+    request_count = Column(Integer, nullable=False, default=0)
+    item_count = Column(Integer, nullable=False, default=0)  # e.g. pending requests returned
+    last_access_at = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint('hotel_id', 'user_id', 'endpoint', 'hour_start', name='uq_access_metric_key'),
+        Index('idx_access_metric_hotel_hour', 'hotel_id', 'hour_start'),
+    )
+
+    def __repr__(self):
+        return f'<AccessMetric user={self.user_id} {self.endpoint} {self.hour_start}: {self.request_count}>'
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'hotel_id': self.hotel_id,
+            'user_id': self.user_id,
+            'endpoint': self.endpoint,
+            'hour_start': self.hour_start.isoformat() if self.hour_start else None,
+            'request_count': self.request_count,
+            'item_count': self.item_count,
+            'last_access_at': self.last_access_at.isoformat() if self.last_access_at else None
+        }
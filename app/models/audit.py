@@ -4,7 +4,7 @@ Tracks all important system events
 """
 from app import db
 from app.models import BaseModel, get_current_timestamp
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, BigInteger, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, BigInteger, DateTime, Index
 from sqlalchemy.orm import relationship
 
 
@@ -19,7 +19,7 @@ class AuditTrail(db.Model, BaseModel):
     __table_args__ = {'info': {'immutable': True}}
     
     # Primary Key
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)  # SQLite only autoincrements INTEGER
     
     # Foreign Keys
     hotel_id = Column(Integer, ForeignKey('hotels.id', ondelete='CASCADE'), nullable=False, index=True)
@@ -73,3 +73,40 @@ class AuditTrail(db.Model, BaseModel):
             'user_agent': self.user_agent,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+class AuditTrailArchive(db.Model, BaseModel):
+    """
+    Archived audit trail entries - IMMUTABLE
+    
+    Rows are moved here from audit_trail by the archive job (same id and
+    values) so the hot table stays small. No foreign keys: history is kept
+    even after users are removed.
+    """
+    
+    __tablename__ = 'audit_trail_archive'
+    __table_args__ = (
+        Index('idx_audit_archive_hotel_created_id', 'hotel_id', 'created_at', 'id'),
+        {'info': {'immutable': True}},
+    )
+    
+    # Primary Key (copied from audit_trail)
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=False)
+    
+    hotel_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, index=True)
+    
+    # Audit Information
+    action = Column(String(100), nullable=False, index=True)
+    entity_type = Column(String(50), nullable=False)
+    entity_id = Column(Integer)
+    old_values = Column(Text)
+    new_values = Column(Text)
+    ip_address = Column(String(45))
+    user_agent = Column(Text)
+    
+    # Timestamps
+    created_at = Column(DateTime, nullable=False, index=True)
+    archived_at = Column(DateTime, default=get_current_timestamp, nullable=False)
+    
+    to_dict = AuditTrail.to_dict
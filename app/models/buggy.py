@@ -123,6 +123,100 @@ class Buggy(db.Model, BaseModel):
         _, driver_name = self._get_driver_association(active_only=False)
         return driver_name
     
+    @classmethod
+    def prefetch_related(cls, buggies):
+        """
+        Bulk-load what to_dict() needs for a list of buggies (2 queries total)
+
+        Fills the per-instance driver caches used by _get_driver_association
+        and the current_location relationship, so serializing the list does
+        not issue per-buggy queries.
+
+        Args:
+            buggies: Iterable of Buggy instances (duplicates/None are ignored)
+
+        Returns:
+            list: The unique buggies, in input order
+        """
+        from sqlalchemy import inspect as sa_inspect
+        from sqlalchemy.orm.attributes import set_committed_value
+        from app.models.buggy_driver import BuggyDriver
+        from app.models.user import SystemUser
+        from app.models.location import Location
+
+        unique = list({id(b): b for b in buggies if b is not None}.values())
+        if not unique:
+            return unique
+
+        # 1) Tüm sürücü atamaları + sürücü adları tek sorguda
+        pending = [b for b in unique if not (
+            hasattr(b, '_driver_cache_active') and hasattr(b, '_driver_cache_assigned')
+        )]
+        if pending:
+            rows = db.session.query(
+                BuggyDriver.id,
+                BuggyDriver.buggy_id,
+                BuggyDriver.driver_id,
+                BuggyDriver.is_active,
+                BuggyDriver.is_primary,
+                SystemUser.full_name,
+                SystemUser.username
+            ).outerjoin(
+                SystemUser, SystemUser.id == BuggyDriver.driver_id
+            ).filter(
+                BuggyDriver.buggy_id.in_([b.id for b in pending])
+            ).order_by(
+                BuggyDriver.buggy_id,
+                BuggyDriver.assigned_at.desc(),
+                BuggyDriver.id
+            ).all()
+
+            by_buggy = {}
+            for row in rows:
+                by_buggy.setdefault(row.buggy_id, []).append(row)
+
+            def entry(row):
+                if row is None:
+                    return (None, None)
+                return (row.driver_id, row.full_name if row.full_name else row.username)
+
+            def first_by_id(rows):
+                # .first() without ORDER BY -> en düşük id (tekil sorgu ile aynı sonuç)
+                return min(rows, key=lambda a: a.id, default=None)
+
+            for buggy in pending:
+                assocs = by_buggy.get(buggy.id, [])
+                if not hasattr(buggy, '_driver_cache_active'):
+                    if buggy.status == BuggyStatus.OFFLINE:
+                        buggy._driver_cache_active = (None, None)
+                    else:
+                        buggy._driver_cache_active = entry(first_by_id([a for a in assocs if a.is_active]))
+                if not hasattr(buggy, '_driver_cache_assigned'):
+                    # Primary varsa o, yoksa en son atanan (assigned_at desc)
+                    primary = first_by_id([a for a in assocs if a.is_primary])
+                    buggy._driver_cache_assigned = entry(primary or (assocs[0] if assocs else None))
+
+        # 2) Yüklenmemiş current_location ilişkileri tek sorguda
+        unloaded = [
+            b for b in unique
+            if 'current_location' in sa_inspect(b).unloaded
+        ]
+        location_ids = {b.current_location_id for b in unloaded if b.current_location_id}
+        locations = {}
+        if location_ids:
+            locations = {
+                loc.id: loc for loc in Location.query.filter(Location.id.in_(location_ids)).all()
+            }
+        for buggy in unloaded:
+            set_committed_value(buggy, 'current_location', locations.get(buggy.current_location_id))
+
+        return unique
+
+    @classmethod
+    def to_dict_many(cls, buggies):
+        """Serialize a list of buggies with prefetch_related (same dicts as to_dict)"""
+        return [buggy.to_dict() for buggy in cls.prefetch_related(buggies)]
+
     def to_dict(self):
         """Convert to dictionary"""
         # Tek seferde hem aktif hem atanmış sürücü bilgisini al (cache kullanarak)
@@ -0,0 +1,79 @@
+"""
+Buggy Call - Outbox Event Model
+Durable side-effect queue written in the same transaction as state changes
+"""
+from app import db
+from app.models import BaseModel, get_current_timestamp
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+import json
+
+
+class OutboxStatus:
+    """Outbox event status values"""
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DELIVERED = 'delivered'
+    FAILED = 'failed'
+
+
+class OutboxEvent(db.Model, BaseModel):
+    """
+    Transactional outbox entry
+
+    A row is inserted together with the business change (same commit) and
+    delivered later by the outbox worker pool (at-least-once semantics).
+    """
+
+    __tablename__ = 'outbox_events'
+
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # Routing
+    hotel_id = Column(Integer, index=True)
+    event_type = Column(String(50), nullable=False, index=True)  # fcm.new_request, socket.emit, audit.log ...
+    aggregate_type = Column(String(50))  # request, buggy, user
+    aggregate_id = Column(Integer, index=True)
+    payload = Column(Text, nullable=False)  # JSON
+
+    # Delivery State
+    status = Column(String(20), default=OutboxStatus.PENDING, nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text)
+
+    # Timestamps
+    created_at = Column(DateTime, default=get_current_timestamp, nullable=False)
+    available_at = Column(DateTime, default=get_current_timestamp, nullable=False)  # Not before (retry backoff)
+    claimed_at = Column(DateTime)  # Worker lease start
+    processed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('idx_outbox_status_available', 'status', 'available_at'),
+    )
+
+    def __repr__(self):
+        return f'<OutboxEvent {self.id}: {self.event_type} - {self.status}>'
+
+    def get_payload(self):
+        """Get payload as dict"""
+        try:
+            return json.loads(self.payload) if self.payload else {}
+        except (TypeError, ValueError):
+            return {}
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'hotel_id': self.hotel_id,
+            'event_type': self.event_type,
+            'aggregate_type': self.aggregate_type,
+            'aggregate_id': self.aggregate_id,
+            'payload': self.get_payload(),
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'available_at': self.available_at.isoformat() if self.available_at else None,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None
+        }
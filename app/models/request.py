@@ -3,7 +3,7 @@ Buggy Call - Buggy Request Model
 Represents guest requests for buggy pickup
 """
 from app import db
-from app.models import BaseModel, get_current_timestamp
+from app.models import BaseModel, get_current_timestamp, format_cyprus_datetime
 from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 import enum
@@ -42,7 +42,7 @@ class BuggyRequest(db.Model, BaseModel):
     # guest_device_id removed for privacy
     guest_push_subscription = Column(Text)  # Web Push API subscription (JSON)
     guest_fcm_token = Column(String(500))  # Firebase Cloud Messaging token for guest notifications
-    guest_fcm_token_expires_at = Column(DateTime)  # FCM token expiration timestamp (TTL: 1 hour)
+    guest_fcm_token_expires_at = Column(DateTime, index=True)  # FCM token expiration timestamp (TTL: 1 hour)
     status = Column(Enum(RequestStatus), default=RequestStatus.PENDING, nullable=False, index=True)
     cancelled_by = Column(String(50))  # 'driver', 'guest', 'admin'
     
@@ -124,10 +124,7 @@ class BuggyRequest(db.Model, BaseModel):
         if not dt:
             return None
         try:
-            import pytz
-            cyprus_tz = pytz.timezone('Europe/Nicosia')
-            cyprus_dt = cyprus_tz.localize(dt)
-            return cyprus_dt.isoformat()
+            return format_cyprus_datetime(dt)
         except Exception:
             # Fallback to simple isoformat
             return dt.isoformat() if dt else None
@@ -0,0 +1,85 @@
+"""
+Buggy Call - Request Hourly Rollup Model
+Pre-aggregated request counters per (hotel, location, buggy, driver, hour)
+"""
+from app import db
+from sqlalchemy import Column, Integer, Float, DateTime, Index, UniqueConstraint
+
+
+class RequestHourlyRollup(db.Model):
+    """
+    Hourly request rollup
+
+    One row per (hotel, location, buggy, driver, hour of requested_at).
+    buggy_id / driver_id are 0 while a request has no buggy / driver yet
+    (NULLs would break the unique key used for upserts).
+    Maintained incrementally by RequestRollupService on every flush.
+    """
+
+    __tablename__ = 'request_hourly_rollups'
+
+    # Counter columns (summed by reports, incremented by upserts)
+    COUNTERS = (
+        'total_count',
+        'pending_count',
+        'accepted_count',
+        'completed_count',
+        'cancelled_count',
+        'unanswered_count',
+        'cancelled_by_driver_count',
+        'cancelled_by_guest_count',
+        'cancelled_by_admin_count',
+        'response_time_sum',
+        'response_time_count',
+        'completion_time_sum',
+        'completion_time_count',
+    )
+
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # Dimensions
+    hotel_id = Column(Integer, nullable=False)
+    location_id = Column(Integer, nullable=False, index=True)
+    buggy_id = Column(Integer, nullable=False, default=0)
+    driver_id = Column(Integer, nullable=False, default=0)
+    hour_start = Column(DateTime, nullable=False)  # requested_at truncated to the hour (Cyprus time)
+
+    # Status counts
+    total_count = Column(Integer, nullable=False, default=0)
+    pending_count = Column(Integer, nullable=False, default=0)
+    accepted_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    cancelled_count = Column(Integer, nullable=False, default=0)
+    unanswered_count = Column(Integer, nullable=False, default=0)
+    cancelled_by_driver_count = Column(Integer, nullable=False, default=0)
+    cancelled_by_guest_count = Column(Integer, nullable=False, default=0)
+    cancelled_by_admin_count = Column(Integer, nullable=False, default=0)
+
+    # Time sums (seconds, completed requests only)
+    response_time_sum = Column(Float, nullable=False, default=0)  # requested_at -> accepted_at
+    response_time_count = Column(Integer, nullable=False, default=0)
+    completion_time_sum = Column(Float, nullable=False, default=0)  # requested_at -> completed_at
+    completion_time_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('hotel_id', 'location_id', 'buggy_id', 'driver_id', 'hour_start',
+                         name='uq_request_rollup_key'),
+        Index('idx_request_rollup_hotel_hour', 'hotel_id', 'hour_start'),
+    )
+
+    def __repr__(self):
+        return f'<RequestHourlyRollup hotel={self.hotel_id} loc={self.location_id} {self.hour_start}: {self.total_count}>'
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        result = {
+            'hotel_id': self.hotel_id,
+            'location_id': self.location_id,
+            'buggy_id': self.buggy_id or None,
+            'driver_id': self.driver_id or None,
+            'hour_start': self.hour_start.isoformat() if self.hour_start else None
+        }
+        for name in self.COUNTERS:
+            result[name] = getattr(self, name)
+        return result
@@ -62,23 +62,13 @@ class SystemUser(db.Model, BaseModel):
     
     @property
     def buggy(self):
-        """Get the buggy assigned to this driver (if any)"""
+        """Get the buggy assigned to this driver (if any, resolved once per request)"""
         if self.role != UserRole.DRIVER:
             return None
         
-        from app.models.buggy_driver import BuggyDriver
-        from app.models.buggy import Buggy
-        
-        # Get active buggy association
-        active_assoc = BuggyDriver.query.filter_by(
-            driver_id=self.id,
-            is_primary=True
-        ).first()
-        
-        if active_assoc:
-            return Buggy.query.get(active_assoc.buggy_id)
-        
-        return None
+        # Primary buggy association, one joined query memoized per request
+        from app.utils.driver_context import DriverContextResolver
+        return DriverContextResolver.for_user(self).buggy
     
     def set_password(self, password):
         """Set password hash"""
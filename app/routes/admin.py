@@ -22,9 +22,9 @@ def admin_required(fn):
             flash('Lütfen giriş yapın', 'warning')
             return redirect(url_for('auth.login'))
         
-        # ✅ Cache'den user al (DB sorgusu yerine)
-        from app.utils.decorators import get_current_user_cached
-        user = get_current_user_cached()
+        # ✅ Cache'den principal al (DB sorgusu yerine)
+        from app.utils.decorators import get_current_principal
+        user = get_current_principal()
         
         if not user:
             session.clear()
@@ -7,6 +7,7 @@ from functools import wraps
 from app import db
 from app.models.notification_log import NotificationLog
 from app.models.user import SystemUser, UserRole
+from app.utils.helpers import RequestContext
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_, case
 
@@ -30,7 +31,7 @@ def admin_required(f):
         if 'user_id' not in session:
             return jsonify({'error': 'Authentication required'}), 401
         
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         if not user or user.role != UserRole.ADMIN:
             return jsonify({'error': 'Admin access required'}), 403
         
@@ -304,6 +305,13 @@ def get_background_jobs_status():
                 'old_logs_to_cleanup': old_logs
             }
         
+        # In-process FCM retry scheduler metrics
+        from app.services.fcm_notification_service import FCMNotificationService
+        status['fcm_retries'] = FCMNotificationService.get_retry_stats()
+        
+        from app.services.notification_log_buffer import NotificationLogBuffer
+        status['notification_log_buffer'] = NotificationLogBuffer.get_stats()
+        
         return jsonify(status), 200
         
     except Exception as e:
@@ -12,7 +12,7 @@ from app.models.session import Session as SessionModel
 from app.models.request import BuggyRequest
 from app.models.notification_log import NotificationLog
 from app.services import BuggyService, AuditService
-from app.utils import APIResponse, require_login, require_role, validate_schema, handle_errors
+from app.utils import APIResponse, RequestContext, require_login, require_role, validate_schema, handle_errors
 from app.utils.logger import logger, log_driver_event, log_api_call, log_error
 from app.models import get_current_timestamp
 from datetime import datetime
@@ -117,7 +117,7 @@ def admin_close_driver_session(driver_id):
 def get_admin_sessions():
     """Get all active sessions (admin only)"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
 
         if user.role != UserRole.ADMIN:
             return jsonify({'error': 'Sadece adminler oturumları görüntüleyebilir'}), 403
@@ -143,7 +143,7 @@ def get_admin_sessions():
 def terminate_admin_session(session_id):
     """Terminate a user session (admin only)"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
 
         if user.role != UserRole.ADMIN:
             return jsonify({'error': 'Sadece adminler oturum sonlandırabilir'}), 403
@@ -220,7 +220,7 @@ def assign_driver_to_buggy():
     }
     """
     try:
-        admin = SystemUser.query.get(session['user_id'])
+        admin = RequestContext.get_current_user()
         data = request.get_json()
 
         if not data or 'buggy_id' not in data or 'driver_id' not in data:
@@ -316,7 +316,7 @@ def transfer_driver():
     }
     """
     try:
-        admin = SystemUser.query.get(session['user_id'])
+        admin = RequestContext.get_current_user()
         data = request.get_json()
 
         required_fields = ['driver_id', 'source_buggy_id', 'target_buggy_id']
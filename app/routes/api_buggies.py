@@ -8,7 +8,7 @@ from app.models.buggy import Buggy, BuggyStatus
 from app.models.buggy_driver import BuggyDriver
 from app.models.location import Location
 from app.models import get_current_timestamp
-from app.utils import APIResponse, require_login
+from app.utils import APIResponse, RequestContext, require_login
 from app.utils.buggy_icons import assign_buggy_icon
 from datetime import datetime
 
@@ -21,21 +21,12 @@ api_buggies_bp = Blueprint('api_buggies', __name__)
 def get_buggies():
     """Get all buggies"""
     try:
-        from sqlalchemy.orm import joinedload
+        from app.services.fleet_state_service import FleetStateService
 
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
 
-        # Eager loading ile tüm ilişkileri tek sorguda çek (N+1 problemi çözümü)
-        buggies = Buggy.query.filter_by(hotel_id=user.hotel_id)\
-            .options(
-                joinedload(Buggy.current_location),
-                joinedload(Buggy.driver_associations)
-            ).all()
-
-        result = []
-        for buggy in buggies:
-            buggy_dict = buggy.to_dict()
-            result.append(buggy_dict)
+        # In-memory fleet state (Buggy.to_dict ile aynı alanlar)
+        result = FleetStateService.buggy_dicts(user.hotel_id)
 
         return jsonify({
             'success': True,
@@ -50,7 +41,7 @@ def get_buggies():
 def create_buggy():
     """Create new buggy (driver assignment is optional)"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         data = request.get_json()
 
         if not data.get('code'):
@@ -140,7 +131,7 @@ def create_buggy():
 def get_buggy(buggy_id):
     """Get single buggy"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         buggy = Buggy.query.filter_by(id=buggy_id, hotel_id=user.hotel_id).first()
 
         if not buggy:
@@ -167,7 +158,7 @@ def get_buggy(buggy_id):
 def update_buggy(buggy_id):
     """Update buggy"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         buggy = Buggy.query.filter_by(id=buggy_id, hotel_id=user.hotel_id).first()
 
         if not buggy:
@@ -204,7 +195,7 @@ def update_buggy(buggy_id):
 def delete_buggy(buggy_id):
     """Delete buggy (fails if buggy has active requests)"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         buggy = Buggy.query.filter_by(id=buggy_id, hotel_id=user.hotel_id).first()
 
         if not buggy:
@@ -236,7 +227,7 @@ def delete_buggy(buggy_id):
 def get_drivers():
     """Get all drivers"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         drivers = SystemUser.query.filter_by(hotel_id=user.hotel_id, role=UserRole.DRIVER, is_active=True).all()
 
         return jsonify({
@@ -259,43 +250,9 @@ def get_active_drivers():
         notify_param = request.args.get('notify', 'false')
         notify = notify_param.lower() == 'true' if notify_param else False
 
-        # DEBUG: Tüm buggy'leri kontrol et
-        all_buggies = Buggy.query.filter_by(hotel_id=hotel_id).all()
-        print(f'\n🔍 [DEBUG] Hotel {hotel_id} - Total Buggies: {len(all_buggies)}')
-        for b in all_buggies:
-            print(f'   Buggy {b.code}: status={b.status.value}, location={b.current_location_id}')
-
-        # N+1 FIX: Single query to get all active assignments
-        active_assignments = BuggyDriver.query.join(
-            Buggy, BuggyDriver.buggy_id == Buggy.id
-        ).filter(
-            Buggy.hotel_id == hotel_id,
-            Buggy.status == BuggyStatus.AVAILABLE,
-            BuggyDriver.is_active == True
-        ).all()
-
-        print(f'🟢 [DEBUG] Available Buggies with Active Assignments: {len(active_assignments)}')
-
-        active_drivers = []
-
-        for assignment in active_assignments:
-            buggy = assignment.buggy
-            driver = assignment.driver
-
-            if buggy and driver:
-                print(f'   ✅ Buggy {buggy.code}, Driver: {driver.full_name or driver.username}, FCM: {bool(driver.fcm_token)}')
-                active_drivers.append({
-                    'driver_id': driver.id,
-                    'driver_name': driver.full_name or driver.username,
-                    'buggy_id': buggy.id,
-                    'buggy_code': buggy.code,
-                    'buggy_icon': buggy.icon,
-                    'buggy_status': buggy.status.value,
-                    'has_fcm_token': bool(driver.fcm_token),
-                    'last_active': assignment.last_active_at.isoformat() if assignment.last_active_at else None
-                })
-
-        print(f'👥 [DEBUG] Total Active Drivers: {len(active_drivers)}\n')
+        # In-memory fleet state: müsait buggy'lerin aktif sürücüleri
+        from app.services.fleet_state_service import FleetStateService
+        active_drivers = FleetStateService.active_drivers(hotel_id)
 
         # Eğer notify=true ise, sürücülere WebSocket ile bildirim gönder
         if notify and len(active_drivers) > 0:
@@ -303,9 +260,7 @@ def get_active_drivers():
             location_id = request.args.get('location_id', type=int)
             location_name = 'Bilinmeyen Lokasyon'
             if location_id:
-                location = Location.query.get(location_id)
-                if location:
-                    location_name = location.name
+                location_name = FleetStateService.location_name(hotel_id, location_id) or location_name
 
             # WebSocket event data - hotel_id ve guest_count eklendi
             event_data = {
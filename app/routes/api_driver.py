@@ -4,13 +4,15 @@ Extracted from api_old.py for driver-specific endpoints
 """
 from flask import Blueprint, jsonify, request, session, current_app
 from app import db, csrf, socketio
-from app.models.user import SystemUser, UserRole
+from app.models.user import UserRole
 from app.models.location import Location
 from app.models.buggy import Buggy, BuggyStatus
 from app.models.request import BuggyRequest, RequestStatus
 from app.models.buggy_driver import BuggyDriver
-from app.services import LocationService, BuggyService, FCMNotificationService
-from app.utils import APIResponse, require_login, require_role
+from app.services import (
+    LocationService, BuggyService, FCMNotificationService, AccessMetricsService, PendingRequestNotifier
+)
+from app.utils import APIResponse, RequestContext, require_login, require_role, read_only
 from app.utils.logger import log_driver_event, log_error
 from app.utils.exceptions import BuggyCallException, ForbiddenException, BusinessLogicException
 from datetime import datetime
@@ -28,7 +30,7 @@ csrf.exempt(api_driver_bp)
 def set_initial_location():
     """Set driver's initial location on first login"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user, buggy, _ = RequestContext.get_driver_context()
         data = request.get_json()
         
         if not data or 'location_id' not in data:
@@ -41,7 +43,7 @@ def set_initial_location():
             return jsonify({'error': 'Sadece sürücüler lokasyon ayarlayabilir'}), 403
         
         # Check if driver has buggy
-        if not user.buggy:
+        if not buggy:
             return jsonify({'error': 'Size atanmış buggy bulunamadı'}), 404
         
         # Validate location
@@ -53,8 +55,8 @@ def set_initial_location():
             return jsonify({'error': 'Lokasyon farklı bir otele ait'}), 400
         
         # Set buggy location and status
-        user.buggy.current_location_id = location_id
-        user.buggy.status = BuggyStatus.AVAILABLE
+        buggy.current_location_id = location_id
+        buggy.status = BuggyStatus.AVAILABLE
         
         # Remove location setup flag
         session.pop('needs_location_setup', None)
@@ -66,7 +68,7 @@ def set_initial_location():
         AuditService.log_action(
             action='driver_initial_location_set',
             entity_type='buggy',
-            entity_id=user.buggy.id,
+            entity_id=buggy.id,
             new_values={'location_id': location_id, 'location_name': location.name},
             user_id=user.id,
             hotel_id=user.hotel_id
@@ -76,9 +78,9 @@ def set_initial_location():
         try:
             from app import socketio
             socketio.emit('buggy_status_changed', {
-                'buggy_id': user.buggy.id,
-                'buggy_code': user.buggy.code,
-                'buggy_icon': user.buggy.icon,
+                'buggy_id': buggy.id,
+                'buggy_code': buggy.code,
+                'buggy_icon': buggy.icon,
                 'driver_id': user.id,
                 'driver_name': user.full_name if user.full_name else user.username,
                 'location_id': location_id,
@@ -93,7 +95,7 @@ def set_initial_location():
         # Emit buggy status update for real-time dashboard
         try:
             from app.services.buggy_service import BuggyService
-            BuggyService.emit_buggy_status_update(user.buggy.id, user.hotel_id)
+            BuggyService.emit_buggy_status_update(buggy.id, user.hotel_id)
             print(f'[INITIAL_LOCATION] Emitted buggy status update')
         except Exception as e:
             print(f'[INITIAL_LOCATION] Error emitting buggy status: {e}')
@@ -101,7 +103,7 @@ def set_initial_location():
         return jsonify({
             'success': True,
             'message': 'Lokasyon ayarlandı, sisteme hoş geldiniz!',
-            'buggy': user.buggy.to_dict()
+            'buggy': buggy.to_dict()
         }), 200
         
     except Exception as e:
@@ -116,7 +118,7 @@ def set_initial_location():
 def set_driver_location():
     """Set or update driver's current location"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user, buggy, _ = RequestContext.get_driver_context()
         
         # User kontrolü
         if not user:
@@ -138,7 +140,7 @@ def set_driver_location():
             return jsonify({'error': 'Sadece sürücüler lokasyon ayarlayabilir'}), 403
         
         # Check if driver has buggy
-        if not user.buggy:
+        if not buggy:
             return jsonify({'error': 'Size atanmış buggy bulunamadı. Lütfen yöneticinizle iletişime geçin.'}), 404
         
         # Validate location
@@ -150,12 +152,12 @@ def set_driver_location():
             return jsonify({'error': 'Lokasyon farklı bir otele ait'}), 400
         
         # Store old location for audit
-        old_location_id = user.buggy.current_location_id
-        old_location_name = user.buggy.current_location.name if user.buggy.current_location else None
+        old_location_id = buggy.current_location_id
+        old_location_name = buggy.current_location.name if buggy.current_location else None
         
         # Update buggy location and set to available
-        user.buggy.current_location_id = location_id
-        user.buggy.status = BuggyStatus.AVAILABLE
+        buggy.current_location_id = location_id
+        buggy.status = BuggyStatus.AVAILABLE
         
         db.session.commit()
         
@@ -164,7 +166,7 @@ def set_driver_location():
         AuditService.log_action(
             action='driver_location_updated',
             entity_type='buggy',
-            entity_id=user.buggy.id,
+            entity_id=buggy.id,
             old_values={'location_id': old_location_id, 'location_name': old_location_name},
             new_values={'location_id': location_id, 'location_name': location.name},
             user_id=user.id,
@@ -176,19 +178,19 @@ def set_driver_location():
         
         # Emit location update event
         socketio.emit('driver_location_updated', {
-            'buggy_id': user.buggy.id,
-            'buggy_code': user.buggy.code,
+            'buggy_id': buggy.id,
+            'buggy_code': buggy.code,
             'driver_name': user.full_name,
             'location_id': location_id,
             'location_name': location.name,
-            'status': user.buggy.status.value
+            'status': buggy.status.value
         }, room=f'hotel_{user.hotel_id}_admin')
         
         # Emit buggy status changed event for full dashboard update
         socketio.emit('buggy_status_changed', {
-            'buggy_id': user.buggy.id,
-            'buggy_code': user.buggy.code,
-            'buggy_icon': user.buggy.icon,
+            'buggy_id': buggy.id,
+            'buggy_code': buggy.code,
+            'buggy_icon': buggy.icon,
             'driver_id': user.id,
             'driver_name': user.full_name if user.full_name else user.username,
             'location_id': location_id,
@@ -202,7 +204,7 @@ def set_driver_location():
         return jsonify({
             'success': True,
             'message': 'Konumunuz güncellendi',
-            'buggy': user.buggy.to_dict()
+            'buggy': buggy.to_dict()
         }), 200
         
     except Exception as e:
@@ -216,7 +218,7 @@ def set_driver_location():
 def driver_accept_request(request_id):
     """Accept a PENDING buggy request"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user, buggy, _ = RequestContext.get_driver_context()
         
         if not user:
             return jsonify({'error': 'Kullanıcı bulunamadı'}), 404
@@ -224,14 +226,14 @@ def driver_accept_request(request_id):
         if user.role != UserRole.DRIVER:
             return jsonify({'error': 'Sadece sürücüler talep kabul edebilir'}), 403
         
-        if not user.buggy:
+        if not buggy:
             return jsonify({'error': 'Size atanmış buggy bulunamadı. Lütfen yöneticinizle iletişime geçin.'}), 404
 
         # Use RequestService for validation + DB update + FCM (with row-level locking)
         from app.services.request_service import RequestService
         buggy_request = RequestService.accept_request(
             request_id=request_id,
-            buggy_id=user.buggy.id,
+            buggy_id=buggy.id,
             driver_id=user.id
         )
 
@@ -241,7 +243,7 @@ def driver_accept_request(request_id):
         # Notify guest
         socketio.emit('request_accepted', {
             'request_id': buggy_request.id,
-            'buggy': user.buggy.to_dict(),
+            'buggy': buggy.to_dict(),
             'driver': user.to_dict()
         }, room=f'request_{buggy_request.id}')
         
@@ -249,12 +251,12 @@ def driver_accept_request(request_id):
         socketio.emit('request_status_changed', {
             'request_id': buggy_request.id,
             'status': 'accepted',
-            'buggy_code': user.buggy.code
+            'buggy_code': buggy.code
         }, room=f'hotel_{user.hotel_id}_admin')
         
         # Emit buggy status change
         socketio.emit('buggy_status_changed', {
-            'buggy_id': user.buggy.id,
+            'buggy_id': buggy.id,
             'status': 'busy',
             'location_name': buggy_request.location.name if buggy_request.location else None
         }, room=f'hotel_{user.hotel_id}_admin')
@@ -285,7 +287,7 @@ def driver_accept_request(request_id):
 def driver_complete_request(request_id):
     """Mark an accepted request as completed"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user, buggy, _ = RequestContext.get_driver_context()
         
         if not user:
             return jsonify({'error': 'Kullanıcı bulunamadı'}), 404
@@ -293,7 +295,7 @@ def driver_complete_request(request_id):
         if user.role != UserRole.DRIVER:
             return jsonify({'error': 'Sadece sürücüler talep tamamlayabilir'}), 403
         
-        if not user.buggy:
+        if not buggy:
             return jsonify({'error': 'Size atanmış buggy bulunamadı. Lütfen yöneticinizle iletişime geçin.'}), 404
         
         data = request.get_json() or {}
@@ -325,7 +327,7 @@ def driver_complete_request(request_id):
         
         # Buggy status değişikliğini bildir
         socketio.emit('buggy_status_changed', {
-            'buggy_id': user.buggy.id,
+            'buggy_id': buggy.id,
             'status': 'available',
             'location_id': completion_location_id,
             'location_name': completion_location.name if completion_location_id and buggy_request.completion_location else None
@@ -355,13 +357,35 @@ def driver_complete_request(request_id):
 # Rate limiter removed
 @require_login
 @require_role('driver')
+@read_only
 def get_pending_requests():
-    """Get all pending requests for driver's hotel"""
+    """
+    Get all pending requests for driver's hotel (read-only, counted in access metrics)
+    
+    Long-poll: pass since=<version from the previous response> and
+    optionally wait=<seconds> (max DRIVER_LONG_POLL_MAX_WAIT). The request
+    parks until the hotel's PENDING set changes or the wait expires; an
+    unchanged timeout returns {changed: false, version} without any query.
+    """
     try:
-        user = SystemUser.query.get(session['user_id'])
+        since = request.args.get('since', type=int)
+        principal = RequestContext.get_principal()
+        hotel_id = principal.hotel_id
+        
+        if since is not None:
+            db.session.rollback()  # park without holding a DB connection
+            max_wait = current_app.config.get('DRIVER_LONG_POLL_MAX_WAIT', 25)
+            wait = max(0, min(request.args.get('wait', max_wait, type=int), max_wait))
+            version, changed = PendingRequestNotifier.wait(hotel_id, since, wait)
+            if not changed:
+                AccessMetricsService.record('driver.pending_requests.unchanged', principal.id, hotel_id)
+                return jsonify({'success': True, 'changed': False, 'version': version}), 200
+        else:
+            # Read before querying: a change during the query shows up as a newer version
+            version = PendingRequestNotifier.version(hotel_id)
         
         # Check if driver has assigned buggy
-        if not user.buggy:
+        if not principal.buggy_id:
             return jsonify({'success': False, 'error': 'No buggy assigned'}), 400
         
         # Query PENDING requests for the hotel with location eager loading
@@ -371,13 +395,13 @@ def get_pending_requests():
         pending_requests = BuggyRequest.query\
             .options(joinedload(BuggyRequest.location))\
             .filter_by(
-                hotel_id=user.hotel_id,
+                hotel_id=hotel_id,
                 status=RequestStatus.PENDING
             )\
             .order_by(BuggyRequest.requested_at.desc())\
             .all()
         
-        print(f'📋 Found {len(pending_requests)} pending requests for hotel {user.hotel_id}')
+        print(f'📋 Found {len(pending_requests)} pending requests for hotel {hotel_id}')
         
         # Serialize with location and guest info
         requests_data = [{
@@ -393,25 +417,15 @@ def get_pending_requests():
             'notes': req.notes
         } for req in pending_requests]
         
-        # Log fetch action for debugging
-        try:
-            from app.services.audit_service import AuditService
-            AuditService.log_action(
-                action='driver_fetched_pending_requests',
-                entity_type='request',
-                entity_id=None,
-                new_values={'count': len(pending_requests)},
-                user_id=user.id,
-                hotel_id=user.hotel_id
-            )
-        except Exception as log_error:
-            # Logging failure should not break the API
-            print(f"Audit log failed: {log_error}")
-        
-        print(f'✅ Returning {len(requests_data)} pending requests to driver {user.username}')
+        # Count the poll (in memory, no audit row)
+        AccessMetricsService.record('driver.pending_requests', principal.id, hotel_id, items=len(pending_requests))
+        
+        print(f'✅ Returning {len(requests_data)} pending requests to driver {principal.id}')
         
         return jsonify({
             'success': True,
+            'changed': True,
+            'version': version,
             'requests': requests_data,
             'total': len(requests_data)
         }), 200
@@ -424,13 +438,14 @@ def get_pending_requests():
 # Rate limiter removed
 @require_login
 @require_role('driver')
+@read_only
 def get_active_request():
-    """Get driver's currently active request"""
+    """Get driver's currently active request (read-only, counted in access metrics)"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        principal = RequestContext.get_principal()
         
         # Check if driver has assigned buggy
-        if not user.buggy:
+        if not principal.buggy_id:
             return jsonify({'success': False, 'error': 'No buggy assigned'}), 400
         
         # Find accepted request assigned to this buggy
@@ -440,26 +455,16 @@ def get_active_request():
         active_request = BuggyRequest.query\
             .options(joinedload(BuggyRequest.location))\
             .filter_by(
-                buggy_id=user.buggy.id,
+                buggy_id=principal.buggy_id,
                 status=RequestStatus.ACCEPTED
             )\
             .first()
         
+        # Count the poll (in memory, no audit row)
+        AccessMetricsService.record('driver.active_request', principal.id, principal.hotel_id,
+                                    items=1 if active_request else 0)
+        
         if not active_request:
-            # Log fetch action
-            try:
-                from app.services.audit_service import AuditService
-                AuditService.log_action(
-                    action='driver_fetched_active_request',
-                    entity_type='request',
-                    entity_id=None,
-                    new_values={'has_active': False},
-                    user_id=user.id,
-                    hotel_id=user.hotel_id
-                )
-            except Exception as log_error:
-                print(f"Audit log failed: {log_error}")
-            
             return jsonify({
                 'success': True,
                 'request': None
@@ -481,20 +486,6 @@ def get_active_request():
             'status': active_request.status.value
         }
         
-        # Log fetch action
-        try:
-            from app.services.audit_service import AuditService
-            AuditService.log_action(
-                action='driver_fetched_active_request',
-                entity_type='request',
-                entity_id=active_request.id,
-                new_values={'has_active': True, 'request_id': active_request.id},
-                user_id=user.id,
-                hotel_id=user.hotel_id
-            )
-        except Exception as log_error:
-            print(f"Audit log failed: {log_error}")
-        
         return jsonify({
             'success': True,
             'request': request_data
@@ -511,7 +502,7 @@ def get_active_request():
 def get_driver_shuttle_info():
     """Get driver's assigned shuttle information"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user, buggy, _ = RequestContext.get_driver_context()
         
         # User kontrolü
         if not user:
@@ -520,7 +511,7 @@ def get_driver_shuttle_info():
                 'error': 'Kullanıcı bulunamadı'
             }), 404
         
-        if not user.buggy:
+        if not buggy:
             return jsonify({
                 'success': False,
                 'error': 'Size atanmış shuttle bulunamadı. Lütfen yöneticinizle iletişime geçin.'
@@ -529,11 +520,11 @@ def get_driver_shuttle_info():
         return jsonify({
             'success': True,
             'buggy': {  # Keep 'buggy' key for backward compatibility
-                'id': user.buggy.id,
-                'code': user.buggy.code,
-                'model': user.buggy.model,
-                'icon': user.buggy.icon,
-                'status': user.buggy.status.value if hasattr(user.buggy.status, 'value') else str(user.buggy.status)
+                'id': buggy.id,
+                'code': buggy.code,
+                'model': buggy.model,
+                'icon': buggy.icon,
+                'status': buggy.status.value if hasattr(buggy.status, 'value') else str(buggy.status)
             }
         }), 200
         
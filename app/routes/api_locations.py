@@ -4,10 +4,9 @@ Extracted from api.py for modularity
 """
 from flask import Blueprint, jsonify, request, session, current_app, send_file
 from app import db
-from app.models.user import SystemUser
 from app.models.location import Location
 from app.services import LocationService
-from app.utils import APIResponse, require_login
+from app.utils import APIResponse, RequestContext, require_login
 from app.utils.exceptions import BuggyCallException, ResourceNotFoundException, ValidationException
 import qrcode
 import io
@@ -108,7 +107,7 @@ def get_location(location_id):
 @require_login
 def create_location():
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         if request.files:
             data = request.form.to_dict()
             image_file = request.files.get('location_image')
@@ -187,7 +186,7 @@ def create_location():
 @require_login
 def update_location(location_id):
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         location = Location.query.filter_by(id=location_id, hotel_id=user.hotel_id).first()
         if not location:
             return jsonify({'error': 'Lokasyon bulunamadı'}), 404
@@ -276,7 +275,7 @@ def update_location(location_id):
 @require_login
 def regenerate_qr_code(location_id):
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         location = Location.query.filter_by(id=location_id, hotel_id=user.hotel_id).first()
         if not location:
             return jsonify({'error': 'Lokasyon bulunamadı'}), 404
@@ -316,7 +315,7 @@ def regenerate_qr_code(location_id):
 @require_login
 def delete_location(location_id):
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         location = Location.query.filter_by(id=location_id, hotel_id=user.hotel_id).first()
         if not location:
             return jsonify({'error': 'Lokasyon bulunamadı'}), 404
@@ -4,20 +4,26 @@ Extracted from api.py for modularity
 """
 from flask import Blueprint, jsonify, request, session, current_app
 from app import db, csrf
-from app.models.user import SystemUser
+from app.models.user import UserRole
 from app.models.location import Location
 from app.models.buggy import Buggy, BuggyStatus
 from app.models.request import BuggyRequest, RequestStatus
 from app.utils import require_login, require_role
-from app.utils.exceptions import BuggyCallException, ForbiddenException, BusinessLogicException
+from app.utils.exceptions import BuggyCallException, ForbiddenException, BusinessLogicException, ValidationException
 from app.utils.logger import logger, log_request_event, log_websocket_event, log_error
-from app.utils.helpers import RequestContext
+from app.utils.helpers import RequestContext, Pagination
+from app.websocket.emit_router import EmitRouter
+from datetime import datetime
 
 api_requests_bp = Blueprint('api_requests', __name__)
 
 # CSRF exempt for API endpoints
 csrf.exempt(api_requests_bp)
 
+# GET /api/requests sayfa boyutu (sunucu tarafında sınırlandırılır)
+REQUESTS_PAGE_SIZE = 50
+REQUESTS_MAX_PAGE_SIZE = 100
+
 
 # ==================== Requests API ====================
 
@@ -58,8 +64,6 @@ def create_request():
         })
 
         # Emit WebSocket event for drivers and admins
-        from app import socketio
-
         # Prepare event data safely
         try:
             location_dict = location.to_dict()
@@ -88,21 +92,12 @@ def create_request():
         except Exception as sse_error:
             log_error('SSE_NOTIFICATION', str(sse_error), {'request_id': buggy_request.id})
 
-        # Send via WebSocket to DRIVERS
-        try:
-            drivers_room = f'hotel_{location.hotel_id}_drivers'
-            socketio.emit('new_request', event_data, room=drivers_room, namespace='/')
-            log_websocket_event('WS_NEW_REQUEST_DRIVERS', {'request_id': buggy_request.id, 'room': drivers_room})
-        except Exception as ws_error:
-            log_error('WS_NOTIFICATION_DRIVERS', str(ws_error), {'request_id': buggy_request.id})
-
-        # Send via WebSocket to admin
+        # Send via WebSocket to hotel drivers + admin (one emit)
         try:
-            admin_room = f'hotel_{location.hotel_id}_admin'
-            socketio.emit('new_request', event_data, room=admin_room, namespace='/')
-            log_websocket_event('WS_NEW_REQUEST_ADMIN', {'request_id': buggy_request.id, 'room': admin_room})
+            rooms = EmitRouter.emit('new_request', event_data, hotel_id=location.hotel_id)
+            log_websocket_event('WS_NEW_REQUEST', {'request_id': buggy_request.id, 'rooms': rooms})
         except Exception as ws_error:
-            log_error('WS_NOTIFICATION_ADMIN', str(ws_error), {'request_id': buggy_request.id})
+            log_error('WS_NOTIFICATION', str(ws_error), {'request_id': buggy_request.id})
 
         # Note: FCM notification is already sent by RequestService.create_request()
 
@@ -148,15 +143,30 @@ def create_request():
 @api_requests_bp.route('/api/requests', methods=['GET'])
 @require_login
 def get_requests():
-    """Get all requests (Admin/Driver)"""
+    """
+    Get requests, newest first (Admin/Driver)
+
+    Keyset-paginated on (requested_at, id). Query params: status, buggy_id,
+    start_date, end_date (ISO), limit (max REQUESTS_MAX_PAGE_SIZE), cursor
+    (next_cursor of the previous page), include_total=1 (approximate total
+    from hourly rollups, no COUNT(*)).
+    """
     try:
         from sqlalchemy.orm import joinedload
 
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
 
         # Get query parameters
         status_str = request.args.get('status')
         buggy_id = request.args.get('buggy_id')
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', '').lower() in ('1', 'true', 'yes')
+        try:
+            limit = int(request.args.get('limit', REQUESTS_PAGE_SIZE))
+            start_date = datetime.fromisoformat(request.args['start_date']) if request.args.get('start_date') else None
+            end_date = datetime.fromisoformat(request.args['end_date']) if request.args.get('end_date') else None
+        except ValueError:
+            raise ValidationException('Geçersiz limit veya tarih parametresi')
 
         # Build query with eager loading (N+1 problemi cozumu)
         query = BuggyRequest.query.filter_by(hotel_id=user.hotel_id)\
@@ -164,11 +174,11 @@ def get_requests():
                 joinedload(BuggyRequest.location),
                 joinedload(BuggyRequest.completion_location),
                 joinedload(BuggyRequest.buggy).joinedload(Buggy.current_location),
-                joinedload(BuggyRequest.buggy).joinedload(Buggy.driver_associations),
                 joinedload(BuggyRequest.accepted_by_driver)
             )
 
         # Handle status filter - convert string to enum
+        status_enum = None
         if status_str:
             try:
                 status_enum = RequestStatus(status_str.upper())
@@ -179,8 +189,24 @@ def get_requests():
         if buggy_id:
             query = query.filter_by(buggy_id=buggy_id)
 
-        # Get requests
-        requests = query.order_by(BuggyRequest.requested_at.desc()).all()
+        if start_date:
+            query = query.filter(BuggyRequest.requested_at >= start_date)
+
+        if end_date:
+            query = query.filter(BuggyRequest.requested_at <= end_date)
+
+        # Get one page (keyset: requested_at DESC, id DESC)
+        page = Pagination.keyset(
+            query,
+            (BuggyRequest.requested_at, BuggyRequest.id),
+            cursor=cursor,
+            limit=limit,
+            max_limit=REQUESTS_MAX_PAGE_SIZE
+        )
+        requests = page['items']
+
+        # İç içe buggy dict'leri için sürücü bilgilerini toplu yükle (buggy başına sorgu yok)
+        Buggy.prefetch_related(req.buggy for req in requests)
 
         result = []
         for req in requests:
@@ -243,10 +269,26 @@ def get_requests():
                 log_error('GET_REQUESTS_ITEM', str(req_error), {'request_id': req.id})
                 continue
 
-        return jsonify({
+        response = {
             'success': True,
-            'requests': result
-        }), 200
+            'requests': result,
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more'],
+            'limit': page['limit']
+        }
+        if include_total:
+            from app.services.request_rollup_service import RequestRollupService
+            response['approx_total'] = RequestRollupService.approximate_count(
+                user.hotel_id,
+                status=status_enum,
+                buggy_id=buggy_id,
+                start_date=start_date,
+                end_date=end_date
+            )
+
+        return jsonify(response), 200
+    except ValidationException as e:
+        return jsonify({'error': e.message}), 400
     except Exception as e:
         current_app.logger.error(f'Error in get_requests: {str(e)}')
         return jsonify({'error': str(e)}), 500
@@ -302,10 +344,9 @@ def get_request(request_id):
 def accept_request(request_id):
     """Accept request (Driver)"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user, buggy, _ = RequestContext.get_driver_context()
 
         # Get driver's buggy via association
-        buggy = user.buggy
         if not buggy:
             log_error('ACCEPT_REQUEST', 'Buggy bulunamadi', {'user_id': user.id, 'request_id': request_id})
             return jsonify({'error': 'Bu kullaniciya atanmis buggy bulunamadi'}), 404
@@ -318,13 +359,12 @@ def accept_request(request_id):
             driver_id=user.id
         )
 
-        # Emit WebSocket event for guest
-        from app import socketio
-        socketio.emit('request_accepted', {
+        # Emit WebSocket event for guest (buggy details)
+        EmitRouter.emit('request_accepted', {
             'request_id': buggy_request.id,
             'buggy': buggy.to_dict(),
             'accepted_at': buggy_request.accepted_at.isoformat()
-        }, room=f'request_{request_id}')
+        }, request_id=request_id, audiences=('guest',))
 
         # Emit to other drivers that this request is taken (via SSE)
         from app.routes.sse import send_to_all_drivers
@@ -333,9 +373,9 @@ def accept_request(request_id):
         })
 
         # Emit via WebSocket for backward compatibility
-        socketio.emit('request_taken', {
+        EmitRouter.emit('request_taken', {
             'request_id': buggy_request.id
-        }, room=f'hotel_{buggy_request.hotel_id}_drivers')
+        }, hotel_id=buggy_request.hotel_id)
 
         # Emit buggy status update for real-time dashboard
         try:
@@ -365,10 +405,10 @@ def accept_request(request_id):
 def complete_request(request_id):
     """Complete a buggy request and update buggy location"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user, buggy, _ = RequestContext.get_driver_context()
 
         # Check if driver has assigned buggy
-        if not user.buggy:
+        if not buggy:
             return jsonify({'success': False, 'error': 'No buggy assigned'}), 400
 
         data = request.get_json() or {}
@@ -397,7 +437,7 @@ def complete_request(request_id):
             return jsonify({'success': False, 'error': 'Request not found'}), 404
 
         # Verify request is assigned to driver's buggy
-        if buggy_request.buggy_id != user.buggy.id:
+        if buggy_request.buggy_id != buggy.id:
             return jsonify({'success': False, 'error': 'Request not assigned to your buggy'}), 403
 
         # Verify request status is ACCEPTED
@@ -425,8 +465,8 @@ def complete_request(request_id):
                     'completed_at': buggy_request.completed_at.isoformat() if buggy_request.completed_at else None
                 },
                 'buggy': {
-                    'id': user.buggy.id,
-                    'status': user.buggy.status.value,
+                    'id': buggy.id,
+                    'status': buggy.status.value,
                     'current_location': {
                         'id': location.id,
                         'name': location.name
@@ -478,16 +518,11 @@ def cancel_request(request_id):
 
         db.session.commit()
 
-        # Emit WebSocket event
-        from app import socketio
-        socketio.emit('request_cancelled', {
+        # Emit WebSocket event (guest; drivers too if a buggy was assigned)
+        EmitRouter.emit('request_cancelled', {
             'request_id': buggy_request.id
-        }, room=f'request_{request_id}')
-
-        if old_status == RequestStatus.ACCEPTED:
-            socketio.emit('request_cancelled', {
-                'request_id': buggy_request.id
-            }, room=f'hotel_{buggy_request.hotel_id}_drivers')
+        }, hotel_id=buggy_request.hotel_id, request_id=request_id,
+            audiences=('guest', 'drivers') if old_status == RequestStatus.ACCEPTED else ('guest',))
 
         return jsonify({
             'success': True,
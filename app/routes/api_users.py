@@ -10,7 +10,7 @@ from app.models.location import Location
 from app.models.buggy import Buggy, BuggyStatus
 from app.models.buggy_driver import BuggyDriver
 from app.services import AuthService
-from app.utils import APIResponse, require_login, require_role, validate_schema
+from app.utils import APIResponse, RequestContext, require_login, require_role, validate_schema
 from app.utils.decorators import get_current_user_cached, invalidate_user_cache
 from app.utils.exceptions import BuggyCallException
 from app.schemas import UserCreateSchema
@@ -26,7 +26,7 @@ def reset_user_password(user_id):
     """Reset user password to temporary password (Admin only)"""
     try:
         # Check if user is admin
-        admin = SystemUser.query.get(session['user_id'])
+        admin = RequestContext.get_principal()
         if not admin or admin.role != UserRole.ADMIN:
             return jsonify({'error': 'Bu işlem için yetkiniz yok'}), 403
 
@@ -61,7 +61,7 @@ def create_user():
     """Create new user (Admin only)"""
     try:
         # Check if user is admin
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         if not user or user.role != UserRole.ADMIN:
             return jsonify({'error': 'Bu işlem için yetkiniz yok'}), 403
 
@@ -123,7 +123,7 @@ def get_user(user_id):
     Kullanıcı bilgilerini getir (Admin veya kendi bilgisi)
     """
     try:
-        current_user = SystemUser.query.get(session['user_id'])
+        current_user = RequestContext.get_principal()
 
         # Admin değilse sadece kendi bilgisini görebilir
         if current_user.role != UserRole.ADMIN and current_user.id != user_id:
@@ -167,7 +167,7 @@ def update_user(user_id):
     Kullanıcı bilgilerini güncelle (Admin veya kendi bilgisi)
     """
     try:
-        current_user = SystemUser.query.get(session['user_id'])
+        current_user = RequestContext.get_principal()
 
         # Admin değilse sadece kendi bilgisini güncelleyebilir
         if current_user.role != UserRole.ADMIN and current_user.id != user_id:
@@ -245,7 +245,7 @@ def delete_user(user_id):
     Kullanıcıyı sil (Sadece Admin)
     """
     try:
-        current_user = SystemUser.query.get(session['user_id'])
+        current_user = RequestContext.get_principal()
 
         # Sadece admin silebilir
         if current_user.role != UserRole.ADMIN:
@@ -314,21 +314,12 @@ def get_buggies_locations():
     """Get all buggies with their current locations (Admin only)"""
     try:
         from app.utils.helpers import RequestContext
-        from sqlalchemy.orm import joinedload
+        from app.services.fleet_state_service import FleetStateService
 
         hotel_id = RequestContext.get_current_hotel_id()
 
-        # Eager loading ile tüm ilişkileri tek sorguda çek (N+1 problemi çözümü)
-        buggies = Buggy.query.filter_by(hotel_id=hotel_id)\
-            .options(
-                joinedload(Buggy.current_location),
-                joinedload(Buggy.driver_associations)
-            ).all()
-
-        result = []
-        for buggy in buggies:
-            buggy_data = buggy.to_dict()
-            result.append(buggy_data)
+        # In-memory fleet state (Buggy.to_dict ile aynı alanlar)
+        result = FleetStateService.buggy_dicts(hotel_id)
 
         return jsonify({
             'success': True,
@@ -345,7 +336,7 @@ def get_buggies_locations():
 def update_buggy_location(buggy_id):
     """Update buggy's current location (Driver or Admin)"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         data = request.get_json()
 
         if not data or 'location_id' not in data:
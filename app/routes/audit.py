@@ -16,14 +16,34 @@ audit_bp = Blueprint('audit', __name__)
 @require_login
 @require_role('admin')
 def get_audit_trail():
-    """Get audit trail (Admin only)"""
+    """
+    Get audit trail, newest first (Admin only)
+    
+    Keyset-paginated on (created_at, id). Query params: user_id, action,
+    entity_type, date_from, date_to (ISO), limit, cursor (next_cursor of the
+    previous page). Entries older than AUDIT_HOT_RETENTION_DAYS are served
+    by /audit/archive.
+    """
+    return _audit_page(archive=False)
+
+
+@audit_bp.route('/audit/archive', methods=['GET'])
+# Rate limiter removed
+@require_login
+@require_role('admin')
+def get_audit_archive():
+    """Get archived audit trail entries, same parameters as /audit (Admin only)"""
+    return _audit_page(archive=True)
+
+
+def _audit_page(archive):
     try:
         from app.utils.helpers import RequestContext
         hotel_id = RequestContext.get_current_hotel_id()
         
         # Get query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', request.args.get('per_page', 50, type=int), type=int)
         
         # Build filters
         filters = {}
@@ -42,8 +62,9 @@ def get_audit_trail():
         result = AuditService.get_audit_trail(
             hotel_id=hotel_id,
             filters=filters,
-            page=page,
-            per_page=per_page
+            cursor=cursor,
+            limit=limit,
+            archive=archive
         )
         
         return APIResponse.success(result)
@@ -61,6 +82,7 @@ def get_audit_trail():
 def get_audit_stats():
     """Get audit trail statistics (Admin only)"""
     try:
+        from app import db
         from app.utils.helpers import RequestContext
         from app.models.audit import AuditTrail
         from sqlalchemy import func
@@ -179,14 +201,13 @@ def update_audit_log(audit_id):
 @require_login
 @require_role('admin')
 def get_suspicious_activity():
-    """Get suspicious activity logs (Admin only)"""
+    """Get suspicious activity logs, keyset-paginated like /audit (Admin only)"""
     try:
         from app.utils.helpers import RequestContext
-        from app.models.audit import AuditTrail
         
         hotel_id = RequestContext.get_current_hotel_id()
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', request.args.get('per_page', 50, type=int), type=int)
         
         # Get suspicious activities
         suspicious_actions = [
@@ -197,21 +218,14 @@ def get_suspicious_activity():
             'suspicious_bulk_operation'
         ]
         
-        query = AuditTrail.query.filter(
-            AuditTrail.hotel_id == hotel_id,
-            AuditTrail.action.in_(suspicious_actions)
-        ).order_by(AuditTrail.created_at.desc())
-        
-        total = query.count()
-        items = query.limit(per_page).offset((page - 1) * per_page).all()
+        result = AuditService.get_audit_trail(
+            hotel_id=hotel_id,
+            filters={'actions': suspicious_actions},
+            cursor=cursor,
+            limit=limit
+        )
         
-        return APIResponse.success({
-            'items': [item.to_dict() for item in items],
-            'total': total,
-            'page': page,
-            'per_page': per_page,
-            'pages': (total + per_page - 1) // per_page
-        })
+        return APIResponse.success(result)
         
     except BuggyCallException as e:
         return jsonify(e.to_dict()), e.status_code
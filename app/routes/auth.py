@@ -4,7 +4,7 @@ Buggy Call - Authentication Routes
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from app import db, csrf, limiter
-from app.models.user import SystemUser
+from app.utils.helpers import RequestContext
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -126,7 +126,7 @@ def change_password_submit():
             return jsonify({'error': 'Şifre en az 6 karakter olmalı'}), 400
         
         # Get user
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_current_user()
         if not user:
             return jsonify({'error': 'Kullanıcı bulunamadı'}), 404
         
@@ -20,9 +20,9 @@ def driver_required(fn):
             flash('Lütfen giriş yapın', 'warning')
             return redirect(url_for('auth.login'))
         
-        # ✅ Cache'den user al (DB sorgusu yerine)
-        from app.utils.decorators import get_current_user_cached
-        user = get_current_user_cached()
+        # ✅ Cache'den principal al (DB sorgusu yerine)
+        from app.utils.decorators import get_current_principal
+        user = get_current_principal()
         
         if not user:
             session.clear()
@@ -47,12 +47,12 @@ def select_location():
         if not session.get('needs_location_setup'):
             return redirect(url_for('driver.dashboard'))
         
-        # Cache'den user al
-        from app.utils.decorators import get_current_user_cached
-        user = get_current_user_cached()
+        # Sürücü, buggy ve atama tek sorguda (request başına bir kez)
+        from app.utils.helpers import RequestContext
+        user, buggy, _ = RequestContext.get_driver_context()
         
         # Sürücüye buggy atanmış mı kontrol et
-        if not user or not user.buggy:
+        if not user or not buggy:
             flash('Size henüz bir buggy atanmamış. Lütfen yöneticinizle iletişime geçin.', 'warning')
             session.pop('needs_location_setup', None)
             return redirect(url_for('auth.login'))
@@ -75,9 +75,9 @@ def select_location():
 def dashboard():
     """Driver dashboard"""
     try:
-        # ✅ Cache'den user al
-        from app.utils.decorators import get_current_user_cached
-        user = get_current_user_cached()
+        # ✅ Sürücü, buggy ve atama tek sorguda (request başına bir kez)
+        from app.utils.helpers import RequestContext
+        user, buggy, assignment = RequestContext.get_driver_context()
         
         if not user:
             flash('Kullanıcı bilgisi alınamadı', 'danger')
@@ -94,7 +94,7 @@ def dashboard():
             return redirect(url_for('auth.change_password'))
         
         # Sürücüye buggy atanmış mı kontrol et
-        if not user.buggy:
+        if not buggy:
             flash('Size henüz bir buggy atanmamış. Lütfen yöneticinizle iletişime geçin.', 'warning')
             session.clear()
             return redirect(url_for('auth.login'))
@@ -104,22 +104,18 @@ def dashboard():
             return redirect(url_for('driver.select_location'))
         
         # If somehow location is missing, redirect to location setup
-        if not user.buggy.current_location_id:
+        if not buggy.current_location_id:
             session['needs_location_setup'] = True
             return redirect(url_for('driver.select_location'))
         
         # ✅ Set driver as active when dashboard loads
-        from app.models.buggy_driver import BuggyDriver
         from app import db
-        assignment = BuggyDriver.query.filter_by(
-            buggy_id=user.buggy.id,
-            driver_id=user.id
-        ).first()
-        
         if assignment and not assignment.is_active:
             assignment.is_active = True
-            assignment.last_active_at = user.buggy.updated_at  # Use existing timestamp
+            assignment.last_active_at = buggy.updated_at  # Use existing timestamp
             db.session.commit()
+            from app.services.fcm_notification_service import FCMNotificationService
+            FCMNotificationService.invalidate_dispatch_roster(buggy.hotel_id)  # yeni talepler bu sürücüye de gitsin
             print(f'✅ [DRIVER_DASHBOARD] Driver {user.full_name} set to active')
         
         return render_template('driver/dashboard.html', 
@@ -4,6 +4,7 @@ Session-based authentication
 """
 from flask import Blueprint, request, jsonify, session
 from app.services.fcm_notification_service import FCMNotificationService
+from app.utils.retry_scheduler import PendingRetry
 from app.models.user import SystemUser
 from app import db
 import logging
@@ -152,6 +153,14 @@ def test_notification():
                 'user_id': user_id,
                 'status': 'sent'
             }), 200
+        elif isinstance(success, PendingRetry):
+            logger.warning(f"⏳ Test bildirimi yeniden denenecek: User {user_id}")
+            return jsonify({
+                'success': True,
+                'message': 'Test bildirimi ilk denemede gönderilemedi, yeniden denenecek',
+                'user_id': user_id,
+                'status': 'retry_scheduled'
+            }), 202
         else:
             logger.error(f"❌ Test bildirimi gönderilemedi: User {user_id}")
             return jsonify({
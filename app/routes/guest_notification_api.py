@@ -13,6 +13,7 @@ from app.constants import (
     SUCCESS_MESSAGES,
     HttpStatus
 )
+from app.utils.retry_scheduler import PendingRetry
 from datetime import datetime, timedelta
 import logging
 
@@ -24,36 +25,6 @@ guest_notification_api_bp = Blueprint('guest_notification_api', __name__)
 csrf.exempt(guest_notification_api_bp)
 
 
-def cleanup_expired_guest_tokens():
-    """
-    ✅ DATABASE VERSION: Expired guest FCM token'larını temizle
-    TTL'i dolmuş token'ları database'den sil
-    """
-    try:
-        current_time = datetime.utcnow().replace(tzinfo=None)
-
-        # Find and clear expired tokens in database
-        expired_requests = BuggyRequest.query.filter(
-            BuggyRequest.guest_fcm_token.isnot(None),
-            BuggyRequest.guest_fcm_token_expires_at < current_time
-        ).all()
-
-        count = 0
-        for req in expired_requests:
-            req.guest_fcm_token = None
-            req.guest_fcm_token_expires_at = None
-            count += 1
-            logger.info(f'🗑️ Expired guest FCM token removed: Request {req.id}')
-
-        if count > 0:
-            db.session.commit()
-            logger.info(f'🧹 Cleaned up {count} expired guest FCM tokens from database')
-
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f'❌ Error cleaning up expired tokens: {str(e)}')
-
-
 def get_guest_token(request_id: int) -> str:
     """
     ✅ DATABASE VERSION: Guest FCM token'ını al (TTL kontrolü ile)
@@ -133,8 +104,7 @@ def register_guest_fcm_token():
 
         logger.info(f'✅ Guest FCM token saved to database for request {request_id} (TTL: {GUEST_TOKEN_TTL_SECONDS}s)')
 
-        # Cleanup expired tokens
-        cleanup_expired_guest_tokens()
+        # Expired tokens are cleared by the expire_guest_tokens background job
 
         return jsonify({
             'success': True,
@@ -199,6 +169,8 @@ def send_guest_notification(request_id):
         success, message = send_fcm_http_notification(fcm_token, message_data, status, request_id=request_id)
         if success:
             return jsonify({'success': True, 'message': message}), 200
+        elif isinstance(success, PendingRetry):
+            return jsonify({'success': True, 'message': message, 'status': 'retry_scheduled'}), 202
         else:
             return jsonify({'success': False, 'message': message}), 500
         
@@ -210,10 +182,11 @@ def send_guest_notification(request_id):
         }), 500
 
 
-def send_fcm_http_notification(token, message_data, status, request_id=None):
+def send_fcm_http_notification(token, message_data, status, request_id=None, retry=True):
     """
     ✅ FIXED: FCMNotificationService kullanarak bildirim gönder
-    Returns: (success: bool, message: str)
+    retry=False: tek deneme (yeniden denemeyi çağıran yönetir, örn. outbox)
+    Returns: (success: bool | PendingRetry, message: str)
     """
     try:
         from app.services.fcm_notification_service import FCMNotificationService
@@ -240,7 +213,7 @@ def send_fcm_http_notification(token, message_data, status, request_id=None):
             },
             priority='high' if status == 'accepted' else 'normal',
             sound='default',
-            retry=True,
+            retry=retry,
             click_action=f'/guest/status/{request_id}' if request_id else '/'
         )
 
@@ -248,6 +221,10 @@ def send_fcm_http_notification(token, message_data, status, request_id=None):
             logger.info('✅ [GUEST_FCM] Notification sent successfully!')
             logger.info('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
             return True, 'Bildirim başarıyla gönderildi'
+        elif isinstance(success, PendingRetry):
+            logger.warning('⏳ [GUEST_FCM] First attempt failed, retry scheduled')
+            logger.info('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
+            return success, 'Bildirim yeniden denenecek'
         else:
             logger.error('❌ [GUEST_FCM] Notification failed!')
             logger.error('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
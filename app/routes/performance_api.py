@@ -102,6 +102,90 @@ def get_websocket_stats():
         }), 500
 
 
+@performance_bp.route('/background-tasks/stats', methods=['GET'])
+@admin_required
+def get_background_task_stats():
+    """
+    Get shared background task pool statistics
+    
+    Returns:
+        JSON response with queue depth and latency metrics
+    """
+    try:
+        from app.services.task_executor import BackgroundTaskExecutor
+        
+        return jsonify({
+            'success': True,
+            'stats': BackgroundTaskExecutor.get_stats()
+        })
+    except Exception as e:
+        logger.error(f"Error getting background task stats: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@performance_bp.route('/audit-writer/stats', methods=['GET'])
+@admin_required
+def get_audit_writer_stats():
+    """
+    Get audit writer statistics
+    
+    Returns:
+        JSON response with buffer depth and batch metrics
+    """
+    try:
+        from app.services.audit_writer import AuditWriter
+        
+        return jsonify({
+            'success': True,
+            'stats': AuditWriter.get_stats()
+        })
+    except Exception as e:
+        logger.error(f"Error getting audit writer stats: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@performance_bp.route('/access-metrics', methods=['GET'])
+@admin_required
+def get_access_metrics():
+    """
+    Get read-access counters (driver polls) for the admin's hotel
+    
+    Query params: hours (default 24), endpoint
+    
+    Returns:
+        JSON response with per (user, endpoint) counts, flush and long-poll statistics
+    """
+    try:
+        from datetime import timedelta
+        from app.models import get_current_timestamp
+        from app.services.access_metrics_service import AccessMetricsService
+        from app.services.pending_request_notifier import PendingRequestNotifier
+        
+        hours = request.args.get('hours', 24, type=int)
+        start = get_current_timestamp() - timedelta(hours=hours)
+        
+        return jsonify({
+            'success': True,
+            'metrics': AccessMetricsService.summarize(
+                current_user.hotel_id, start=start, endpoint=request.args.get('endpoint')
+            ),
+            'stats': AccessMetricsService.get_stats(),
+            'long_poll': PendingRequestNotifier.get_stats()
+        })
+    except Exception as e:
+        logger.error(f"Error getting access metrics: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @performance_bp.route('/health', methods=['GET'])
 @admin_required
 def health_check():
@@ -2,12 +2,15 @@
 Buggy Call - Reports Routes
 Powered by Erkan ERDEM
 """
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, Response, jsonify, request, session, stream_with_context
 from functools import wraps
 from datetime import datetime, timedelta
 from app import csrf
-from app.models.user import SystemUser
+from app.models import get_current_timestamp
+from app.models.user import UserRole
+from app.utils.helpers import RequestContext
 from app.services.report_service import ReportService
+from app.services.report_cache import ReportCache
 from app.models.request import RequestStatus
 
 reports_bp = Blueprint('reports', __name__)
@@ -30,7 +33,7 @@ def admin_required(fn):
         if 'user_id' not in session:
             return jsonify({'error': 'Unauthorized'}), 401
 
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         if not user or user.role != UserRole.ADMIN:
             return jsonify({'error': 'Forbidden', 'message': 'Admin yetkisi gerekli'}), 403
 
@@ -44,7 +47,7 @@ def admin_required(fn):
 def get_daily_summary():
     """Get daily summary report"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
 
         # Get date from query params (defaults to today)
         date_str = request.args.get('date')
@@ -72,7 +75,7 @@ def get_daily_summary():
 def get_buggy_performance():
     """Get buggy performance report"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
 
         # Get optional parameters
         buggy_id = request.args.get('buggy_id', type=int)
@@ -117,7 +120,7 @@ def get_buggy_performance():
 def get_location_analytics():
     """Get location analytics report"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
 
         # Get optional date range
         start_date_str = request.args.get('start_date')
@@ -158,7 +161,7 @@ def get_location_analytics():
 def get_request_details():
     """Get detailed request list"""
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
 
         # Get optional parameters
         status_str = request.args.get('status')
@@ -213,48 +216,61 @@ def get_request_details():
 def get_dashboard_stats():
     """Get real-time dashboard statistics"""
     try:
-        from app.models.buggy import Buggy, BuggyStatus
         from app.models.request import BuggyRequest, RequestStatus
         from sqlalchemy import func
 
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         hotel_id = user.hotel_id
 
-        # Active buggies count
-        active_buggies = Buggy.query.filter_by(
-            hotel_id=hotel_id,
-            status=BuggyStatus.AVAILABLE
-        ).count()
-
-        # Pending requests count
-        PENDING_requests = BuggyRequest.query.filter_by(
-            hotel_id=hotel_id,
-            status=RequestStatus.PENDING
-        ).count()
-
-        # Today's completed requests
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_completed = BuggyRequest.query.filter(
-            BuggyRequest.hotel_id == hotel_id,
-            BuggyRequest.status == RequestStatus.COMPLETED,
-            BuggyRequest.completed_at >= today_start
-        ).count()
-
-        # Average response time today
-        today_requests = BuggyRequest.query.filter(
-            BuggyRequest.hotel_id == hotel_id,
-            BuggyRequest.status == RequestStatus.COMPLETED,
-            BuggyRequest.requested_at >= today_start,
-            BuggyRequest.accepted_at.isnot(None)
-        ).all()
-
-        avg_response_time = 0
-        if today_requests:
-            total_response = sum([
-                (req.accepted_at - req.requested_at).total_seconds()
-                for req in today_requests
-            ])
-            avg_response_time = round(total_response / len(today_requests) / 60, 2)  # in minutes
+        # Active buggies count (in-memory fleet state)
+        from app.services.fleet_state_service import FleetStateService
+        active_buggies = FleetStateService.available_count(hotel_id)
+
+        # Request-derived counters: cached until the next request change (or OPEN_RANGE_TIMEOUT)
+        today_start = get_current_timestamp().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        def compute_request_stats(start, end):
+            # Pending requests count
+            PENDING_requests = BuggyRequest.query.filter_by(
+                hotel_id=hotel_id,
+                status=RequestStatus.PENDING
+            ).count()
+
+            # Today's completed requests
+            today_completed = BuggyRequest.query.filter(
+                BuggyRequest.hotel_id == hotel_id,
+                BuggyRequest.status == RequestStatus.COMPLETED,
+                BuggyRequest.completed_at >= start
+            ).count()
+
+            # Average response time today
+            today_requests = BuggyRequest.query.filter(
+                BuggyRequest.hotel_id == hotel_id,
+                BuggyRequest.status == RequestStatus.COMPLETED,
+                BuggyRequest.requested_at >= start,
+                BuggyRequest.accepted_at.isnot(None)
+            ).all()
+
+            avg_response_time = 0
+            if today_requests:
+                total_response = sum([
+                    (req.accepted_at - req.requested_at).total_seconds()
+                    for req in today_requests
+                ])
+                avg_response_time = round(total_response / len(today_requests) / 60, 2)  # in minutes
+
+            return {
+                'PENDING_requests': PENDING_requests,
+                'today_completed': today_completed,
+                'avg_response_time': avg_response_time
+            }
+
+        request_stats = ReportCache.get_or_compute(
+            hotel_id, 'dashboard-stats', today_start, None, compute_request_stats
+        )
+        PENDING_requests = request_stats['PENDING_requests']
+        today_completed = request_stats['today_completed']
+        avg_response_time = request_stats['avg_response_time']
 
         return jsonify({
             'success': True,
@@ -271,51 +287,56 @@ def get_dashboard_stats():
 
 
 # ==================== Export to Excel ====================
+def _export_rows(report_type, user):
+    """
+    Report rows for file exports
+
+    request-details streams from a server-side cursor (no row cap unless
+    `limit` is given); the other reports are small aggregates.
+
+    Returns:
+        (rows, base filename) or (None, None) for unknown report types
+    """
+    if report_type == 'daily-summary':
+        date_str = request.args.get('date')
+        date = datetime.strptime(date_str, '%Y-%m-%d') if date_str else datetime.utcnow()
+        report_data = ReportService.get_daily_summary(user.hotel_id, date)
+        return [report_data], f'daily_summary_{date.strftime("%Y%m%d")}'  # Convert dict to list
+
+    start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d') if request.args.get('start_date') else None
+    end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d') if request.args.get('end_date') else None
+
+    if report_type == 'buggy-performance':
+        buggy_id = request.args.get('buggy_id', type=int)
+        return ReportService.get_buggy_performance(user.hotel_id, buggy_id, start_date, end_date), 'buggy_performance'
+
+    if report_type == 'location-analytics':
+        return ReportService.get_location_analytics(user.hotel_id, start_date, end_date), 'location_analytics'
+
+    if report_type == 'request-details':
+        status_str = request.args.get('status')
+        status = RequestStatus(status_str) if status_str else None
+        limit = request.args.get('limit', type=int)
+        rows = ReportService.iter_request_details(user.hotel_id, status, start_date, end_date, limit)
+        return rows, 'request_details'
+
+    return None, None
+
+
 @reports_bp.route('/export/excel/<report_type>', methods=['GET'])
 @api_login_required
 def export_excel(report_type):
-    """Export report to Excel"""
+    """Export report to Excel (write-only worksheet, streamed from a temp file)"""
     try:
-        from flask import send_file
-        from io import BytesIO
-        
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         
-        # Get report data based on type
-        if report_type == 'daily-summary':
-            date_str = request.args.get('date')
-            date = datetime.strptime(date_str, '%Y-%m-%d') if date_str else datetime.utcnow()
-            report_data = ReportService.get_daily_summary(user.hotel_id, date)
-            data = [report_data]  # Convert dict to list
-            filename = f'daily_summary_{date.strftime("%Y%m%d")}.xlsx'
-            
-        elif report_type == 'buggy-performance':
-            buggy_id = request.args.get('buggy_id', type=int)
-            start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d') if request.args.get('start_date') else None
-            end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d') if request.args.get('end_date') else None
-            data = ReportService.get_buggy_performance(user.hotel_id, buggy_id, start_date, end_date)
-            filename = 'buggy_performance.xlsx'
-            
-        elif report_type == 'location-analytics':
-            start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d') if request.args.get('start_date') else None
-            end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d') if request.args.get('end_date') else None
-            data = ReportService.get_location_analytics(user.hotel_id, start_date, end_date)
-            filename = 'location_analytics.xlsx'
-            
-        elif report_type == 'request-details':
-            status_str = request.args.get('status')
-            status = RequestStatus(status_str) if status_str else None
-            start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d') if request.args.get('start_date') else None
-            end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d') if request.args.get('end_date') else None
-            limit = request.args.get('limit', 1000, type=int)
-            data = ReportService.get_request_details(user.hotel_id, status, start_date, end_date, limit)
-            filename = 'request_details.xlsx'
-            
-        else:
+        data, basename = _export_rows(report_type, user)
+        if data is None:
             return jsonify({'error': 'Invalid report type'}), 400
+        filename = f'{basename}.xlsx'
         
         # Export to Excel
-        excel_bytes = ReportService.export_to_excel(data, filename, sheet_name=report_type.replace('-', ' ').title())
+        path, record_count = ReportService.write_excel_file(data, sheet_name=report_type.replace('-', ' ').title())
         
         # Log export operation
         from app.services.audit_service import AuditService
@@ -326,17 +347,55 @@ def export_excel(report_type):
                 'report_type': report_type,
                 'format': 'excel',
                 'filename': filename,
-                'record_count': len(data)
+                'record_count': record_count
             },
             user_id=session.get('user_id'),
             hotel_id=user.hotel_id
         )
         
-        return send_file(
-            BytesIO(excel_bytes),
+        return Response(
+            ReportService.iter_file_chunks(path),
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ==================== Export to CSV ====================
+@reports_bp.route('/export/csv/<report_type>', methods=['GET'])
+@api_login_required
+def export_csv(report_type):
+    """Export report to CSV (chunked, streamed straight from the DB cursor)"""
+    try:
+        user = RequestContext.get_principal()
+        
+        data, basename = _export_rows(report_type, user)
+        if data is None:
+            return jsonify({'error': 'Invalid report type'}), 400
+        filename = f'{basename}.csv'
+        
+        chunks = ReportService.stream_csv(data)
+        
+        # Log export operation
+        from app.services.audit_service import AuditService
+        AuditService.log_action(
+            action='report_exported',
+            entity_type='report',
+            new_values={
+                'report_type': report_type,
+                'format': 'csv',
+                'filename': filename
+            },
+            user_id=session.get('user_id'),
+            hotel_id=user.hotel_id
+        )
+        
+        return Response(
+            stream_with_context(chunks),
+            mimetype='text/csv; charset=utf-8',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
         
     except Exception as e:
@@ -352,7 +411,7 @@ def export_pdf(report_type):
         from flask import send_file
         from io import BytesIO
         
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         
         # Get report data based on type
         if report_type == 'daily-summary':
@@ -434,7 +493,7 @@ def get_advanced_analytics():
     - Peak hours analysis
     """
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         
         # Get date range from query params
         days = request.args.get('days', 30, type=int)
@@ -445,14 +504,18 @@ def get_advanced_analytics():
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
         else:
-            end_date = datetime.utcnow()
+            end_date = get_current_timestamp()
             start_date = end_date - timedelta(days=days)
         
-        # Get comprehensive analytics
-        analytics = ReportService.get_advanced_analytics(
-            hotel_id=user.hotel_id,
-            start_date=start_date,
-            end_date=end_date
+        # Get comprehensive analytics (cached per hotel + range, lifecycle-invalidated)
+        start_date, end_date = ReportCache.normalize_range(start_date, end_date)
+        analytics = ReportCache.get_or_compute(
+            user.hotel_id, 'advanced-analytics', start_date, end_date,
+            lambda start, end: ReportService.get_advanced_analytics(
+                hotel_id=user.hotel_id,
+                start_date=start,
+                end_date=end
+            )
         )
         
         return jsonify({
@@ -477,7 +540,7 @@ def get_timeout_statistics():
     try:
         from app.tasks.timeout_checker import get_timeout_statistics
         
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         days = request.args.get('days', 30, type=int)
         
         stats = get_timeout_statistics(hotel_id=user.hotel_id, days=days)
@@ -500,7 +563,7 @@ def get_route_analytics():
     Rota analizi - Başlangıç ve bitiş konumları arası detaylı istatistikler
     """
     try:
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         
         # Tarih aralığını al
         start_date_str = request.args.get('start_date')
@@ -508,7 +571,7 @@ def get_route_analytics():
         
         # Varsayılan: Son 7 gün
         if not start_date_str:
-            start_date = datetime.utcnow() - timedelta(days=7)
+            start_date = get_current_timestamp() - timedelta(days=7)
         else:
             try:
                 start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
@@ -516,7 +579,7 @@ def get_route_analytics():
                 return jsonify({'error': 'Geçersiz start_date formatı. YYYY-MM-DD kullanın'}), 400
         
         if not end_date_str:
-            end_date = datetime.utcnow()
+            end_date = get_current_timestamp()
         else:
             try:
                 end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
@@ -525,8 +588,11 @@ def get_route_analytics():
             except ValueError:
                 return jsonify({'error': 'Geçersiz end_date formatı. YYYY-MM-DD kullanın'}), 400
         
-        # Rota analizini al
-        analytics = ReportService.get_route_analytics(user.hotel_id, start_date, end_date)
+        # Rota analizini al (otel + aralık bazında önbellekli)
+        analytics = ReportCache.get_or_compute(
+            user.hotel_id, 'route-analytics', start_date, end_date,
+            lambda start, end: ReportService.get_route_analytics(user.hotel_id, start, end)
+        )
         
         return jsonify({
             'success': True,
@@ -547,26 +613,28 @@ def get_route_analytics():
 def export_comprehensive_excel():
     """
     Kapsamlı Excel raporu oluştur - Tüm istatistikler ve detaylar
+
+    Write-only workbook: rows go to disk as they are written. When the body
+    carries start_date/end_date (YYYY-MM-DD), the "Talepler" sheet is fed
+    from a server-side cursor instead of the posted request list.
     """
     try:
-        from flask import send_file
-        from io import BytesIO
         from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Border, Side
         from openpyxl.utils import get_column_letter
         
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         data = request.get_json()
         
         export_data = data.get('data', {})
         date_range = data.get('date_range', 'week')
         
-        # Excel workbook oluştur
-        wb = Workbook()
+        # Excel workbook oluştur (write-only: sabit bellek)
+        wb = Workbook(write_only=True)
         
         # Stil tanımlamaları
-        header_fill = PatternFill(start_color="1BA5A8", end_color="1BA5A8", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
+        header_color = "1BA5A8"
         title_font = Font(bold=True, size=14, color="1A2B4A")
         border = Border(
             left=Side(style='thin'),
@@ -575,22 +643,35 @@ def export_comprehensive_excel():
             bottom=Side(style='thin')
         )
         
-        # 1. ÖZET SAYFA
-        ws_summary = wb.active
-        ws_summary.title = "Özet"
+        def styled(ws, value, font=None, cell_border=None):
+            cell = WriteOnlyCell(ws, value=value)
+            if font is not None:
+                cell.font = font
+            if cell_border is not None:
+                cell.border = cell_border
+            return cell
+        
+        def bordered_row(ws, values):
+            return [styled(ws, value, cell_border=border) for value in values]
         
-        ws_summary['A1'] = "SHUTTLE CALL RAPORU"
-        ws_summary['A1'].font = Font(bold=True, size=16, color="1A2B4A")
-        ws_summary.merge_cells('A1:D1')
+        def set_widths(ws, widths):
+            # Write-only: genişlikler ilk satırdan önce ayarlanmalı
+            for col, width in enumerate(widths, start=1):
+                ws.column_dimensions[get_column_letter(col)].width = width
+        
+        # 1. ÖZET SAYFA
+        ws_summary = wb.create_sheet("Özet")
+        set_widths(ws_summary, [25, 20])
         
         summary = export_data.get('summary', {})
-        ws_summary['A3'] = "Tarih Aralığı:"
-        ws_summary['B3'] = summary.get('date_range', '')
-        ws_summary['A3'].font = Font(bold=True)
+        ws_summary.append([styled(ws_summary, "SHUTTLE CALL RAPORU", Font(bold=True, size=16, color="1A2B4A"))])
+        ws_summary.append([])
+        ws_summary.append([styled(ws_summary, "Tarih Aralığı:", Font(bold=True)), summary.get('date_range', '')])
+        ws_summary.append([])
         
         # İstatistikler
+        ws_summary.append(ReportService.header_cells(ws_summary, ['Metrik', 'Değer'], header_color, border))
         stats_data = [
-            ['Metrik', 'Değer'],
             ['Toplam Talep', summary.get('total_requests', 0)],
             ['Tamamlanan', summary.get('completed', 0)],
             ['İptal Edilen', summary.get('cancelled', 0)],
@@ -600,131 +681,95 @@ def export_comprehensive_excel():
             ['Ort. Yanıt Süresi', summary.get('avg_response_time', '0 dk')],
             ['Ort. Tamamlanma Süresi', summary.get('avg_completion_time', '0 dk')]
         ]
-        
-        for row_idx, row_data in enumerate(stats_data, start=5):
-            for col_idx, value in enumerate(row_data, start=1):
-                cell = ws_summary.cell(row=row_idx, column=col_idx, value=value)
-                cell.border = border
-                if row_idx == 5:  # Header
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = Alignment(horizontal='center')
-        
-        # Sütun genişlikleri
-        ws_summary.column_dimensions['A'].width = 25
-        ws_summary.column_dimensions['B'].width = 20
+        for row_data in stats_data:
+            ws_summary.append(bordered_row(ws_summary, row_data))
         
         # 2. DETAYLI TALEPLER
         ws_requests = wb.create_sheet("Talepler")
+        set_widths(ws_requests, [18] * 9)
         
         headers = ['Tarih', 'Başlangıç', 'Bitiş', 'Shuttle', 'Sürücü', 'Oda', 'Yanıt (dk)', 'Tamamlanma (dk)', 'Durum']
-        for col_idx, header in enumerate(headers, start=1):
-            cell = ws_requests.cell(row=1, column=col_idx, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center')
-            cell.border = border
-        
-        requests = export_data.get('requests', [])
-        for row_idx, req in enumerate(requests, start=2):
-            ws_requests.cell(row=row_idx, column=1, value=req.get('tarih', '')).border = border
-            ws_requests.cell(row=row_idx, column=2, value=req.get('baslangic', '')).border = border
-            ws_requests.cell(row=row_idx, column=3, value=req.get('bitis', '')).border = border
-            ws_requests.cell(row=row_idx, column=4, value=req.get('shuttle', '')).border = border
-            ws_requests.cell(row=row_idx, column=5, value=req.get('surucu', '')).border = border
-            ws_requests.cell(row=row_idx, column=6, value=req.get('oda', '')).border = border
-            ws_requests.cell(row=row_idx, column=7, value=req.get('yanit_suresi_dk', 0)).border = border
-            ws_requests.cell(row=row_idx, column=8, value=req.get('tamamlanma_suresi_dk', 0)).border = border
-            ws_requests.cell(row=row_idx, column=9, value=req.get('durum', '')).border = border
-        
-        # Sütun genişlikleri
-        for col in range(1, 10):
-            ws_requests.column_dimensions[get_column_letter(col)].width = 18
+        ws_requests.append(ReportService.header_cells(ws_requests, headers, header_color, border))
+        
+        if data.get('start_date') and data.get('end_date'):
+            # Sunucu tarafı cursor: satırlar EXPORT_CHUNK_SIZE'lık partiler halinde okunur
+            start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
+            end_date = datetime.strptime(data['end_date'], '%Y-%m-%d') + timedelta(days=1)
+            for row in ReportService.iter_request_sheet_rows(user.hotel_id, start_date, end_date):
+                ws_requests.append(row)
+        else:
+            for req in export_data.get('requests', []):
+                ws_requests.append([
+                    req.get('tarih', ''),
+                    req.get('baslangic', ''),
+                    req.get('bitis', ''),
+                    req.get('shuttle', ''),
+                    req.get('surucu', ''),
+                    req.get('oda', ''),
+                    req.get('yanit_suresi_dk', 0),
+                    req.get('tamamlanma_suresi_dk', 0),
+                    req.get('durum', '')
+                ])
         
         # 3. ROTA ANALİZİ
         route_analytics = export_data.get('route_analytics', {})
         if route_analytics and route_analytics.get('most_popular_routes'):
             ws_routes = wb.create_sheet("Rota Analizi")
+            set_widths(ws_routes, [25] * 5)
             
-            ws_routes['A1'] = "EN POPÜLER ROTALAR"
-            ws_routes['A1'].font = title_font
-            ws_routes.merge_cells('A1:E1')
+            ws_routes.append([styled(ws_routes, "EN POPÜLER ROTALAR", title_font)])
+            ws_routes.append([])
             
             route_headers = ['Rota', 'Kullanım Sayısı', 'Ort. Süre (dk)', 'Min Süre (sn)', 'Max Süre (sn)']
-            for col_idx, header in enumerate(route_headers, start=1):
-                cell = ws_routes.cell(row=3, column=col_idx, value=header)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center')
-                cell.border = border
+            ws_routes.append(ReportService.header_cells(ws_routes, route_headers, header_color, border))
             
-            routes = route_analytics.get('most_popular_routes', [])
-            for row_idx, route in enumerate(routes, start=4):
-                ws_routes.cell(row=row_idx, column=1, value=route.get('route', '')).border = border
-                ws_routes.cell(row=row_idx, column=2, value=route.get('count', 0)).border = border
-                ws_routes.cell(row=row_idx, column=3, value=route.get('avg_time_minutes', 0)).border = border
-                ws_routes.cell(row=row_idx, column=4, value=route.get('min_time_seconds', 0)).border = border
-                ws_routes.cell(row=row_idx, column=5, value=route.get('max_time_seconds', 0)).border = border
-            
-            for col in range(1, 6):
-                ws_routes.column_dimensions[get_column_letter(col)].width = 25
+            for route in route_analytics.get('most_popular_routes', []):
+                ws_routes.append(bordered_row(ws_routes, [
+                    route.get('route', ''),
+                    route.get('count', 0),
+                    route.get('avg_time_minutes', 0),
+                    route.get('min_time_seconds', 0),
+                    route.get('max_time_seconds', 0)
+                ]))
         
         # 4. SÜRÜCÜ PERFORMANSI
         if route_analytics and route_analytics.get('driver_performance'):
             ws_drivers = wb.create_sheet("Sürücü Performansı")
+            set_widths(ws_drivers, [30] * 4)
             
-            ws_drivers['A1'] = "SÜRÜCÜ PERFORMANS RAPORU"
-            ws_drivers['A1'].font = title_font
-            ws_drivers.merge_cells('A1:D1')
+            ws_drivers.append([styled(ws_drivers, "SÜRÜCÜ PERFORMANS RAPORU", title_font)])
+            ws_drivers.append([])
             
             driver_headers = ['Sürücü', 'Tamamlanan', 'Ort. Süre (dk)', 'En Çok Kullanılan Rota']
-            for col_idx, header in enumerate(driver_headers, start=1):
-                cell = ws_drivers.cell(row=3, column=col_idx, value=header)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center')
-                cell.border = border
-            
-            drivers = route_analytics.get('driver_performance', [])
-            for row_idx, driver in enumerate(drivers, start=4):
-                ws_drivers.cell(row=row_idx, column=1, value=driver.get('driver_name', '')).border = border
-                ws_drivers.cell(row=row_idx, column=2, value=driver.get('total_completed', 0)).border = border
-                ws_drivers.cell(row=row_idx, column=3, value=driver.get('avg_completion_time_minutes', 0)).border = border
-                ws_drivers.cell(row=row_idx, column=4, value=driver.get('most_used_route', '')).border = border
+            ws_drivers.append(ReportService.header_cells(ws_drivers, driver_headers, header_color, border))
             
-            for col in range(1, 5):
-                ws_drivers.column_dimensions[get_column_letter(col)].width = 30
+            for driver in route_analytics.get('driver_performance', []):
+                ws_drivers.append(bordered_row(ws_drivers, [
+                    driver.get('driver_name', ''),
+                    driver.get('total_completed', 0),
+                    driver.get('avg_completion_time_minutes', 0),
+                    driver.get('most_used_route', '')
+                ]))
         
         # 5. LOKASYON İSTATİSTİKLERİ
         location_stats = export_data.get('location_stats', {})
         if location_stats and location_stats.get('labels'):
             ws_locations = wb.create_sheet("Lokasyon İstatistikleri")
+            set_widths(ws_locations, [30, 15])
             
-            ws_locations['A1'] = "LOKASYON BAZLI TALEP DAĞILIMI"
-            ws_locations['A1'].font = title_font
-            ws_locations.merge_cells('A1:B1')
+            ws_locations.append([styled(ws_locations, "LOKASYON BAZLI TALEP DAĞILIMI", title_font)])
+            ws_locations.append([])
             
             loc_headers = ['Lokasyon', 'Talep Sayısı']
-            for col_idx, header in enumerate(loc_headers, start=1):
-                cell = ws_locations.cell(row=3, column=col_idx, value=header)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center')
-                cell.border = border
+            ws_locations.append(ReportService.header_cells(ws_locations, loc_headers, header_color, border))
             
             labels = location_stats.get('labels', [])
             values = location_stats.get('values', [])
-            for row_idx, (label, value) in enumerate(zip(labels, values), start=4):
-                ws_locations.cell(row=row_idx, column=1, value=label).border = border
-                ws_locations.cell(row=row_idx, column=2, value=value).border = border
-            
-            ws_locations.column_dimensions['A'].width = 30
-            ws_locations.column_dimensions['B'].width = 15
+            for label, value in zip(labels, values):
+                ws_locations.append(bordered_row(ws_locations, [label, value]))
         
-        # Excel dosyasını kaydet
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
+        # Excel dosyasını geçici dosyaya kaydet
+        path = ReportService.save_workbook_to_temp(wb)
         
         # Dosya adı
         filename = f'shuttle_call_rapor_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
@@ -743,11 +788,10 @@ def export_comprehensive_excel():
             hotel_id=user.hotel_id
         )
         
-        return send_file(
-            output,
+        return Response(
+            ReportService.iter_file_chunks(path),
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
         
     except Exception as e:
@@ -776,7 +820,7 @@ def export_comprehensive_pdf():
         from reportlab.lib.enums import TA_CENTER
         import base64
         
-        user = SystemUser.query.get(session['user_id'])
+        user = RequestContext.get_principal()
         data = request.get_json()
         
         export_data = data.get('data', {})
@@ -5,7 +5,8 @@ Simple and reliable push notifications to drivers
 from flask import Blueprint, Response, stream_with_context, request, session
 from app.models.user import SystemUser, UserRole
 from app.utils.decorators import require_login, require_role
-from app import csrf
+from app import db, csrf
+from app.services.sse_broker import SSEBroker
 import json
 import time
 import queue
@@ -16,8 +17,9 @@ sse_bp = Blueprint('sse', __name__)
 # CSRF exempt for SSE endpoints
 csrf.exempt(sse_bp)
 
-# Store active SSE connections per driver
+# Store active SSE connections of THIS worker per driver
 # Key: user_id, Value: queue
+# Events reach them through the broker, so every worker sees every event
 active_connections = {}
 
 
@@ -28,39 +30,80 @@ def get_driver_queue(user_id):
     return active_connections[user_id]
 
 
+def deliver_local(message):
+    """
+    Broker handler: put a published event on this worker's driver queues
+
+    Args:
+        message: {'user_ids': [...], 'event': str, 'data': dict, 'timestamp': str}
+
+    Returns:
+        int: Number of local queues the event was delivered to
+    """
+    event = {
+        'event': message['event'],
+        'data': message['data'],
+        'timestamp': message.get('timestamp')
+    }
+    delivered = 0
+    for user_id in message.get('user_ids', []):
+        q = active_connections.get(user_id)
+        if q is not None:
+            q.put(event)
+            delivered += 1
+    return delivered
+
+
+def publish(user_ids, event_type, data):
+    """
+    Publish an event for drivers on every worker
+
+    Returns:
+        int: Local deliveries (in-process broker) or receiving workers (redis)
+    """
+    return SSEBroker.get().publish({
+        'user_ids': list(user_ids),
+        'event': event_type,
+        'data': data,
+        'timestamp': datetime.utcnow().isoformat()
+    })
+
+
 def send_to_driver(user_id, event_type, data):
-    """Send event to specific driver"""
-    if user_id in active_connections:
-        try:
-            active_connections[user_id].put({
-                'event': event_type,
-                'data': data,
-                'timestamp': datetime.utcnow().isoformat()
-            })
+    """Send event to specific driver (whichever worker holds the stream)"""
+    try:
+        delivered = publish([user_id], event_type, data)
+        if delivered:
             print(f'✅ SSE: Sent {event_type} to driver {user_id}')
-            return True
-        except Exception as e:
-            print(f'❌ SSE: Error sending to driver {user_id}: {e}')
-            return False
-    return False
+        return delivered > 0
+    except Exception as e:
+        print(f'❌ SSE: Error sending to driver {user_id}: {e}')
+        return False
 
 
 def send_to_all_drivers(hotel_id, event_type, data):
-    """Send event to all drivers in hotel"""
+    """
+    Send event to all drivers in hotel (one publish for the whole hotel)
+
+    Returns:
+        int: Drivers reached (in-process) or targeted (redis: delivery happens in each worker)
+    """
     from app.models.buggy_driver import BuggyDriver
     
     # Get all active drivers in hotel
-    active_drivers = BuggyDriver.query.filter_by(
-        is_active=True
-    ).join(SystemUser).filter(
-        SystemUser.hotel_id == hotel_id,
-        SystemUser.role == UserRole.DRIVER
-    ).all()
+    driver_ids = [
+        row.driver_id for row in db.session.query(BuggyDriver.driver_id).filter_by(
+            is_active=True
+        ).join(SystemUser, SystemUser.id == BuggyDriver.driver_id).filter(
+            SystemUser.hotel_id == hotel_id,
+            SystemUser.role == UserRole.DRIVER
+        ).all()
+    ]
+    if not driver_ids:
+        return 0
     
-    sent_count = 0
-    for driver_assoc in active_drivers:
-        if send_to_driver(driver_assoc.driver_id, event_type, data):
-            sent_count += 1
+    delivered = publish(driver_ids, event_type, data)
+    sent_count = delivered if SSEBroker.get().inline else (len(driver_ids) if delivered else 0)
     
     print(f'✅ SSE: Sent {event_type} to {sent_count} drivers in hotel {hotel_id}')
     return sent_count
@@ -74,6 +117,9 @@ def stream():
     user_id = session.get('user_id')
     print(f'✅ [SSE] Driver {user_id} connected to stream')
     
+    # Worker başına tek abonelik: yayınlanan olaylar bu worker'ın kuyruklarına dağıtılır
+    SSEBroker.get().subscribe(deliver_local)
+    
     def event_stream():
         """Generate SSE events"""
         q = get_driver_queue(user_id)
@@ -539,7 +539,9 @@ def execute_system_reset():
             }
         )
         
-        # Commit audit log before deletion
+        # Write buffered audit logs before deletion
+        from app.services.audit_writer import AuditWriter
+        AuditWriter.flush()
         db.session.commit()
         
         # Delete all data in correct order (respecting foreign keys)
@@ -6,11 +6,22 @@ from app.services.location_service import LocationService
 from app.services.buggy_service import BuggyService
 from app.services.request_service import RequestService
 from app.services.audit_service import AuditService
+from app.services.outbox_service import OutboxService
 from app.services.qr_service import QRCodeService
+from app.services.request_rollup_service import RequestRollupService
 from app.services.report_service import ReportService
+from app.services.report_cache import ReportCache
 from app.services.fcm_notification_service import FCMNotificationService
 from app.services.web_push_service import WebPushService
 from app.services.background_jobs import BackgroundJobsService
+from app.services.sse_broker import SSEBroker
+from app.services.fleet_state_service import FleetStateService
+from app.services.task_executor import BackgroundTaskExecutor
+from app.services.request_expiry_service import RequestExpiryService
+from app.services.maintenance_service import MaintenanceService
+from app.services.audit_writer import AuditWriter
+from app.services.access_metrics_service import AccessMetricsService
+from app.services.pending_request_notifier import PendingRequestNotifier
 
 __all__ = [
     'AuthService',
@@ -18,9 +29,20 @@ __all__ = [
     'BuggyService',
     'RequestService',
     'AuditService',
+    'OutboxService',
     'QRCodeService',
+    'RequestRollupService',
     'ReportService',
+    'ReportCache',
     'FCMNotificationService',
     'WebPushService',
-    'BackgroundJobsService'
+    'BackgroundJobsService',
+    'SSEBroker',
+    'FleetStateService',
+    'BackgroundTaskExecutor',
+    'RequestExpiryService',
+    'MaintenanceService',
+    'AuditWriter',
+    'AccessMetricsService',
+    'PendingRequestNotifier'
 ]
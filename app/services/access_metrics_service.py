@@ -0,0 +1,237 @@
+"""
+Buggy Call - Access Metrics Service
+In-memory counters for read-only endpoints, flushed as hourly aggregate rows
+"""
+from threading import Lock
+from sqlalchemy import select, update, and_, func
+from app import db
+from app.models import get_current_timestamp
+from app.models.access_metric import AccessMetric
+import atexit
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_FIELDS = ('hotel_id', 'user_id', 'endpoint', 'hour_start')
+
+
+class AccessMetricsService:
+    """
+    Access counters per (hotel, user, endpoint, hour)
+
+    record() only touches a dict under a lock - no SQL, no commit - so a
+    poll stays a read-only request. flush() (background job, shutdown)
+    adds the counters to access_metrics with one upsert per key; on
+    failure the counts are merged back and retried on the next flush.
+    Audit trail rows are kept for state changes.
+    """
+
+    # Defaults (overridable via app.config)
+    MAX_KEYS = 10000  # pending keys before record() flushes itself
+
+    _counters = {}  # key tuple -> {'request_count', 'item_count', 'last_access_at'}
+    _lock = Lock()
+    _atexit_registered = False
+    _stats = {'recorded': 0, 'flushes': 0, 'rows_written': 0, 'failed_flushes': 0}
+
+    @classmethod
+    def init_app(cls, app):
+        """Configure from app.config and flush pending counters at exit"""
+        cls.MAX_KEYS = int(app.config.get('ACCESS_METRICS_MAX_KEYS', cls.MAX_KEYS))
+        if not app.config.get('TESTING') and not cls._atexit_registered:
+            atexit.register(cls._flush_at_exit, app)
+            cls._atexit_registered = True
+
+    @classmethod
+    def record(cls, endpoint, user_id, hotel_id, items=0, now=None):
+        """
+        Count one access
+
+        Args:
+            endpoint: Endpoint name (e.g. 'driver.pending_requests')
+            user_id: Accessing user
+            hotel_id: User's hotel
+            items: Items returned (summed per hour)
+            now: Access time (default: get_current_timestamp())
+        """
+        now = now or get_current_timestamp()
+        key = (hotel_id, user_id, endpoint, now.replace(minute=0, second=0, microsecond=0))
+        with cls._lock:
+            counters = cls._counters.get(key)
+            if counters is None:
+                counters = cls._counters[key] = {'request_count': 0, 'item_count': 0, 'last_access_at': now}
+            counters['request_count'] += 1
+            counters['item_count'] += items
+            counters['last_access_at'] = max(counters['last_access_at'], now)
+            cls._stats['recorded'] += 1
+            overflow = len(cls._counters) >= cls.MAX_KEYS
+
+        if overflow:
+            logger.warning(f"⚠️ Access metric buffer full ({cls.MAX_KEYS} keys), flushing in caller")
+            cls.flush()
+
+    @classmethod
+    def flush(cls):
+        """
+        Write pending counters (one upsert per key, one commit)
+
+        Returns:
+            int: Rows inserted or updated
+        """
+        with cls._lock:
+            pending, cls._counters = cls._counters, {}
+        if not pending:
+            return 0
+
+        try:
+            connection = db.session.connection()
+            for key, counters in pending.items():
+                cls._upsert(connection, key, counters)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            cls._merge_back(pending)
+            with cls._lock:
+                cls._stats['failed_flushes'] += 1
+            logger.error(f"⚠️ Access metrics flush failed ({len(pending)} keys kept): {str(e)}")
+            return 0
+
+        with cls._lock:
+            cls._stats['flushes'] += 1
+            cls._stats['rows_written'] += len(pending)
+        return len(pending)
+
+    @staticmethod
+    def _upsert(connection, key, counters):
+        """Add counters to the row for key (atomic upsert)"""
+        table = AccessMetric.__table__
+        row = dict(zip(KEY_FIELDS, key))
+        row.update(counters)
+        dialect = connection.dialect.name
+
+        if dialect == 'mysql':
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            stmt = mysql_insert(table).values(row)
+            stmt = stmt.on_duplicate_key_update({
+                'request_count': table.c.request_count + stmt.inserted.request_count,
+                'item_count': table.c.item_count + stmt.inserted.item_count,
+                'last_access_at': func.greatest(func.coalesce(table.c.last_access_at, stmt.inserted.last_access_at),
+                                                stmt.inserted.last_access_at)
+            })
+            connection.execute(stmt)
+        elif dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                latest = func.max
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                latest = func.greatest
+            stmt = dialect_insert(table).values(row)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(KEY_FIELDS),
+                set_={
+                    'request_count': table.c.request_count + stmt.excluded.request_count,
+                    'item_count': table.c.item_count + stmt.excluded.item_count,
+                    'last_access_at': latest(func.coalesce(table.c.last_access_at, stmt.excluded.last_access_at),
+                                             stmt.excluded.last_access_at)
+                }
+            )
+            connection.execute(stmt)
+        else:
+            key_clause = and_(*[table.c[name] == row[name] for name in KEY_FIELDS])
+            result = connection.execute(
+                update(table).where(key_clause).values(
+                    request_count=table.c.request_count + counters['request_count'],
+                    item_count=table.c.item_count + counters['item_count'],
+                    last_access_at=counters['last_access_at']
+                )
+            )
+            if result.rowcount == 0:
+                connection.execute(table.insert().values(row))
+
+    @classmethod
+    def _merge_back(cls, pending):
+        with cls._lock:
+            for key, counters in pending.items():
+                current = cls._counters.get(key)
+                if current is None:
+                    cls._counters[key] = counters
+                    continue
+                current['request_count'] += counters['request_count']
+                current['item_count'] += counters['item_count']
+                current['last_access_at'] = max(current['last_access_at'], counters['last_access_at'])
+
+    @classmethod
+    def _flush_at_exit(cls, app):
+        try:
+            with app.app_context():
+                cls.flush()
+        except Exception as e:
+            logger.error(f"Access metrics flush at exit failed: {str(e)}")
+
+    @classmethod
+    def summarize(cls, hotel_id, start=None, endpoint=None):
+        """
+        Access counts per (user, endpoint), including unflushed counters
+
+        Args:
+            hotel_id: Hotel ID
+            start: Optional start time (hour granularity)
+            endpoint: Optional endpoint filter
+
+        Returns:
+            list: [{user_id, endpoint, request_count, item_count, last_access_at}]
+        """
+        query = select(
+            AccessMetric.user_id,
+            AccessMetric.endpoint,
+            func.sum(AccessMetric.request_count),
+            func.sum(AccessMetric.item_count),
+            func.max(AccessMetric.last_access_at)
+        ).where(AccessMetric.hotel_id == hotel_id)
+        if start:
+            query = query.where(AccessMetric.hour_start >= start.replace(minute=0, second=0, microsecond=0))
+        if endpoint:
+            query = query.where(AccessMetric.endpoint == endpoint)
+        query = query.group_by(AccessMetric.user_id, AccessMetric.endpoint)
+
+        totals = {}
+        for user_id, name, request_count, item_count, last_access_at in db.session.execute(query):
+            totals[(user_id, name)] = [int(request_count or 0), int(item_count or 0), last_access_at]
+
+        with cls._lock:
+            pending = [(key, dict(counters)) for key, counters in cls._counters.items()]
+        for (key_hotel, user_id, name, hour_start), counters in pending:
+            if key_hotel != hotel_id or (endpoint and name != endpoint):
+                continue
+            if start and hour_start < start.replace(minute=0, second=0, microsecond=0):
+                continue
+            total = totals.setdefault((user_id, name), [0, 0, None])
+            total[0] += counters['request_count']
+            total[1] += counters['item_count']
+            if total[2] is None or counters['last_access_at'] > total[2]:
+                total[2] = counters['last_access_at']
+
+        return [
+            {
+                'user_id': user_id,
+                'endpoint': name,
+                'request_count': request_count,
+                'item_count': item_count,
+                'last_access_at': last_access_at.isoformat() if last_access_at else None
+            }
+            for (user_id, name), (request_count, item_count, last_access_at) in sorted(totals.items())
+        ]
+
+    @classmethod
+    def get_stats(cls):
+        """Pending keys and flush counters"""
+        with cls._lock:
+            return {'pending_keys': len(cls._counters), **cls._stats}
+
+    @classmethod
+    def reset(cls):
+        """Drop pending counters and clear metrics (tests)"""
+        with cls._lock:
+            cls._counters = {}
+            cls._stats = {'recorded': 0, 'flushes': 0, 'rows_written': 0, 'failed_flushes': 0}
@@ -1,11 +1,12 @@
 """
 Buggy Call - Audit Trail Service
 """
-from app import db
-from app.models.audit import AuditTrail
-from flask import request, session
+from app.models import get_current_timestamp
+from app.models.audit import AuditTrail, AuditTrailArchive
+from app.services.audit_writer import AuditWriter
+from flask import request, session, has_request_context
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from functools import wraps
 
 
@@ -14,10 +15,13 @@ class AuditService:
     
     @staticmethod
     def log_action(action, entity_type, entity_id=None, old_values=None, new_values=None, 
-                   user_id=None, hotel_id=None):
+                   user_id=None, hotel_id=None, ip_address=None, user_agent=None):
         """
         Log an action to the audit trail
         
+        The record is handed to AuditWriter and written in a batch by the
+        background writer; the caller's DB session is not touched.
+        
         Args:
             action: Action type (e.g., 'create', 'update', 'delete', 'login', 'logout')
             entity_type: Type of entity (e.g., 'location', 'buggy', 'request', 'user')
@@ -26,45 +30,77 @@ class AuditService:
             new_values: Dictionary of new values (for creates/updates)
             user_id: ID of the user performing the action
             hotel_id: ID of the hotel
+            ip_address: Client IP (defaults to current request)
+            user_agent: Client user agent (defaults to current request)
+        
+        Returns:
+            dict: The queued record, or None on error
         """
         try:
-            # Get user_id from session if not provided
-            if user_id is None:
-                user_id = session.get('user_id')
-            
-            # Get hotel_id from session if not provided
-            if hotel_id is None:
-                # Try to get from user's hotel
-                from app.models.user import SystemUser
-                if user_id:
-                    user = SystemUser.query.get(user_id)
-                    if user:
-                        hotel_id = user.hotel_id
-            
-            # Create audit trail entry
-            audit = AuditTrail(
-                hotel_id=hotel_id,
-                user_id=user_id,
-                action=action,
-                entity_type=entity_type,
-                entity_id=entity_id,
-                old_values=json.dumps(old_values) if old_values else None,
-                new_values=json.dumps(new_values) if new_values else None,
-                ip_address=request.remote_addr if request else None,
-                user_agent=request.user_agent.string if request and request.user_agent else None
+            audit = AuditService.build_record(
+                action, entity_type, entity_id=entity_id, old_values=old_values,
+                new_values=new_values, user_id=user_id, hotel_id=hotel_id,
+                ip_address=ip_address, user_agent=user_agent
             )
-            
-            db.session.add(audit)
-            db.session.commit()
+            AuditWriter.enqueue(audit)
             
             return audit
             
         except Exception as e:
             # Log error but don't fail the main operation
             print(f"Audit logging error: {str(e)}")
-            db.session.rollback()
             return None
     
+    @staticmethod
+    def write_action(**kwargs):
+        """
+        Write an audit record synchronously (same arguments as log_action)
+        
+        Used by the outbox audit.log handler: the event is only marked
+        delivered once the row is stored, and DB errors propagate so the
+        outbox retries it.
+        
+        Returns:
+            dict: The written record
+        """
+        audit = AuditService.build_record(**kwargs)
+        AuditWriter.write_now([audit])
+        return audit
+    
+    @staticmethod
+    def build_record(action, entity_type, entity_id=None, old_values=None, new_values=None,
+                     user_id=None, hotel_id=None, ip_address=None, user_agent=None):
+        """Audit record dict (AUDIT_COLUMNS) filled from the current request where missing"""
+        # Get user_id from session if not provided
+        if user_id is None and has_request_context():
+            user_id = session.get('user_id')
+        
+        # Outbox workers run without a request context
+        if has_request_context():
+            if ip_address is None:
+                ip_address = request.remote_addr
+            if user_agent is None and request.user_agent:
+                user_agent = request.user_agent.string
+        
+        # Get hotel_id from session if not provided
+        # (otherwise the writer resolves it from the user, once per batch)
+        if hotel_id is None and has_request_context() and user_id == session.get('user_id'):
+            hotel_id = session.get('hotel_id')
+        
+        # Create audit trail record
+        return {
+            'hotel_id': hotel_id,
+            'user_id': user_id,
+            'action': action,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'old_values': json.dumps(old_values) if old_values else None,
+            'new_values': json.dumps(new_values) if new_values else None,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'created_at': get_current_timestamp()
+        }
+    
     @staticmethod
     def log_create(entity_type, entity_id, new_values, user_id=None, hotel_id=None):
         """Log a create action"""
@@ -125,51 +161,77 @@ class AuditService:
         )
     
     @staticmethod
-    def get_audit_trail(hotel_id, filters=None, page=1, per_page=50):
+    def get_audit_trail(hotel_id, filters=None, cursor=None, limit=50, archive=False):
         """
-        Get audit trail with filters
+        Get audit trail with filters, newest first
+        
+        Keyset-paginated on (created_at, id): no COUNT(*) and no OFFSET, so
+        a page costs the same however much history there is.
         
         Args:
             hotel_id: Hotel ID to filter by
-            filters: Dictionary of filters (user_id, action, entity_type, date_from, date_to)
-            page: Page number
-            per_page: Items per page
+            filters: Dictionary of filters (user_id, action, actions, entity_type, date_from, date_to)
+            cursor: next_cursor of the previous page (None = first page)
+            limit: Items per page
+            archive: Query audit_trail_archive instead of the hot table
         
         Returns:
-            Dictionary with items, total, page, pages
+            Dictionary with items, next_cursor, has_more, limit
+        
+        Raises:
+            ValidationException: Malformed cursor
         """
-        query = AuditTrail.query.filter_by(hotel_id=hotel_id)
+        from app.utils.helpers import Pagination
+        
+        model = AuditTrailArchive if archive else AuditTrail
+        query = model.query.filter(model.hotel_id == hotel_id)
         
         if filters:
             if filters.get('user_id'):
-                query = query.filter_by(user_id=filters['user_id'])
+                query = query.filter(model.user_id == filters['user_id'])
             
             if filters.get('action'):
-                query = query.filter_by(action=filters['action'])
+                query = query.filter(model.action == filters['action'])
+            
+            if filters.get('actions'):
+                query = query.filter(model.action.in_(filters['actions']))
             
             if filters.get('entity_type'):
-                query = query.filter_by(entity_type=filters['entity_type'])
+                query = query.filter(model.entity_type == filters['entity_type'])
             
             if filters.get('date_from'):
-                query = query.filter(AuditTrail.created_at >= filters['date_from'])
+                query = query.filter(model.created_at >= filters['date_from'])
             
             if filters.get('date_to'):
-                query = query.filter(AuditTrail.created_at <= filters['date_to'])
+                query = query.filter(model.created_at <= filters['date_to'])
         
-        # Order by most recent first
-        query = query.order_by(AuditTrail.created_at.desc())
+        page = Pagination.keyset(query, (model.created_at, model.id), cursor=cursor, limit=limit, max_limit=200)
+        page['items'] = [item.to_dict() for item in page['items']]
+        return page
+    
+    @staticmethod
+    def archive_old_entries(retention_days=None, now=None):
+        """
+        Move audit entries older than the retention window to audit_trail_archive
         
-        # Paginate
-        total = query.count()
-        items = query.limit(per_page).offset((page - 1) * per_page).all()
+        Chunked INSERT ... SELECT + DELETE (MaintenanceService), at most
+        MAINTENANCE_MAX_ROWS rows per pass.
         
-        return {
-            'items': [item.to_dict() for item in items],
-            'total': total,
-            'page': page,
-            'per_page': per_page,
-            'pages': (total + per_page - 1) // per_page
-        }
+        Args:
+            retention_days: Days kept in audit_trail (default: AUDIT_HOT_RETENTION_DAYS)
+            now: Current Cyprus-local time
+        
+        Returns:
+            int: Archived entries
+        """
+        from flask import current_app
+        from app.services.maintenance_service import MaintenanceService
+        
+        if retention_days is None:
+            retention_days = current_app.config.get('AUDIT_HOT_RETENTION_DAYS', 90)
+        cutoff = (now or get_current_timestamp()) - timedelta(days=retention_days)
+        
+        return MaintenanceService.move_in_chunks(AuditTrail, AuditTrailArchive, [AuditTrail.created_at < cutoff])
 
 
 def audit_log(entity_type, action='update'):
@@ -0,0 +1,301 @@
+"""
+Buggy Call - Audit Writer
+Buffers audit trail records and writes them with batched multi-row INSERTs
+from one background writer thread
+"""
+from collections import deque
+from threading import Condition, Thread
+from sqlalchemy import insert, select
+from app import db
+from app.models.audit import AuditTrail
+import atexit
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+AUDIT_COLUMNS = (
+    'hotel_id', 'user_id', 'action', 'entity_type', 'entity_id',
+    'old_values', 'new_values', 'ip_address', 'user_agent', 'created_at'
+)
+
+
+class AuditWriter:
+    """
+    Group-commit audit sink
+
+    Callers enqueue finished audit records (plain dicts, never modified
+    afterwards) without touching their own DB session. The writer thread
+    wakes every FLUSH_INTERVAL seconds, or as soon as BATCH_SIZE records are
+    waiting, and writes up to BATCH_SIZE records per INSERT. Missing
+    hotel_ids are resolved with one user lookup per batch. When MAX_BUFFER
+    records are waiting the caller writes the buffer itself, so audit
+    records are never dropped. A batch the database rejects is retried
+    row by row, so only the offending record is lost. The buffer is
+    flushed on shutdown. With
+    AUDIT_WRITER_INLINE (tests) every record is written immediately.
+    """
+
+    # Defaults (overridable via app.config)
+    BATCH_SIZE = 200
+    FLUSH_INTERVAL = 1.0
+    MAX_BUFFER = 5000
+
+    _app = None
+    _inline = False
+    _buffer = deque()
+    _cond = Condition()
+    _thread = None
+    _stopping = False
+    _atexit_registered = False
+    _stats = {}
+
+    @classmethod
+    def init_app(cls, app):
+        """Configure from app.config (the writer thread starts lazily)"""
+        cls._app = app
+        cls.BATCH_SIZE = int(app.config.get('AUDIT_BATCH_SIZE', cls.BATCH_SIZE))
+        cls.FLUSH_INTERVAL = float(app.config.get('AUDIT_FLUSH_INTERVAL', cls.FLUSH_INTERVAL))
+        cls.MAX_BUFFER = int(app.config.get('AUDIT_BUFFER_MAX', cls.MAX_BUFFER))
+        cls._inline = bool(app.config.get('AUDIT_WRITER_INLINE', False))
+        if not cls._stats:
+            cls._reset_stats()
+
+    @classmethod
+    def enqueue(cls, record):
+        """
+        Queue one audit record for writing
+
+        Args:
+            record: Dict with AUDIT_COLUMNS keys (created_at already set)
+        """
+        with cls._cond:
+            if not cls._stats:
+                cls._reset_stats()
+            cls._stats['enqueued'] += 1
+        if cls._inline or cls._app is None:
+            cls._write([record])
+            return
+
+        with cls._cond:
+            cls._buffer.append(record)
+            depth = len(cls._buffer)
+            cls._stats['max_buffered'] = max(cls._stats['max_buffered'], depth)
+            if depth >= cls.BATCH_SIZE:
+                cls._cond.notify()
+        cls._ensure_thread()
+
+        if depth >= cls.MAX_BUFFER:
+            # Writer is behind - write here instead of growing without bound
+            logger.warning(f"⚠️ Audit buffer full ({depth}), flushing in caller")
+            with cls._cond:
+                cls._stats['caller_flushes'] += 1
+            cls.flush()
+
+    @classmethod
+    def _ensure_thread(cls):
+        if cls._thread is not None and cls._thread.is_alive():
+            return
+        with cls._cond:
+            if cls._thread is not None and cls._thread.is_alive():
+                return
+            cls._stopping = False
+            cls._thread = Thread(target=cls._run, name='audit-writer', daemon=True)
+            cls._thread.start()
+        if not cls._atexit_registered:
+            atexit.register(cls.shutdown)
+            cls._atexit_registered = True
+        logger.info("Audit writer started")
+
+    @classmethod
+    def _take(cls, limit):
+        batch = []
+        while cls._buffer and len(batch) < limit:
+            batch.append(cls._buffer.popleft())
+        return batch
+
+    @classmethod
+    def _run(cls):
+        while True:
+            with cls._cond:
+                if not cls._stopping and len(cls._buffer) < cls.BATCH_SIZE:
+                    cls._cond.wait(cls.FLUSH_INTERVAL)
+                batch = cls._take(cls.BATCH_SIZE)
+                stopping = cls._stopping
+            if batch:
+                cls._write_in_app(batch)
+            elif stopping:
+                return
+
+    @classmethod
+    def flush(cls):
+        """
+        Write everything buffered so far (caller's thread)
+
+        Returns:
+            int: Records written
+        """
+        written = 0
+        while True:
+            with cls._cond:
+                batch = cls._take(cls.BATCH_SIZE)
+            if not batch:
+                return written
+            written += cls._write_in_app(batch)
+
+    @classmethod
+    def _write_in_app(cls, batch):
+        if cls._app is None:
+            return cls._write(batch)
+        with cls._app.app_context():
+            try:
+                return cls._write(batch)
+            finally:
+                db.session.remove()
+
+    @classmethod
+    def write_now(cls, records):
+        """
+        Write records synchronously in the caller's session (no buffering)
+
+        For callers that must know the row is stored, e.g. the outbox
+        audit.log handler, which retries the event when this raises.
+
+        Args:
+            records: List of dicts with AUDIT_COLUMNS keys
+
+        Returns:
+            int: Records written
+
+        Raises:
+            Exception: The DB error (session already rolled back)
+        """
+        started = time.monotonic()
+        try:
+            written, skipped = cls._insert(records)
+        except Exception:
+            db.session.rollback()
+            raise
+        cls._record(written, skipped, time.monotonic() - started)
+        return written
+
+    @classmethod
+    def _write(cls, batch):
+        """
+        INSERT the batch with one statement; if it fails, retry row by row
+        so one bad record does not take the rest of the batch with it
+        """
+        started = time.monotonic()
+        try:
+            written, failed = cls._insert(batch)
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                logger.error(f"Audit logging error (1 record lost): {str(e)}")
+                cls._record(0, 1, time.monotonic() - started)
+                return 0
+            logger.warning(f"⚠️ Audit batch insert failed, writing {len(batch)} record(s) one by one: {str(e)}")
+            written, failed = 0, 0
+            for record in batch:
+                try:
+                    row_written, row_skipped = cls._insert([record])
+                    written += row_written
+                    failed += row_skipped
+                except Exception as row_error:
+                    db.session.rollback()
+                    failed += 1
+                    logger.error(f"Audit logging error (1 record lost, action={record.get('action')}): {str(row_error)}")
+
+        cls._record(written, failed, time.monotonic() - started)
+        return written
+
+    @staticmethod
+    def _insert(batch):
+        """
+        Resolve missing hotel_ids and INSERT the batch (one statement), then commit
+
+        Returns:
+            tuple: (written, skipped without hotel)
+        """
+        from app.models.user import SystemUser
+
+        missing = {r['user_id'] for r in batch if r['hotel_id'] is None and r['user_id']}
+        if missing:
+            hotels = dict(db.session.execute(
+                select(SystemUser.id, SystemUser.hotel_id).where(SystemUser.id.in_(missing))
+            ).all())
+            batch = [dict(r, hotel_id=hotels.get(r['user_id'])) if r['hotel_id'] is None else r
+                     for r in batch]
+
+        rows = [r for r in batch if r['hotel_id'] is not None]
+        skipped = len(batch) - len(rows)
+        if skipped:
+            logger.warning(f"⚠️ Skipped {skipped} audit record(s) without hotel")
+        if rows:
+            db.session.execute(insert(AuditTrail).values([{c: r.get(c) for c in AUDIT_COLUMNS} for r in rows]))
+            db.session.commit()
+        return len(rows), skipped
+
+    @classmethod
+    def _record(cls, written, failed, duration):
+        with cls._cond:
+            if not cls._stats:
+                cls._reset_stats()
+            stats = cls._stats
+            stats['written'] += written
+            stats['failed'] += failed
+            stats['batches'] += 1
+            stats['write_max'] = max(stats['write_max'], duration)
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Buffer depth and write counters
+
+        Returns:
+            dict: buffered, max_buffered, enqueued/written/failed/batches/caller_flushes,
+                  avg batch size and max write time in ms
+        """
+        with cls._cond:
+            stats = dict(cls._stats) if cls._stats else {}
+            depth = len(cls._buffer)
+        batches = stats.get('batches', 0)
+        return {
+            'buffered': depth,
+            'buffer_max': cls.MAX_BUFFER,
+            'max_buffered': stats.get('max_buffered', 0),
+            'enqueued': stats.get('enqueued', 0),
+            'written': stats.get('written', 0),
+            'failed': stats.get('failed', 0),
+            'batches': batches,
+            'caller_flushes': stats.get('caller_flushes', 0),
+            'avg_batch_size': round(stats.get('written', 0) / batches, 2) if batches else 0.0,
+            'max_write_ms': round(stats.get('write_max', 0.0) * 1000, 2)
+        }
+
+    @classmethod
+    def _reset_stats(cls):
+        cls._stats = {
+            'enqueued': 0, 'written': 0, 'failed': 0, 'batches': 0,
+            'caller_flushes': 0, 'max_buffered': 0, 'write_max': 0.0
+        }
+
+    @classmethod
+    def shutdown(cls, timeout=10):
+        """Stop the writer thread and flush the remaining buffer"""
+        with cls._cond:
+            thread, cls._thread = cls._thread, None
+            cls._stopping = True
+            cls._cond.notify_all()
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        cls.flush()
+
+    @classmethod
+    def reset(cls):
+        """Stop the writer (flushing its buffer) and clear metrics (tests)"""
+        cls.shutdown()
+        with cls._cond:
+            cls._buffer.clear()
+            cls._stopping = False
+            cls._reset_stats()
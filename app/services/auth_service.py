@@ -178,12 +178,10 @@ class AuthService:
             except:
                 pass
         
-        # ✅ Ağır işlemleri background'da yap
+        # ✅ Ağır işlemleri paylaşılan background pool'da yap
         if user_id and hotel_id:
-            from threading import Thread
-            Thread(target=AuthService._cleanup_driver_session, 
-                   args=(user_id, hotel_id), 
-                   daemon=True).start()
+            from app.services.task_executor import BackgroundTaskExecutor
+            BackgroundTaskExecutor.submit(AuthService._cleanup_driver_session, user_id, hotel_id)
         
         print(f'[LOGOUT] Session cleared, cleanup started in background')
     
@@ -191,75 +189,71 @@ class AuthService:
     def _cleanup_driver_session(user_id, hotel_id):
         """
         Background'da driver cleanup işlemleri
-        Bu fonksiyon async çalışır, kullanıcı beklemez
+        BackgroundTaskExecutor üzerinde çalışır (app context hazır), kullanıcı beklemez
         """
         try:
-            from app import create_app
-            app = create_app()
+            user = SystemUser.query.get(user_id)
+            if not user or user.role != UserRole.DRIVER:
+                print(f'[LOGOUT_CLEANUP] User {user_id} is not a driver, skipping')
+                return
             
-            with app.app_context():
-                user = SystemUser.query.get(user_id)
-                if not user or user.role != UserRole.DRIVER:
-                    print(f'[LOGOUT_CLEANUP] User {user_id} is not a driver, skipping')
-                    return
-                
-                print(f'[LOGOUT_CLEANUP] Processing driver cleanup: {user.username}')
-                
-                from app.models.buggy import Buggy, BuggyStatus
-                from app.models.buggy_driver import BuggyDriver
-                
-                # Get all active associations for this driver
-                active_associations = BuggyDriver.query.filter_by(
-                    driver_id=user_id,
-                    is_active=True
-                ).all()
-                
-                print(f'[LOGOUT_CLEANUP] Found {len(active_associations)} active buggy associations')
+            print(f'[LOGOUT_CLEANUP] Processing driver cleanup: {user.username}')
+            
+            from app.models.buggy import Buggy, BuggyStatus
+            from app.models.buggy_driver import BuggyDriver
+            
+            # Get all active associations for this driver
+            active_associations = BuggyDriver.query.filter_by(
+                driver_id=user_id,
+                is_active=True
+            ).all()
+            
+            print(f'[LOGOUT_CLEANUP] Found {len(active_associations)} active buggy associations')
+            
+            for assoc in active_associations:
+                # Deactivate driver
+                assoc.is_active = False
+                print(f'[LOGOUT_CLEANUP] Deactivated association for buggy_id={assoc.buggy_id}')
                 
-                for assoc in active_associations:
-                    # Deactivate driver
-                    assoc.is_active = False
-                    print(f'[LOGOUT_CLEANUP] Deactivated association for buggy_id={assoc.buggy_id}')
+                # Set buggy to offline and clear location
+                buggy = Buggy.query.get(assoc.buggy_id)
+                if buggy:
+                    old_status = buggy.status
+                    buggy.status = BuggyStatus.OFFLINE
+                    buggy.current_location_id = None  # Clear location on logout
+                    print(f'[LOGOUT_CLEANUP] Set buggy {buggy.code} status from {old_status} to OFFLINE')
                     
-                    # Set buggy to offline and clear location
-                    buggy = Buggy.query.get(assoc.buggy_id)
-                    if buggy:
-                        old_status = buggy.status
-                        buggy.status = BuggyStatus.OFFLINE
-                        buggy.current_location_id = None  # Clear location on logout
-                        print(f'[LOGOUT_CLEANUP] Set buggy {buggy.code} status from {old_status} to OFFLINE')
-                        
-                        # Emit WebSocket event for driver logout
-                        try:
-                            from app import socketio
-                            socketio.emit('buggy_status_changed', {
-                                'buggy_id': buggy.id,
-                                'buggy_code': buggy.code,
-                                'buggy_icon': buggy.icon,
-                                'driver_id': None,
-                                'driver_name': None,
-                                'location_name': None,
-                                'status': 'offline',
-                                'reason': 'driver_logout'
-                            }, room=f'hotel_{hotel_id}_admin')
-                            print(f'[LOGOUT_CLEANUP] Emitted buggy_status_changed event')
-                        except Exception as e:
-                            print(f'[LOGOUT_CLEANUP] Error emitting buggy_status_changed: {e}')
-                        
-                        # Emit buggy status update
-                        try:
-                            from app.services.buggy_service import BuggyService
-                            BuggyService.emit_buggy_status_update(buggy.id, hotel_id)
-                        except Exception as e:
-                            print(f'[LOGOUT_CLEANUP] Error emitting buggy status: {e}')
-                
-                db.session.commit()
-                print(f'[LOGOUT_CLEANUP] Database changes committed')
-                
-                # Log logout
-                AuditService.log_logout(user_id, hotel_id)
-                print(f'[LOGOUT_CLEANUP] Cleanup completed for user {user_id}')
-                
+                    # Emit WebSocket event for driver logout
+                    try:
+                        from app import socketio
+                        socketio.emit('buggy_status_changed', {
+                            'buggy_id': buggy.id,
+                            'buggy_code': buggy.code,
+                            'buggy_icon': buggy.icon,
+                            'driver_id': None,
+                            'driver_name': None,
+                            'location_name': None,
+                            'status': 'offline',
+                            'reason': 'driver_logout'
+                        }, room=f'hotel_{hotel_id}_admin')
+                        print(f'[LOGOUT_CLEANUP] Emitted buggy_status_changed event')
+                    except Exception as e:
+                        print(f'[LOGOUT_CLEANUP] Error emitting buggy_status_changed: {e}')
+                    
+                    # Emit buggy status update
+                    try:
+                        from app.services.buggy_service import BuggyService
+                        BuggyService.emit_buggy_status_update(buggy.id, hotel_id)
+                    except Exception as e:
+                        print(f'[LOGOUT_CLEANUP] Error emitting buggy status: {e}')
+            
+            db.session.commit()
+            print(f'[LOGOUT_CLEANUP] Database changes committed')
+            
+            # Log logout
+            AuditService.log_logout(user_id, hotel_id)
+            print(f'[LOGOUT_CLEANUP] Cleanup completed for user {user_id}')
+            
         except Exception as e:
             print(f'[LOGOUT_CLEANUP] Error in cleanup: {str(e)}')
             import traceback
@@ -420,11 +414,9 @@ class AuthService:
     
     @staticmethod
     def get_current_user():
-        """Get current logged-in user"""
-        user_id = session.get('user_id')
-        if user_id:
-            return SystemUser.query.get(user_id)
-        return None
+        """Get current logged-in user (loaded once per request)"""
+        from app.utils.principal import PrincipalCache
+        return PrincipalCache.current_user()
     
     @staticmethod
     def require_role(*roles):
@@ -6,6 +6,7 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime, timedelta
+from sqlalchemy import select, update, exists, or_, and_, case
 from app import db
 from app.models.notification_log import NotificationLog
 from app.models.user import SystemUser
@@ -76,12 +77,36 @@ class BackgroundJobsService:
             replace_existing=True
         )
         
-        # Job 4: Check and timeout unanswered requests every 10 minutes
+        # Job 3b: Clear expired guest FCM tokens (chunked bulk UPDATE)
+        guest_token_interval = 15
+        if BackgroundJobsService.app_instance:
+            guest_token_interval = BackgroundJobsService.app_instance.config.get('GUEST_TOKEN_CLEANUP_INTERVAL', 15)
+        BackgroundJobsService.scheduler.add_job(
+            func=BackgroundJobsService.expire_guest_tokens,
+            trigger=IntervalTrigger(minutes=guest_token_interval),
+            id='expire_guest_tokens',
+            name='Expire Guest FCM Tokens',
+            replace_existing=True
+        )
+        
+        # Job 4: Expire due requests from the timer wheel (1 hour timeout)
+        expiry_tick = 10
+        if BackgroundJobsService.app_instance:
+            expiry_tick = BackgroundJobsService.app_instance.config.get('REQUEST_EXPIRY_TICK', 10)
+        BackgroundJobsService.scheduler.add_job(
+            func=BackgroundJobsService.expire_requests,
+            trigger=IntervalTrigger(seconds=expiry_tick),
+            id='expire_requests',
+            name='Expire Unanswered Requests (timer wheel)',
+            replace_existing=True
+        )
+        
+        # Job 4b: Re-arm timers from the database every 10 minutes (safety net)
         BackgroundJobsService.scheduler.add_job(
             func=BackgroundJobsService.check_request_timeouts,
             trigger=IntervalTrigger(minutes=10),
             id='check_request_timeouts',
-            name='Check Request Timeouts (1 hour)',
+            name='Reconcile Request Timeout Timers',
             replace_existing=True
         )
         
@@ -94,6 +119,60 @@ class BackgroundJobsService:
             replace_existing=True
         )
         
+        # Job 6: Drain due outbox events (retries, missed deliveries)
+        drain_interval = 10
+        if BackgroundJobsService.app_instance:
+            drain_interval = BackgroundJobsService.app_instance.config.get('OUTBOX_DRAIN_INTERVAL', 10)
+        BackgroundJobsService.scheduler.add_job(
+            func=BackgroundJobsService.drain_outbox,
+            trigger=IntervalTrigger(seconds=drain_interval),
+            id='drain_outbox',
+            name='Drain Outbox Events',
+            replace_existing=True
+        )
+        
+        # Job 7: Purge delivered outbox events daily at 3 AM
+        BackgroundJobsService.scheduler.add_job(
+            func=BackgroundJobsService.purge_outbox,
+            trigger=CronTrigger(hour=3, minute=0),
+            id='purge_outbox',
+            name='Purge Delivered Outbox Events',
+            replace_existing=True
+        )
+        
+        # Job 7b: Move old audit entries to audit_trail_archive daily at 4 AM
+        BackgroundJobsService.scheduler.add_job(
+            func=BackgroundJobsService.archive_audit_trail,
+            trigger=CronTrigger(hour=4, minute=0),
+            id='archive_audit_trail',
+            name='Archive Old Audit Trail Entries',
+            replace_existing=True
+        )
+        
+        # Job 7c: Flush in-memory access counters (driver polls)
+        access_flush_interval = 60
+        if BackgroundJobsService.app_instance:
+            access_flush_interval = BackgroundJobsService.app_instance.config.get('ACCESS_METRICS_FLUSH_INTERVAL', 60)
+        BackgroundJobsService.scheduler.add_job(
+            func=BackgroundJobsService.flush_access_metrics,
+            trigger=IntervalTrigger(seconds=access_flush_interval),
+            id='flush_access_metrics',
+            name='Flush Access Metrics',
+            replace_existing=True
+        )
+        
+        # Job 8: Reconcile in-memory fleet state with the database
+        reconcile_interval = 60
+        if BackgroundJobsService.app_instance:
+            reconcile_interval = BackgroundJobsService.app_instance.config.get('FLEET_STATE_RECONCILE_INTERVAL', 60)
+        BackgroundJobsService.scheduler.add_job(
+            func=BackgroundJobsService.reconcile_fleet_state,
+            trigger=IntervalTrigger(seconds=reconcile_interval),
+            id='reconcile_fleet_state',
+            name='Reconcile Fleet State',
+            replace_existing=True
+        )
+        
         logger.info("All background jobs added to scheduler")
     
     @staticmethod
@@ -106,6 +185,8 @@ class BackgroundJobsService:
         - Use exponential backoff: 30s, 60s, 120s, 300s (max 5 min)
         - Max 3 retry attempts
         - Mark as permanently_failed after 3 attempts
+        - Candidates, backoff and result writes are set-based (at most
+          MAINTENANCE_MAX_ROWS sends per pass)
         """
         try:
             # ✅ CRITICAL: Mevcut app instance'ı kullan, yeniden create etme
@@ -117,95 +198,92 @@ class BackgroundJobsService:
             # ✅ CRITICAL: Ensure proper session cleanup in background job
             with app.app_context():
                 logger.info("Starting retry_failed_notifications job")
-
-                # Get failed notifications from last 24 hours with retry count < 3
-                cutoff_time = datetime.utcnow() - timedelta(hours=24)
-                failed_notifications = NotificationLog.query.filter(
+                
+                from app.services.maintenance_service import MaintenanceService
+                
+                now = datetime.utcnow()
+                cutoff_time = now - timedelta(hours=24)
+                candidate = [
                     NotificationLog.status == 'failed',
                     NotificationLog.sent_at >= cutoff_time,
                     NotificationLog.retry_count < 3
+                ]
+                
+                # Unreachable users can never be retried: fail them in bulk
+                user_exists = exists().where(SystemUser.id == NotificationLog.user_id)
+                has_token = exists().where(
+                    SystemUser.id == NotificationLog.user_id,
+                    SystemUser.fcm_token.isnot(None)
+                )
+                MaintenanceService.update_in_chunks(
+                    NotificationLog, candidate + [~user_exists],
+                    {'status': 'permanently_failed', 'error_message': 'User not found'}
+                )
+                MaintenanceService.update_in_chunks(
+                    NotificationLog, candidate + [user_exists, ~has_token],
+                    {'status': 'permanently_failed', 'error_message': 'No FCM token'}
+                )
+                
+                # Exponential backoff in SQL - retry_count 0: 30s, 1: 60s, 2: 120s (max 5 min)
+                backoff_elapsed = or_(*[
+                    and_(
+                        NotificationLog.retry_count == attempt,
+                        NotificationLog.sent_at <= now - timedelta(seconds=min(300, 30 * (2 ** attempt)))
+                    )
+                    for attempt in range(3)
+                ])
+                due = db.session.execute(
+                    select(NotificationLog, SystemUser.fcm_token)
+                    .join(SystemUser, SystemUser.id == NotificationLog.user_id)
+                    .where(*candidate, backoff_elapsed, SystemUser.fcm_token.isnot(None))
+                    .order_by(NotificationLog.id)
+                    .limit(MaintenanceService.MAX_ROWS_PER_PASS)
                 ).all()
-
-                if not failed_notifications:
+                
+                if not due:
                     logger.info("No failed notifications to retry")
                     return
-
-                logger.info(f"Found {len(failed_notifications)} failed notifications to process")
-
-                retry_count = 0
-                success_count = 0
-
-                for log in failed_notifications:
+                
+                logger.info(f"Found {len(due)} failed notifications to retry")
+                
+                from app.services.fcm_notification_service import FCMNotificationService
+                
+                succeeded, failed = [], []
+                for log, fcm_token in due:
                     try:
-                        # Calculate exponential backoff delay
-                        # retry_count 0: 30s, 1: 60s, 2: 120s, 3: 300s
-                        delay_seconds = min(300, 30 * (2 ** log.retry_count))
-
-                        # Check if enough time has passed since last attempt
-                        time_since_sent = (datetime.utcnow() - log.sent_at).total_seconds()
-
-                        if time_since_sent < delay_seconds:
-                            logger.debug(f"Notification {log.id} not ready for retry (waiting {delay_seconds}s)")
-                            continue
-
-                        # Get user and check if subscription still exists
-                        user = SystemUser.query.get(log.user_id)
-                        if not user:
-                            logger.warning(f"User {log.user_id} not found for notification {log.id}")
-                            log.status = 'permanently_failed'
-                            log.error_message = 'User not found'
-                            db.session.commit()
-                            continue
-
-                        if not user.fcm_token:
-                            logger.warning(f"User {log.user_id} has no FCM token")
-                            log.status = 'permanently_failed'
-                            log.error_message = 'No FCM token'
-                            db.session.commit()
-                            continue
-
-                        # Retry sending notification (FCM)
                         logger.info(f"Retrying notification {log.id} (attempt {log.retry_count + 1}/3)")
-
-                        # FCM ile retry
-                        from app.services.fcm_notification_service import FCMNotificationService
-
-                        if user.fcm_token:
-                            success = FCMNotificationService.send_to_token(
-                                token=user.fcm_token,
-                                title=log.title,
-                                body=log.body,
-                                data={'user_id': user.id, 'retry': True, 'type': log.notification_type},
-                                priority=log.priority
-                            )
-                        else:
-                            logger.warning(f"User {log.user_id} has no FCM token")
-                            success = False
-
-                        # Update log based on result
-                        log.retry_count += 1
-
-                        if success:
-                            log.status = 'sent'
-                            log.error_message = None
-                            success_count += 1
-                            logger.info(f"Successfully retried notification {log.id}")
-                        else:
-                            if log.retry_count >= 3:
-                                log.status = 'permanently_failed'
-                                logger.warning(f"Notification {log.id} permanently failed after 3 attempts")
-                            else:
-                                logger.warning(f"Retry failed for notification {log.id}, will retry again")
-
-                        db.session.commit()
-                        retry_count += 1
-
+                        
+                        success = FCMNotificationService.send_to_token(
+                            token=fcm_token,
+                            title=log.title,
+                            body=log.body,
+                            data={'user_id': log.user_id, 'retry': True, 'type': log.notification_type},
+                            priority=log.priority,
+                            retry=False  # This job is the retry loop
+                        )
+                        (succeeded if success else failed).append(log.id)
+                    
                     except Exception as e:
                         logger.error(f"Error retrying notification {log.id}: {str(e)}")
-                        db.session.rollback()
                         continue
-
-                logger.info(f"Retry job completed: {retry_count} retried, {success_count} successful")
+                
+                # Write results with one UPDATE per outcome
+                if succeeded:
+                    db.session.execute(
+                        update(NotificationLog).where(NotificationLog.id.in_(succeeded)).values(
+                            status='sent', error_message=None, retry_count=NotificationLog.retry_count + 1
+                        ).execution_options(synchronize_session=False)
+                    )
+                if failed:
+                    db.session.execute(
+                        update(NotificationLog).where(NotificationLog.id.in_(failed)).values(
+                            status=case((NotificationLog.retry_count + 1 >= 3, 'permanently_failed'), else_='failed'),
+                            retry_count=NotificationLog.retry_count + 1
+                        ).execution_options(synchronize_session=False)
+                    )
+                db.session.commit()
+                
+                logger.info(f"Retry job completed: {len(succeeded) + len(failed)} retried, {len(succeeded)} successful")
             
         except Exception as e:
             logger.error(f"Error in retry_failed_notifications job: {str(e)}")
@@ -222,6 +300,7 @@ class BackgroundJobsService:
         Logic:
         - Find failed notifications older than 24 hours
         - Mark as permanently_failed if retry_count >= 3
+        - Chunked bulk UPDATE (MaintenanceService)
         """
         try:
             # ✅ CRITICAL: Mevcut app instance'ı kullan, yeniden create etme
@@ -234,28 +313,10 @@ class BackgroundJobsService:
             with app.app_context():
                 logger.info("Starting mark_permanently_failed job")
                 
-                cutoff_time = datetime.utcnow() - timedelta(hours=24)
-                
-                # Find old failed notifications with max retries
-                old_failed = NotificationLog.query.filter(
-                    NotificationLog.status == 'failed',
-                    NotificationLog.sent_at < cutoff_time,
-                    NotificationLog.retry_count >= 3
-                ).all()
+                from app.services.maintenance_service import MaintenanceService
                 
-                if not old_failed:
+                if not MaintenanceService.mark_permanently_failed():
                     logger.info("No notifications to mark as permanently failed")
-                    return
-                
-                logger.info(f"Marking {len(old_failed)} notifications as permanently failed")
-                
-                for log in old_failed:
-                    log.status = 'permanently_failed'
-                    if not log.error_message:
-                        log.error_message = 'Max retry attempts exceeded'
-                
-                db.session.commit()
-                logger.info(f"Marked {len(old_failed)} notifications as permanently failed")
             
         except Exception as e:
             logger.error(f"Error in mark_permanently_failed job: {str(e)}")
@@ -264,6 +325,26 @@ class BackgroundJobsService:
             except:
                 pass
 
+    @staticmethod
+    def expire_guest_tokens():
+        """Clear guest FCM tokens whose TTL has passed (chunked bulk UPDATE)"""
+        try:
+            app = BackgroundJobsService.app_instance
+            if not app:
+                logger.error("App instance not available for background job")
+                return
+            
+            with app.app_context():
+                from app.services.maintenance_service import MaintenanceService
+                MaintenanceService.expire_guest_tokens()
+            
+        except Exception as e:
+            logger.error(f"Error in expire_guest_tokens job: {str(e)}")
+            try:
+                db.session.rollback()
+            except:
+                pass
+
     @staticmethod
     def process_ws_queues():
         """Process WebSocket throttled event queues (runs every 5s)"""
@@ -284,6 +365,7 @@ class BackgroundJobsService:
         Logic:
         - Delete logs older than 30 days
         - Keep permanently_failed logs for audit purposes
+        - Chunked DELETE, at most MAINTENANCE_MAX_ROWS rows per pass
         """
         try:
             # ✅ CRITICAL: Mevcut app instance'ı kullan, yeniden create etme
@@ -298,24 +380,22 @@ class BackgroundJobsService:
                 
                 cutoff_date = datetime.utcnow() - timedelta(days=days)
                 
-                # Delete old logs except permanently_failed ones
-                deleted_count = NotificationLog.query.filter(
+                from app.services.maintenance_service import MaintenanceService
+                
+                # Delete old logs except permanently_failed ones (chunked)
+                deleted_count = MaintenanceService.delete_in_chunks(NotificationLog, [
                     NotificationLog.sent_at < cutoff_date,
                     NotificationLog.status != 'permanently_failed'
-                ).delete(synchronize_session=False)
-                
-                db.session.commit()
+                ])
                 
                 logger.info(f"Cleanup completed: {deleted_count} old logs deleted")
                 
                 # Also cleanup very old permanently_failed logs (90 days)
                 very_old_cutoff = datetime.utcnow() - timedelta(days=90)
-                very_old_deleted = NotificationLog.query.filter(
+                very_old_deleted = MaintenanceService.delete_in_chunks(NotificationLog, [
                     NotificationLog.sent_at < very_old_cutoff,
                     NotificationLog.status == 'permanently_failed'
-                ).delete(synchronize_session=False)
-                
-                db.session.commit()
+                ])
                 
                 if very_old_deleted > 0:
                     logger.info(f"Cleanup completed: {very_old_deleted} very old permanently_failed logs deleted")
@@ -328,34 +408,170 @@ class BackgroundJobsService:
                 pass
     
     @staticmethod
-    def check_request_timeouts():
+    def drain_outbox():
+        """Hand due outbox events (retry backoff elapsed, expired leases) to the worker pool"""
+        try:
+            app = BackgroundJobsService.app_instance
+            if not app:
+                logger.error("App instance not available for background job")
+                return
+            
+            from app.services.outbox_service import OutboxService
+            if not OutboxService.is_running():
+                return
+            
+            with app.app_context():
+                claimed = OutboxService.drain()
+                if claimed > 0:
+                    logger.info(f"Outbox drain: {claimed} event(s) handed to workers")
+            
+        except Exception as e:
+            logger.error(f"Error in drain_outbox job: {str(e)}")
+            try:
+                db.session.rollback()
+            except:
+                pass
+    
+    @staticmethod
+    def reconcile_fleet_state():
+        """Reload the in-memory fleet state from the database (bulk updates, missed events)"""
+        try:
+            app = BackgroundJobsService.app_instance
+            if not app:
+                logger.error("App instance not available for background job")
+                return
+            
+            with app.app_context():
+                from app.services.fleet_state_service import FleetStateService
+                FleetStateService.reconcile()
+            
+        except Exception as e:
+            logger.error(f"Error in reconcile_fleet_state job: {str(e)}")
+            try:
+                db.session.rollback()
+            except:
+                pass
+    
+    @staticmethod
+    def purge_outbox(days=7):
         """
-        Check for PENDING requests older than 1 hour and mark as unanswered
+        Delete delivered outbox events older than specified days
         
-        Logic:
-        - Find PENDING requests older than 1 hour
-        - Mark as UNANSWERED status
-        - Record timeout timestamp
-        - Calculate response time
+        Args:
+            days: Number of days to keep delivered events (default: 7)
         """
         try:
-            # ✅ CRITICAL: Mevcut app instance'ı kullan, yeniden create etme
             app = BackgroundJobsService.app_instance
             if not app:
                 logger.error("App instance not available for background job")
                 return
             
             with app.app_context():
-                logger.info("Starting check_request_timeouts job")
+                from app.services.outbox_service import OutboxService
                 
-                from app.tasks.timeout_checker import check_and_timeout_requests
+                deleted_count = OutboxService.purge_delivered(days=days)
+                logger.info(f"Outbox purge completed: {deleted_count} delivered events deleted")
+            
+        except Exception as e:
+            logger.error(f"Error in purge_outbox job: {str(e)}")
+            try:
+                db.session.rollback()
+            except:
+                pass
+    
+    @staticmethod
+    def archive_audit_trail():
+        """Move audit entries older than AUDIT_HOT_RETENTION_DAYS to the archive table"""
+        try:
+            app = BackgroundJobsService.app_instance
+            if not app:
+                logger.error("App instance not available for background job")
+                return
+            
+            with app.app_context():
+                from app.services.audit_service import AuditService
+                
+                archived_count = AuditService.archive_old_entries()
+                logger.info(f"Audit archive completed: {archived_count} entries moved")
+            
+        except Exception as e:
+            logger.error(f"Error in archive_audit_trail job: {str(e)}")
+            try:
+                db.session.rollback()
+            except:
+                pass
+    
+    @staticmethod
+    def flush_access_metrics():
+        """Write in-memory access counters as hourly aggregate rows"""
+        try:
+            app = BackgroundJobsService.app_instance
+            if not app:
+                logger.error("App instance not available for background job")
+                return
+            
+            with app.app_context():
+                from app.services.access_metrics_service import AccessMetricsService
+                AccessMetricsService.flush()
+            
+        except Exception as e:
+            logger.error(f"Error in flush_access_metrics job: {str(e)}")
+            try:
+                db.session.rollback()
+            except:
+                pass
+    
+    @staticmethod
+    def expire_requests():
+        """
+        Advance the request timer wheel (runs every REQUEST_EXPIRY_TICK seconds)
+        
+        Logic:
+        - Collect PENDING requests whose 1 hour deadline has passed
+        - Mark them UNANSWERED with one UPDATE (timeout_at, response_time)
+        """
+        try:
+            app = BackgroundJobsService.app_instance
+            if not app:
+                logger.error("App instance not available for background job")
+                return
+            
+            with app.app_context():
+                from app.services.request_expiry_service import RequestExpiryService
                 
-                timeout_count = check_and_timeout_requests()
+                timeout_count = RequestExpiryService.tick()
                 
                 if timeout_count > 0:
                     logger.info(f"✅ Timeout check completed: {timeout_count} request(s) marked as unanswered")
-                else:
-                    logger.info("No requests timed out")
+            
+        except Exception as e:
+            logger.error(f"Error in expire_requests job: {str(e)}")
+            try:
+                db.session.rollback()
+            except:
+                pass
+    
+    @staticmethod
+    def check_request_timeouts():
+        """
+        Re-arm request timeout timers from the database
+        
+        Logic:
+        - Arm every PENDING request the wheel does not know (other processes, restarts)
+        - Drop timers of requests that already left PENDING
+        - Overdue requests expire on the next expire_requests tick
+        """
+        try:
+            # ✅ CRITICAL: Mevcut app instance'ı kullan, yeniden create etme
+            app = BackgroundJobsService.app_instance
+            if not app:
+                logger.error("App instance not available for background job")
+                return
+            
+            with app.app_context():
+                from app.services.request_expiry_service import RequestExpiryService
+                
+                RequestExpiryService.reconcile()
             
         except Exception as e:
             logger.error(f"Error in check_request_timeouts job: {str(e)}")
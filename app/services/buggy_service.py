@@ -11,6 +11,7 @@ from app.models.location import Location
 from app.services.audit_service import AuditService
 from app.utils.exceptions import ResourceNotFoundException, ValidationException, BusinessLogicException
 from app.utils.helpers import Pagination
+from app.utils.principal import PrincipalCache
 from app.utils.buggy_icons import assign_buggy_icon
 from datetime import datetime
 
@@ -184,9 +185,11 @@ class BuggyService:
 
         old_values = buggy.to_dict()
         hotel_id = buggy.hotel_id
+        driver_ids = [a.driver_id for a in BuggyDriver.query.filter_by(buggy_id=buggy_id).all()]
         BuggyDriver.query.filter_by(buggy_id=buggy_id).delete()
         db.session.delete(buggy)
         db.session.commit()
+        PrincipalCache.invalidate(*driver_ids)  # bulk delete, listener görmez
         AuditService.log_delete(
             entity_type='buggy', entity_id=buggy_id,
             old_values=old_values, hotel_id=hotel_id
@@ -240,26 +243,14 @@ class BuggyService:
     @staticmethod
     def emit_buggy_status_update(buggy_id, hotel_id):
         try:
-            buggy = Buggy.query.get(buggy_id)
-            if not buggy:
+            from app.services.fleet_state_service import FleetStateService
+            live = FleetStateService.live_status(hotel_id, buggy_id)
+            if not live:
                 return
-            active = BuggyDriver.query.filter_by(buggy_id=buggy_id, is_active=True).first()
-            driver_name = None
-            if active:
-                d = SystemUser.query.get(active.driver_id)
-                driver_name = d.full_name or d.username if d else None
-            status = 'offline'
-            if active:
-                from app.models.request import BuggyRequest, RequestStatus
-                ar = BuggyRequest.query.filter_by(buggy_id=buggy_id, status=RequestStatus.ACCEPTED).first()
-                status = 'busy' if ar else 'available'
-            loc_name = buggy.current_location.name if buggy.current_location else None
-            socketio.emit('buggy_status_update', {
-                'buggy_id': buggy.id, 'buggy_code': buggy.code,
-                'buggy_icon': buggy.icon, 'status': status,
-                'driver_name': driver_name,
-                'location_id': buggy.current_location_id, 'location_name': loc_name,
-                'timestamp': datetime.utcnow().isoformat()
-            }, room=f'hotel_{hotel_id}_admin')
+            # Throttled: aynı buggy için art arda gelen güncellemeler tek mesaja iner
+            from app.websocket.throttle import EmitThrottle
+            EmitThrottle.emit('buggy_status_update', {
+                **live, 'timestamp': datetime.utcnow().isoformat()
+            }, room=f'hotel_{hotel_id}_admin', emitter=socketio.emit)
         except Exception as e:
             print(f'Error emitting buggy status update: {e}')
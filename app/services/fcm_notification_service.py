@@ -8,21 +8,24 @@ from firebase_admin import credentials, messaging
 import os
 import json
 import base64
-import time
 import traceback
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from threading import Lock
 from app import db
 from app.models.user import SystemUser
 from app.models.notification_log import NotificationLog
+from app.services.notification_log_buffer import NotificationLogBuffer
 from app.utils.logger import logger, log_fcm_event, log_error
-from typing import List, Dict, Optional, Tuple
+from app.utils.retry_scheduler import RetryScheduler, PendingRetry
+from sqlalchemy import event, select, inspect
+from typing import List, Dict, Optional, Tuple, Union
 
 # ✅ Import Cyprus timezone helper
 def get_cyprus_now():
     """Get current Cyprus time"""
-    import pytz
-    cyprus_tz = pytz.timezone('Europe/Nicosia')
-    return datetime.now(cyprus_tz).replace(tzinfo=None)
+    from app.models import get_current_timestamp
+    return get_current_timestamp()
 
 
 class FCMNotificationService:
@@ -34,54 +37,101 @@ class FCMNotificationService:
     MAX_RETRIES = 3
     RETRY_DELAY_BASE = 1  # seconds
     RETRY_BACKOFF_MULTIPLIER = 2  # exponential backoff
+    _retry_stats = {'scheduled': 0, 'succeeded': 0, 'exhausted': 0}
+    _retry_stats_lock = Lock()
+    
+    # Dispatch roster cache (safety TTL, explicit invalidation on changes)
+    ROSTER_CACHE_TIMEOUT = 300  # seconds
+    _roster_listeners_registered = False
+    
+    # Multicast send engine
+    MULTICAST_CHUNK_SIZE = 500  # FCM per-request token limit
+    SEND_WORKERS = 16
+    _send_executor = None
+    _send_executor_lock = Lock()
     
     @staticmethod
-    def _retry_with_exponential_backoff(func, *args, **kwargs) -> Tuple[bool, Optional[str], int]:
+    def _retry_with_exponential_backoff(
+        func, attempt: int = 0, pending: Optional[PendingRetry] = None
+    ) -> Tuple[Union[bool, PendingRetry], Optional[str], int]:
         """
-        Retry a function with exponential backoff
+        Run a function, scheduling retries with exponential backoff
+        
+        Failed attempts are not retried in the caller's thread; the next
+        attempt is handed to RetryScheduler and runs after the backoff delay.
         
         Args:
-            func: Function to retry
-            *args: Function arguments
-            **kwargs: Function keyword arguments
+            func: Function to retry (returns truthy on success)
+            attempt: Zero-based attempt index
+            pending: PendingRetry handed back to the caller, resolved by the last attempt
         
         Returns:
-            Tuple[bool, Optional[str], int]: (success, error_message, attempts)
+            Tuple: (outcome, error_message, attempts) - outcome is True, False
+            or a PendingRetry when the next attempt is scheduled
         """
         last_error = None
         
-        for attempt in range(FCMNotificationService.MAX_RETRIES):
-            try:
-                result = func(*args, **kwargs)
-                if result:
-                    if attempt > 0:
-                        logger.info(f"✅ Retry başarılı (attempt {attempt + 1}/{FCMNotificationService.MAX_RETRIES})")
-                    return True, None, attempt + 1
-                else:
-                    last_error = "Function returned False"
-                    
-            except messaging.UnregisteredError as e:
-                # Don't retry for invalid tokens
-                logger.warning(f"⚠️ Invalid token, no retry: {str(e)}")
-                return False, f"Invalid token: {str(e)}", attempt + 1
-                
-            except messaging.SenderIdMismatchError as e:
-                # Don't retry for sender ID mismatch
-                logger.warning(f"⚠️ Sender ID mismatch, no retry: {str(e)}")
-                return False, f"Sender ID mismatch: {str(e)}", attempt + 1
+        def _finish(success):
+            if pending is not None:
+                pending.resolve(success)
+            return success
+        
+        try:
+            result = func()
+            if result:
+                if attempt > 0:
+                    FCMNotificationService._record_retry('succeeded')
+                    logger.info(f"✅ Retry başarılı (attempt {attempt + 1}/{FCMNotificationService.MAX_RETRIES})")
+                return _finish(True), None, attempt + 1
+            else:
+                last_error = "Function returned False"
                 
-            except Exception as e:
-                last_error = str(e)
-                logger.warning(f"⚠️ Attempt {attempt + 1}/{FCMNotificationService.MAX_RETRIES} failed: {last_error}")
+        except messaging.UnregisteredError as e:
+            # Don't retry for invalid tokens
+            logger.warning(f"⚠️ Invalid token, no retry: {str(e)}")
+            return _finish(False), f"Invalid token: {str(e)}", attempt + 1
+            
+        except messaging.SenderIdMismatchError as e:
+            # Don't retry for sender ID mismatch
+            logger.warning(f"⚠️ Sender ID mismatch, no retry: {str(e)}")
+            return _finish(False), f"Sender ID mismatch: {str(e)}", attempt + 1
             
-            # Exponential backoff (don't sleep on last attempt)
-            if attempt < FCMNotificationService.MAX_RETRIES - 1:
-                delay = FCMNotificationService.RETRY_DELAY_BASE * (FCMNotificationService.RETRY_BACKOFF_MULTIPLIER ** attempt)
-                logger.info(f"⏳ Waiting {delay}s before retry...")
-                time.sleep(delay)
+        except Exception as e:
+            last_error = str(e)
+            logger.warning(f"⚠️ Attempt {attempt + 1}/{FCMNotificationService.MAX_RETRIES} failed: {last_error}")
+        
+        # Exponential backoff - next attempt runs on the retry scheduler
+        if attempt < FCMNotificationService.MAX_RETRIES - 1:
+            delay = FCMNotificationService.RETRY_DELAY_BASE * (FCMNotificationService.RETRY_BACKOFF_MULTIPLIER ** attempt)
+            logger.info(f"⏳ Retry scheduled in {delay}s (attempt {attempt + 2}/{FCMNotificationService.MAX_RETRIES})")
+            FCMNotificationService._record_retry('scheduled')
+            if pending is None:
+                pending = PendingRetry(last_error)
+            RetryScheduler.schedule(delay, FCMNotificationService._retry_with_exponential_backoff, func, attempt + 1, pending)
+            return pending, f"Retry scheduled: {last_error}", attempt + 1
         
+        if attempt > 0:
+            FCMNotificationService._record_retry('exhausted')
         logger.error(f"❌ All {FCMNotificationService.MAX_RETRIES} attempts failed")
-        return False, last_error, FCMNotificationService.MAX_RETRIES
+        return _finish(False), last_error, FCMNotificationService.MAX_RETRIES
+    
+    @staticmethod
+    def _record_retry(outcome: str):
+        with FCMNotificationService._retry_stats_lock:
+            FCMNotificationService._retry_stats[outcome] += 1
+    
+    @staticmethod
+    def get_retry_stats() -> Dict:
+        """
+        FCM retry metrikleri
+        
+        Returns:
+            dict: scheduled/succeeded/exhausted sayaçları ve scheduler durumu
+        """
+        with FCMNotificationService._retry_stats_lock:
+            stats = dict(FCMNotificationService._retry_stats)
+        stats['scheduler'] = RetryScheduler.get_stats()
+        return stats
     
     @staticmethod
     def initialize() -> bool:
@@ -235,7 +285,7 @@ class FCMNotificationService:
         image: Optional[str] = None,
         click_action: Optional[str] = None,
         retry: bool = True
-    ) -> bool:
+    ) -> Union[bool, PendingRetry]:
         """
         Tek bir token'a bildirim gönder - Priority-based with retry logic
         
@@ -249,10 +299,11 @@ class FCMNotificationService:
             badge: Badge sayısı
             image: Görsel URL (Rich media)
             click_action: Tıklama aksiyonu
-            retry: Retry on failure (default: True)
+            retry: Retry on failure in the background (default: True)
         
         Returns:
-            bool: Başarılı ise True
+            True (gönderildi), False (başarısız) veya PendingRetry (ilk deneme
+            başarısız, retry arka planda zamanlandı; falsy, wait() ile sonucu beklenir)
         """
         # Initialize Firebase
         if not FCMNotificationService.initialize():
@@ -431,13 +482,14 @@ class FCMNotificationService:
         
         # Execute with retry if enabled
         if retry:
-            success, error_msg, attempts = FCMNotificationService._retry_with_exponential_backoff(_send)
-            if success:
+            outcome, error_msg, attempts = FCMNotificationService._retry_with_exponential_backoff(_send)
+            if outcome is True:
                 logger.info(f"✅ FCM notification sent successfully (attempts: {attempts})")
-                return True
+            elif isinstance(outcome, PendingRetry):
+                logger.warning(f"⏳ FCM notification pending retry (attempt {attempts}): {error_msg}")
             else:
-                logger.error(f"❌ FCM notification failed after {attempts} attempts: {error_msg}")
-                return False
+                logger.error(f"❌ FCM notification failed (attempt {attempts}): {error_msg}")
+            return outcome
         else:
             # No retry, execute once
             try:
@@ -446,6 +498,81 @@ class FCMNotificationService:
                 logger.error(f"❌ FCM notification failed (no retry): {str(e)}")
                 return False
     
+    @staticmethod
+    def _get_send_executor() -> ThreadPoolExecutor:
+        """Paylaşılan, sınırlı FCM gönderim thread pool'u (lazy)"""
+        if FCMNotificationService._send_executor is None:
+            with FCMNotificationService._send_executor_lock:
+                if FCMNotificationService._send_executor is None:
+                    FCMNotificationService._send_executor = ThreadPoolExecutor(
+                        max_workers=FCMNotificationService.SEND_WORKERS,
+                        thread_name_prefix='fcm-send'
+                    )
+        return FCMNotificationService._send_executor
+    
+    @staticmethod
+    def _submit_chunk(messages: List) -> List[Future]:
+        """
+        Bir chunk'taki mesajları paylaşılan pool'a gönderim için kuyruğa al
+        (beklemez; sonuçlar _send_result ile toplanır)
+        
+        messaging.send, Firebase app'e bağlı tek messaging client'ını
+        (ve HTTP session'ını) kullanır; her chunk ayrı session açmaz.
+        
+        Args:
+            messages: messaging.Message listesi (max MULTICAST_CHUNK_SIZE)
+        
+        Returns:
+            list: Mesaj sırasıyla Future'lar
+        """
+        executor = FCMNotificationService._get_send_executor()
+        return [executor.submit(messaging.send, message) for message in messages]
+    
+    @staticmethod
+    def _send_result(token: str, future: Future) -> Dict:
+        """Tamamlanmış bir gönderim Future'ını token bazında sonuca çevir"""
+        try:
+            return {
+                'token': token,
+                'success': True,
+                'message_id': future.result(),
+                'error_code': None,
+                'error': None
+            }
+        except Exception as e:
+            return {
+                'token': token,
+                'success': False,
+                'message_id': None,
+                'error_code': getattr(e, 'code', None) or 'UNKNOWN',
+                'error': str(e),
+                'invalid_token': FCMNotificationService._is_invalid_token_exception(e)
+            }
+    
+    @staticmethod
+    def _is_invalid_token_exception(e: Exception) -> bool:
+        """
+        Hata, token'ın kalıcı olarak geçersiz olduğunu mu gösteriyor?
+        
+        Sadece açık kalıcı hatalar: kayıtsız token (NOT_FOUND), sender ID
+        uyuşmazlığı ve token alanı için INVALID_ARGUMENT. Kota
+        (RESOURCE_EXHAUSTED), APNs kimlik doğrulama (UNAUTHENTICATED) ve
+        sunucu hataları dahil geri kalan her şey geçici - token korunur.
+        """
+        if isinstance(e, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+            return True
+        code = getattr(e, 'code', None)
+        if code == 'NOT_FOUND':
+            return True
+        if code == 'INVALID_ARGUMENT':
+            return 'token' in str(e).lower()
+        return False
+    
+    @staticmethod
+    def _is_invalid_token_error(result: Dict) -> bool:
+        """Sonuç, token'ın kalıcı olarak geçersiz olduğunu mu gösteriyor?"""
+        return not result['success'] and result.get('invalid_token', False)
+    
     @staticmethod
     def send_to_multiple(
         tokens: List[str],
@@ -454,10 +581,14 @@ class FCMNotificationService:
         data: Optional[Dict] = None,
         priority: str = 'high',
         image: Optional[str] = None
-    ) -> Dict[str, int]:
+    ) -> Dict:
         """
         Birden fazla token'a bildirim gönder (Multicast) - Priority-based
         
+        Token'lar MULTICAST_CHUNK_SIZE'lık chunk'lara bölünür ve paylaşılan
+        sınırlı thread pool üzerinde paralel gönderilir. Geçersiz token'lar
+        tek bir toplu işlemle temizlenir.
+        
         Args:
             tokens: FCM token listesi
             title: Bildirim başlığı
@@ -467,14 +598,17 @@ class FCMNotificationService:
             image: Görsel URL (Rich media)
         
         Returns:
-            dict: {'success': başarılı_sayısı, 'failure': başarısız_sayısı}
+            dict: {'success': başarılı_sayısı, 'failure': başarısız_sayısı, 'results': token bazında sonuçlar}
         """
         if not FCMNotificationService.initialize():
-            print("❌ Firebase başlatılamadı")
-            return {'success': 0, 'failure': len(tokens)}
+            logger.error("❌ Firebase başlatılamadı")
+            return {'success': 0, 'failure': len(tokens), 'results': []}
         
         if not tokens:
-            return {'success': 0, 'failure': 0}
+            return {'success': 0, 'failure': 0, 'results': []}
+        
+        # Aynı token'a iki kez gönderme
+        tokens = list(dict.fromkeys(tokens))
         
         try:
             # Notification
@@ -496,51 +630,55 @@ class FCMNotificationService:
                 )
             )
             
-            # Multicast message
-            message = messaging.MulticastMessage(
-                tokens=tokens,
-                notification=notification,
-                data=data or {},
-                android=android_config
-            )
+            # Önce tüm chunk'ları kuyruğa al, sonra tamamlanan sırayla topla
+            # (chunk'lar birbirini beklemez)
+            chunk_size = FCMNotificationService.MULTICAST_CHUNK_SIZE
+            pending = {}  # Future -> token index
+            for i in range(0, len(tokens), chunk_size):
+                messages = [messaging.Message(
+                    token=token,
+                    notification=notification,
+                    data=data or {},
+                    android=android_config
+                ) for token in tokens[i:i + chunk_size]]
+                for offset, future in enumerate(FCMNotificationService._submit_chunk(messages)):
+                    pending[future] = i + offset
             
-            # ✅ Yeni API kullan: send_each_for_multicast (batch endpoint hatası çözümü)
-            try:
-                response = messaging.send_each_for_multicast(message)
-            except AttributeError:
-                # Eski SDK versiyonu için fallback
-                response = messaging.send_multicast(message)
+            results = [None] * len(tokens)
+            for future in as_completed(pending):
+                index = pending[future]
+                results[index] = FCMNotificationService._send_result(tokens[index], future)
             
-            print(f"✅ FCM notifications sent: {response.success_count} success, {response.failure_count} failed")
+            success_count = sum(1 for r in results if r['success'])
+            failure_count = len(results) - success_count
+            logger.info(f"✅ FCM notifications sent: {success_count} success, {failure_count} failed")
             
-            # Başarısız token'ları temizle ve hata detaylarını logla
-            if response.failure_count > 0:
-                print(f"❌ FCM Failures detected:")
-                for idx, resp in enumerate(response.responses):
-                    if not resp.success:
-                        token = tokens[idx]
-                        error_code = resp.exception.code if hasattr(resp.exception, 'code') else 'UNKNOWN'
-                        error_msg = str(resp.exception) if resp.exception else 'No error message'
-                        print(f"   Token {idx+1}: {token[:20]}... - Error: {error_code} - {error_msg}")
-                        
-                        # INTERNAL error için token temizleme, sadece logla
-                        if error_code == 'INTERNAL' or '500' in error_msg:
-                            print(f"   ⚠️ INTERNAL ERROR - Token korunuyor, Firebase sunucu hatası olabilir")
-                            print(f"   💡 Firebase credentials ve quota kontrol edin")
-                        else:
-                            # Diğer hatalar için token temizle
-                            FCMNotificationService._remove_invalid_token(token)
+            # Başarısız token'ları logla, geçersizleri toplu temizle
+            if failure_count > 0:
+                logger.warning(f"❌ FCM Failures detected:")
+                invalid_tokens = []
+                for r in results:
+                    if r['success']:
+                        continue
+                    logger.warning(f"   Token: {r['token'][:20]}... - Error: {r['error_code']} - {r['error']}")
+                    if FCMNotificationService._is_invalid_token_error(r):
+                        invalid_tokens.append(r['token'])
+                    else:
+                        logger.warning(f"   ⚠️ {r['error_code']} - Token korunuyor, geçici Firebase hatası olabilir")
+                
+                if invalid_tokens:
+                    FCMNotificationService._remove_invalid_tokens(invalid_tokens)
             
             return {
-                'success': response.success_count,
-                'failure': response.failure_count
+                'success': success_count,
+                'failure': failure_count,
+                'results': results
             }
             
         except Exception as e:
-            print(f"❌ FCM error: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return {'success': 0, 'failure': len(tokens)}
+            logger.error(f"❌ FCM error: {str(e)}")
+            logger.error(f"❌ Traceback: {traceback.format_exc()}")
+            return {'success': 0, 'failure': len(tokens), 'results': []}
 
     @staticmethod
     def notify_new_request(request_obj) -> int:
@@ -554,8 +692,6 @@ class FCMNotificationService:
         Returns:
             int: Bildirim gönderilen sürücü sayısı
         """
-        from app.models.buggy import Buggy, BuggyStatus
-
         logger.info('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
         logger.info(f'🔔 [FCM] NEW REQUEST NOTIFICATION START')
         logger.info(f'📋 Request ID: {request_obj.id}')
@@ -564,61 +700,38 @@ class FCMNotificationService:
         logger.info(f'⌚ Time: {request_obj.requested_at}')
         logger.info('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
 
-        # Tüm buggy'leri detaylı logla
-        all_buggies = Buggy.query.filter_by(hotel_id=request_obj.hotel_id).all()
-        logger.info(f"🚗 Hotel {request_obj.hotel_id} - Toplam buggy sayısı: {len(all_buggies)}")
-        for b in all_buggies:
-            logger.info(f"  - Buggy {b.code}: Status={b.status.value}, Driver ID={b.driver_id}")
-
-        # Müsait buggy'leri bul
-        available_buggies = Buggy.query.filter_by(
-            hotel_id=request_obj.hotel_id,
-            status=BuggyStatus.AVAILABLE
-        ).all()
+        # Müsait buggy → aktif sürücü → token (cached, tek sorgu)
+        roster = FCMNotificationService.get_dispatch_roster(request_obj.hotel_id)
+        available_buggy_ids = {entry['buggy_id'] for entry in roster}
 
-        logger.info(f"✅ Müsait buggy sayısı: {len(available_buggies)}")
+        logger.info(f"✅ Müsait buggy sayısı (aktif sürücülü): {len(available_buggy_ids)}")
 
         # Sürücü token'larını topla
         tokens = []
         driver_ids = []
         driver_details = []
 
-        for buggy in available_buggies:
-            # Yeni sistem: BuggyDriver association table kullan
-            from app.models.buggy_driver import BuggyDriver
-            active_assignments = BuggyDriver.query.filter_by(
-                buggy_id=buggy.id,
-                is_active=True
-            ).all()
-
-            logger.info(f"  🔍 Buggy {buggy.code}: {len(active_assignments)} aktif atama")
-
-            for assignment in active_assignments:
-                driver = SystemUser.query.get(assignment.driver_id)
-                if driver:
-                    has_token = bool(driver.fcm_token)
-                    token_preview = driver.fcm_token[:20] + '...' if driver.fcm_token else 'None'
-
-                    logger.info(f"    👤 Driver: {driver.full_name} (ID: {driver.id})")
-                    logger.info(f"       FCM Token: {'✅ ' + token_preview if has_token else '❌ None'}")
-
-                    if driver.fcm_token and driver.id not in driver_ids:
-                        tokens.append(driver.fcm_token)
-                        driver_ids.append(driver.id)
-                        driver_details.append({
-                            'id': driver.id,
-                            'name': driver.full_name,
-                            'buggy': buggy.code
-                        })
-                        logger.info(f"       ✅ Token added to send list")
-                    elif driver.fcm_token:
-                        logger.warning(f"       ⚠️ Driver already in list (duplicate prevented)")
-                    else:
-                        logger.error(f"       ❌ NO FCM TOKEN - Driver cannot receive notifications!")
+        for entry in roster:
+            token_preview = entry['fcm_token'][:20] + '...' if entry['fcm_token'] else 'None'
+            logger.info(f"  👤 Buggy {entry['buggy_code']} → Driver: {entry['driver_name']} (ID: {entry['driver_id']})")
+            logger.info(f"     FCM Token: {'✅ ' + token_preview if entry['fcm_token'] else '❌ None'}")
+
+            if entry['fcm_token'] and entry['driver_id'] not in driver_ids:
+                tokens.append(entry['fcm_token'])
+                driver_ids.append(entry['driver_id'])
+                driver_details.append({
+                    'id': entry['driver_id'],
+                    'name': entry['driver_name'],
+                    'buggy': entry['buggy_code']
+                })
+            elif entry['fcm_token']:
+                logger.warning(f"     ⚠️ Driver already in list (duplicate prevented)")
+            else:
+                logger.error(f"     ❌ NO FCM TOKEN - Driver cannot receive notifications!")
 
         logger.info('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
         logger.info(f"📊 SUMMARY:")
-        logger.info(f"   Total Available Buggies: {len(available_buggies)}")
+        logger.info(f"   Total Available Buggies: {len(available_buggy_ids)}")
         logger.info(f"   Drivers with FCM Tokens: {len(tokens)}")
         logger.info(f"   Ready to Send: {len(tokens)} notifications")
         logger.info('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
@@ -628,16 +741,15 @@ class FCMNotificationService:
             logger.error(f"❌ {error_msg}")
             logger.error(f"   Hotel ID: {request_obj.hotel_id}")
             logger.error(f"   Request ID: {request_obj.id}")
-            logger.error(f"   Available Buggies: {len(available_buggies)}")
-            logger.error(f"   Drivers Found: {len(driver_ids)}")
+            logger.error(f"   Available Buggies: {len(available_buggy_ids)}")
+            logger.error(f"   Drivers Found: {len(roster)}")
             logger.error('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
 
             log_error('FCM_NO_DRIVERS', error_msg, {
                 'hotel_id': request_obj.hotel_id,
                 'request_id': request_obj.id,
-                'available_buggies': len(available_buggies),
-                'all_buggies': len(all_buggies),
-                'drivers_checked': len(driver_ids)
+                'available_buggies': len(available_buggy_ids),
+                'drivers_checked': len(roster)
             })
             return 0
         
@@ -740,7 +852,123 @@ class FCMNotificationService:
         return result['success']
     
     @staticmethod
-    def notify_request_accepted(request_obj) -> bool:
+    def get_dispatch_roster(hotel_id: int) -> List[Dict]:
+        """
+        Otelin yeni talep bildirimi alacak sürücü listesi (cached)
+
+        Müsait buggy → aktif sürücü → FCM token eşleşmesi tek bir join
+        sorgusuyla çözülür ve otel bazında cache'lenir. Buggy, sürücü
+        ataması veya sürücü kaydı değişen commit'lerde session listener'ı
+        (register_roster_listeners) cache'i temizler.
+
+        Args:
+            hotel_id: Otel ID
+
+        Returns:
+            list: [{'buggy_id', 'buggy_code', 'driver_id', 'driver_name', 'fcm_token'}]
+        """
+        from app import cache
+
+        cache_key = f'dispatch_roster_{hotel_id}'
+        roster = cache.get(cache_key)
+        if roster is not None:
+            return roster
+
+        from app.models.buggy import Buggy, BuggyStatus
+        from app.models.buggy_driver import BuggyDriver
+
+        rows = db.session.query(
+            Buggy.id, Buggy.code,
+            SystemUser.id, SystemUser.full_name, SystemUser.username, SystemUser.fcm_token
+        ).join(
+            BuggyDriver, db.and_(BuggyDriver.buggy_id == Buggy.id, BuggyDriver.is_active == True)
+        ).join(
+            SystemUser, SystemUser.id == BuggyDriver.driver_id
+        ).filter(
+            Buggy.hotel_id == hotel_id,
+            Buggy.status == BuggyStatus.AVAILABLE
+        ).order_by(Buggy.id, SystemUser.id).all()
+
+        roster = [{
+            'buggy_id': buggy_id,
+            'buggy_code': buggy_code,
+            'driver_id': driver_id,
+            'driver_name': full_name or username,
+            'fcm_token': fcm_token
+        } for buggy_id, buggy_code, driver_id, full_name, username, fcm_token in rows]
+
+        cache.set(cache_key, roster, timeout=FCMNotificationService.ROSTER_CACHE_TIMEOUT)
+        return roster
+
+    @staticmethod
+    def invalidate_dispatch_roster(hotel_id: Optional[int]):
+        """
+        Otelin dispatch roster cache'ini temizle
+
+        Session üzerinden yapılan değişikliklerde commit listener'ı bunu
+        kendisi çağırır; elle çağrı yalnızca bulk UPDATE/DELETE sonrası gerekir.
+
+        Args:
+            hotel_id: Otel ID
+        """
+        if hotel_id is None:
+            return
+        try:
+            from app import cache
+            cache.delete(f'dispatch_roster_{hotel_id}')
+        except Exception as e:
+            logger.warning(f"⚠️ Dispatch roster cache temizlenemedi: {str(e)}")
+
+    # ==================== ROSTER LIFECYCLE EVENTS ====================
+
+    @classmethod
+    def register_roster_listeners(cls):
+        """Drop cached rosters on committed buggy / assignment / driver changes (idempotent)"""
+        if cls._roster_listeners_registered:
+            return
+        event.listen(db.session, 'after_flush', cls._roster_after_flush)
+        event.listen(db.session, 'after_commit', cls._roster_after_commit)
+        event.listen(db.session, 'after_rollback', cls._roster_after_rollback)
+        cls._roster_listeners_registered = True
+
+    @staticmethod
+    def _roster_after_flush(session, flush_context):
+        from app.models.buggy import Buggy
+        from app.models.buggy_driver import BuggyDriver
+        from app.models.user import UserRole
+
+        hotel_ids = session.info.setdefault('dispatch_roster_hotels', set())
+        buggy_ids = set()
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            if isinstance(obj, Buggy):
+                hotel_ids.add(obj.hotel_id)
+            elif isinstance(obj, BuggyDriver):
+                buggy_ids.update(inspect(obj).attrs.buggy_id.history.deleted)
+                buggy_ids.add(obj.buggy_id)
+            elif isinstance(obj, SystemUser) and obj not in session.new:
+                roles = {obj.role, *inspect(obj).attrs.role.history.deleted}
+                if UserRole.DRIVER in roles:
+                    hotel_ids.add(obj.hotel_id)
+        buggy_ids.discard(None)
+        if buggy_ids:
+            # Buggy'nin oteli: flush sırasında sorgu atılamaz, bağlantı üzerinden oku
+            hotel_ids.update(session.connection().execute(
+                select(Buggy.hotel_id).where(Buggy.id.in_(buggy_ids)).distinct()
+            ).scalars())
+
+    @staticmethod
+    def _roster_after_commit(session):
+        for hotel_id in session.info.pop('dispatch_roster_hotels', ()):
+            FCMNotificationService.invalidate_dispatch_roster(hotel_id)
+
+    @staticmethod
+    def _roster_after_rollback(session):
+        session.info.pop('dispatch_roster_hotels', None)
+
+    @staticmethod
+    def notify_request_accepted(request_obj) -> Union[bool, PendingRetry]:
         """
         Talep kabul edildi bildirimi - NORMAL PRIORITY
         Misafire gönder
@@ -749,7 +977,7 @@ class FCMNotificationService:
             request_obj: BuggyRequest nesnesi
         
         Returns:
-            bool: Başarılı ise True
+            bool: Başarılı ise True (PendingRetry: retry zamanlandı, bkz. send_to_token)
         """
         if not hasattr(request_obj, 'guest_fcm_token') or not request_obj.guest_fcm_token:
             print("⚠️ Misafir FCM token'ı yok")
@@ -774,7 +1002,7 @@ class FCMNotificationService:
         )
     
     @staticmethod
-    def notify_request_completed(request_obj) -> bool:
+    def notify_request_completed(request_obj) -> Union[bool, PendingRetry]:
         """
         Talep tamamlandı bildirimi - LOW PRIORITY
         Misafire gönder
@@ -783,7 +1011,7 @@ class FCMNotificationService:
             request_obj: BuggyRequest nesnesi
         
         Returns:
-            bool: Başarılı ise True
+            bool: Başarılı ise True (PendingRetry: retry zamanlandı, bkz. send_to_token)
         """
         if not hasattr(request_obj, 'guest_fcm_token') or not request_obj.guest_fcm_token:
             return False
@@ -806,26 +1034,19 @@ class FCMNotificationService:
 
     @staticmethod
     def _log_notification(token: str, title: str, body: str, status: str, priority: str = 'normal', response: str = None, error: str = None):
-        """Bildirim logla - Priority tracking ile"""
+        """Bildirim logla - Priority tracking ile (buffered bulk insert)"""
         try:
-            user = SystemUser.query.filter_by(fcm_token=token).first()
-            
-            if user:
-                log = NotificationLog(
-                    user_id=user.id,
-                    notification_type='fcm',
-                    priority=priority,
-                    title=title,
-                    body=body,
-                    status=status,
-                    error_message=error,
-                    sent_at=get_cyprus_now()  # ✅ Cyprus timezone
-                )
-                db.session.add(log)
-                db.session.commit()
+            NotificationLogBuffer.add(
+                token=token,
+                title=title,
+                body=body,
+                status=status,
+                priority=priority,
+                error=error,
+                sent_at=get_cyprus_now()  # ✅ Cyprus timezone
+            )
         except Exception as e:
-            print(f"⚠️ Log kaydedilemedi: {str(e)}")
-            db.session.rollback()
+            logger.warning(f"⚠️ Log kaydedilemedi: {str(e)}")
     
     @staticmethod
     def _remove_invalid_token(token: str):
@@ -837,6 +1058,7 @@ class FCMNotificationService:
                 user.fcm_token = None
                 user.fcm_token_date = None
                 db.session.commit()
+                NotificationLogBuffer.forget_tokens(token)
                 logger.info(f"🗑️ Geçersiz driver token temizlendi: User {user.id}")
                 return
             
@@ -856,6 +1078,46 @@ class FCMNotificationService:
             logger.error(f"⚠️ Token temizlenemedi: {str(e)}")
             db.session.rollback()
     
+    @staticmethod
+    def _remove_invalid_tokens(tokens: List[str]):
+        """Geçersiz token'ları toplu temizle (Driver & Guest) - tek commit"""
+        if not tokens:
+            return
+        try:
+            from app.models.request import BuggyRequest
+            
+            hotel_ids = {hotel_id for (hotel_id,) in db.session.query(SystemUser.hotel_id).filter(
+                SystemUser.fcm_token.in_(tokens)
+            ).distinct()}
+            
+            driver_count = SystemUser.query.filter(
+                SystemUser.fcm_token.in_(tokens)
+            ).update({
+                SystemUser.fcm_token: None,
+                SystemUser.fcm_token_date: None
+            }, synchronize_session=False)
+            
+            guest_count = BuggyRequest.query.filter(
+                BuggyRequest.guest_fcm_token.in_(tokens)
+            ).update({
+                BuggyRequest.guest_fcm_token: None,
+                BuggyRequest.guest_fcm_token_expires_at: None
+            }, synchronize_session=False)
+            
+            db.session.commit()
+            NotificationLogBuffer.forget_tokens(*tokens)
+            
+            from app.services.fleet_state_service import FleetStateService
+            for hotel_id in hotel_ids:
+                FCMNotificationService.invalidate_dispatch_roster(hotel_id)
+                FleetStateService.invalidate(hotel_id)  # bulk UPDATE, listener görmez
+            
+            logger.info(f"🗑️ Geçersiz token'lar temizlendi: {driver_count} driver, {guest_count} guest")
+            
+        except Exception as e:
+            logger.error(f"⚠️ Token'lar temizlenemedi: {str(e)}")
+            db.session.rollback()
+    
     @staticmethod
     def validate_token(token: str) -> bool:
         """
@@ -920,10 +1182,15 @@ class FCMNotificationService:
                 existing_user.fcm_token_date = None
             
             # Register token
+            previous_token = user.fcm_token
             user.fcm_token = token
             user.fcm_token_date = get_cyprus_now()  # ✅ Cyprus timezone
             db.session.commit()
 
+            if previous_token != token:
+                NotificationLogBuffer.forget_tokens(previous_token)
+            NotificationLogBuffer.remember_token(token, user.id)
+
             # ✅ CRITICAL: Expire session to clear cache
             db.session.expire(user)
 
@@ -959,9 +1226,12 @@ class FCMNotificationService:
                 print(f"⚠️ Token uyuşmazlığı: User {user_id}")
             
             # Yeni token kaydet
+            previous_token = user.fcm_token
             user.fcm_token = new_token
             user.fcm_token_date = get_cyprus_now()  # ✅ Cyprus timezone
             db.session.commit()
+            NotificationLogBuffer.forget_tokens(previous_token, old_token)
+            NotificationLogBuffer.remember_token(new_token, user.id)
             
             print(f"🔄 FCM token yenilendi: User {user_id}")
             return True
@@ -0,0 +1,496 @@
+"""
+Buggy Call - Fleet State Service
+In-memory live fleet state per hotel (buggy status, location, drivers,
+current request), kept in step with committed changes
+"""
+from threading import RLock
+from sqlalchemy import event, inspect, select
+from app import db
+from app.models.buggy import Buggy, BuggyStatus
+from app.models.buggy_driver import BuggyDriver
+from app.models.location import Location
+from app.models.request import BuggyRequest, RequestStatus
+from app.models.user import SystemUser, UserRole
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_BUGGY_FIELDS = (
+    'id', 'hotel_id', 'code', 'model', 'license_plate', 'icon', 'status',
+    'current_location_id', 'created_at', 'updated_at'
+)
+_ASSOCIATION_FIELDS = ('id', 'buggy_id', 'driver_id', 'is_active', 'is_primary', 'assigned_at', 'last_active_at')
+
+
+class FleetStateService:
+    """
+    Live fleet state served from process memory
+
+    A hotel is loaded on first use (or at boot via warm_up) with four
+    queries: buggies, driver associations (+ driver names), accepted
+    requests and location names. After that, session listeners apply every
+    committed Buggy / BuggyDriver / BuggyRequest / SystemUser / Location
+    change to the loaded hotels, so reads issue no SQL.
+
+    State is per worker process. With a pub/sub broker (SSE_BROKER_URL) each
+    commit also publishes the touched hotel ids on FLEET_STATE_CHANNEL and
+    the other workers drop those hotels, reloading them on the next read.
+    Without a broker the app must run a single worker (see config). Writes
+    that bypass the ORM unit of work (bulk UPDATE) call invalidate(), which
+    is broadcast too; anything still missed is picked up by reconcile(),
+    which a background job runs every FLEET_STATE_RECONCILE_INTERVAL seconds.
+    """
+
+    _hotels = {}  # hotel_id -> {'buggies': {buggy_id: entry}, 'locations': {location_id: name}}
+    _drivers = {}  # driver_id -> {'name', 'has_fcm_token'}
+    _lock = RLock()
+    _listeners_registered = False
+    _broker = None  # RedisSSEBroker on FLEET_STATE_CHANNEL, None = single worker
+    _origin = uuid.uuid4().hex  # skips this process's own broadcasts
+    _stats = {'loads': 0, 'applied': 0, 'reconciled': 0, 'drift': 0}
+
+    # ==================== LOAD ====================
+
+    @classmethod
+    def warm_up(cls):
+        """Load every hotel that has buggies (boot)"""
+        hotel_ids = [hotel_id for (hotel_id,) in db.session.query(Buggy.hotel_id).distinct()]
+        for hotel_id in hotel_ids:
+            cls._ensure(hotel_id)
+        logger.info(f"✅ Fleet state loaded for {len(hotel_ids)} hotel(s)")
+        return len(hotel_ids)
+
+    @classmethod
+    def _ensure(cls, hotel_id):
+        if cls._broker is not None:
+            cls._broker.subscribe(cls._on_broadcast)  # idempotent, (re)starts the listener after fork
+        state = cls._hotels.get(hotel_id)
+        if state is not None:
+            return state
+        with cls._lock:
+            if hotel_id not in cls._hotels:
+                state, drivers = cls._load(hotel_id)
+                cls._hotels[hotel_id] = state
+                cls._drivers.update(drivers)
+                cls._stats['loads'] += 1
+            return cls._hotels[hotel_id]
+
+    @staticmethod
+    def _load(hotel_id):
+        """Read one hotel's fleet from the database (4 queries)"""
+        buggies = {}
+        for row in db.session.query(*[getattr(Buggy, field) for field in _BUGGY_FIELDS]).filter(
+            Buggy.hotel_id == hotel_id
+        ):
+            entry = dict(zip(_BUGGY_FIELDS, row))
+            entry['drivers'] = {}
+            entry['request_id'] = None
+            buggies[entry['id']] = entry
+
+        drivers = {}
+        rows = db.session.query(
+            *[getattr(BuggyDriver, field) for field in _ASSOCIATION_FIELDS],
+            SystemUser.full_name, SystemUser.username, SystemUser.fcm_token
+        ).join(
+            Buggy, Buggy.id == BuggyDriver.buggy_id
+        ).outerjoin(
+            SystemUser, SystemUser.id == BuggyDriver.driver_id
+        ).filter(Buggy.hotel_id == hotel_id)
+        for row in rows:
+            association = dict(zip(_ASSOCIATION_FIELDS, row[:len(_ASSOCIATION_FIELDS)]))
+            buggies[association['buggy_id']]['drivers'][association['id']] = association
+            full_name, username, fcm_token = row[len(_ASSOCIATION_FIELDS):]
+            drivers[association['driver_id']] = {
+                'name': full_name if full_name else username,
+                'has_fcm_token': bool(fcm_token)
+            }
+
+        for request_id, buggy_id in db.session.query(BuggyRequest.id, BuggyRequest.buggy_id).filter(
+            BuggyRequest.hotel_id == hotel_id,
+            BuggyRequest.status == RequestStatus.ACCEPTED,
+            BuggyRequest.buggy_id.isnot(None)
+        ).order_by(BuggyRequest.id):
+            if buggy_id in buggies and buggies[buggy_id]['request_id'] is None:
+                buggies[buggy_id]['request_id'] = request_id
+
+        locations = dict(db.session.query(Location.id, Location.name).filter(Location.hotel_id == hotel_id))
+        return {'buggies': buggies, 'locations': locations}, drivers
+
+    @classmethod
+    def reconcile(cls):
+        """
+        Reload every loaded hotel from the database and swap it in
+
+        Returns:
+            int: Buggies whose in-memory state had drifted from the database
+        """
+        drift = 0
+        for hotel_id in list(cls._hotels):
+            with cls._lock:
+                state, drivers = cls._load(hotel_id)
+                current = cls._hotels.get(hotel_id, {'buggies': {}})['buggies']
+                fresh = state['buggies']
+                drift += sum(1 for buggy_id in set(current) | set(fresh)
+                             if current.get(buggy_id) != fresh.get(buggy_id))
+                cls._hotels[hotel_id] = state
+                cls._drivers.update(drivers)
+        cls._stats['reconciled'] += 1
+        cls._stats['drift'] += drift
+        if drift:
+            logger.warning(f"⚠️ Fleet state reconciled: {drift} buggy entries had drifted")
+        return drift
+
+    @classmethod
+    def invalidate(cls, hotel_id, broadcast=True):
+        """
+        Drop a hotel's state; the next read reloads it
+
+        Args:
+            hotel_id: Hotel ID
+            broadcast: Also drop it in the other workers (broker)
+        """
+        with cls._lock:
+            cls._hotels.pop(hotel_id, None)
+        if broadcast:
+            cls._broadcast([hotel_id])
+
+    # ==================== BROKER ====================
+
+    @classmethod
+    def init_broker(cls, app):
+        """
+        Share invalidations with the other workers (SSE_BROKER_URL)
+
+        The listener thread starts on the first hotel load, i.e. in the
+        worker, not in a preloading master.
+        """
+        cls._broker = None
+        url = app.config.get('SSE_BROKER_URL')
+        if not url:
+            return
+        try:
+            from app.services.sse_broker import RedisSSEBroker
+            cls._broker = RedisSSEBroker(url, app.config.get('FLEET_STATE_CHANNEL', 'buggycall:fleet'))
+            logger.info("✅ Fleet state invalidations shared through the broker")
+        except Exception as e:
+            logger.error(f"❌ Fleet state broker kurulamadı, tek worker gerekir: {str(e)}")
+
+    @classmethod
+    def _broadcast(cls, hotel_ids):
+        if cls._broker is None or not hotel_ids:
+            return
+        try:
+            cls._broker.publish({'origin': cls._origin, 'hotel_ids': sorted(hotel_ids)})
+        except Exception as e:
+            # Diğer worker'lar bir sonraki reconcile ile düzelir
+            logger.warning(f"⚠️ Fleet state invalidation yayınlanamadı: {str(e)}")
+
+    @classmethod
+    def _on_broadcast(cls, message):
+        """Broker handler: drop hotels another worker changed"""
+        if message.get('origin') == cls._origin:
+            return  # already applied by the commit listener
+        for hotel_id in message.get('hotel_ids', []):
+            cls.invalidate(hotel_id, broadcast=False)
+
+    @classmethod
+    def reset(cls):
+        """Forget all state (app start, tests)"""
+        with cls._lock:
+            cls._hotels = {}
+            cls._drivers = {}
+            cls._stats = {'loads': 0, 'applied': 0, 'reconciled': 0, 'drift': 0}
+
+    # ==================== READ ====================
+
+    @classmethod
+    def available_count(cls, hotel_id):
+        """Number of AVAILABLE buggies"""
+        buggies = cls._ensure(hotel_id)['buggies']
+        with cls._lock:
+            return sum(1 for entry in buggies.values() if entry['status'] == BuggyStatus.AVAILABLE)
+
+    @classmethod
+    def active_drivers(cls, hotel_id):
+        """
+        Logged-in drivers of AVAILABLE buggies
+
+        Returns:
+            list: [{'driver_id', 'driver_name', 'buggy_id', 'buggy_code', 'buggy_icon',
+                    'buggy_status', 'has_fcm_token', 'last_active'}]
+        """
+        state = cls._ensure(hotel_id)
+        with cls._lock:
+            result = []
+            for buggy_id in sorted(state['buggies']):
+                entry = state['buggies'][buggy_id]
+                if entry['status'] != BuggyStatus.AVAILABLE:
+                    continue
+                for association_id in sorted(entry['drivers']):
+                    association = entry['drivers'][association_id]
+                    driver = cls._drivers.get(association['driver_id'])
+                    if not association['is_active'] or driver is None:
+                        continue
+                    result.append({
+                        'driver_id': association['driver_id'],
+                        'driver_name': driver['name'],
+                        'buggy_id': buggy_id,
+                        'buggy_code': entry['code'],
+                        'buggy_icon': entry['icon'],
+                        'buggy_status': entry['status'].value,
+                        'has_fcm_token': driver['has_fcm_token'],
+                        'last_active': association['last_active_at'].isoformat() if association['last_active_at'] else None
+                    })
+            return result
+
+    @classmethod
+    def buggy_dicts(cls, hotel_id):
+        """All buggies of a hotel, same dicts as Buggy.to_dict()"""
+        state = cls._ensure(hotel_id)
+        with cls._lock:
+            return [cls._to_dict(state['buggies'][buggy_id], state['locations'])
+                    for buggy_id in sorted(state['buggies'])]
+
+    @classmethod
+    def live_status(cls, hotel_id, buggy_id):
+        """
+        Dashboard status of one buggy
+
+        Returns:
+            dict: {'buggy_id', 'buggy_code', 'buggy_icon', 'status' (offline/busy/available),
+                   'driver_name', 'location_id', 'location_name'} or None if unknown
+        """
+        state = cls._ensure(hotel_id)
+        with cls._lock:
+            entry = state['buggies'].get(buggy_id)
+            if entry is None:
+                return None
+            active = cls._first([a for a in entry['drivers'].values() if a['is_active']])
+            status = 'offline'
+            if active:
+                status = 'busy' if entry['request_id'] else 'available'
+            return {
+                'buggy_id': entry['id'],
+                'buggy_code': entry['code'],
+                'buggy_icon': entry['icon'],
+                'status': status,
+                'driver_name': cls._driver_name(active),
+                'location_id': entry['current_location_id'],
+                'location_name': state['locations'].get(entry['current_location_id'])
+            }
+
+    @classmethod
+    def location_name(cls, hotel_id, location_id):
+        """Location name from the hotel's state (None if unknown)"""
+        return cls._ensure(hotel_id)['locations'].get(location_id)
+
+    @classmethod
+    def get_stats(cls):
+        """Loaded hotels/buggies and load/apply/reconcile counters"""
+        with cls._lock:
+            return {
+                'hotels': len(cls._hotels),
+                'buggies': sum(len(state['buggies']) for state in cls._hotels.values()),
+                'drivers': len(cls._drivers),
+                **cls._stats
+            }
+
+    @staticmethod
+    def _first(associations):
+        # .first() without ORDER BY -> en düşük id (Buggy.prefetch_related ile aynı)
+        return min(associations, key=lambda a: a['id'], default=None)
+
+    @classmethod
+    def _driver_name(cls, association):
+        if association is None:
+            return None
+        driver = cls._drivers.get(association['driver_id'])
+        return driver['name'] if driver else None
+
+    @classmethod
+    def _to_dict(cls, entry, locations):
+        associations = list(entry['drivers'].values())
+        if entry['status'] == BuggyStatus.OFFLINE:
+            active = None
+        else:
+            active = cls._first([a for a in associations if a['is_active']])
+        # Primary varsa o, yoksa en son atanan (assigned_at desc, id)
+        assigned = cls._first([a for a in associations if a['is_primary']])
+        if assigned is None and associations:
+            assigned = min(associations, key=lambda a: (-a['assigned_at'].timestamp(), a['id']))
+        driver = active or assigned
+        location_id = entry['current_location_id']
+        location_name = locations.get(location_id) if location_id else None
+        return {
+            'id': entry['id'],
+            'hotel_id': entry['hotel_id'],
+            'driver_id': driver['driver_id'] if driver else None,
+            'current_location_id': location_id,
+            'code': entry['code'],
+            'model': entry['model'],
+            'license_plate': entry['license_plate'],
+            'icon': entry['icon'] or '🚗',
+            'status': entry['status'].value if entry['status'] else None,
+            'driver_name': cls._driver_name(driver),
+            'current_location': {'id': location_id, 'name': location_name} if location_name is not None else None,
+            'current_location_name': location_name,
+            'created_at': entry['created_at'].isoformat() if entry['created_at'] else None,
+            'updated_at': entry['updated_at'].isoformat() if entry['updated_at'] else None
+        }
+
+    # ==================== LIFECYCLE EVENTS ====================
+
+    @classmethod
+    def register_listeners(cls):
+        """Apply committed fleet changes to the loaded state (idempotent)"""
+        if cls._listeners_registered:
+            return
+        event.listen(db.session, 'after_flush', cls._after_flush)
+        event.listen(db.session, 'after_commit', cls._after_commit)
+        event.listen(db.session, 'after_rollback', cls._after_rollback)
+        cls._listeners_registered = True
+
+    @classmethod
+    def _after_flush(cls, session, flush_context):
+        if not cls._hotels and cls._broker is None:
+            return  # nothing loaded yet, the first read loads fresh state
+        changes = session.info.setdefault('fleet_state_changes', [])
+        hotels = session.info.setdefault('fleet_state_hotels', set())
+        deleted = set(session.deleted)
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            if cls._broker is not None:
+                hotels.update(cls._touched_hotels(session, obj))
+            if not cls._hotels:
+                continue
+            if isinstance(obj, Buggy):
+                changes.append(('buggy', {field: getattr(obj, field) for field in _BUGGY_FIELDS}, obj in deleted))
+            elif isinstance(obj, BuggyDriver):
+                changes.append(('association', {field: getattr(obj, field) for field in _ASSOCIATION_FIELDS}, obj in deleted))
+                if obj.driver_id not in cls._drivers:
+                    changes.append(('driver', cls._read_driver(session, obj.driver_id), False))
+            elif isinstance(obj, BuggyRequest):
+                changes.append(('request', {'id': obj.id, 'hotel_id': obj.hotel_id,
+                                            'buggy_id': obj.buggy_id, 'status': obj.status}, obj in deleted))
+            elif isinstance(obj, SystemUser) and obj.id in cls._drivers:
+                changes.append(('driver', {'id': obj.id, 'name': obj.full_name if obj.full_name else obj.username,
+                                           'has_fcm_token': bool(obj.fcm_token)}, obj in deleted))
+            elif isinstance(obj, Location):
+                changes.append(('location', {'id': obj.id, 'hotel_id': obj.hotel_id, 'name': obj.name}, obj in deleted))
+
+    @classmethod
+    def _touched_hotels(cls, session, obj):
+        """Hotels whose state a flushed object changes (broadcast to the other workers)"""
+        if isinstance(obj, Buggy):
+            return {obj.hotel_id, *inspect(obj).attrs.hotel_id.history.deleted}
+        if isinstance(obj, BuggyDriver):
+            buggy_ids = {obj.buggy_id, *inspect(obj).attrs.buggy_id.history.deleted}
+            return {cls._buggy_hotel(session, buggy_id) for buggy_id in buggy_ids} - {None}
+        if isinstance(obj, (BuggyRequest, Location)):
+            return {obj.hotel_id}
+        if isinstance(obj, SystemUser) and obj.role == UserRole.DRIVER:
+            return {obj.hotel_id}
+        return set()
+
+    @classmethod
+    def _buggy_hotel(cls, session, buggy_id):
+        entry = cls._find_buggy(buggy_id)
+        if entry is not None:
+            return entry['hotel_id']
+        return session.connection().execute(select(Buggy.hotel_id).where(Buggy.id == buggy_id)).scalar()
+
+    @staticmethod
+    def _read_driver(session, driver_id):
+        row = session.connection().execute(
+            select(SystemUser.full_name, SystemUser.username, SystemUser.fcm_token).where(SystemUser.id == driver_id)
+        ).first()
+        return {
+            'id': driver_id,
+            'name': (row.full_name if row.full_name else row.username) if row else None,
+            'has_fcm_token': bool(row.fcm_token) if row else False
+        }
+
+    @classmethod
+    def _after_commit(cls, session):
+        cls._broadcast(session.info.pop('fleet_state_hotels', None))
+        changes = session.info.pop('fleet_state_changes', None)
+        if not changes:
+            return
+        with cls._lock:
+            for kind, data, deleted in changes:
+                try:
+                    getattr(cls, f'_apply_{kind}')(data, deleted)
+                    cls._stats['applied'] += 1
+                except Exception as e:
+                    # Bir sonraki reconcile düzeltir
+                    logger.error(f"⚠️ Fleet state update failed ({kind} {data.get('id')}): {str(e)}")
+
+    @staticmethod
+    def _after_rollback(session):
+        session.info.pop('fleet_state_changes', None)
+        session.info.pop('fleet_state_hotels', None)
+
+    @classmethod
+    def _apply_buggy(cls, data, deleted):
+        for hotel_id, state in cls._hotels.items():
+            if hotel_id != data['hotel_id'] or deleted:
+                state['buggies'].pop(data['id'], None)  # deleted or moved to another hotel
+        state = cls._hotels.get(data['hotel_id'])
+        if state is None or deleted:
+            return
+        entry = state['buggies'].setdefault(data['id'], {'drivers': {}, 'request_id': None})
+        entry.update(data)
+
+    @classmethod
+    def _find_buggy(cls, buggy_id):
+        for state in cls._hotels.values():
+            if buggy_id in state['buggies']:
+                return state['buggies'][buggy_id]
+        return None
+
+    @classmethod
+    def _apply_association(cls, data, deleted):
+        for state in cls._hotels.values():
+            for entry in state['buggies'].values():
+                if entry['id'] != data['buggy_id']:
+                    entry['drivers'].pop(data['id'], None)
+        entry = cls._find_buggy(data['buggy_id'])
+        if entry is None:
+            return
+        if deleted:
+            entry['drivers'].pop(data['id'], None)
+        else:
+            entry['drivers'][data['id']] = data
+
+    @classmethod
+    def _apply_request(cls, data, deleted):
+        state = cls._hotels.get(data['hotel_id'])
+        if state is None:
+            return
+        for entry in state['buggies'].values():
+            if entry['request_id'] == data['id']:
+                entry['request_id'] = None
+        if deleted or data['status'] != RequestStatus.ACCEPTED or data['buggy_id'] is None:
+            return
+        entry = state['buggies'].get(data['buggy_id'])
+        if entry is not None and entry['request_id'] is None:
+            entry['request_id'] = data['id']
+
+    @classmethod
+    def _apply_driver(cls, data, deleted):
+        if deleted:
+            cls._drivers.pop(data['id'], None)
+        else:
+            cls._drivers[data['id']] = {'name': data['name'], 'has_fcm_token': data['has_fcm_token']}
+
+    @classmethod
+    def _apply_location(cls, data, deleted):
+        state = cls._hotels.get(data['hotel_id'])
+        if state is None:
+            return
+        if deleted:
+            state['locations'].pop(data['id'], None)
+        else:
+            state['locations'][data['id']] = data['name']
@@ -0,0 +1,179 @@
+"""
+Buggy Call - Maintenance Service
+Chunked, set-based cleanup statements for scheduled maintenance jobs
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, delete, func
+from app import db
+from app.models.request import BuggyRequest
+from app.models.notification_log import NotificationLog
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceService:
+    """
+    Bulk UPDATE/DELETE/archive helpers for background maintenance
+
+    Every pass selects at most BATCH_SIZE primary keys, changes them with
+    set-based statements and commits, until nothing matches or MAX_ROWS_PER_PASS rows
+    were touched. Locks stay short and a large backlog is worked off over
+    several scheduled passes instead of one long transaction.
+    """
+
+    # Defaults (overridable via app.config)
+    BATCH_SIZE = 500
+    MAX_ROWS_PER_PASS = 5000
+
+    @classmethod
+    def init_app(cls, app):
+        """Configure chunk limits from app.config"""
+        cls.BATCH_SIZE = int(app.config.get('MAINTENANCE_BATCH_SIZE', cls.BATCH_SIZE))
+        cls.MAX_ROWS_PER_PASS = int(app.config.get('MAINTENANCE_MAX_ROWS', cls.MAX_ROWS_PER_PASS))
+
+    # ==================== CHUNKED STATEMENTS ====================
+
+    @classmethod
+    def _chunked(cls, model, conditions, apply, max_rows=None):
+        max_rows = max_rows or cls.MAX_ROWS_PER_PASS
+        total = 0
+        while total < max_rows:
+            limit = min(cls.BATCH_SIZE, max_rows - total)
+            ids = db.session.execute(
+                select(model.id).where(*conditions).order_by(model.id).limit(limit)
+            ).scalars().all()
+            if not ids:
+                break
+            # Conditions are repeated so rows changed meanwhile are skipped
+            total += apply([model.id.in_(ids), *conditions])
+            db.session.commit()
+            if len(ids) < limit:
+                break
+        return total
+
+    @classmethod
+    def update_in_chunks(cls, model, conditions, values, max_rows=None):
+        """
+        UPDATE matching rows in primary-key chunks
+
+        Args:
+            model: Model class with an integer id
+            conditions: WHERE clauses
+            values: Column values (may be SQL expressions)
+            max_rows: Row limit for this pass (default: MAX_ROWS_PER_PASS)
+
+        Returns:
+            int: Updated rows
+        """
+        return cls._chunked(
+            model, conditions,
+            lambda where: cls._execute(update(model).where(*where).values(**values)),
+            max_rows
+        )
+
+    @classmethod
+    def delete_in_chunks(cls, model, conditions, max_rows=None):
+        """
+        DELETE matching rows in primary-key chunks
+
+        Args:
+            model: Model class with an integer id
+            conditions: WHERE clauses
+            max_rows: Row limit for this pass (default: MAX_ROWS_PER_PASS)
+
+        Returns:
+            int: Deleted rows
+        """
+        return cls._chunked(
+            model, conditions,
+            lambda where: cls._execute(delete(model).where(*where)),
+            max_rows
+        )
+
+    @classmethod
+    def move_in_chunks(cls, model, archive_model, conditions, max_rows=None):
+        """
+        Copy matching rows into an archive table and delete them, in chunks
+
+        Each chunk is one INSERT ... SELECT plus one DELETE in the same
+        transaction, so a row is never lost or duplicated.
+
+        Args:
+            model: Source model class with an integer id
+            archive_model: Target model with the same column names (extra
+                columns must have defaults)
+            conditions: WHERE clauses
+            max_rows: Row limit for this pass (default: MAX_ROWS_PER_PASS)
+
+        Returns:
+            int: Moved rows
+        """
+        columns = [column.key for column in model.__table__.columns]
+
+        def apply(where):
+            cls._execute(insert(archive_model).from_select(
+                columns, select(*[model.__table__.c[name] for name in columns]).where(*where)
+            ))
+            return cls._execute(delete(model).where(*where))
+
+        return cls._chunked(model, conditions, apply, max_rows)
+
+    @staticmethod
+    def _execute(statement):
+        return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+    # ==================== JOBS ====================
+
+    @classmethod
+    def expire_guest_tokens(cls, now=None):
+        """
+        Clear guest FCM tokens whose TTL has passed
+
+        Args:
+            now: Current UTC time (tokens are stored with UTC expiry)
+
+        Returns:
+            int: Cleared tokens
+        """
+        now = now or datetime.utcnow()
+        count = cls.update_in_chunks(
+            BuggyRequest,
+            [BuggyRequest.guest_fcm_token_expires_at < now],
+            {'guest_fcm_token': None, 'guest_fcm_token_expires_at': None}
+        )
+        if count:
+            logger.info(f'🧹 Cleaned up {count} expired guest FCM tokens from database')
+        return count
+
+    @classmethod
+    def mark_permanently_failed(cls, now=None, max_age=timedelta(hours=24), max_retries=3):
+        """
+        Mark old failed notifications that used up their retries as permanently failed
+
+        Args:
+            now: Current UTC time
+            max_age: Minimum age of the notification
+            max_retries: Retry limit
+
+        Returns:
+            int: Updated notification logs
+        """
+        now = now or datetime.utcnow()
+        count = cls.update_in_chunks(
+            NotificationLog,
+            [
+                NotificationLog.status == 'failed',
+                NotificationLog.sent_at < now - max_age,
+                NotificationLog.retry_count >= max_retries
+            ],
+            {
+                'status': 'permanently_failed',
+                'error_message': func.coalesce(
+                    func.nullif(NotificationLog.error_message, ''), 'Max retry attempts exceeded'
+                )
+            }
+        )
+        if count:
+            logger.info(f"Marked {count} notifications as permanently failed")
+        return count
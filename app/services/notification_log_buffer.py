@@ -0,0 +1,209 @@
+"""
+Buggy Call - Notification Log Buffer
+Batches NotificationLog rows into multi-row INSERTs instead of one commit per
+notification
+"""
+from app import db
+from app.models.notification_log import NotificationLog
+from app.models.user import SystemUser
+from flask import current_app, has_app_context
+from threading import Condition, Thread
+import atexit
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_UNKNOWN = object()
+
+
+class NotificationLogBuffer:
+    """
+    Buffered NotificationLog sink
+
+    Rows are flushed when the buffer reaches NOTIFICATION_LOG_FLUSH_SIZE,
+    when the oldest row is NOTIFICATION_LOG_FLUSH_INTERVAL seconds old, and
+    at process exit. token → user_id is resolved from an in-memory index
+    kept current by FCM token registration/cleanup.
+    """
+
+    # Defaults (overridable via app.config)
+    FLUSH_SIZE = 50
+    FLUSH_INTERVAL = 2.0  # seconds
+    TOKEN_INDEX_MAX = 10000
+
+    _rows = []
+    _oldest_at = None
+    _app = None
+    _cond = Condition()
+    _flusher = None
+    _token_index = {}  # token -> user_id (None = token belongs to no user)
+    _stats = {'buffered': 0, 'flushed': 0, 'flushes': 0, 'dropped': 0}
+
+    # ==================== TOKEN INDEX ====================
+
+    @classmethod
+    def resolve_user_id(cls, token):
+        """
+        Get the user owning an FCM token (indexed, one query per unseen token)
+
+        Returns:
+            int or None: User ID
+        """
+        use_index = current_app.config.get('NOTIFICATION_LOG_TOKEN_INDEX', True)
+        if use_index:
+            user_id = cls._token_index.get(token, _UNKNOWN)
+            if user_id is not _UNKNOWN:
+                return user_id
+
+        row = db.session.query(SystemUser.id).filter_by(fcm_token=token).first()
+        user_id = row[0] if row else None
+        if use_index:
+            cls.remember_token(token, user_id)
+        return user_id
+
+    @classmethod
+    def remember_token(cls, token, user_id):
+        """Record token ownership (call when a token is registered)"""
+        if not token:
+            return
+        if len(cls._token_index) >= cls.TOKEN_INDEX_MAX:
+            cls._token_index.clear()
+        cls._token_index[token] = user_id
+
+    @classmethod
+    def forget_tokens(cls, *tokens):
+        """Drop tokens from the index (call when tokens are removed or reassigned)"""
+        for token in tokens:
+            cls._token_index.pop(token, None)
+
+    # ==================== BUFFER ====================
+
+    @classmethod
+    def add(cls, token, title, body, status, priority='normal', error=None,
+            notification_type='fcm', sent_at=None):
+        """
+        Buffer a notification log row
+
+        Args:
+            token: FCM token the notification was sent to
+            title: Notification title
+            body: Notification body
+            status: sent / failed
+            priority: high / normal / low
+            error: Error message (optional)
+            notification_type: Log type (default: fcm)
+            sent_at: Send time (default: now)
+
+        Returns:
+            bool: False if the token belongs to no user (nothing logged)
+        """
+        from app.models import get_current_timestamp
+
+        user_id = cls.resolve_user_id(token)
+        if user_id is None:
+            return False
+
+        row = {
+            'user_id': user_id,
+            'notification_type': notification_type,
+            'priority': priority,
+            'title': title,
+            'body': body,
+            'status': status,
+            'error_message': error,
+            'retry_count': 0,
+            'sent_at': sent_at or get_current_timestamp()
+        }
+
+        flush_size = current_app.config.get('NOTIFICATION_LOG_FLUSH_SIZE', cls.FLUSH_SIZE)
+        with cls._cond:
+            cls._app = current_app._get_current_object()
+            cls._rows.append(row)
+            cls._stats['buffered'] += 1
+            if cls._oldest_at is None:
+                cls._oldest_at = time.monotonic()
+            flush_now = len(cls._rows) >= flush_size
+            if not flush_now:
+                cls._ensure_flusher()
+                cls._cond.notify_all()
+
+        if flush_now:
+            cls.flush()
+        return True
+
+    @classmethod
+    def flush(cls):
+        """
+        Write all buffered rows with one multi-row INSERT
+
+        Returns:
+            int: Rows written
+        """
+        with cls._cond:
+            rows, cls._rows = cls._rows, []
+            cls._oldest_at = None
+            app = cls._app
+        if not rows:
+            return 0
+
+        if has_app_context():
+            return cls._write(rows)
+        if app is None:
+            return 0
+        with app.app_context():
+            try:
+                return cls._write(rows)
+            finally:
+                db.session.remove()
+
+    @classmethod
+    def _write(cls, rows):
+        try:
+            db.session.execute(NotificationLog.__table__.insert(), rows)
+            db.session.commit()
+            with cls._cond:
+                cls._stats['flushed'] += len(rows)
+                cls._stats['flushes'] += 1
+            return len(rows)
+        except Exception as e:
+            logger.error(f"⚠️ Notification log flush failed ({len(rows)} rows): {str(e)}")
+            db.session.rollback()
+            with cls._cond:
+                cls._stats['dropped'] += len(rows)
+            return 0
+
+    @classmethod
+    def _ensure_flusher(cls):
+        """Start the time-based flusher thread (caller holds the lock)"""
+        if cls._flusher is None or not cls._flusher.is_alive():
+            cls._flusher = Thread(target=cls._flush_loop, name='notification-log-flusher', daemon=True)
+            cls._flusher.start()
+
+    @classmethod
+    def _flush_loop(cls):
+        while True:
+            with cls._cond:
+                while cls._oldest_at is None:
+                    cls._cond.wait()
+                interval = cls.FLUSH_INTERVAL
+                if cls._app is not None:
+                    interval = cls._app.config.get('NOTIFICATION_LOG_FLUSH_INTERVAL', interval)
+                wait = cls._oldest_at + interval - time.monotonic()
+                if wait > 0:
+                    cls._cond.wait(wait)
+                    continue
+            cls.flush()
+
+    @classmethod
+    def get_stats(cls):
+        """Get buffer counters"""
+        with cls._cond:
+            stats = dict(cls._stats)
+            stats['pending'] = len(cls._rows)
+        stats['indexed_tokens'] = len(cls._token_index)
+        return stats
+
+
+# Flush whatever is left at shutdown
+atexit.register(NotificationLogBuffer.flush)
@@ -0,0 +1,449 @@
+"""
+Buggy Call - Transactional Outbox Service
+Side effects (FCM, Socket.IO, audit) of request lifecycle transitions are
+written to the outbox inside the business transaction and delivered by a
+worker pool, so the HTTP call only pays for one DB commit.
+"""
+from app import db, socketio
+from app.models import get_current_timestamp
+from app.models.outbox import OutboxEvent, OutboxStatus
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from flask import current_app, has_request_context, request, session
+from sqlalchemy import or_, and_
+from threading import Lock
+import heapq
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxService:
+    """Service for enqueueing and delivering outbox events"""
+
+    # Defaults (overridden from app.config in init_worker)
+    WORKERS = 4
+    BATCH_SIZE = 50
+    MAX_ATTEMPTS = 5
+    LEASE_SECONDS = 120  # processing rows older than this are re-claimed
+    RETRY_DELAY_BASE = 5  # seconds, doubled per attempt
+    RETRY_DELAY_MAX = 300
+    SWEEP_INTERVAL = 300  # seconds between full recovery sweeps (expired leases, other processes)
+
+    _handlers = {}
+    _app = None
+    _executor = None
+    _retry_due = []  # heap of retry due times rescheduled by this process (monotonic)
+    _last_sweep = None
+    _stats = {'delivered': 0, 'retried': 0, 'failed': 0}
+    _stats_lock = Lock()
+
+    # ==================== HANDLER REGISTRY ====================
+
+    @classmethod
+    def handler(cls, event_type):
+        """
+        Decorator to register an outbox handler
+
+        Usage:
+            @OutboxService.handler('socket.emit')
+            def _emit(payload):
+                ...
+        """
+        def decorator(func):
+            cls._handlers[event_type] = func
+            return func
+        return decorator
+
+    # ==================== ENQUEUE ====================
+
+    @staticmethod
+    def enqueue(event_type, payload, hotel_id=None, aggregate_type='request', aggregate_id=None):
+        """
+        Add an event to the current DB transaction (no commit)
+
+        Args:
+            event_type: Registered handler name
+            payload: JSON-serializable dict
+            hotel_id: Hotel ID (optional)
+            aggregate_type: Entity type the event belongs to
+            aggregate_id: Entity ID the event belongs to
+
+        Returns:
+            OutboxEvent: Pending event (id assigned on flush/commit)
+        """
+        now = get_current_timestamp()
+        event = OutboxEvent(
+            hotel_id=hotel_id,
+            event_type=event_type,
+            aggregate_type=aggregate_type,
+            aggregate_id=aggregate_id,
+            payload=json.dumps(payload, default=str),
+            status=OutboxStatus.PENDING,
+            attempts=0,
+            created_at=now,
+            available_at=now
+        )
+        db.session.add(event)
+        return event
+
+    @staticmethod
+    def enqueue_audit(action, entity_type, entity_id=None, old_values=None, new_values=None,
+                      user_id=None, hotel_id=None):
+        """
+        Enqueue an audit trail entry, capturing request context now
+
+        The worker has no request context, so user, IP and user agent are
+        resolved at enqueue time.
+        """
+        ip_address = None
+        user_agent = None
+        if has_request_context():
+            if user_id is None:
+                user_id = session.get('user_id')
+            ip_address = request.remote_addr
+            user_agent = request.user_agent.string if request.user_agent else None
+
+        return OutboxService.enqueue('audit.log', {
+            'action': action,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'old_values': old_values,
+            'new_values': new_values,
+            'user_id': user_id,
+            'hotel_id': hotel_id,
+            'ip_address': ip_address,
+            'user_agent': user_agent
+        }, hotel_id=hotel_id, aggregate_type=entity_type, aggregate_id=entity_id)
+
+    @staticmethod
+    def publish(events):
+        """
+        Hand committed events to the worker pool
+
+        Call after db.session.commit(). When no worker pool is running
+        (tests, CLI scripts) the events are delivered inline instead.
+
+        Args:
+            events: List of committed OutboxEvent objects
+        """
+        event_ids = [e.id for e in events if e is not None and e.id is not None]
+        if not event_ids:
+            return
+
+        # Only hand off to a pool bound to this app (create_app() may run more than once per process)
+        if OutboxService.is_running() and OutboxService._app is current_app._get_current_object():
+            OutboxService._executor.submit(OutboxService._deliver_in_context, event_ids)
+            return
+
+        OutboxService._deliver(event_ids)
+
+    @staticmethod
+    def drain():
+        """
+        Deliver due events (new, retry backoff elapsed, or expired lease)
+
+        Called periodically by BackgroundJobsService as the safety net for
+        events whose immediate delivery failed or whose worker died.
+
+        The DB is only polled when a retry scheduled by this process is due
+        or SWEEP_INTERVAL has passed since the last full sweep.
+
+        Returns:
+            int: Number of events claimed
+        """
+        now = time.monotonic()
+        with OutboxService._stats_lock:
+            retry_due = bool(OutboxService._retry_due) and now >= OutboxService._retry_due[0]
+        sweep_due = OutboxService._last_sweep is None or now - OutboxService._last_sweep >= OutboxService.SWEEP_INTERVAL
+        if not (retry_due or sweep_due):
+            return 0
+
+        event_ids = OutboxService._claim(limit=OutboxService.BATCH_SIZE)
+        for event_id in event_ids:
+            OutboxService._executor.submit(OutboxService._process_in_context, event_id)
+
+        # A full batch may leave more due rows behind; check again next run
+        if len(event_ids) < OutboxService.BATCH_SIZE:
+            # Only retries that have come due were covered; later ones stay scheduled
+            with OutboxService._stats_lock:
+                while OutboxService._retry_due and OutboxService._retry_due[0] <= now:
+                    heapq.heappop(OutboxService._retry_due)
+            OutboxService._last_sweep = now
+        return len(event_ids)
+
+    # ==================== WORKER ====================
+
+    @staticmethod
+    def init_worker(app):
+        """Start the worker pool"""
+        if OutboxService.is_running():
+            return
+
+        OutboxService._app = app
+        OutboxService.WORKERS = app.config.get('OUTBOX_WORKERS', OutboxService.WORKERS)
+        OutboxService.BATCH_SIZE = app.config.get('OUTBOX_BATCH_SIZE', OutboxService.BATCH_SIZE)
+        OutboxService.MAX_ATTEMPTS = app.config.get('OUTBOX_MAX_ATTEMPTS', OutboxService.MAX_ATTEMPTS)
+
+        OutboxService._executor = ThreadPoolExecutor(
+            max_workers=OutboxService.WORKERS,
+            thread_name_prefix='outbox'
+        )
+        # First recovery sweep one interval after startup
+        OutboxService._last_sweep = time.monotonic()
+        logger.info(f"Outbox worker pool started ({OutboxService.WORKERS} workers)")
+
+    @staticmethod
+    def shutdown_worker(wait=True):
+        """Stop the worker pool, finishing in-flight events"""
+        if OutboxService._executor:
+            OutboxService._executor.shutdown(wait=wait)
+        OutboxService._executor = None
+        logger.info("Outbox worker pool shut down")
+
+    @staticmethod
+    def is_running():
+        """Whether a worker pool exists in this process"""
+        return OutboxService._executor is not None
+
+    @staticmethod
+    def _deliver_in_context(event_ids):
+        """Worker entry point: claim and process freshly published events"""
+        with OutboxService._app.app_context():
+            try:
+                OutboxService._deliver(event_ids)
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def _deliver(event_ids):
+        """Claim the given events and run their handlers in order"""
+        for event_id in OutboxService._claim(event_ids=event_ids):
+            OutboxService._process(event_id)
+
+    @staticmethod
+    def _claim(event_ids=None, limit=None):
+        """
+        Lease due events for processing
+
+        Args:
+            event_ids: Restrict to these IDs (inline publish)
+            limit: Max rows to claim
+
+        Returns:
+            list: Claimed event IDs
+        """
+        try:
+            now = get_current_timestamp()
+            lease_expired = now - timedelta(seconds=OutboxService.LEASE_SECONDS)
+
+            query = OutboxEvent.query.filter(or_(
+                and_(OutboxEvent.status == OutboxStatus.PENDING,
+                     OutboxEvent.available_at <= now),
+                and_(OutboxEvent.status == OutboxStatus.PROCESSING,
+                     OutboxEvent.claimed_at < lease_expired)
+            ))
+            if event_ids is not None:
+                query = query.filter(OutboxEvent.id.in_(event_ids))
+
+            query = query.order_by(OutboxEvent.id)
+            if limit:
+                query = query.limit(limit)
+
+            # Row locks keep workers in other processes from claiming the same rows
+            events = query.with_for_update(skip_locked=True).all()
+            for event in events:
+                event.status = OutboxStatus.PROCESSING
+                event.claimed_at = now
+            db.session.commit()
+            return [event.id for event in events]
+
+        except Exception as e:
+            logger.error(f"Outbox claim error: {str(e)}")
+            db.session.rollback()
+            return []
+
+    @staticmethod
+    def _process_in_context(event_id):
+        """Worker entry point: process one event inside an app context"""
+        with OutboxService._app.app_context():
+            try:
+                OutboxService._process(event_id)
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def _process(event_id):
+        """Run the handler for one claimed event and record the outcome"""
+        event = OutboxEvent.query.get(event_id)
+        if not event or event.status != OutboxStatus.PROCESSING:
+            return
+
+        handler = OutboxService._handlers.get(event.event_type)
+        try:
+            if handler is None:
+                raise LookupError(f"No outbox handler for '{event.event_type}'")
+            handler(event.get_payload())
+        except Exception as e:
+            db.session.rollback()
+            event = OutboxEvent.query.get(event_id)
+            event.attempts = (event.attempts or 0) + 1
+            event.last_error = f"{type(e).__name__}: {str(e)}"
+
+            if handler is None or event.attempts >= OutboxService.MAX_ATTEMPTS:
+                event.status = OutboxStatus.FAILED
+                event.processed_at = get_current_timestamp()
+                OutboxService._record('failed')
+                logger.error(f"❌ Outbox event {event_id} ({event.event_type}) failed permanently: {event.last_error}")
+            else:
+                delay = min(OutboxService.RETRY_DELAY_MAX,
+                            OutboxService.RETRY_DELAY_BASE * (2 ** (event.attempts - 1)))
+                event.status = OutboxStatus.PENDING
+                event.available_at = get_current_timestamp() + timedelta(seconds=delay)
+                OutboxService._note_retry(delay)
+                OutboxService._record('retried')
+                logger.warning(f"⚠️ Outbox event {event_id} ({event.event_type}) retry in {delay}s: {event.last_error}")
+            db.session.commit()
+            return
+
+        event = OutboxEvent.query.get(event_id)
+        event.status = OutboxStatus.DELIVERED
+        event.attempts = (event.attempts or 0) + 1
+        event.last_error = None
+        event.processed_at = get_current_timestamp()
+        db.session.commit()
+        OutboxService._record('delivered')
+
+    @staticmethod
+    def _note_retry(delay):
+        """Remember when a rescheduled event becomes due"""
+        due_at = time.monotonic() + delay
+        with OutboxService._stats_lock:
+            heapq.heappush(OutboxService._retry_due, due_at)
+
+    @staticmethod
+    def _record(outcome):
+        with OutboxService._stats_lock:
+            OutboxService._stats[outcome] += 1
+
+    @staticmethod
+    def get_stats():
+        """Get delivery counters and pending backlog size"""
+        with OutboxService._stats_lock:
+            stats = dict(OutboxService._stats)
+        stats['running'] = OutboxService.is_running()
+        try:
+            stats['pending'] = OutboxEvent.query.filter_by(status=OutboxStatus.PENDING).count()
+        except Exception:
+            stats['pending'] = None
+        return stats
+
+    @staticmethod
+    def purge_delivered(days=7):
+        """
+        Delete delivered events older than given days
+
+        Returns:
+            int: Deleted row count
+        """
+        cutoff = get_current_timestamp() - timedelta(days=days)
+        deleted = OutboxEvent.query.filter(
+            OutboxEvent.status == OutboxStatus.DELIVERED,
+            OutboxEvent.processed_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+# ==================== BUILT-IN HANDLERS ====================
+
+@OutboxService.handler('audit.log')
+def _handle_audit_log(payload):
+    """Write an audit trail entry (synchronously; DB errors retry the event)"""
+    from app.services.audit_service import AuditService
+    AuditService.write_action(**payload)
+
+
+@OutboxService.handler('socket.emit')
+def _handle_socket_emit(payload):
+    """
+    Emit a Socket.IO event to its tenant-scoped rooms (single emit)
+
+    Payload: {'event': str, 'data': dict, 'scope': {'hotel_id', 'request_id', 'user_id'},
+              'rooms': [str] (optional, extra explicit rooms)}
+    Rooms come from EmitRouter; there is no broadcast to all clients.
+    Rows queued before scoping may still carry a None room: it is replaced
+    by the event's hotel/request rooms.
+    """
+    from app.websocket.emit_router import EmitRouter, UnscopedEmitError
+
+    event_name = payload['event']
+    data = payload.get('data')
+    rooms = list(payload.get('rooms') or [])
+    scope = payload.get('scope')
+    if scope is None and None in rooms and isinstance(data, dict):
+        scope = {'hotel_id': data.get('hotel_id'), 'request_id': data.get('request_id')}
+
+    try:
+        if scope is not None:
+            rooms = EmitRouter.resolve(event_name, **scope) + rooms
+        rooms = EmitRouter.emit_to_rooms(event_name, data, rooms, emitter=socketio.emit)
+    except UnscopedEmitError as e:
+        # Programlama hatası - tekrar denemenin anlamı yok, tüm otellere yayınlama
+        logger.error(f"❌ WebSocket: {event_name} dropped: {str(e)}")
+        return
+    logger.info(f"📡 WebSocket: {event_name} emitted to {rooms}")
+
+
+@OutboxService.handler('fcm.new_request')
+def _handle_fcm_new_request(payload):
+    """Push a new request to the hotel's available drivers"""
+    from app.models.request import BuggyRequest
+    from app.services.fcm_notification_service import FCMNotificationService
+
+    request_obj = BuggyRequest.query.get(payload['request_id'])
+    if not request_obj:
+        logger.warning(f"⚠️ Outbox: request {payload['request_id']} not found for FCM")
+        return
+
+    logger.info(f"🔔 FCM bildirimi gönderiliyor - Request ID: {request_obj.id}")
+    notified_count = FCMNotificationService.notify_new_request(request_obj)
+    if notified_count > 0:
+        logger.info(f"✅ FCM: {notified_count} sürücüye bildirim gönderildi")
+    else:
+        logger.warning(f"⚠️ FCM: Hiçbir sürücüye bildirim gönderilemedi")
+
+
+@OutboxService.handler('fcm.guest_status')
+def _handle_fcm_guest_status(payload):
+    """
+    Push a status change to the guest
+
+    Payload: {'request_id', 'status', 'title', 'body', 'log_data'}
+    """
+    from app.routes.guest_notification_api import get_guest_token, send_fcm_http_notification
+    from app.utils.logger import log_fcm_event
+
+    request_id = payload['request_id']
+    guest_token = get_guest_token(request_id)
+    if not guest_token:
+        logger.info(f"ℹ️ Guest FCM token bulunamadı - Request ID: {request_id}")
+        return
+
+    success, _ = send_fcm_http_notification(
+        guest_token,
+        {'title': payload['title'], 'body': payload['body']},
+        payload['status'],
+        request_id=request_id,
+        retry=False  # outbox backoff owns the retries, no duplicate pushes
+    )
+
+    if success:
+        logger.info(f"✅ Guest FCM bildirimi gönderildi - Request ID: {request_id}")
+        if payload.get('log_data'):
+            log_fcm_event('GUEST_NOTIFIED', {'request_id': request_id, **payload['log_data']})
+    else:
+        # Raise so the event is retried with backoff (at-least-once)
+        raise RuntimeError(f"Guest FCM bildirimi gönderilemedi - Request ID: {request_id}")
@@ -0,0 +1,137 @@
+"""
+Buggy Call - Pending Request Notifier
+Per-hotel version of the PENDING request set, with long-poll waiting
+"""
+from threading import Condition
+from sqlalchemy import event, inspect
+from app import db
+from app.models.request import BuggyRequest, RequestStatus
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PendingRequestNotifier:
+    """
+    Long-poll support for driver pending-request lists
+
+    Every committed change that adds a request to, or removes it from, a
+    hotel's PENDING set (create, accept, cancel, timeout) bumps the hotel's
+    version and wakes parked waiters. A hotel's first version is derived
+    from the clock, so versions held by clients across a restart never
+    match and those clients reload immediately. Waiters park on a
+    Condition (cooperative under gevent) without holding a DB connection.
+    """
+
+    _versions = {}  # hotel_id -> int
+    _cond = Condition()
+    _listeners_registered = False
+    _stats = {'bumps': 0, 'waits': 0, 'woken': 0, 'timeouts': 0, 'parked': 0}
+
+    @classmethod
+    def version(cls, hotel_id):
+        """Current pending-set version for a hotel"""
+        with cls._cond:
+            return cls._version_locked(hotel_id)
+
+    @classmethod
+    def _version_locked(cls, hotel_id):
+        current = cls._versions.get(hotel_id)
+        if current is None:
+            current = cls._versions[hotel_id] = int(time.time() * 1000)
+        return current
+
+    @classmethod
+    def bump(cls, *hotel_ids):
+        """Mark hotels' pending sets as changed and wake their waiters"""
+        if not hotel_ids:
+            return
+        with cls._cond:
+            for hotel_id in hotel_ids:
+                cls._versions[hotel_id] = cls._version_locked(hotel_id) + 1
+                cls._stats['bumps'] += 1
+            cls._cond.notify_all()
+
+    @classmethod
+    def wait(cls, hotel_id, since, timeout):
+        """
+        Park until the hotel's version differs from since or timeout expires
+
+        Args:
+            hotel_id: Hotel ID
+            since: Version the client last saw
+            timeout: Maximum wait in seconds
+
+        Returns:
+            tuple: (version, changed)
+        """
+        deadline = time.monotonic() + max(0, timeout)
+        with cls._cond:
+            cls._stats['waits'] += 1
+            current = cls._version_locked(hotel_id)
+            if current != since:
+                return current, True
+            cls._stats['parked'] += 1
+            try:
+                while current == since:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        cls._stats['timeouts'] += 1
+                        return current, False
+                    cls._cond.wait(remaining)
+                    current = cls._version_locked(hotel_id)
+                cls._stats['woken'] += 1
+                return current, True
+            finally:
+                cls._stats['parked'] -= 1
+
+    @classmethod
+    def get_stats(cls):
+        """Parked waiters and bump/wait counters"""
+        with cls._cond:
+            return {'hotels': len(cls._versions), **cls._stats}
+
+    @classmethod
+    def reset(cls):
+        """Forget versions and clear metrics (tests)"""
+        with cls._cond:
+            cls._versions = {}
+            cls._stats = {'bumps': 0, 'waits': 0, 'woken': 0, 'timeouts': 0, 'parked': 0}
+
+    # ==================== LIFECYCLE EVENTS ====================
+
+    @classmethod
+    def register_listeners(cls):
+        """Bump on commits that change a hotel's PENDING set (idempotent)"""
+        if cls._listeners_registered:
+            return
+        event.listen(db.session, 'after_flush', cls._after_flush)
+        event.listen(db.session, 'after_commit', cls._after_commit)
+        event.listen(db.session, 'after_rollback', cls._after_rollback)
+        cls._listeners_registered = True
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        hotels = session.info.setdefault('pending_set_hotels', set())
+        for obj in session.new:
+            if isinstance(obj, BuggyRequest) and obj.status == RequestStatus.PENDING:
+                hotels.add(obj.hotel_id)
+        for obj in session.dirty:
+            if isinstance(obj, BuggyRequest):
+                history = inspect(obj).attrs.status.history
+                if history.has_changes() and RequestStatus.PENDING in (list(history.added) + list(history.deleted)):
+                    hotels.add(obj.hotel_id)
+        for obj in session.deleted:
+            if isinstance(obj, BuggyRequest) and obj.status == RequestStatus.PENDING:
+                hotels.add(obj.hotel_id)
+
+    @classmethod
+    def _after_commit(cls, session):
+        hotels = session.info.pop('pending_set_hotels', None)
+        if hotels:
+            cls.bump(*hotels)
+
+    @staticmethod
+    def _after_rollback(session):
+        session.info.pop('pending_set_hotels', None)
@@ -0,0 +1,152 @@
+"""
+Buggy Call - Report Cache
+Caches report results per (hotel, report, range) and invalidates them on
+request lifecycle changes
+"""
+from datetime import timedelta
+from sqlalchemy import event
+from app import db, cache
+from app.models import get_current_timestamp
+from app.models.request import BuggyRequest
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class ReportCache:
+    """
+    Versioned report result cache (Flask-Caching backend)
+
+    Keys are (hotel_id, report, normalized range, version). Every committed
+    BuggyRequest change (create, accept, complete, cancel, timeout ...) bumps
+    the hotel's `live` version. Changes to requests older than SETTLE_WINDOW
+    also bump the `historic` version.
+
+    Ranges that ended more than SETTLE_WINDOW ago can only be affected by
+    such old-request changes, so they are keyed by the historic version and
+    kept for SETTLED_RANGE_TIMEOUT. Ranges ending within SETTLE_WINDOW of
+    now (rolling "last N days" defaults get a new minute key every minute)
+    use the live version plus OPEN_RANGE_TIMEOUT, which also bounds
+    staleness on per-process (simple) caches. Nothing is stored without a
+    TTL. Range ends must come from get_current_timestamp() (Cyprus local
+    time, like the stored request timestamps).
+    """
+
+    OPEN_RANGE_TIMEOUT = 60  # seconds
+    SETTLED_RANGE_TIMEOUT = 24 * 3600  # seconds; version bumps still invalidate earlier
+    SETTLE_WINDOW = timedelta(hours=1)  # PENDING requests time out after 1 hour
+
+    _listeners_registered = False
+
+    # ==================== READ ====================
+
+    @staticmethod
+    def normalize_range(start_date, end_date):
+        """Truncate to the minute so `now`-based default ranges share keys"""
+        start = start_date.replace(second=0, microsecond=0) if start_date else None
+        end = end_date.replace(second=0, microsecond=0) if end_date else None
+        return start, end
+
+    @staticmethod
+    def get_or_compute(hotel_id, report, start_date, end_date, compute):
+        """
+        Return a cached report or compute and cache it
+
+        Args:
+            hotel_id: Hotel ID
+            report: Report name (part of the key)
+            start_date: Range start (None = unbounded)
+            end_date: Range end (None = open ended, never settled)
+            compute: Callable(start, end) run with the normalized range
+
+        Returns:
+            Report result
+        """
+        start, end = ReportCache.normalize_range(start_date, end_date)
+        settled = end is not None and end <= get_current_timestamp() - ReportCache.SETTLE_WINDOW
+        version = ReportCache.get_version(hotel_id, 'historic' if settled else 'live')
+
+        key = 'report:{}:{}:{}:{}:{}'.format(
+            hotel_id,
+            report,
+            start.strftime('%Y%m%d%H%M') if start else '-',
+            end.strftime('%Y%m%d%H%M') if end else '-',
+            version
+        )
+
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+        result = compute(start, end)
+        cache.set(key, result, timeout=ReportCache.SETTLED_RANGE_TIMEOUT if settled else ReportCache.OPEN_RANGE_TIMEOUT)
+        return result
+
+    @staticmethod
+    def get_version(hotel_id, kind='live'):
+        """Get (or initialize) a hotel's report version"""
+        key = f'report_version:{hotel_id}:{kind}'
+        version = cache.get(key)
+        if version is None:
+            version = ReportCache._new_version()
+            cache.set(key, version, timeout=0)
+        return version
+
+    # ==================== INVALIDATION ====================
+
+    @staticmethod
+    def bump(hotel_id, historic=False):
+        """
+        Invalidate a hotel's cached reports
+
+        Args:
+            hotel_id: Hotel ID
+            historic: Also invalidate settled (past) ranges
+        """
+        kinds = ('live', 'historic') if historic else ('live',)
+        for kind in kinds:
+            # Fresh random value: an evicted version key can never resurrect old entries
+            cache.set(f'report_version:{hotel_id}:{kind}', ReportCache._new_version(), timeout=0)
+
+    @staticmethod
+    def _new_version():
+        return uuid.uuid4().hex[:12]
+
+    @staticmethod
+    def register_listeners():
+        """Bump versions after every commit that touched requests (idempotent)"""
+        if ReportCache._listeners_registered:
+            return
+        event.listen(db.session, 'after_flush', ReportCache._after_flush)
+        event.listen(db.session, 'after_commit', ReportCache._after_commit)
+        event.listen(db.session, 'after_rollback', ReportCache._after_rollback)
+        ReportCache._listeners_registered = True
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        settle_before = get_current_timestamp() - ReportCache.SETTLE_WINDOW
+        pending = session.info.setdefault('report_cache_bumps', {})
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if not isinstance(obj, BuggyRequest) or obj.hotel_id is None:
+                continue
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            historic = obj.requested_at is not None and obj.requested_at < settle_before
+            pending[obj.hotel_id] = pending.get(obj.hotel_id, False) or historic
+
+    @staticmethod
+    def _after_commit(session):
+        pending = session.info.pop('report_cache_bumps', None)
+        if not pending:
+            return
+        # Bumps happen after commit so readers never cache pre-commit data under a new version
+        for hotel_id, historic in pending.items():
+            try:
+                ReportCache.bump(hotel_id, historic=historic)
+            except Exception as e:
+                logger.error(f"⚠️ Report cache invalidation failed (hotel {hotel_id}): {str(e)}")
+
+    @staticmethod
+    def _after_rollback(session):
+        session.info.pop('report_cache_bumps', None)
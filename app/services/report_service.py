@@ -7,13 +7,33 @@ from sqlalchemy import func, and_, or_
 from app import db
 from app.models.request import BuggyRequest, RequestStatus
 from app.models.buggy import Buggy, BuggyStatus
+from app.models.buggy_driver import BuggyDriver
+from app.models.user import SystemUser
 from app.models.location import Location
-from typing import Dict, List, Optional, Any
+from app.models.request_rollup import RequestHourlyRollup
+from app.services.request_rollup_service import RequestRollupService
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Tuple
+import csv
+import io
+import itertools
+import os
+import tempfile
 
 
 class ReportService:
     """Service for generating reports and analytics"""
 
+    # Rows fetched per server-side cursor batch / flushed per CSV chunk (exports)
+    EXPORT_CHUNK_SIZE = 1000
+
+    STATUS_LABELS = {
+        RequestStatus.PENDING: 'Bekliyor',
+        RequestStatus.ACCEPTED: 'Kabul Edildi',
+        RequestStatus.COMPLETED: 'Tamamlandı',
+        RequestStatus.CANCELLED: 'İptal Edildi',
+        RequestStatus.UNANSWERED: 'Cevapsız'
+    }
+
     @staticmethod
     def get_daily_summary(hotel_id: int, date: Optional[datetime] = None) -> Dict[str, Any]:
         """
@@ -33,63 +53,24 @@ class ReportService:
         start_of_day = datetime(date.year, date.month, date.day, 0, 0, 0)
         end_of_day = start_of_day + timedelta(days=1)
 
-        # Total requests
-        total_requests = BuggyRequest.query.filter(
-            BuggyRequest.hotel_id == hotel_id,
-            BuggyRequest.requested_at >= start_of_day,
-            BuggyRequest.requested_at < end_of_day
-        ).count()
+        # Aggregated from hourly rollups (one grouped query)
+        totals = RequestRollupService.summarize(hotel_id, start_of_day, end_of_day).get(())
+        totals = totals or {name: 0 for name in RequestHourlyRollup.COUNTERS}
 
-        # Completed requests
-        completed_requests = BuggyRequest.query.filter(
-            BuggyRequest.hotel_id == hotel_id,
-            BuggyRequest.requested_at >= start_of_day,
-            BuggyRequest.requested_at < end_of_day,
-            BuggyRequest.status == RequestStatus.COMPLETED
-        ).count()
-
-        # Cancelled requests
-        cancelled_requests = BuggyRequest.query.filter(
-            BuggyRequest.hotel_id == hotel_id,
-            BuggyRequest.requested_at >= start_of_day,
-            BuggyRequest.requested_at < end_of_day,
-            BuggyRequest.status == RequestStatus.CANCELLED
-        ).count()
-
-        # Pending requests
-        PENDING_requests = BuggyRequest.query.filter(
-            BuggyRequest.hotel_id == hotel_id,
-            BuggyRequest.requested_at >= start_of_day,
-            BuggyRequest.requested_at < end_of_day,
-            BuggyRequest.status == RequestStatus.PENDING
-        ).count()
+        total_requests = totals['total_count']
+        completed_requests = totals['completed_count']
+        cancelled_requests = totals['cancelled_count']
+        PENDING_requests = totals['pending_count']
 
         # Average response time (time to accept)
-        completed_with_times = BuggyRequest.query.filter(
-            BuggyRequest.hotel_id == hotel_id,
-            BuggyRequest.requested_at >= start_of_day,
-            BuggyRequest.requested_at < end_of_day,
-            BuggyRequest.status == RequestStatus.COMPLETED,
-            BuggyRequest.accepted_at.isnot(None)
-        ).all()
-
         avg_response_time = 0
-        if completed_with_times:
-            total_response_time = sum([
-                (req.accepted_at - req.requested_at).total_seconds()
-                for req in completed_with_times
-            ])
-            avg_response_time = total_response_time / len(completed_with_times)
+        if totals['response_time_count']:
+            avg_response_time = totals['response_time_sum'] / totals['response_time_count']
 
         # Average completion time (time from REQUEST to complete - TOPLAM SÜRE)
         avg_completion_time = 0
-        completed_with_completion_times = [req for req in completed_with_times if req.completed_at and req.requested_at]
-        if completed_with_completion_times:
-            total_completion_time = sum([
-                (req.completed_at - req.requested_at).total_seconds()
-                for req in completed_with_completion_times
-            ])
-            avg_completion_time = total_completion_time / len(completed_with_completion_times) if total_completion_time else 0
+        if totals['completion_time_count']:
+            avg_completion_time = totals['completion_time_sum'] / totals['completion_time_count']
 
         return {
             'date': date.strftime('%Y-%m-%d'),
@@ -126,50 +107,41 @@ class ReportService:
         if end_date is None:
             end_date = datetime.utcnow()
 
-        # Build query
-        query = Buggy.query.filter(Buggy.hotel_id == hotel_id)
+        # One grouped query: buggies LEFT JOIN per-buggy counters (rollups + raw edges)
+        totals = RequestRollupService.aggregate_subquery(
+            hotel_id, start_date, end_date, group_by=('buggy_id',), include_end=True
+        )
+        # Assigned driver name (primary, else latest assigned) as a correlated subquery,
+        # same rule as Buggy.get_assigned_driver_name()
+        driver_name = db.session.query(
+            func.coalesce(func.nullif(SystemUser.full_name, ''), SystemUser.username)
+        ).select_from(BuggyDriver).join(SystemUser, SystemUser.id == BuggyDriver.driver_id).filter(
+            BuggyDriver.buggy_id == Buggy.id
+        ).order_by(
+            BuggyDriver.is_primary.desc(), BuggyDriver.assigned_at.desc()
+        ).limit(1).correlate(Buggy).scalar_subquery()
+        query = db.session.query(
+            Buggy, driver_name, totals.c.total_count, totals.c.completed_count,
+            totals.c.response_time_sum, totals.c.response_time_count,
+            totals.c.completion_time_sum, totals.c.completion_time_count
+        ).outerjoin(totals, totals.c.buggy_id == Buggy.id).filter(Buggy.hotel_id == hotel_id)
         if buggy_id:
             query = query.filter(Buggy.id == buggy_id)
 
-        buggies = query.all()
-
         results = []
-        for buggy in buggies:
-            # Get requests for this buggy
-            requests = BuggyRequest.query.filter(
-                BuggyRequest.buggy_id == buggy.id,
-                BuggyRequest.requested_at >= start_date,
-                BuggyRequest.requested_at <= end_date
-            ).all()
-
-            completed = [r for r in requests if r.status == RequestStatus.COMPLETED]
-
+        for (buggy, assigned_driver_name, total_requests, completed_requests, response_sum, response_count,
+             completion_sum, completion_count) in query.all():
             # Calculate metrics
-            total_requests = len(requests)
-            completed_requests = len(completed)
+            total_requests = total_requests or 0
+            completed_requests = completed_requests or 0
 
-            avg_response = 0
-            avg_completion = 0
-
-            if completed:
-                response_times = [
-                    (r.accepted_at - r.requested_at).total_seconds()
-                    for r in completed if r.accepted_at
-                ]
-                if response_times:
-                    avg_response = sum(response_times) / len(response_times)
-
-                completion_times = [
-                    (r.completed_at - r.requested_at).total_seconds()
-                    for r in completed if r.completed_at and r.requested_at
-                ]
-                if completion_times:
-                    avg_completion = sum(completion_times) / len(completion_times)
+            avg_response = response_sum / response_count if response_count else 0
+            avg_completion = completion_sum / completion_count if completion_count else 0
 
             results.append({
                 'buggy_id': buggy.id,
                 'buggy_code': buggy.code,
-                'driver_name': buggy.driver.full_name if buggy.driver else None,
+                'driver_name': assigned_driver_name,
                 'total_requests': total_requests,
                 'completed_requests': completed_requests,
                 'completion_rate': round((completed_requests / total_requests * 100) if total_requests > 0 else 0, 2),
@@ -200,40 +172,46 @@ class ReportService:
         if end_date is None:
             end_date = datetime.utcnow()
 
-        # Get all active locations
-        locations = Location.query.filter_by(hotel_id=hotel_id, is_active=True).all()
+        # One grouped query: active locations LEFT JOIN per-(location, hour) counters
+        totals = RequestRollupService.aggregate_subquery(
+            hotel_id, start_date, end_date, group_by=('location_id', 'hour'), include_end=True
+        )
+        rows = db.session.query(
+            Location.id, Location.name, totals.c.hour, totals.c.total_count,
+            totals.c.completed_count, totals.c.response_time_sum, totals.c.response_time_count
+        ).outerjoin(totals, totals.c.location_id == Location.id).filter(
+            Location.hotel_id == hotel_id,
+            Location.is_active == True
+        ).order_by(Location.id).all()
+
+        locations = {}
+        for location_id, name, hour, total, completed, response_sum, response_count in rows:
+            location = locations.setdefault(location_id, {
+                'name': name, 'total': 0, 'completed': 0, 'response_sum': 0, 'response_count': 0,
+                # Hourly distribution
+                'hourly': {f"{h:02d}:00": 0 for h in range(24)}
+            })
+            if hour is None:
+                continue  # no requests in range
+            location['total'] += total or 0
+            location['completed'] += completed or 0
+            location['response_sum'] += response_sum or 0
+            location['response_count'] += response_count or 0
+            location['hourly'][f"{RequestRollupService.normalize_group_value('hour', hour):02d}:00"] += total or 0
 
         results = []
-        for location in locations:
-            # Get requests from this location
-            requests = BuggyRequest.query.filter(
-                BuggyRequest.location_id == location.id,
-                BuggyRequest.requested_at >= start_date,
-                BuggyRequest.requested_at <= end_date
-            ).all()
-
-            total_requests = len(requests)
-            completed = len([r for r in requests if r.status == RequestStatus.COMPLETED])
+        for location_id, location in locations.items():
+            total_requests = location['total']
+            completed = location['completed']
 
             # Calculate average wait time
-            completed_with_times = [r for r in requests if r.status == RequestStatus.COMPLETED and r.accepted_at]
-            avg_wait = 0
-            if completed_with_times:
-                wait_times = [(r.accepted_at - r.requested_at).total_seconds() for r in completed_with_times]
-                avg_wait = sum(wait_times) / len(wait_times)
+            avg_wait = location['response_sum'] / location['response_count'] if location['response_count'] else 0
 
-            # Hourly distribution
-            hourly_dist = {}
-            for hour in range(24):
-                hourly_dist[f"{hour:02d}:00"] = 0
-
-            for req in requests:
-                hour = req.requested_at.hour
-                hourly_dist[f"{hour:02d}:00"] += 1
+            hourly_dist = location['hourly']
 
             results.append({
-                'location_id': location.id,
-                'location_name': location.name,
+                'location_id': location_id,
+                'location_name': location['name'],
                 'total_requests': total_requests,
                 'completed_requests': completed,
                 'completion_rate': round((completed / total_requests * 100) if total_requests > 0 else 0, 2),
@@ -266,7 +244,102 @@ class ReportService:
         Returns:
             List of request details
         """
-        query = BuggyRequest.query.filter(BuggyRequest.hotel_id == hotel_id)
+        return list(ReportService.iter_request_details(hotel_id, status, start_date, end_date, limit))
+
+    @staticmethod
+    def iter_request_details(hotel_id: int,
+                             status: Optional[RequestStatus] = None,
+                             start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None,
+                             limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream detailed request rows (server-side cursor, EXPORT_CHUNK_SIZE rows per fetch)
+
+        Args:
+            hotel_id: Hotel ID
+            status: Filter by status (None for all)
+            start_date: Start date
+            end_date: End date
+            limit: Maximum number of records (None for all)
+
+        Yields:
+            Request detail dictionaries (same shape as get_request_details)
+        """
+        query = ReportService._request_export_query(hotel_id, status, start_date, end_date)
+        if limit:
+            query = query.limit(limit)
+
+        for row in query.yield_per(ReportService.EXPORT_CHUNK_SIZE):
+            yield {
+                'id': row.id,
+                'location_name': row.location_name,
+                'buggy_code': row.buggy_code,
+                'driver_name': row.driver_name,
+                'room_number': row.room_number,
+                'status': row.status.value,
+                'requested_at': row.requested_at.isoformat() if row.requested_at else None,
+                'accepted_at': row.accepted_at.isoformat() if row.accepted_at else None,
+                'completed_at': row.completed_at.isoformat() if row.completed_at else None,
+                'response_time_seconds': (row.accepted_at - row.requested_at).total_seconds() if row.accepted_at else None,
+                'completion_time_seconds': (row.completed_at - row.accepted_at).total_seconds() if row.completed_at and row.accepted_at else None,
+                'notes': row.notes
+            }
+
+    @staticmethod
+    def iter_request_sheet_rows(hotel_id: int,
+                                start_date: Optional[datetime] = None,
+                                end_date: Optional[datetime] = None) -> Iterator[List[Any]]:
+        """
+        Stream rows for the "Talepler" sheet of the comprehensive export
+
+        Yields:
+            [Tarih, Başlangıç, Bitiş, Shuttle, Sürücü, Oda, Yanıt (dk), Tamamlanma (dk), Durum]
+        """
+        query = ReportService._request_export_query(hotel_id, None, start_date, end_date)
+
+        for row in query.yield_per(ReportService.EXPORT_CHUNK_SIZE):
+            yield [
+                row.requested_at.strftime('%d.%m.%Y %H:%M') if row.requested_at else '-',
+                row.location_name or '-',
+                row.completion_location_name or '-',
+                row.buggy_code or '-',
+                row.driver_name or '-',
+                row.room_number or '-',
+                round(row.response_time / 60) if row.response_time else 0,
+                round(row.completion_time / 60) if row.completion_time else 0,
+                ReportService.STATUS_LABELS.get(row.status, row.status.value)
+            ]
+
+    @staticmethod
+    def _request_export_query(hotel_id, status, start_date, end_date):
+        """Column-only request query with names joined in (no ORM entities)"""
+        from sqlalchemy.orm import aliased
+        from app.models.user import SystemUser
+
+        CompletionLocation = aliased(Location)
+        query = db.session.query(
+            BuggyRequest.id,
+            BuggyRequest.room_number,
+            BuggyRequest.status,
+            BuggyRequest.requested_at,
+            BuggyRequest.accepted_at,
+            BuggyRequest.completed_at,
+            BuggyRequest.response_time,
+            BuggyRequest.completion_time,
+            BuggyRequest.notes,
+            Location.name.label('location_name'),
+            CompletionLocation.name.label('completion_location_name'),
+            Buggy.code.label('buggy_code'),
+            SystemUser.full_name.label('driver_name')
+        ).outerjoin(
+            Location, Location.id == BuggyRequest.location_id
+        ).outerjoin(
+            CompletionLocation, CompletionLocation.id == BuggyRequest.completion_location_id
+        ).outerjoin(
+            Buggy, Buggy.id == BuggyRequest.buggy_id
+        ).outerjoin(
+            SystemUser, SystemUser.id == BuggyRequest.accepted_by_id
+        ).filter(BuggyRequest.hotel_id == hotel_id)
 
         if status:
             query = query.filter(BuggyRequest.status == status)
@@ -277,92 +350,180 @@ class ReportService:
         if end_date:
             query = query.filter(BuggyRequest.requested_at <= end_date)
 
-        requests = query.order_by(BuggyRequest.requested_at.desc()).limit(limit).all()
-
-        results = []
-        for req in requests:
-            results.append({
-                'id': req.id,
-                'location_name': req.location.name if req.location else None,
-                'buggy_code': req.buggy.code if req.buggy else None,
-                'driver_name': req.buggy.driver.full_name if req.buggy and req.buggy.driver else None,
-                'room_number': req.room_number,
-                'status': req.status.value,
-                'requested_at': req.requested_at.isoformat() if req.requested_at else None,
-                'accepted_at': req.accepted_at.isoformat() if req.accepted_at else None,
-                'completed_at': req.completed_at.isoformat() if req.completed_at else None,
-                'response_time_seconds': (req.accepted_at - req.requested_at).total_seconds() if req.accepted_at else None,
-                'completion_time_seconds': (req.completed_at - req.accepted_at).total_seconds() if req.completed_at and req.accepted_at else None,
-                'notes': req.notes
-            })
-
-        return results
-
+        return query.order_by(BuggyRequest.requested_at.desc())
 
     @staticmethod
-    def export_to_excel(data: List[Dict[str, Any]], filename: str, sheet_name: str = 'Report') -> bytes:
+    def export_to_excel(data: Iterable[Dict[str, Any]], filename: str, sheet_name: str = 'Report') -> bytes:
         """
         Export data to Excel format
-        
+
         Args:
-            data: List of dictionaries to export
+            data: Dictionaries to export (list or iterator)
             filename: Name of the file
             sheet_name: Name of the sheet
-            
+
         Returns:
             Excel file as bytes
         """
         from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
         from io import BytesIO
-        
-        if not data:
+
+        wb = Workbook(write_only=True)
+        ReportService._write_dict_sheet(wb, sheet_name, data)
+
+        # Save to bytes
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        return output.getvalue()
+
+    @staticmethod
+    def write_excel_file(data: Iterable[Dict[str, Any]], sheet_name: str = 'Report') -> Tuple[str, int]:
+        """
+        Export data to a temporary Excel file using a write-only worksheet
+
+        Rows are written to disk as they are consumed, so memory stays bounded
+        by EXPORT_CHUNK_SIZE when `data` is a streaming iterator.
+
+        Args:
+            data: Dictionaries to export (list or iterator)
+            sheet_name: Name of the sheet
+
+        Returns:
+            (file path, row count) - stream the file with iter_file_chunks()
+        """
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        row_count = ReportService._write_dict_sheet(wb, sheet_name, data)
+        return ReportService.save_workbook_to_temp(wb), row_count
+
+    @staticmethod
+    def _write_dict_sheet(wb, sheet_name: str, data: Iterable[Dict[str, Any]]) -> int:
+        """Append a header + data rows sheet to a write-only workbook"""
+        from openpyxl.utils import get_column_letter
+
+        rows = iter(data)
+        first = next(rows, None)
+        if first is None:
             raise ValueError("No data to export")
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = sheet_name
-        
-        # Header style
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Write headers
-        headers = list(data[0].keys())
+
+        ws = wb.create_sheet(sheet_name)
+        headers = list(first.keys())
+
+        # Widths must be set before the first row in write-only mode
         for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-        
-        # Write data
-        for row_num, row_data in enumerate(data, 2):
-            for col_num, header in enumerate(headers, 1):
+            ws.column_dimensions[get_column_letter(col_num)].width = min(max(len(header) + 2, 15), 50)
+
+        ws.append(ReportService.header_cells(ws, headers))
+
+        row_count = 0
+        for row_data in itertools.chain([first], rows):
+            values = []
+            for header in headers:
                 value = row_data.get(header, '')
                 # Convert datetime to string
                 if isinstance(value, datetime):
                     value = value.strftime('%Y-%m-%d %H:%M:%S')
-                ws.cell(row=row_num, column=col_num, value=value)
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Save to bytes
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return output.getvalue()
+                elif isinstance(value, (dict, list)):
+                    value = str(value)
+                values.append(value)
+            ws.append(values)
+            row_count += 1
+        return row_count
+
+    @staticmethod
+    def header_cells(ws, headers: List[str], fill_color: str = "366092", border=None) -> List[Any]:
+        """Styled header cells for a write-only worksheet"""
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment
+
+        header_fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
+        header_font = Font(bold=True, color="FFFFFF")
+        header_alignment = Alignment(horizontal="center", vertical="center")
+
+        cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.alignment = header_alignment
+            if border is not None:
+                cell.border = border
+            cells.append(cell)
+        return cells
+
+    @staticmethod
+    def save_workbook_to_temp(wb) -> str:
+        """Save a workbook to a temporary .xlsx file and return its path"""
+        handle, path = tempfile.mkstemp(suffix='.xlsx', prefix='buggy_export_')
+        os.close(handle)
+        try:
+            wb.save(path)
+        except Exception:
+            os.remove(path)
+            raise
+        return path
+
+    @staticmethod
+    def iter_file_chunks(path: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Stream a temporary export file and delete it afterwards"""
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def stream_csv(data: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """
+        Export data as chunked CSV
+
+        The first row is read eagerly so an empty export raises ValueError
+        before the response starts; the rest is written EXPORT_CHUNK_SIZE
+        rows at a time.
+
+        Args:
+            data: Dictionaries to export (list or iterator)
+
+        Returns:
+            Iterator of CSV text chunks (UTF-8 BOM first, for Excel)
+        """
+        rows = iter(data)
+        first = next(rows, None)
+        if first is None:
+            raise ValueError("No data to export")
+        headers = list(first.keys())
+
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(headers)
+            pending = 0
+            for row_data in itertools.chain([first], rows):
+                values = []
+                for header in headers:
+                    value = row_data.get(header, '')
+                    if isinstance(value, datetime):
+                        value = value.strftime('%Y-%m-%d %H:%M:%S')
+                    values.append(value)
+                writer.writerow(values)
+                pending += 1
+                if pending >= ReportService.EXPORT_CHUNK_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate(0)
+                    pending = 0
+            yield buffer.getvalue()
+
+        return itertools.chain(['\ufeff'], generate())
 
     @staticmethod
     def export_to_pdf(data: List[Dict[str, Any]], title: str, filename: str) -> bytes:
@@ -485,31 +646,15 @@ class ReportService:
         Returns:
             Comprehensive analytics dictionary
         """
-        # Get all requests in date range
-        all_requests = BuggyRequest.query.filter(
-            BuggyRequest.hotel_id == hotel_id,
-            BuggyRequest.requested_at >= start_date,
-            BuggyRequest.requested_at < end_date
-        ).all()
-        
-        # Initialize counters
-        total_requests = len(all_requests)
-        completed_count = 0
-        cancelled_count = 0
-        unanswered_count = 0
-        PENDING_count = 0
-        
-        # Breakdown by cancellation reason
-        cancelled_by_driver = 0
-        cancelled_by_guest = 0
-        cancelled_by_admin = 0
-        
-        # Response time analysis
-        response_times = []
-        completion_times = []
+        # Aggregated from hourly rollups (two small grouped queries)
+        by_date_hour = RequestRollupService.summarize(
+            hotel_id, start_date, end_date, group_by=('date', 'hour')
+        )
+        by_location = RequestRollupService.summarize(
+            hotel_id, start_date, end_date, group_by=('location_id',)
+        )
         
-        # Location analysis
-        location_stats = {}
+        totals = {name: 0 for name in RequestHourlyRollup.COUNTERS}
         
         # Hour of day analysis
         hour_stats = {str(i): 0 for i in range(24)}
@@ -520,70 +665,55 @@ class ReportService:
             'Friday': 0, 'Saturday': 0, 'Sunday': 0
         }
         
-        # Process each request
-        for req in all_requests:
-            # Status counts
-            if req.status == RequestStatus.COMPLETED:
-                completed_count += 1
-                
-                # Response time
-                if req.response_time:
-                    response_times.append(req.response_time)
-                
-                # Completion time - Dinamik hesaplama (requested_at -> completed_at)
-                completion_time = None
-                if req.completed_at and req.requested_at:
-                    delta = req.completed_at - req.requested_at
-                    completion_time = int(delta.total_seconds())
-                elif req.completion_time:
-                    # Fallback: Veritabanındaki değeri kullan
-                    completion_time = req.completion_time
-                
-                if completion_time and completion_time > 0:
-                    completion_times.append(completion_time)
-            elif req.status == RequestStatus.CANCELLED:
-                cancelled_count += 1
-                if req.cancelled_by == 'driver':
-                    cancelled_by_driver += 1
-                elif req.cancelled_by == 'guest':
-                    cancelled_by_guest += 1
-                elif req.cancelled_by == 'admin':
-                    cancelled_by_admin += 1
-            elif req.status == RequestStatus.UNANSWERED:
-                unanswered_count += 1
-            elif req.status == RequestStatus.PENDING:
-                PENDING_count += 1
-            
-            # Location stats
-            if req.location:
-                loc_name = req.location.name
-                if loc_name not in location_stats:
-                    location_stats[loc_name] = {
-                        'total': 0,
-                        'completed': 0,
-                        'cancelled': 0,
-                        'unanswered': 0
-                    }
-                location_stats[loc_name]['total'] += 1
-                if req.status == RequestStatus.COMPLETED:
-                    location_stats[loc_name]['completed'] += 1
-                elif req.status == RequestStatus.CANCELLED:
-                    location_stats[loc_name]['cancelled'] += 1
-                elif req.status == RequestStatus.UNANSWERED:
-                    location_stats[loc_name]['unanswered'] += 1
-            
-            # Hour of day stats
-            if req.requested_at:
-                hour = str(req.requested_at.hour)
-                hour_stats[hour] += 1
-                
-                # Day of week stats
-                day_name = req.requested_at.strftime('%A')
-                day_stats[day_name] += 1
+        for (day, hour), counters in by_date_hour.items():
+            for name, value in counters.items():
+                totals[name] += value
+            hour_stats[str(hour)] += counters['total_count']
+            day_stats[day.strftime('%A')] += counters['total_count']
+        
+        # Status counts
+        total_requests = totals['total_count']
+        completed_count = totals['completed_count']
+        cancelled_count = totals['cancelled_count']
+        unanswered_count = totals['unanswered_count']
+        PENDING_count = totals['pending_count']
+        
+        # Breakdown by cancellation reason
+        cancelled_by_driver = totals['cancelled_by_driver_count']
+        cancelled_by_guest = totals['cancelled_by_guest_count']
+        cancelled_by_admin = totals['cancelled_by_admin_count']
+        
+        # Location analysis
+        location_names = dict(
+            db.session.query(Location.id, Location.name).filter(
+                Location.id.in_([key[0] for key in by_location])
+            ).all()
+        ) if by_location else {}
+        location_stats = {}
+        for (location_id, ), counters in by_location.items():
+            loc_name = location_names.get(location_id)
+            if loc_name is None:
+                continue
+            stats = location_stats.setdefault(loc_name, {
+                'total': 0,
+                'completed': 0,
+                'cancelled': 0,
+                'unanswered': 0
+            })
+            stats['total'] += counters['total_count']
+            stats['completed'] += counters['completed_count']
+            stats['cancelled'] += counters['cancelled_count']
+            stats['unanswered'] += counters['unanswered_count']
         
         # Calculate averages
-        avg_response_time = sum(response_times) / len(response_times) if response_times else 0
-        avg_completion_time = sum(completion_times) / len(completion_times) if completion_times else 0
+        avg_response_time = (
+            totals['response_time_sum'] / totals['response_time_count']
+            if totals['response_time_count'] else 0
+        )
+        avg_completion_time = (
+            totals['completion_time_sum'] / totals['completion_time_count']
+            if totals['completion_time_count'] else 0
+        )
         
         # Calculate percentages
         completion_rate = (completed_count / total_requests * 100) if total_requests > 0 else 0
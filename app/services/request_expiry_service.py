@@ -0,0 +1,298 @@
+"""
+Buggy Call - Request Expiry Service
+Hashed timer wheel that expires unanswered PENDING requests on time
+"""
+from datetime import datetime
+from threading import Lock
+from sqlalchemy import event, select, update, cast, Integer, literal, DateTime
+from app import db
+from app.models import get_current_timestamp
+from app.models.request import BuggyRequest, RequestStatus
+from app.services.request_rollup_service import RequestRollupService, TRACKED_FIELDS, seconds_between
+from app.tasks.timeout_checker import TIMEOUT_DURATION
+import logging
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class RequestExpiryService:
+    """
+    In-memory timer wheel for PENDING request timeouts
+
+    Every committed PENDING request is armed with a deadline of
+    requested_at + TIMEOUT_DURATION; any commit that moves it out of
+    PENDING (accept, cancel, ...) disarms it. Deadlines are hashed into
+    WHEEL_SIZE slots of TICK_SECONDS each, so arm/disarm are O(1) and a
+    tick only looks at the slots it passed. Due requests are expired with
+    one set-based UPDATE (status still PENDING), so a request accepted
+    meanwhile by another process is never overwritten. reconcile()
+    re-arms timers from the database after a restart.
+    """
+
+    # Defaults (overridable via app.config)
+    TICK_SECONDS = 10
+    WHEEL_SIZE = 512  # 512 x 10s ≈ 85 min per revolution
+    EXPIRE_CHUNK = 500
+
+    _slots = [{} for _ in range(WHEEL_SIZE)]  # slot -> {request_id: deadline tick}
+    _armed = {}  # request_id -> deadline tick
+    _cursor = None  # last processed tick
+    _lock = Lock()
+    _listeners_registered = False
+    _stats = {'armed': 0, 'disarmed': 0, 'expired': 0, 'max_lateness': 0.0}
+
+    @classmethod
+    def init_app(cls, app):
+        """Configure the wheel and hook arm/disarm into db.session commits"""
+        cls.TICK_SECONDS = int(app.config.get('REQUEST_EXPIRY_TICK', cls.TICK_SECONDS))
+        cls.reset()
+        cls.register_listeners()
+
+    @classmethod
+    def reset(cls):
+        """Disarm everything (app start, tests)"""
+        with cls._lock:
+            cls._slots = [{} for _ in range(cls.WHEEL_SIZE)]
+            cls._armed = {}
+            cls._cursor = None
+            cls._stats = {'armed': 0, 'disarmed': 0, 'expired': 0, 'max_lateness': 0.0}
+
+    # ==================== WHEEL ====================
+
+    @classmethod
+    def _tick_of(cls, moment):
+        return int((moment - _EPOCH).total_seconds() // cls.TICK_SECONDS)
+
+    @classmethod
+    def arm(cls, request_id, requested_at):
+        """Schedule a request's timeout (re-arming replaces the old deadline)"""
+        if requested_at is None:
+            return
+        deadline = cls._tick_of(requested_at + TIMEOUT_DURATION) + 1  # first tick at/after the deadline
+        with cls._lock:
+            if cls._cursor is None:
+                cls._cursor = cls._tick_of(get_current_timestamp())
+            deadline = max(deadline, cls._cursor + 1)  # overdue: next tick
+            cls._disarm_locked(request_id)
+            cls._slots[deadline % cls.WHEEL_SIZE][request_id] = deadline
+            cls._armed[request_id] = deadline
+            cls._stats['armed'] += 1
+
+    @classmethod
+    def disarm(cls, request_id):
+        """Cancel a request's timeout (accepted, cancelled, deleted)"""
+        with cls._lock:
+            if cls._disarm_locked(request_id):
+                cls._stats['disarmed'] += 1
+
+    @classmethod
+    def _disarm_locked(cls, request_id):
+        deadline = cls._armed.pop(request_id, None)
+        if deadline is None:
+            return False
+        cls._slots[deadline % cls.WHEEL_SIZE].pop(request_id, None)
+        return True
+
+    @classmethod
+    def _collect_due(cls, now):
+        """Remove and return request IDs whose deadline tick has passed"""
+        current = cls._tick_of(now)
+        due = []
+        with cls._lock:
+            if cls._cursor is None:
+                cls._cursor = current
+            if current <= cls._cursor:
+                return due
+            passed = current - cls._cursor
+            if passed >= cls.WHEEL_SIZE:
+                slots = range(cls.WHEEL_SIZE)
+            else:
+                slots = [tick % cls.WHEEL_SIZE for tick in range(cls._cursor + 1, current + 1)]
+            for slot in slots:
+                entries = cls._slots[slot]
+                for request_id in [rid for rid, deadline in entries.items() if deadline <= current]:
+                    del entries[request_id]
+                    del cls._armed[request_id]
+                    due.append(request_id)
+            cls._cursor = current
+        return due
+
+    @classmethod
+    def tick(cls, now=None):
+        """
+        Expire requests whose deadline has passed
+
+        Args:
+            now: Current Cyprus-local time (default: get_current_timestamp())
+
+        Returns:
+            int: Requests marked UNANSWERED
+        """
+        now = now or get_current_timestamp()
+        due = cls._collect_due(now)
+        if not due:
+            return 0
+        expired = 0
+        for start in range(0, len(due), cls.EXPIRE_CHUNK):
+            expired += cls.expire(due[start:start + cls.EXPIRE_CHUNK], now)
+        return expired
+
+    # ==================== EXPIRY ====================
+
+    @classmethod
+    def expire(cls, request_ids, now=None):
+        """
+        Mark still-PENDING requests UNANSWERED with one UPDATE
+
+        Rollup counters, report caches and long-poll waiters are handled
+        here because a bulk UPDATE bypasses their session listeners.
+
+        Args:
+            request_ids: Candidate request IDs
+            now: Timeout timestamp (default: get_current_timestamp())
+
+        Returns:
+            int: Requests actually expired
+        """
+        from app.services.report_cache import ReportCache
+        from app.services.pending_request_notifier import PendingRequestNotifier
+
+        if not request_ids:
+            return 0
+        now = now or get_current_timestamp()
+        try:
+            # Lock the candidates so a concurrent accept either wins or waits
+            rows = db.session.execute(
+                select(BuggyRequest.id, *[getattr(BuggyRequest, name) for name in TRACKED_FIELDS]).where(
+                    BuggyRequest.id.in_(request_ids),
+                    BuggyRequest.status == RequestStatus.PENDING
+                ).with_for_update()
+            ).all()
+            if not rows:
+                db.session.rollback()
+                return 0
+
+            ids = [row[0] for row in rows]
+            result = db.session.execute(
+                update(BuggyRequest).where(
+                    BuggyRequest.id.in_(ids),
+                    BuggyRequest.status == RequestStatus.PENDING
+                ).values(
+                    status=RequestStatus.UNANSWERED,
+                    timeout_at=now,
+                    response_time=cast(seconds_between(BuggyRequest.requested_at, literal(now, DateTime)), Integer)
+                ).execution_options(synchronize_session=False)
+            )
+
+            deltas = {}
+            hotel_ids = set()
+            lateness = 0.0
+            for row in rows:
+                values = dict(zip(TRACKED_FIELDS, row[1:]))
+                hotel_ids.add(values['hotel_id'])
+                RequestRollupService._accumulate(deltas, RequestRollupService.contribution(values), -1)
+                RequestRollupService._accumulate(
+                    deltas, RequestRollupService.contribution({**values, 'status': RequestStatus.UNANSWERED}), 1)
+                if values['requested_at']:
+                    lateness = max(lateness, (now - values['requested_at'] - TIMEOUT_DURATION).total_seconds())
+            deltas = {key: {name: value for name, value in counters.items() if value}
+                      for key, counters in deltas.items()}
+            RequestRollupService.apply_deltas(db.session.connection(), {k: v for k, v in deltas.items() if v})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error expiring requests: {str(e)}")
+            return 0
+
+        for hotel_id in hotel_ids:
+            try:
+                ReportCache.bump(hotel_id, historic=True)
+            except Exception as e:
+                logger.error(f"⚠️ Report cache invalidation failed (hotel {hotel_id}): {str(e)}")
+        # Wake long-polling drivers (bulk UPDATE bypasses the session listeners)
+        PendingRequestNotifier.bump(*hotel_ids)
+
+        with cls._lock:
+            for request_id in ids:
+                cls._disarm_locked(request_id)
+            cls._stats['expired'] += result.rowcount
+            cls._stats['max_lateness'] = max(cls._stats['max_lateness'], lateness)
+        logger.info(f"✅ Marked {result.rowcount} request(s) as unanswered: {ids}")
+        return result.rowcount
+
+    @classmethod
+    def reconcile(cls):
+        """
+        Re-arm timers for every PENDING request in the database
+
+        Runs at startup (timers are in memory) and periodically as a safety
+        net for requests created or answered by other processes.
+
+        Returns:
+            int: Armed timers
+        """
+        pending = dict(db.session.execute(
+            select(BuggyRequest.id, BuggyRequest.requested_at).where(BuggyRequest.status == RequestStatus.PENDING)
+        ).all())
+        with cls._lock:
+            stale = [request_id for request_id in cls._armed if request_id not in pending]
+            for request_id in stale:
+                cls._disarm_locked(request_id)
+        for request_id, requested_at in pending.items():
+            with cls._lock:
+                armed = request_id in cls._armed
+            if not armed:
+                cls.arm(request_id, requested_at)
+        logger.info(f"Request expiry timers reconciled: {len(pending)} armed, {len(stale)} stale removed")
+        return len(pending)
+
+    @classmethod
+    def get_stats(cls):
+        """Armed timers and arm/disarm/expiry counters"""
+        with cls._lock:
+            return {
+                'pending_timers': len(cls._armed),
+                'tick_seconds': cls.TICK_SECONDS,
+                **cls._stats
+            }
+
+    # ==================== LIFECYCLE EVENTS ====================
+
+    @classmethod
+    def register_listeners(cls):
+        """Arm on committed PENDING requests, disarm when they leave PENDING (idempotent)"""
+        if cls._listeners_registered:
+            return
+        event.listen(db.session, 'after_flush', cls._after_flush)
+        event.listen(db.session, 'after_commit', cls._after_commit)
+        event.listen(db.session, 'after_rollback', cls._after_rollback)
+        cls._listeners_registered = True
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        changes = session.info.setdefault('request_expiry_changes', {})
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, BuggyRequest) and obj.id is not None:
+                if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                    continue
+                changes[obj.id] = obj.requested_at if obj.status == RequestStatus.PENDING else None
+        for obj in session.deleted:
+            if isinstance(obj, BuggyRequest) and obj.id is not None:
+                changes[obj.id] = None
+
+    @classmethod
+    def _after_commit(cls, session):
+        changes = session.info.pop('request_expiry_changes', None)
+        if not changes:
+            return
+        for request_id, requested_at in changes.items():
+            if requested_at is None:
+                cls.disarm(request_id)
+            else:
+                cls.arm(request_id, requested_at)
+
+    @staticmethod
+    def _after_rollback(session):
+        session.info.pop('request_expiry_changes', None)
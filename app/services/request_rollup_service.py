@@ -0,0 +1,514 @@
+"""
+Buggy Call - Request Rollup Service
+Maintains hourly request rollups and answers report aggregates from them
+"""
+from datetime import datetime, date, timedelta
+from sqlalchemy import event, func, inspect, or_, and_, case, select, update, union_all, Float
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from app import db
+from app.models.request import BuggyRequest, RequestStatus
+from app.models.request_rollup import RequestHourlyRollup
+import logging
+
+logger = logging.getLogger(__name__)
+
+# BuggyRequest columns a rollup contribution depends on
+TRACKED_FIELDS = (
+    'hotel_id', 'location_id', 'buggy_id', 'accepted_by_id', 'status',
+    'cancelled_by', 'requested_at', 'accepted_at', 'completed_at'
+)
+
+KEY_FIELDS = ('hotel_id', 'location_id', 'buggy_id', 'driver_id', 'hour_start')
+
+STATUS_COUNTERS = {
+    RequestStatus.PENDING: 'pending_count',
+    RequestStatus.ACCEPTED: 'accepted_count',
+    RequestStatus.COMPLETED: 'completed_count',
+    RequestStatus.CANCELLED: 'cancelled_count',
+    RequestStatus.UNANSWERED: 'unanswered_count',
+}
+
+CANCELLED_BY_COUNTERS = {
+    'driver': 'cancelled_by_driver_count',
+    'guest': 'cancelled_by_guest_count',
+    'admin': 'cancelled_by_admin_count',
+}
+
+
+def _floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(value):
+    floored = _floor_hour(value)
+    return floored if floored == value else floored + timedelta(hours=1)
+
+
+def _as_date(value):
+    """DATE() comes back as date (MySQL) or 'YYYY-MM-DD' string (SQLite)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class seconds_between(FunctionElement):
+    """Seconds from start to end (TIMESTAMPDIFF on MySQL)"""
+    type = Float()
+    inherit_cache = True
+    name = 'seconds_between'
+
+
+@compiles(seconds_between)
+def _seconds_between_default(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"EXTRACT(EPOCH FROM ({compiler.process(end, **kw)} - {compiler.process(start, **kw)}))"
+
+
+@compiles(seconds_between, 'mysql')
+def _seconds_between_mysql(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"TIMESTAMPDIFF(SECOND, {compiler.process(start, **kw)}, {compiler.process(end, **kw)})"
+
+
+@compiles(seconds_between, 'sqlite')
+def _seconds_between_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return (f"ROUND((JULIANDAY({compiler.process(end, **kw)}) - "
+            f"JULIANDAY({compiler.process(start, **kw)})) * 86400)")
+
+
+class RequestRollupService:
+    """
+    Hourly rollup maintenance and querying
+
+    Every flush that inserts, changes or deletes a BuggyRequest moves that
+    request's contribution from its old rollup row to its new one inside the
+    same transaction, so rollups are as current as the request table itself.
+    Bulk Query.update()/delete() calls bypass the ORM and are not tracked;
+    run scripts/backfill_request_rollups.py after such changes.
+    """
+
+    BACKFILL_CHUNK_SIZE = 1000
+    _listeners_registered = False
+
+    # ==================== CONTRIBUTIONS ====================
+
+    @staticmethod
+    def contribution(values):
+        """
+        Rollup key and counters a single request contributes
+
+        Args:
+            values: Mapping with TRACKED_FIELDS of a request
+
+        Returns:
+            tuple: (key, counters) or None if the request can't be bucketed
+        """
+        hotel_id = values.get('hotel_id')
+        location_id = values.get('location_id')
+        requested_at = values.get('requested_at')
+        if hotel_id is None or location_id is None or requested_at is None:
+            return None
+
+        status = values.get('status')
+        if isinstance(status, str):
+            status = RequestStatus(status)
+
+        key = (
+            hotel_id,
+            location_id,
+            values.get('buggy_id') or 0,
+            values.get('accepted_by_id') or 0,
+            _floor_hour(requested_at)
+        )
+        counters = {'total_count': 1}
+
+        status_counter = STATUS_COUNTERS.get(status)
+        if status_counter:
+            counters[status_counter] = 1
+
+        if status == RequestStatus.CANCELLED:
+            cancelled_by_counter = CANCELLED_BY_COUNTERS.get(values.get('cancelled_by'))
+            if cancelled_by_counter:
+                counters[cancelled_by_counter] = 1
+
+        if status == RequestStatus.COMPLETED:
+            accepted_at = values.get('accepted_at')
+            completed_at = values.get('completed_at')
+            if accepted_at:
+                counters['response_time_sum'] = (accepted_at - requested_at).total_seconds()
+                counters['response_time_count'] = 1
+            if completed_at:
+                counters['completion_time_sum'] = (completed_at - requested_at).total_seconds()
+                counters['completion_time_count'] = 1
+
+        return key, counters
+
+    @staticmethod
+    def _current_values(obj):
+        return {name: getattr(obj, name) for name in TRACKED_FIELDS}
+
+    @staticmethod
+    def _previous_values(obj):
+        """Values as of the last load/flush, read from attribute history"""
+        state = inspect(obj)
+        values = {}
+        for name in TRACKED_FIELDS:
+            history = state.attrs[name].history
+            if history.deleted:
+                values[name] = history.deleted[0]
+            elif history.unchanged:
+                values[name] = history.unchanged[0]
+            elif history.added:
+                values[name] = None  # was NULL before this change
+            else:
+                values[name] = getattr(obj, name)
+        return values
+
+    @staticmethod
+    def _accumulate(deltas, contribution, sign):
+        if contribution is None:
+            return
+        key, counters = contribution
+        bucket = deltas.setdefault(key, {})
+        for name, value in counters.items():
+            bucket[name] = bucket.get(name, 0) + sign * value
+
+    # ==================== INCREMENTAL MAINTENANCE ====================
+
+    @staticmethod
+    def register_listeners():
+        """Hook rollup maintenance into every db.session flush (idempotent)"""
+        if RequestRollupService._listeners_registered:
+            return
+        # Load the old value on assignment so history always has it
+        for name in TRACKED_FIELDS:
+            event.listen(getattr(BuggyRequest, name), 'set',
+                         RequestRollupService._on_set, active_history=True)
+        event.listen(db.session, 'after_flush', RequestRollupService._after_flush)
+        RequestRollupService._listeners_registered = True
+
+    @staticmethod
+    def _on_set(target, value, oldvalue, initiator):
+        return value
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        deltas = {}
+        for obj in session.new:
+            if isinstance(obj, BuggyRequest):
+                RequestRollupService._accumulate(
+                    deltas, RequestRollupService.contribution(RequestRollupService._current_values(obj)), 1)
+        for obj in session.dirty:
+            if isinstance(obj, BuggyRequest) and session.is_modified(obj, include_collections=False):
+                RequestRollupService._accumulate(
+                    deltas, RequestRollupService.contribution(RequestRollupService._previous_values(obj)), -1)
+                RequestRollupService._accumulate(
+                    deltas, RequestRollupService.contribution(RequestRollupService._current_values(obj)), 1)
+        for obj in session.deleted:
+            if isinstance(obj, BuggyRequest):
+                RequestRollupService._accumulate(
+                    deltas, RequestRollupService.contribution(RequestRollupService._previous_values(obj)), -1)
+
+        deltas = {
+            key: {name: value for name, value in counters.items() if value}
+            for key, counters in deltas.items()
+        }
+        deltas = {key: counters for key, counters in deltas.items() if counters}
+        if not deltas:
+            return
+
+        try:
+            RequestRollupService.apply_deltas(session.connection(), deltas)
+        except Exception as e:
+            # Never fail the business transaction because of reporting; backfill repairs drift
+            logger.error(f"⚠️ Request rollup update failed: {str(e)}")
+
+    @staticmethod
+    def apply_deltas(connection, deltas):
+        """
+        Add counter deltas to rollup rows (atomic upsert per key)
+
+        Args:
+            connection: SQLAlchemy connection (caller's transaction)
+            deltas: {key tuple: {counter: delta}}
+        """
+        table = RequestHourlyRollup.__table__
+        dialect = connection.dialect.name
+
+        for key, counters in deltas.items():
+            row = dict(zip(KEY_FIELDS, key))
+            row.update({name: 0 for name in RequestHourlyRollup.COUNTERS})
+            row.update(counters)
+
+            if dialect == 'mysql':
+                from sqlalchemy.dialects.mysql import insert as mysql_insert
+                stmt = mysql_insert(table).values(row)
+                stmt = stmt.on_duplicate_key_update({
+                    name: table.c[name] + stmt.inserted[name] for name in counters
+                })
+                connection.execute(stmt)
+            elif dialect in ('sqlite', 'postgresql'):
+                if dialect == 'sqlite':
+                    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                else:
+                    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                stmt = dialect_insert(table).values(row)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=list(KEY_FIELDS),
+                    set_={name: table.c[name] + stmt.excluded[name] for name in counters}
+                )
+                connection.execute(stmt)
+            else:
+                key_clause = and_(*[table.c[name] == row[name] for name in KEY_FIELDS])
+                result = connection.execute(
+                    update(table).where(key_clause).values({
+                        name: table.c[name] + value for name, value in counters.items()
+                    })
+                )
+                if result.rowcount == 0:
+                    connection.execute(table.insert().values(row))
+
+    # ==================== BACKFILL ====================
+
+    @staticmethod
+    def rebuild(hotel_id=None, start_date=None, end_date=None):
+        """
+        Recompute rollups from buggy_requests (backfill / repair)
+
+        The range is widened to whole hours. Existing rollup rows in range
+        are replaced. Requests are streamed, so memory is bounded by the
+        number of rollup keys, not the number of requests.
+
+        Args:
+            hotel_id: Restrict to one hotel (None = all hotels)
+            start_date: First requested_at to include (None = no lower bound)
+            end_date: Last requested_at to include (None = no upper bound)
+
+        Returns:
+            int: Rollup rows written
+        """
+        start_hour = _floor_hour(start_date) if start_date else None
+        end_hour = _floor_hour(end_date) + timedelta(hours=1) if end_date else None
+
+        columns = [getattr(BuggyRequest, name) for name in TRACKED_FIELDS]
+        query = select(*columns)
+        delete_query = RequestHourlyRollup.__table__.delete()
+        if hotel_id is not None:
+            query = query.where(BuggyRequest.hotel_id == hotel_id)
+            delete_query = delete_query.where(RequestHourlyRollup.hotel_id == hotel_id)
+        if start_hour is not None:
+            query = query.where(BuggyRequest.requested_at >= start_hour)
+            delete_query = delete_query.where(RequestHourlyRollup.hour_start >= start_hour)
+        if end_hour is not None:
+            query = query.where(BuggyRequest.requested_at < end_hour)
+            delete_query = delete_query.where(RequestHourlyRollup.hour_start < end_hour)
+
+        totals = {}
+        result = db.session.execute(
+            query.execution_options(yield_per=RequestRollupService.BACKFILL_CHUNK_SIZE)
+        )
+        for row in result:
+            RequestRollupService._accumulate(
+                totals, RequestRollupService.contribution(dict(zip(TRACKED_FIELDS, row))), 1)
+
+        try:
+            db.session.execute(delete_query)
+            rows = []
+            for key, counters in totals.items():
+                row = dict(zip(KEY_FIELDS, key))
+                row.update({name: counters.get(name, 0) for name in RequestHourlyRollup.COUNTERS})
+                rows.append(row)
+                if len(rows) >= RequestRollupService.BACKFILL_CHUNK_SIZE:
+                    db.session.execute(RequestHourlyRollup.__table__.insert(), rows)
+                    rows = []
+            if rows:
+                db.session.execute(RequestHourlyRollup.__table__.insert(), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        logger.info(f"✅ Request rollups rebuilt: {len(totals)} row(s) (hotel={hotel_id or 'all'})")
+        return len(totals)
+
+    # ==================== QUERYING ====================
+
+    @staticmethod
+    def aggregate_subquery(hotel_id, start_date, end_date, group_by=(), include_end=False):
+        """
+        Grouped counters for a requested_at range as a single SQL subquery
+
+        Whole hours are summed from rollups; the partial hours at either edge
+        of the range are aggregated from buggy_requests with conditional
+        aggregates in the same statement (UNION ALL), so results are exact
+        for any range and nothing is aggregated in Python.
+
+        Args:
+            hotel_id: Hotel ID
+            start_date: Range start (inclusive)
+            end_date: Range end (exclusive unless include_end)
+            group_by: Any of 'location_id', 'buggy_id', 'driver_id', 'hour', 'date'
+            include_end: Treat end_date as inclusive
+
+        Returns:
+            Subquery with one column per group_by name and per counter
+        """
+        full_start = _ceil_hour(start_date)
+        full_end = _floor_hour(end_date)
+        if include_end:
+            before_end = BuggyRequest.requested_at <= end_date
+        else:
+            before_end = BuggyRequest.requested_at < end_date
+
+        if full_start < full_end:
+            # Partial hours at the edges
+            edges = [and_(BuggyRequest.requested_at >= full_end, before_end)]
+            if start_date < full_start:
+                edges.append(and_(BuggyRequest.requested_at >= start_date,
+                                  BuggyRequest.requested_at < full_start))
+            rollups = select(
+                *[RequestRollupService._rollup_group_column(name).label(name) for name in group_by],
+                *[getattr(RequestHourlyRollup, name).label(name) for name in RequestHourlyRollup.COUNTERS]
+            ).where(
+                RequestHourlyRollup.hotel_id == hotel_id,
+                RequestHourlyRollup.hour_start >= full_start,
+                RequestHourlyRollup.hour_start < full_end
+            )
+        else:
+            # Range shorter than a whole hour bucket
+            edges = [and_(BuggyRequest.requested_at >= start_date, before_end)]
+            rollups = None
+
+        raw_groups = [RequestRollupService._raw_group_column(name) for name in group_by]
+        raw = select(
+            *[column.label(name) for column, name in zip(raw_groups, group_by)],
+            *[expression.label(name) for name, expression in RequestRollupService._raw_counters()]
+        ).where(
+            BuggyRequest.hotel_id == hotel_id,
+            or_(*edges)
+        )
+        if raw_groups:
+            raw = raw.group_by(*raw_groups)
+
+        source = union_all(rollups, raw).subquery() if rollups is not None else raw.subquery()
+        group_columns = [source.c[name] for name in group_by]
+        grouped = select(
+            *group_columns,
+            *[func.sum(source.c[name]).label(name) for name in RequestHourlyRollup.COUNTERS]
+        )
+        if group_columns:
+            grouped = grouped.group_by(*group_columns)
+        return grouped.subquery()
+
+    @staticmethod
+    def summarize(hotel_id, start_date, end_date, group_by=(), include_end=False):
+        """
+        Aggregate request counters for a requested_at range (one query)
+
+        Args:
+            See aggregate_subquery()
+
+        Returns:
+            dict: {group tuple: {counter: value}} (key () when group_by is empty)
+        """
+        sub = RequestRollupService.aggregate_subquery(hotel_id, start_date, end_date, group_by, include_end)
+        results = {}
+        for row in db.session.execute(select(sub)).mappings():
+            if row['total_count'] is None:
+                continue  # SUM over no rows
+            group = tuple(RequestRollupService.normalize_group_value(name, row[name]) for name in group_by)
+            results[group] = {name: row[name] or 0 for name in RequestHourlyRollup.COUNTERS}
+        return results
+
+    @staticmethod
+    def approximate_count(hotel_id, status=None, buggy_id=None, start_date=None, end_date=None):
+        """
+        Approximate request count from rollups only (no buggy_requests scan)
+
+        Exact without a date range; with one, the edge hours are counted
+        whole (hour granularity).
+
+        Args:
+            hotel_id: Hotel ID
+            status: Optional RequestStatus filter
+            buggy_id: Optional buggy filter
+            start_date: Optional range start
+            end_date: Optional range end
+
+        Returns:
+            int: Request count
+        """
+        counter = STATUS_COUNTERS[status] if status is not None else 'total_count'
+        query = select(func.sum(getattr(RequestHourlyRollup, counter))).where(
+            RequestHourlyRollup.hotel_id == hotel_id
+        )
+        if buggy_id:
+            query = query.where(RequestHourlyRollup.buggy_id == int(buggy_id))
+        if start_date:
+            query = query.where(RequestHourlyRollup.hour_start >= _floor_hour(start_date))
+        if end_date:
+            query = query.where(RequestHourlyRollup.hour_start <= _floor_hour(end_date))
+        return int(db.session.execute(query).scalar() or 0)
+
+    @staticmethod
+    def _raw_counters():
+        """Conditional aggregates over buggy_requests matching contribution()"""
+        status = BuggyRequest.status
+        completed = status == RequestStatus.COMPLETED
+        response_known = and_(completed, BuggyRequest.accepted_at.isnot(None))
+        completion_known = and_(completed, BuggyRequest.completed_at.isnot(None))
+
+        def count_if(condition):
+            return func.sum(case((condition, 1), else_=0))
+
+        counters = [('total_count', func.count(BuggyRequest.id))]
+        for request_status, name in STATUS_COUNTERS.items():
+            counters.append((name, count_if(status == request_status)))
+        for cancelled_by, name in CANCELLED_BY_COUNTERS.items():
+            counters.append((name, count_if(and_(status == RequestStatus.CANCELLED,
+                                                 BuggyRequest.cancelled_by == cancelled_by))))
+        counters += [
+            ('response_time_sum', func.sum(case(
+                (response_known, seconds_between(BuggyRequest.requested_at, BuggyRequest.accepted_at)),
+                else_=0))),
+            ('response_time_count', count_if(response_known)),
+            ('completion_time_sum', func.sum(case(
+                (completion_known, seconds_between(BuggyRequest.requested_at, BuggyRequest.completed_at)),
+                else_=0))),
+            ('completion_time_count', count_if(completion_known)),
+        ]
+        order = {name: index for index, name in enumerate(RequestHourlyRollup.COUNTERS)}
+        return sorted(counters, key=lambda item: order[item[0]])
+
+    @staticmethod
+    def _rollup_group_column(name):
+        if name == 'hour':
+            return func.extract('hour', RequestHourlyRollup.hour_start)
+        if name == 'date':
+            return func.date(RequestHourlyRollup.hour_start)
+        return getattr(RequestHourlyRollup, name)
+
+    @staticmethod
+    def _raw_group_column(name):
+        if name == 'hour':
+            return func.extract('hour', BuggyRequest.requested_at)
+        if name == 'date':
+            return func.date(BuggyRequest.requested_at)
+        if name == 'buggy_id':
+            return func.coalesce(BuggyRequest.buggy_id, 0)
+        if name == 'driver_id':
+            return func.coalesce(BuggyRequest.accepted_by_id, 0)
+        return getattr(BuggyRequest, name)
+
+    @staticmethod
+    def normalize_group_value(name, value):
+        """Make grouped values dialect independent (int hours, date dates)"""
+        if name == 'hour':
+            return int(value)
+        if name == 'date':
+            return _as_date(value)
+        return value
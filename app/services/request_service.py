@@ -9,16 +9,20 @@ from app.models.request import BuggyRequest, RequestStatus
 from app.models.buggy import Buggy, BuggyStatus
 from app.models.location import Location
 from app.models.hotel import Hotel
+from app.models import get_current_timestamp, format_cyprus_datetime as _format_cyprus_datetime
 from app.services.audit_service import AuditService
+from app.services.outbox_service import OutboxService
+from app.services.fleet_state_service import FleetStateService
 from app.utils.exceptions import (
     ResourceNotFoundException, ValidationException, 
     BusinessLogicException, ForbiddenException
 )
 from app.utils.helpers import Pagination
 from app.utils.performance_monitor import PerformanceMonitor
+from app.websocket.emit_router import EmitRouter
 from app.utils.logger import (
     logger, log_request_lifecycle, log_error, 
-    RequestLifecycleLogger, log_fcm_event
+    RequestLifecycleLogger
 )
 from datetime import datetime, timezone
 import logging
@@ -44,9 +48,7 @@ def get_cyprus_now():
     Returns:
         datetime: Current Cyprus datetime (timezone-naive for DB storage)
     """
-    cyprus_tz = pytz.timezone('Europe/Nicosia')  # Cyprus timezone
-    cyprus_time = datetime.now(cyprus_tz)
-    return cyprus_time.replace(tzinfo=None)  # Remove timezone info for DB storage
+    return get_current_timestamp()
 
 
 def format_cyprus_datetime(dt):
@@ -59,14 +61,8 @@ def format_cyprus_datetime(dt):
     Returns:
         str: ISO format string with +02:00 or +03:00 offset
     """
-    if not dt:
-        return None
-    
-    cyprus_tz = pytz.timezone('Europe/Nicosia')
-    # Localize the naive datetime to Cyprus timezone
-    cyprus_dt = cyprus_tz.localize(dt)
-    # Return ISO format with timezone info
-    return cyprus_dt.isoformat()
+    # Modül seviyesindeki timezone + saatlik offset cache'i (app.models)
+    return _format_cyprus_datetime(dt)
 
 
 class RequestService:
@@ -117,11 +113,18 @@ class RequestService:
             })
             raise ValidationException('Oda numarası gereklidir')
         
-        # Check if there are any available buggies
-        available_buggies = Buggy.query.filter_by(
-            hotel_id=location.hotel_id,
-            status=BuggyStatus.AVAILABLE
-        ).count()
+        # Check if there are any available buggies (in-memory fleet state)
+        available_buggies = FleetStateService.available_count(location.hotel_id)
+        
+        if available_buggies == 0:
+            # Snapshot bu process'e ait; başka worker'da müsait olan buggy için reddetmeden önce DB'ye sor
+            available_buggies = Buggy.query.filter_by(
+                hotel_id=location.hotel_id,
+                status=BuggyStatus.AVAILABLE
+            ).count()
+            if available_buggies:
+                logger.warning(f'⚠️ [REQUEST_CREATE] Fleet state stale for hotel {location.hotel_id}, reloading')
+                FleetStateService.invalidate(location.hotel_id)
         
         if available_buggies == 0:
             log_error('REQUEST_CREATE', 'No available buggies', {
@@ -156,6 +159,27 @@ class RequestService:
         )
         
         db.session.add(request_obj)
+        db.session.flush()  # Assign request_obj.id for the outbox rows
+        
+        # Side effects are written to the outbox in the same transaction
+        # and delivered by the outbox workers after commit
+        outbox_events = [
+            OutboxService.enqueue_audit(
+                action='create',
+                entity_type='request',
+                entity_id=request_obj.id,
+                new_values=request_obj.to_dict(),
+                hotel_id=location.hotel_id
+            ),
+            # Notify drivers via FCM (push notification)
+            OutboxService.enqueue(
+                'fcm.new_request',
+                {'request_id': request_obj.id},
+                hotel_id=location.hotel_id,
+                aggregate_id=request_obj.id
+            )
+        ]
+        
         db.session.commit()
         
         # Comprehensive logging
@@ -172,33 +196,7 @@ class RequestService:
         
         logger.info(f"✅ Request created: ID={request_obj.id}, requested_at={request_obj.requested_at.isoformat()}")
         
-        # Log creation
-        AuditService.log_create(
-            entity_type='request',
-            entity_id=request_obj.id,
-            new_values=request_obj.to_dict(),
-            hotel_id=location.hotel_id
-        )
-        
-        # Notify drivers via FCM (push notification) - Socket.IO kaldırıldı
-        try:
-            from app.services.fcm_notification_service import FCMNotificationService
-            
-            logger.info(f"🔔 FCM bildirimi gönderiliyor - Request ID: {request_obj.id}")
-            notified_count = FCMNotificationService.notify_new_request(request_obj)
-            
-            if notified_count > 0:
-                logger.info(f"✅ FCM: {notified_count} sürücüye bildirim gönderildi")
-                print(f"✅ FCM: {notified_count} sürücüye bildirim gönderildi")
-            else:
-                logger.warning(f"⚠️ FCM: Hiçbir sürücüye bildirim gönderilemedi")
-                print(f"⚠️ FCM: Hiçbir sürücüye bildirim gönderilemedi")
-        except Exception as e:
-            import traceback
-            logger.error(f"❌ FCM bildirim hatası: {str(e)}")
-            logger.error(traceback.format_exc())
-            print(f"❌ FCM bildirim hatası: {str(e)}")
-            print(traceback.format_exc())
+        OutboxService.publish(outbox_events)
         
         return request_obj
     
@@ -273,6 +271,42 @@ class RequestService:
         # Update buggy status
         buggy.status = BuggyStatus.BUSY
         
+        driver_name = request_obj.accepted_by_driver.full_name if request_obj.accepted_by_driver else 'Sürücü'
+        outbox_events = [
+            OutboxService.enqueue_audit(
+                action='update',
+                entity_type='request',
+                entity_id=request_obj.id,
+                old_values=old_values,
+                new_values=request_obj.to_dict(),
+                user_id=driver_id,
+                hotel_id=request_obj.hotel_id
+            ),
+            # Guest'e FCM bildirimi
+            OutboxService.enqueue('fcm.guest_status', {
+                'request_id': request_id,
+                'status': 'accepted',
+                'title': '🎉 Shuttle Kabul Edildi!',
+                'body': f'Shuttle size doğru geliyor. Buggy: {buggy.code}',
+                'log_data': {
+                    'type': 'accepted',
+                    'buggy_code': buggy.code,
+                    'driver_id': driver_id
+                }
+            }, hotel_id=request_obj.hotel_id, aggregate_id=request_id),
+            # WebSocket: guest, hotel drivers and hotel admin rooms
+            OutboxService.enqueue('socket.emit', {
+                'event': 'request_accepted',
+                'data': {
+                    'request_id': request_id,
+                    'buggy_code': buggy.code,
+                    'driver_name': driver_name,
+                    'hotel_id': request_obj.hotel_id
+                },
+                'scope': {'hotel_id': request_obj.hotel_id, 'request_id': request_id}
+            }, hotel_id=request_obj.hotel_id, aggregate_id=request_id)
+        ]
+        
         db.session.commit()
         
         # Comprehensive logging
@@ -287,85 +321,7 @@ class RequestService:
         
         logger.info(f"✅ Request accepted: ID={request_id}, accepted_at={request_obj.accepted_at.isoformat()}, response_time={request_obj.response_time}s")
         
-        # Log acceptance
-        AuditService.log_update(
-            entity_type='request',
-            entity_id=request_obj.id,
-            old_values=old_values,
-            new_values=request_obj.to_dict(),
-            user_id=driver_id,
-            hotel_id=request_obj.hotel_id
-        )
-        
-        # Guest'e FCM bildirimi gönder - Socket.IO kaldırıldı
-        try:
-            from app.routes.guest_notification_api import get_guest_token, send_fcm_http_notification
-
-            guest_token = get_guest_token(request_id)
-            if guest_token:
-                message_data = {
-                    'title': '🎉 Shuttle Kabul Edildi!',
-                    'body': f'Shuttle size doğru geliyor. Buggy: {buggy.code}'
-                }
-
-                # Direkt FCM gönder - request_id ve type ekle
-                success, fcm_message = send_fcm_http_notification(
-                    guest_token, 
-                    message_data, 
-                    'accepted', 
-                    request_id=request_id
-                )
-                
-                if success:
-                    logger.info(f"✅ Guest FCM bildirimi gönderildi - Request ID: {request_id}")
-                    log_fcm_event('GUEST_NOTIFIED', request_id, {
-                        'type': 'accepted',
-                        'buggy_code': buggy.code,
-                        'driver_id': driver_id
-                    })
-                else:
-                    logger.warning(f"⚠️ Guest FCM bildirimi gönderilemedi - Request ID: {request_id}")
-            else:
-                logger.info(f"ℹ️ Guest FCM token bulunamadı - Request ID: {request_id}")
-                
-        except Exception as e:
-            import traceback
-            logger.error(f"❌ Guest FCM bildirim hatası: {str(e)}")
-            logger.error(traceback.format_exc())
-        
-        # WebSocket: Notify guest and dashboards
-        try:
-            # Broadcast to all
-            socketio.emit('request_accepted', {
-                'request_id': request_id,
-                'buggy_code': buggy.code,
-                'driver_name': request_obj.accepted_by_driver.full_name if request_obj.accepted_by_driver else 'Sürücü',
-                'hotel_id': request_obj.hotel_id
-            })
-            
-            # Notify guest room specifically
-            guest_room = f'request_{request_id}'
-            socketio.emit('request_accepted', {
-                'request_id': request_id,
-                'buggy_code': buggy.code,
-                'driver_name': request_obj.accepted_by_driver.full_name if request_obj.accepted_by_driver else 'Sürücü',
-                'hotel_id': request_obj.hotel_id
-            }, room=guest_room)
-            
-            # Notify admin room
-            admin_room = f'hotel_{request_obj.hotel_id}_admin'
-            socketio.emit('request_accepted', {
-                'request_id': request_id,
-                'buggy_code': buggy.code,
-                'driver_name': request_obj.accepted_by_driver.full_name if request_obj.accepted_by_driver else 'Sürücü',
-                'hotel_id': request_obj.hotel_id
-            }, room=admin_room)
-            
-            logger.info(f"📡 WebSocket: request_accepted emitted for request {request_id} to all rooms")
-        except Exception as e:
-            import traceback
-            logger.error(f"❌ WebSocket emit hatası: {str(e)}")
-            logger.error(traceback.format_exc())
+        OutboxService.publish(outbox_events)
         
         return request_obj
     
@@ -438,6 +394,36 @@ class RequestService:
                 request_obj.buggy.current_location_id = current_location_id
                 logger.info(f"📍 Buggy {request_obj.buggy.code} location updated to {location.name}")
         
+        outbox_events = [
+            OutboxService.enqueue_audit(
+                action='update',
+                entity_type='request',
+                entity_id=request_obj.id,
+                old_values=old_values,
+                new_values=request_obj.to_dict(),
+                user_id=driver_id,
+                hotel_id=request_obj.hotel_id
+            ),
+            # Guest'e FCM bildirimi
+            OutboxService.enqueue('fcm.guest_status', {
+                'request_id': request_id,
+                'status': 'completed',
+                'title': '✅ Shuttle Ulaştı!',
+                'body': 'Shuttle\'ınız hedefe ulaştı. İyi yolculuklar!'
+            }, hotel_id=request_obj.hotel_id, aggregate_id=request_id),
+            # WebSocket: guest, hotel drivers and hotel admin rooms
+            OutboxService.enqueue('socket.emit', {
+                'event': 'request_completed',
+                'data': {
+                    'request_id': request_id,
+                    'hotel_id': request_obj.hotel_id,
+                    'buggy_id': request_obj.buggy_id,
+                    'location_id': current_location_id
+                },
+                'scope': {'hotel_id': request_obj.hotel_id, 'request_id': request_id}
+            }, hotel_id=request_obj.hotel_id, aggregate_id=request_id)
+        ]
+        
         db.session.commit()
         
         # Comprehensive logging
@@ -453,59 +439,7 @@ class RequestService:
         
         logger.info(f"✅ Request completed: ID={request_id}, completed_at={request_obj.completed_at.isoformat()}, completion_time={request_obj.completion_time}s")
         
-        # Log completion
-        AuditService.log_update(
-            entity_type='request',
-            entity_id=request_obj.id,
-            old_values=old_values,
-            new_values=request_obj.to_dict(),
-            user_id=driver_id,
-            hotel_id=request_obj.hotel_id
-        )
-        
-        # Guest'e FCM bildirimi gönder - Socket.IO kaldırıldı
-        try:
-            from app.routes.guest_notification_api import get_guest_token, send_fcm_http_notification
-
-            guest_token = get_guest_token(request_id)
-            if guest_token:
-                message_data = {
-                    'title': '✅ Shuttle Ulaştı!',
-                    'body': 'Shuttle\'ınız hedefe ulaştı. İyi yolculuklar!'
-                }
-
-                # Direkt FCM gönder - request_id ekle
-                send_fcm_http_notification(guest_token, message_data, 'completed', request_id=request_id)
-                logger.info(f"✅ Guest tamamlanma FCM bildirimi gönderildi - Request ID: {request_id}")
-            else:
-                logger.info(f"ℹ️ Guest FCM token bulunamadı - Request ID: {request_id}")
-                
-        except Exception as e:
-            logger.error(f"❌ Guest tamamlanma FCM bildirim hatası: {str(e)}")
-        
-        # WebSocket: Notify guest, drivers and dashboards
-        try:
-            event_data = {
-                'request_id': request_id,
-                'hotel_id': request_obj.hotel_id,
-                'buggy_id': request_obj.buggy_id,
-                'location_id': current_location_id
-            }
-            
-            # Broadcast to all
-            socketio.emit('request_completed', event_data)
-            
-            # Notify drivers room specifically
-            drivers_room = f'hotel_{request_obj.hotel_id}_drivers'
-            socketio.emit('request_completed', event_data, room=drivers_room)
-            
-            # Notify admin room
-            admin_room = f'hotel_{request_obj.hotel_id}_admin'
-            socketio.emit('request_completed', event_data, room=admin_room)
-            
-            logger.info(f"📡 WebSocket: request_completed emitted for request {request_id} to all rooms")
-        except Exception as e:
-            logger.error(f"❌ WebSocket emit hatası: {str(e)}")
+        OutboxService.publish(outbox_events)
         
         return request_obj
     
@@ -564,14 +498,15 @@ class RequestService:
         )
         
         # Notify relevant parties
-        socketio.emit('request_cancelled', {
-            'request': request_obj.to_dict(),
+        request_data = request_obj.to_dict()
+        EmitRouter.emit('request_cancelled', {
+            'request': request_data,
             'reason': reason
-        }, room=f'request_{request_id}')
+        }, request_id=request_id, audiences=('guest',), emitter=socketio.emit)
         
-        socketio.emit('request_status_changed', {
-            'request': request_obj.to_dict()
-        }, room=f'hotel_{request_obj.hotel_id}_admin')
+        EmitRouter.emit('request_status_changed', {
+            'request': request_data
+        }, hotel_id=request_obj.hotel_id, emitter=socketio.emit)
         
         return request_obj
     
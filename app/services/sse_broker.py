@@ -0,0 +1,149 @@
+"""
+Buggy Call - SSE Broker
+Pub/sub fan-out for SSE events across gunicorn workers and nodes
+"""
+from flask import current_app
+from threading import Event, Lock, Thread
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSSEBroker:
+    """
+    In-process broker (single worker, development, tests)
+
+    publish() calls the subscribed handler inline, so delivery is
+    synchronous and the return value is the handler's delivery count.
+    """
+
+    inline = True  # publish() returns local deliveries
+
+    def __init__(self):
+        self._handler = None
+
+    def publish(self, message):
+        """
+        Publish a message
+
+        Returns:
+            int: Number of local SSE queues the message was delivered to
+        """
+        if self._handler is None:
+            return 0  # no stream served by this process yet
+        return self._handler(message) or 0
+
+    def subscribe(self, handler):
+        """Register this process's delivery handler (idempotent)"""
+        self._handler = handler
+
+    def close(self):
+        self._handler = None
+
+
+class RedisSSEBroker:
+    """
+    Redis pub/sub broker
+
+    Every worker that serves SSE streams subscribes once, on a single
+    background listener thread, and fans each message out to its own local
+    queues. Publishing is one PUBLISH regardless of how many workers or
+    drivers there are. Messages published while a listener is reconnecting
+    are lost (SSE is best effort; Socket.IO and polling cover the gap).
+    """
+
+    inline = False  # delivery happens asynchronously in each worker
+
+    RECONNECT_DELAY = 1.0  # seconds, doubled up to RECONNECT_DELAY_MAX
+    RECONNECT_DELAY_MAX = 30.0
+
+    def __init__(self, url, channel):
+        import redis  # optional dependency, only needed in multi-worker mode
+        self._client = redis.from_url(url)
+        self._channel = channel
+        self._handler = None
+        self._listener = None
+        self._stop = Event()
+
+    def publish(self, message):
+        """
+        Publish a message to all workers
+
+        Returns:
+            int: Number of subscribed workers that received it
+        """
+        return self._client.publish(self._channel, json.dumps(message))
+
+    def subscribe(self, handler):
+        """Start this worker's listener thread (idempotent)"""
+        self._handler = handler
+        if self._listener is not None and self._listener.is_alive():
+            return
+        self._stop.clear()
+        self._listener = Thread(target=self._listen, name='sse-broker-listener', daemon=True)
+        self._listener.start()
+
+    def close(self):
+        self._stop.set()
+
+    def _listen(self):
+        delay = self.RECONNECT_DELAY
+        while not self._stop.is_set():
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self._channel)
+                logger.info(f"✅ SSE broker subscribed to '{self._channel}'")
+                delay = self.RECONNECT_DELAY
+                while not self._stop.is_set():
+                    item = pubsub.get_message(timeout=1.0)
+                    if item is None or item.get('type') != 'message':
+                        continue
+                    try:
+                        self._handler(json.loads(item['data']))
+                    except Exception as e:
+                        logger.error(f"❌ SSE broker delivery error: {str(e)}")
+            except Exception as e:
+                logger.warning(f"⚠️ SSE broker connection lost, retrying in {delay:.0f}s: {str(e)}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.RECONNECT_DELAY_MAX)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+class SSEBroker:
+    """
+    Process-wide broker selection
+
+    SSE_BROKER_URL set (defaults to REDIS_URL) -> RedisSSEBroker,
+    otherwise LocalSSEBroker.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    @classmethod
+    def get(cls):
+        """Get (or create) this process's broker from current_app config"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    url = current_app.config.get('SSE_BROKER_URL')
+                    if url:
+                        channel = current_app.config.get('SSE_BROKER_CHANNEL', 'buggycall:sse')
+                        cls._instance = RedisSSEBroker(url, channel)
+                        logger.info(f"✅ SSE broker: redis ({channel})")
+                    else:
+                        cls._instance = LocalSSEBroker()
+        return cls._instance
+
+    @classmethod
+    def reset(cls, broker=None):
+        """Replace the process broker (tests) - closes the current one"""
+        with cls._lock:
+            if cls._instance is not None:
+                cls._instance.close()
+            cls._instance = broker
@@ -0,0 +1,182 @@
+"""
+Buggy Call - Background Task Executor
+One bounded worker pool for short fire-and-forget tasks (disconnect and
+logout cleanup), running in the existing app's context
+"""
+from flask import current_app, has_app_context
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from app import db
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTaskExecutor:
+    """
+    Shared background task pool
+
+    Tasks run on at most WORKERS threads inside an app context of the app
+    that submitted them (no create_app() per task). At most MAX_QUEUE tasks
+    may wait; beyond that the caller runs the task itself, so cleanup work
+    is never dropped. With BACKGROUND_TASKS_INLINE (tests) every task runs
+    synchronously.
+    """
+
+    # Defaults (overridable via app.config)
+    WORKERS = 4
+    MAX_QUEUE = 200
+
+    _app = None
+    _executor = None
+    _inline = False
+    _lock = Lock()
+    _pending = 0
+    _stats = {}
+
+    @classmethod
+    def init_app(cls, app):
+        """Configure from app.config (the pool itself starts lazily)"""
+        cls._app = app
+        cls.WORKERS = int(app.config.get('BACKGROUND_TASK_WORKERS', cls.WORKERS))
+        cls.MAX_QUEUE = int(app.config.get('BACKGROUND_TASK_QUEUE_MAX', cls.MAX_QUEUE))
+        cls._inline = bool(app.config.get('BACKGROUND_TASKS_INLINE', False))
+        if not cls._stats:
+            cls._reset_stats()
+
+    @classmethod
+    def _get_executor(cls):
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(
+                        max_workers=cls.WORKERS,
+                        thread_name_prefix='background-task'
+                    )
+                    logger.info(f"Background task pool started ({cls.WORKERS} workers)")
+        return cls._executor
+
+    @classmethod
+    def submit(cls, func, *args, name=None, **kwargs):
+        """
+        Run func(*args, **kwargs) in the background, in an app context
+
+        Args:
+            func: Task callable
+            name: Task name for logs/metrics (default: func.__name__)
+
+        Returns:
+            bool: True if queued, False if it ran inline (inline mode or queue full)
+        """
+        name = name or func.__name__
+        app = current_app._get_current_object() if has_app_context() else cls._app
+        if app is None:
+            raise RuntimeError('BackgroundTaskExecutor.init_app() has not been called')
+
+        with cls._lock:
+            full = cls._pending >= cls.MAX_QUEUE
+            if not (cls._inline or full):
+                cls._pending += 1
+                cls._stats['max_depth'] = max(cls._stats['max_depth'], cls._pending)
+            cls._stats['submitted'] += 1
+            if full and not cls._inline:
+                cls._stats['caller_runs'] += 1
+
+        if cls._inline or full:
+            if full:
+                logger.warning(f"⚠️ Background task queue full ({cls.MAX_QUEUE}), running {name} inline")
+            cls._run(app, name, time.monotonic(), func, args, kwargs, queued=False)
+            return False
+
+        try:
+            cls._get_executor().submit(cls._run, app, name, time.monotonic(), func, args, kwargs)
+        except RuntimeError:
+            # Pool shut down (process exiting) - run here
+            with cls._lock:
+                cls._pending -= 1
+            cls._run(app, name, time.monotonic(), func, args, kwargs, queued=False)
+            return False
+        return True
+
+    @classmethod
+    def _run(cls, app, name, submitted_at, func, args, kwargs, queued=True):
+        started = time.monotonic()
+        if queued:
+            with cls._lock:
+                cls._pending -= 1
+        failed = False
+        try:
+            with app.app_context():
+                try:
+                    func(*args, **kwargs)
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            failed = True
+            logger.error(f"❌ Background task {name} failed: {str(e)}")
+        finally:
+            finished = time.monotonic()
+            cls._record(started - submitted_at, finished - started, failed)
+
+    @classmethod
+    def _record(cls, wait, run, failed):
+        with cls._lock:
+            stats = cls._stats
+            stats['failed' if failed else 'completed'] += 1
+            stats['wait_total'] += wait
+            stats['run_total'] += run
+            stats['wait_max'] = max(stats['wait_max'], wait)
+            stats['run_max'] = max(stats['run_max'], run)
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Queue depth and latency metrics
+
+        Returns:
+            dict: queue_depth, max_depth, submitted/completed/failed/caller_runs counters,
+                  avg/max queue wait and run time in ms
+        """
+        with cls._lock:
+            stats = dict(cls._stats)
+            depth = cls._pending
+        done = stats['completed'] + stats['failed']
+        return {
+            'workers': cls.WORKERS,
+            'queue_depth': depth,
+            'queue_max': cls.MAX_QUEUE,
+            'max_depth': stats['max_depth'],
+            'submitted': stats['submitted'],
+            'completed': stats['completed'],
+            'failed': stats['failed'],
+            'caller_runs': stats['caller_runs'],
+            'avg_wait_ms': round(stats['wait_total'] / done * 1000, 2) if done else 0.0,
+            'max_wait_ms': round(stats['wait_max'] * 1000, 2),
+            'avg_run_ms': round(stats['run_total'] / done * 1000, 2) if done else 0.0,
+            'max_run_ms': round(stats['run_max'] * 1000, 2)
+        }
+
+    @classmethod
+    def _reset_stats(cls):
+        cls._stats = {
+            'submitted': 0, 'completed': 0, 'failed': 0, 'caller_runs': 0, 'max_depth': 0,
+            'wait_total': 0.0, 'wait_max': 0.0, 'run_total': 0.0, 'run_max': 0.0
+        }
+
+    @classmethod
+    def reset(cls):
+        """Stop the pool and clear metrics (tests)"""
+        cls.shutdown()
+        with cls._lock:
+            cls._pending = 0
+            cls._reset_stats()
+
+    @classmethod
+    def shutdown(cls, wait=True):
+        """Stop the pool, finishing queued tasks"""
+        with cls._lock:
+            executor, cls._executor = cls._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
+            logger.info("Background task pool shut down")
@@ -16,40 +16,23 @@ TIMEOUT_DURATION = timedelta(hours=1)
 def check_and_timeout_requests():
     """
     Check for PENDING requests older than 1 hour and mark them as unanswered
+    Full sweep (backstop for RequestExpiryService timers), one set-based UPDATE
     Returns: Number of requests timed out
     """
+    from app.models import get_current_timestamp
+    from app.services.request_expiry_service import RequestExpiryService
+
     try:
-        # Calculate timeout threshold
-        timeout_threshold = datetime.utcnow() - TIMEOUT_DURATION
+        # requested_at is Cyprus local time
+        now = get_current_timestamp()
+        timeout_threshold = now - TIMEOUT_DURATION
         
-        # Find PENDING requests older than 1 hour
-        PENDING_requests = BuggyRequest.query.filter(
+        request_ids = [request_id for (request_id,) in db.session.query(BuggyRequest.id).filter(
             BuggyRequest.status == RequestStatus.PENDING,
             BuggyRequest.requested_at <= timeout_threshold
-        ).all()
-        
-        timeout_count = 0
-        
-        for request in PENDING_requests:
-            # Mark as unanswered
-            request.status = RequestStatus.UNANSWERED
-            request.timeout_at = datetime.utcnow()
-            
-            # Calculate response time (negative to indicate timeout)
-            if request.requested_at:
-                elapsed = datetime.utcnow() - request.requested_at
-                request.response_time = int(elapsed.total_seconds())
-            
-            timeout_count += 1
-            
-            logger.info(f"Request #{request.id} timed out after 1 hour (Location: {request.location.name if request.location else 'Unknown'})")
-        
-        # Commit changes
-        if timeout_count > 0:
-            db.session.commit()
-            logger.info(f"✅ Marked {timeout_count} request(s) as unanswered")
+        )]
         
-        return timeout_count
+        return RequestExpiryService.expire(request_ids, now)
         
     except Exception as e:
         db.session.rollback()
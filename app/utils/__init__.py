@@ -1,16 +1,19 @@
 """
 Buggy Call - Utils Package
 """
-from app.utils.decorators import require_role, require_login, validate_schema, handle_errors
+from app.utils.decorators import require_role, require_login, read_only, validate_schema, handle_errors
 from app.utils.helpers import RequestContext, APIResponse, Pagination, generate_unique_code
+from app.utils.principal import Principal, PrincipalCache
+from app.utils.driver_context import DriverContext, DriverContextResolver
 from app.utils.exceptions import (
     BuggyCallException, ValidationException, ResourceNotFoundException,
     UnauthorizedException, ForbiddenException, ConflictException, BusinessLogicException
 )
 
 __all__ = [
-    'require_role', 'require_login', 'validate_schema', 'handle_errors',
+    'require_role', 'require_login', 'read_only', 'validate_schema', 'handle_errors',
     'RequestContext', 'APIResponse', 'Pagination', 'generate_unique_code',
+    'Principal', 'PrincipalCache', 'DriverContext', 'DriverContextResolver',
     'BuggyCallException', 'ValidationException', 'ResourceNotFoundException',
     'UnauthorizedException', 'ForbiddenException', 'ConflictException', 'BusinessLogicException'
 ]
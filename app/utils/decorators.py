@@ -3,46 +3,49 @@ Buggy Call - Custom Decorators
 Performans optimize edilmiş decorator'lar
 """
 from functools import wraps
-from flask import session, redirect, url_for, flash, request, jsonify
+from flask import session, redirect, url_for, flash, request, jsonify, current_app
 from marshmallow import ValidationError
-from app import cache
-from app.models.user import SystemUser, UserRole
+from app.models.user import UserRole
+from app.utils.principal import PrincipalCache
 
 
-def get_current_user_cached():
+def get_current_principal():
     """
-    Cache'lenmiş user bilgisi al
+    Giriş yapmış kullanıcının principal'ı (id, role, hotel_id, is_active, buggy_id)
+    
+    Request başına en fazla bir kez çözülür (flask.g), istekler arası
+    kısa TTL'li cache'ten gelir - steady state'te DB sorgusu yok.
     
     Returns:
-        SystemUser veya None
+        Principal veya None
     """
-    user_id = session.get('user_id')
-    if not user_id:
-        return None
-    
-    # Cache'den kontrol et (60 saniye)
-    cache_key = f'user_{user_id}'
-    user = cache.get(cache_key)
+    return PrincipalCache.current()
+
+
+def get_current_user_cached():
+    """
+    Request boyunca tek SystemUser nesnesi (flask.g)
     
-    if not user:
-        # Cache'de yoksa DB'den çek
-        user = SystemUser.query.get(user_id)
-        if user:
-            # Cache'e kaydet
-            cache.set(cache_key, user, timeout=60)
+    ORM nesneleri istekler arası cache'lenmez (detached instance riski);
+    sadece yetki bilgisi gerekiyorsa get_current_principal() kullanın.
     
-    return user
+    Returns:
+        SystemUser veya None
+    """
+    return PrincipalCache.current_user()
 
 
 def invalidate_user_cache(user_id):
     """
-    User cache'ini temizle (user güncellendiğinde kullan)
+    User cache'ini temizle (session dışı güncellemelerde kullan)
+    
+    Commit edilen SystemUser / BuggyDriver değişiklikleri listener ile
+    otomatik temizlenir.
     
     Args:
         user_id: User ID
     """
-    cache_key = f'user_{user_id}'
-    cache.delete(cache_key)
+    PrincipalCache.invalidate(user_id)
 
 
 def login_required(fn):
@@ -55,7 +58,7 @@ def login_required(fn):
             flash('Lütfen giriş yapın', 'warning')
             return redirect(url_for('auth.login'))
         
-        user = get_current_user_cached()
+        user = get_current_principal()
         if not user:
             session.clear()
             if request.is_json:
@@ -77,7 +80,7 @@ def admin_required(fn):
             flash('Lütfen giriş yapın', 'warning')
             return redirect(url_for('auth.login'))
         
-        user = get_current_user_cached()  # ✅ Cache'den al
+        user = get_current_principal()  # ✅ Cache'den al
         if not user:
             session.clear()
             if request.is_json:
@@ -105,7 +108,7 @@ def driver_required(fn):
             flash('Lütfen giriş yapın', 'warning')
             return redirect(url_for('auth.login'))
         
-        user = get_current_user_cached()  # ✅ Cache'den al
+        user = get_current_principal()  # ✅ Cache'den al
         if not user:
             session.clear()
             if request.is_json:
@@ -172,6 +175,31 @@ def require_login(f):
     return decorated_function
 
 
+def read_only(f):
+    """
+    Decorator for read-only endpoints (polls)
+    
+    The handler's transaction is ended with ROLLBACK instead of a COMMIT:
+    nothing is written and the snapshot is released right away. Pending
+    ORM changes are discarded with a warning.
+    
+    Usage:
+        @read_only
+        def get_pending_requests():
+            ...
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        from app import db
+        try:
+            return f(*args, **kwargs)
+        finally:
+            if db.session.new or db.session.dirty or db.session.deleted:
+                current_app.logger.warning(f"⚠️ Read-only endpoint {f.__name__} left pending changes, discarded")
+            db.session.rollback()
+    return decorated_function
+
+
 def validate_schema(schema_class, location='json'):
     """
     Decorator to validate request data with Marshmallow schema
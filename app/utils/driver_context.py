@@ -0,0 +1,176 @@
+"""
+Buggy Call - Driver Context
+Resolves (user, buggy, association) for a driver once per request, from a
+cross-request cached id snapshot
+"""
+from typing import NamedTuple, Optional
+from flask import g, session, has_request_context, current_app
+from sqlalchemy import select, and_
+from app import db, cache
+from app.models.user import SystemUser, UserRole
+from app.models.buggy import Buggy
+from app.models.buggy_driver import BuggyDriver
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DriverContext(NamedTuple):
+    """A driver with their primary buggy and its BuggyDriver association"""
+    user: Optional[SystemUser]
+    buggy: Optional[Buggy]
+    association: Optional[BuggyDriver]
+
+
+class DriverSnapshot(NamedTuple):
+    """Ids of a driver's context (immutable, safe to cache across requests)"""
+    user_id: int
+    buggy_id: Optional[int]
+    association_id: Optional[int]
+
+
+EMPTY = DriverContext(None, None, None)
+
+
+class DriverContextResolver:
+    """
+    Driver context lookup: flask.g -> cached id snapshot -> one joined SELECT
+
+    Contexts hold live ORM objects, so they are memoized in flask.g and
+    never outlive the request. Across requests only a DriverSnapshot of ids
+    is cached (TTL); on a hit the objects are loaded by primary key. The
+    snapshot is dropped through PrincipalCache.invalidate(), i.e. on login,
+    logout and committed user / buggy assignment changes, which also clears
+    the request memo.
+    """
+
+    TTL = 60  # seconds, PRINCIPAL_CACHE_TTL overrides (same lifetime as the principal)
+
+    @classmethod
+    def current(cls):
+        """
+        Driver context for the session user
+
+        Returns:
+            DriverContext (all None when not logged in / user deleted)
+        """
+        user_id = session.get('user_id')
+        if not user_id:
+            return EMPTY
+        context = cls.resolve(user_id)
+        g.setdefault('_current_user', context.user)  # RequestContext.get_current_user() reuses it
+        return context
+
+    @classmethod
+    def for_user(cls, user):
+        """Driver context for an already loaded user (memoized per request)"""
+        if user.role != UserRole.DRIVER:
+            return DriverContext(user, None, None)
+        return cls.resolve(user.id)
+
+    @classmethod
+    def resolve(cls, user_id):
+        """
+        Driver context by user id (memoized per request)
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            DriverContext
+        """
+        if not has_request_context():
+            return cls.load(user_id)
+        contexts = g.setdefault('_driver_contexts', {})
+        context = contexts.get(user_id)
+        if context is None:
+            context = contexts[user_id] = cls.load(user_id)
+        return context
+
+    @staticmethod
+    def _key(user_id):
+        return f'driver_context_{user_id}'
+
+    @classmethod
+    def load(cls, user_id):
+        """
+        User, primary buggy and association with one SELECT (by primary key
+        when a snapshot is cached)
+        """
+        try:
+            snapshot = cache.get(cls._key(user_id))
+        except Exception as e:
+            logger.warning(f"⚠️ Driver context cache okunamadı: {str(e)}")
+            snapshot = None
+        if snapshot is not None:
+            context = cls._load_snapshot(snapshot)
+            if context is not None:
+                return context
+
+        context = cls._load_joined(user_id)
+        if context.user is not None:
+            snapshot = DriverSnapshot(
+                context.user.id,
+                context.buggy.id if context.buggy else None,
+                context.association.id if context.association else None
+            )
+            try:
+                cache.set(cls._key(user_id), snapshot,
+                          timeout=current_app.config.get('PRINCIPAL_CACHE_TTL', cls.TTL))
+            except Exception as e:
+                logger.warning(f"⚠️ Driver context cache yazılamadı: {str(e)}")
+        return context
+
+    @staticmethod
+    def _load_snapshot(snapshot):
+        """Objects of a cached snapshot by primary key (None if it no longer matches)"""
+        if snapshot.association_id is None:
+            user = db.session.get(SystemUser, snapshot.user_id)
+            return DriverContext(user, None, None) if user is not None else None
+
+        row = db.session.execute(
+            select(SystemUser, Buggy, BuggyDriver)
+            .join(BuggyDriver, BuggyDriver.driver_id == SystemUser.id)
+            .join(Buggy, Buggy.id == BuggyDriver.buggy_id)
+            .where(SystemUser.id == snapshot.user_id, BuggyDriver.id == snapshot.association_id)
+        ).first()
+        if row is None:
+            return None
+        user, buggy, association = row
+        if user.role != UserRole.DRIVER or buggy.id != snapshot.buggy_id or not association.is_primary:
+            return None  # changed behind the cache (bulk write), reload
+        return DriverContext(user, buggy, association)
+
+    @staticmethod
+    def _load_joined(user_id):
+        """User, primary buggy and association with one SELECT"""
+        row = db.session.execute(
+            select(SystemUser, Buggy, BuggyDriver)
+            .outerjoin(BuggyDriver, and_(BuggyDriver.driver_id == SystemUser.id,
+                                         BuggyDriver.is_primary.is_(True)))
+            .outerjoin(Buggy, Buggy.id == BuggyDriver.buggy_id)
+            .where(SystemUser.id == user_id)
+            .limit(1)
+        ).first()
+        if row is None:
+            return EMPTY
+        user, buggy, association = row
+        if user.role != UserRole.DRIVER:
+            return DriverContext(user, None, None)
+        return DriverContext(user, buggy, association)
+
+    @classmethod
+    def invalidate(cls, *user_ids):
+        """Drop cached snapshots and this request's memo (called by PrincipalCache.invalidate)"""
+        for user_id in user_ids:
+            try:
+                cache.delete(cls._key(user_id))
+            except Exception as e:
+                logger.warning(f"⚠️ Driver context cache temizlenemedi: {str(e)}")
+        cls.clear()
+
+    @staticmethod
+    def clear():
+        """Forget this request's memoized contexts"""
+        if has_request_context():
+            g.pop('_driver_contexts', None)
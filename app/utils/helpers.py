@@ -2,20 +2,33 @@
 Buggy Call - Helper Functions
 """
 from flask import session, jsonify
-from app.models.user import SystemUser
+from datetime import datetime
+from sqlalchemy import and_, or_
 from app.models.hotel import Hotel
+from app.utils.exceptions import ValidationException
+from app.utils.principal import PrincipalCache
+from app.utils.driver_context import DriverContextResolver
+import base64
+import json
 
 
 class RequestContext:
     """Helper class for request context"""
     
+    @staticmethod
+    def get_principal():
+        """Get current user's cached principal (no query in steady state)"""
+        return PrincipalCache.current()
+    
     @staticmethod
     def get_current_user():
-        """Get current logged-in user"""
-        user_id = session.get('user_id')
-        if user_id:
-            return SystemUser.query.get(user_id)
-        return None
+        """Get current logged-in user (loaded once per request)"""
+        return PrincipalCache.current_user()
+    
+    @staticmethod
+    def get_driver_context():
+        """Get current driver's (user, buggy, association), resolved once per request"""
+        return DriverContextResolver.current()
     
     @staticmethod
     def get_current_user_id():
@@ -25,17 +38,17 @@ class RequestContext:
     @staticmethod
     def get_current_hotel():
         """Get current user's hotel"""
-        user = RequestContext.get_current_user()
-        if user:
-            return user.hotel
+        principal = PrincipalCache.current()
+        if principal:
+            return Hotel.query.get(principal.hotel_id)
         return None
     
     @staticmethod
     def get_current_hotel_id():
         """Get current user's hotel ID"""
-        user = RequestContext.get_current_user()
-        if user:
-            return user.hotel_id
+        principal = PrincipalCache.current()
+        if principal:
+            return principal.hotel_id
         return None
     
     @staticmethod
@@ -147,6 +160,81 @@ class Pagination:
             'has_next': page < pages
         }
 
+    @staticmethod
+    def keyset(query, columns, cursor=None, limit=50, max_limit=100):
+        """
+        Keyset (cursor) pagination, newest first
+
+        No COUNT(*) and no OFFSET scan: each page is an index range seek
+        starting after the previous page's last row, so page cost does not
+        grow with table size or page depth.
+
+        Args:
+            query: SQLAlchemy query object (filters applied, no ORDER BY)
+            columns: Unique sort key, e.g. (requested_at, id); ordered DESC
+            cursor: Opaque cursor from a previous page (None = first page)
+            limit: Items per page
+            max_limit: Maximum items per page
+
+        Returns:
+            Dictionary with items (model instances), next_cursor, has_more, limit
+
+        Raises:
+            ValidationException: Malformed cursor
+        """
+        limit = max(1, min(limit, max_limit))
+
+        if cursor:
+            values = Pagination.decode_cursor(cursor, columns)
+            # (a, b) < (x, y) açılmış hali - MySQL row constructor'da index kullanmıyor
+            conditions = []
+            for index, column in enumerate(columns):
+                equal_prefix = [columns[i] == values[i] for i in range(index)]
+                conditions.append(and_(*equal_prefix, column < values[index]))
+            query = query.filter(or_(*conditions))
+
+        # Bir fazla satır: sonraki sayfa var mı?
+        rows = query.order_by(*[column.desc() for column in columns]).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        items = rows[:limit]
+
+        next_cursor = None
+        if has_more:
+            last = items[-1]
+            next_cursor = Pagination.encode_cursor([getattr(last, column.key) for column in columns])
+
+        return {
+            'items': items,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'limit': limit
+        }
+
+    @staticmethod
+    def encode_cursor(values):
+        """Encode sort key values as an opaque URL-safe cursor"""
+        payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+        raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor, columns):
+        """Decode a cursor produced by encode_cursor() for the given columns"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(raw.decode('utf-8'))
+            if not isinstance(payload, list) or len(payload) != len(columns):
+                raise ValueError('cursor length')
+            values = []
+            for value, column in zip(payload, columns):
+                if column.type.python_type is datetime:
+                    values.append(datetime.fromisoformat(value))
+                else:
+                    values.append(column.type.python_type(value))
+            return values
+        except (ValueError, TypeError, UnicodeDecodeError, NotImplementedError):
+            raise ValidationException('Geçersiz sayfa imleci (cursor)')
+
 
 def generate_unique_code(prefix='', length=8):
     """Generate a unique code"""
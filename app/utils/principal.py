@@ -0,0 +1,179 @@
+"""
+Buggy Call - Authenticated Principal
+Request-scoped (flask.g) and short-TTL cross-request cache of the logged-in
+user's auth facts
+"""
+from typing import NamedTuple, Optional
+from flask import g, session, has_request_context, current_app
+from sqlalchemy import event, select, and_, inspect
+from app import db, cache
+from app.models.user import SystemUser, UserRole
+from app.models.buggy_driver import BuggyDriver
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Principal(NamedTuple):
+    """Immutable snapshot of the logged-in user (safe to cache across requests)"""
+    id: int
+    role: UserRole
+    hotel_id: int
+    is_active: bool
+    buggy_id: Optional[int]
+
+    @property
+    def is_admin(self):
+        return self.role == UserRole.ADMIN
+
+    @property
+    def is_driver(self):
+        return self.role == UserRole.DRIVER
+
+
+class PrincipalCache:
+    """
+    Principal lookup: flask.g -> Flask-Caching (TTL) -> one SELECT
+
+    Snapshots are plain tuples, so nothing detached or session-bound is
+    shared between requests. Committed changes to a SystemUser or to a
+    driver's BuggyDriver rows drop the cached snapshot; the TTL bounds
+    staleness for writes that bypass the session (bulk UPDATEs, other
+    processes on a per-process cache).
+    """
+
+    TTL = 60  # seconds
+
+    _listeners_registered = False
+
+    @staticmethod
+    def _key(user_id):
+        return f'principal_{user_id}'
+
+    @classmethod
+    def current(cls):
+        """
+        Principal for the session user, loaded at most once per request
+
+        Returns:
+            Principal or None (not logged in / user deleted)
+        """
+        if '_principal' in g:
+            return g._principal
+        user_id = session.get('user_id')
+        g._principal = cls.get(user_id) if user_id else None
+        return g._principal
+
+    @classmethod
+    def current_user(cls):
+        """
+        SystemUser ORM object for the session user, loaded at most once per
+        request (for handlers that modify or serialize the user)
+
+        Returns:
+            SystemUser or None
+        """
+        if '_current_user' in g:
+            return g._current_user
+        user_id = session.get('user_id')
+        g._current_user = db.session.get(SystemUser, user_id) if user_id else None
+        return g._current_user
+
+    @classmethod
+    def get(cls, user_id):
+        """
+        Cached principal for a user (one query on a miss)
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Principal or None
+        """
+        key = cls._key(user_id)
+        try:
+            principal = cache.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Principal cache okunamadı: {str(e)}")
+            principal = None
+        if principal is not None:
+            return principal
+
+        principal = cls.load(user_id)
+        if principal is not None:
+            try:
+                cache.set(key, principal, timeout=current_app.config.get('PRINCIPAL_CACHE_TTL', cls.TTL))
+            except Exception as e:
+                logger.warning(f"⚠️ Principal cache yazılamadı: {str(e)}")
+        return principal
+
+    @staticmethod
+    def load(user_id):
+        """Build a principal with one SELECT (user + primary buggy association)"""
+        row = db.session.execute(
+            select(
+                SystemUser.id, SystemUser.role, SystemUser.hotel_id, SystemUser.is_active,
+                BuggyDriver.buggy_id
+            )
+            .outerjoin(BuggyDriver, and_(BuggyDriver.driver_id == SystemUser.id,
+                                         BuggyDriver.is_primary.is_(True)))
+            .where(SystemUser.id == user_id)
+            .limit(1)
+        ).first()
+        if row is None:
+            return None
+        user_id, role, hotel_id, is_active, buggy_id = row
+        return Principal(
+            id=user_id,
+            role=role,
+            hotel_id=hotel_id,
+            is_active=bool(is_active),
+            buggy_id=buggy_id if role == UserRole.DRIVER else None
+        )
+
+    @classmethod
+    def invalidate(cls, *user_ids):
+        """Drop cached principals (call after commit for writes the listeners miss)"""
+        from app.utils.driver_context import DriverContextResolver
+        for user_id in user_ids:
+            try:
+                cache.delete(cls._key(user_id))
+            except Exception as e:
+                logger.warning(f"⚠️ Principal cache temizlenemedi: {str(e)}")
+        DriverContextResolver.invalidate(*user_ids)  # snapshot + request memo
+        if has_request_context():
+            g.pop('_principal', None)
+
+    # ==================== LIFECYCLE EVENTS ====================
+
+    @classmethod
+    def register_listeners(cls):
+        """Invalidate on committed user / buggy assignment changes (idempotent)"""
+        if cls._listeners_registered:
+            return
+        event.listen(db.session, 'after_flush', cls._after_flush)
+        event.listen(db.session, 'after_commit', cls._after_commit)
+        event.listen(db.session, 'after_rollback', cls._after_rollback)
+        cls._listeners_registered = True
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        user_ids = session.info.setdefault('principal_user_ids', set())
+        for obj in list(session.dirty) + list(session.deleted):
+            if isinstance(obj, SystemUser):
+                user_ids.add(obj.id)
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, BuggyDriver):
+                user_ids.update(d for d in inspect(obj).attrs.driver_id.history.deleted if d)
+                if obj.driver_id:
+                    user_ids.add(obj.driver_id)
+
+    @classmethod
+    def _after_commit(cls, session):
+        user_ids = session.info.pop('principal_user_ids', None)
+        if user_ids:
+            cls.invalidate(*user_ids)
+
+    @staticmethod
+    def _after_rollback(session):
+        session.info.pop('principal_user_ids', None)
@@ -0,0 +1,150 @@
+"""
+Delayed Retry Scheduler
+Runs callables after a delay on a single background worker (heap-ordered),
+so callers never sleep between retry attempts
+"""
+import heapq
+import itertools
+import logging
+import time
+from threading import Condition, Event, Thread
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+
+class PendingRetry:
+    """
+    Outcome of an operation that failed once and has a retry scheduled
+
+    Falsy, so `if result:` callers never count it as done; check
+    isinstance(result, PendingRetry) to tell "scheduled" from "failed" and
+    wait() for the final outcome.
+    """
+
+    def __init__(self, error=None):
+        self.error = error
+        self._done = Event()
+        self._result = None
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        state = 'pending' if not self._done.is_set() else ('succeeded' if self._result else 'failed')
+        return f'<PendingRetry {state}>'
+
+    def resolve(self, result):
+        """Record the final outcome (called by the last retry attempt)"""
+        self._result = bool(result)
+        self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the retries finish
+
+        Returns:
+            bool: Final outcome, or None if still pending after timeout
+        """
+        if not self._done.wait(timeout):
+            return None
+        return self._result
+
+
+class RetryScheduler:
+    """
+    Heap based delayed task scheduler
+
+    Usage:
+        RetryScheduler.schedule(2.0, send_again, token)
+
+    Tasks scheduled inside an app context run inside that app's context.
+    """
+
+    _heap = []  # (due_monotonic, seq, app, func, args, kwargs)
+    _cond = Condition()
+    _seq = itertools.count()
+    _thread = None
+    _active = 0
+    _stats = {'scheduled': 0, 'executed': 0, 'errors': 0}
+
+    @classmethod
+    def schedule(cls, delay, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) after `delay` seconds
+
+        Args:
+            delay: Seconds to wait before running
+            func: Callable to run on the scheduler worker
+        """
+        app = current_app._get_current_object() if has_app_context() else None
+        with cls._cond:
+            heapq.heappush(cls._heap, (time.monotonic() + max(delay, 0), next(cls._seq), app, func, args, kwargs))
+            cls._stats['scheduled'] += 1
+            cls._ensure_worker()
+            cls._cond.notify_all()
+
+    @classmethod
+    def _ensure_worker(cls):
+        """Start the worker thread (caller holds the lock)"""
+        if cls._thread is None or not cls._thread.is_alive():
+            cls._thread = Thread(target=cls._run, name='retry-scheduler', daemon=True)
+            cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        while True:
+            with cls._cond:
+                while not cls._heap:
+                    cls._cond.wait()
+                wait = cls._heap[0][0] - time.monotonic()
+                if wait > 0:
+                    cls._cond.wait(wait)
+                    continue
+                _, _, app, func, args, kwargs = heapq.heappop(cls._heap)
+                cls._active += 1
+
+            try:
+                if app is not None:
+                    with app.app_context():
+                        try:
+                            func(*args, **kwargs)
+                        finally:
+                            from app import db
+                            db.session.remove()
+                else:
+                    func(*args, **kwargs)
+                outcome = 'executed'
+            except Exception as e:
+                logger.error(f"Retry task {getattr(func, '__name__', func)} failed: {str(e)}")
+                outcome = 'errors'
+
+            with cls._cond:
+                cls._active -= 1
+                cls._stats[outcome] += 1
+                cls._cond.notify_all()
+
+    @classmethod
+    def wait_until_idle(cls, timeout=None):
+        """
+        Block until no task is pending or running
+
+        Returns:
+            bool: True if idle, False on timeout
+        """
+        with cls._cond:
+            return cls._cond.wait_for(lambda: not cls._heap and cls._active == 0, timeout)
+
+    @classmethod
+    def get_stats(cls):
+        """Get pending count and outcome counters"""
+        with cls._cond:
+            stats = dict(cls._stats)
+            stats['pending'] = len(cls._heap)
+            stats['running'] = cls._active
+            stats['next_due_in'] = round(max(cls._heap[0][0] - time.monotonic(), 0), 2) if cls._heap else None
+        return stats
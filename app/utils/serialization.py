@@ -0,0 +1,84 @@
+"""
+Buggy Call - JSON Serialization
+Fast Flask JSON provider (orjson) with Flask-compatible output
+"""
+from flask.json.provider import DefaultJSONProvider
+import decimal
+import enum
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib provider
+    orjson = None
+
+
+def _default(o):
+    """Types orjson (and the stdlib encoder) do not handle natively"""
+    if isinstance(o, enum.Enum):
+        return o.value
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    # datetime/date -> RFC 822 (Flask default), dataclass, __html__ ...
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson
+
+    Encodes in C instead of the stdlib json module. Output matches the
+    default provider: sorted keys, compact outside debug, datetimes as
+    RFC 822 strings (models already send pre-formatted ISO strings),
+    Decimal as string. Enums are encoded by value. Non-ASCII text is
+    written as UTF-8 instead of \\u escapes.
+
+    Without orjson, or for values orjson rejects (e.g. integers beyond
+    64 bits), it falls back to the stdlib encoder.
+    """
+
+    default = staticmethod(_default)
+
+    def _options(self, indent=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _dumps_bytes(self, obj, indent=False):
+        """orjson bytes, or None when the stdlib encoder has to take over"""
+        if orjson is None:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except orjson.JSONEncodeError:
+            # Stdlib tekrar dener: geçerli değerleri yazar, desteklenmeyen tipte aynı TypeError'ı verir
+            return None
+
+    def dumps(self, obj, **kwargs):
+        """Serialize to str (custom json.dumps kwargs use the stdlib encoder)"""
+        if not kwargs:
+            data = self._dumps_bytes(obj)
+            if data is not None:
+                return data.decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        """Deserialize from str or bytes"""
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # stdlib raises the familiar json.JSONDecodeError
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """jsonify(): encode straight to bytes, no str round trip"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+
+        data = self._dumps_bytes(obj, indent=indent)
+        if data is None:
+            return super().response(obj)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
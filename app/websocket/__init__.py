@@ -10,9 +10,8 @@ NOT: Event handler'lar events.py'dedir.
 from flask_socketio import emit, join_room, leave_room
 from flask import session, request
 from app import socketio
+from app.websocket.throttle import EmitThrottle
 import logging
-import time
-from collections import deque, defaultdict
 from threading import Lock
 
 logger = logging.getLogger(__name__)
@@ -22,14 +21,7 @@ CONNECTED_GUESTS = {}
 GUEST_LOCK = Lock()
 
 # Performance Optimization: Throttling & Queue Management
-# Max 10 events per second per room
-THROTTLE_LIMIT = 10
-THROTTLE_WINDOW = 1.0  # seconds
-
-# Event queues and throttle tracking
-event_queues = defaultdict(deque)
-throttle_counters = defaultdict(lambda: {'count': 0, 'window_start': time.time()})
-queue_lock = Lock()
+# Per-room token bucket + coalescing queue -> app/websocket/throttle.py (EmitThrottle)
 
 
 @socketio.on('join_room')
@@ -105,88 +97,34 @@ def handle_join_hotel(data):
         logger.error(f"   Exception details: {str(e)}")
 
 
-def throttled_emit(event_name, data, room=None, broadcast=False):
+def throttled_emit(event_name, data, room=None, broadcast=False, key=None):
     """
-    Throttled emit with queue management
-    Max 10 events per second per room
+    Throttled emit with coalescing queue (see EmitThrottle)
+    Max EMIT_THROTTLE_RATE events per second per room, shared across workers
     
     Args:
         event_name: Event name
         data: Event data
         room: Room name (optional)
-        broadcast: Broadcast to all (default: False)
-    """
-    room_key = room or 'global'
+        broadcast: Broadcast to all when no room is given (default: False)
+        key: Coalescing key (default: (event, buggy_id/request_id))
     
-    with queue_lock:
-        current_time = time.time()
-        throttle_data = throttle_counters[room_key]
-        
-        # Reset counter if window expired
-        if current_time - throttle_data['window_start'] >= THROTTLE_WINDOW:
-            throttle_data['count'] = 0
-            throttle_data['window_start'] = current_time
-        
-        # Check if under throttle limit
-        if throttle_data['count'] < THROTTLE_LIMIT:
-            # Send immediately
-            throttle_data['count'] += 1
-            emit(event_name, data, room=room, broadcast=broadcast)
-            logger.debug(f"📤 Emitted {event_name} to {room_key} (count: {throttle_data['count']})")
-        else:
-            # Queue for later
-            event_queues[room_key].append({
-                'event': event_name,
-                'data': data,
-                'room': room,
-                'broadcast': broadcast,
-                'queued_at': current_time
-            })
-            logger.warning(f"⏳ Queued {event_name} for {room_key} (throttle limit reached)")
+    Returns:
+        bool: True if emitted immediately, False if queued
+    """
+    if room is None and not broadcast:
+        # Sadece gönderen istemciye - throttle/kuyruk gerekmez
+        emit(event_name, data)
+        return True
+    return EmitThrottle.emit(event_name, data, room=room, key=key)
 
 
 def process_event_queues():
     """
-    Process queued events (called periodically)
-    Should be called from a background task
+    Process queued events (safety net; EmitThrottle drains on its own while
+    events are queued)
     """
-    with queue_lock:
-        current_time = time.time()
-        
-        for room_key, queue in list(event_queues.items()):
-            if not queue:
-                continue
-            
-            throttle_data = throttle_counters[room_key]
-            
-            # Reset counter if window expired
-            if current_time - throttle_data['window_start'] >= THROTTLE_WINDOW:
-                throttle_data['count'] = 0
-                throttle_data['window_start'] = current_time
-            
-            # Process queued events
-            processed = 0
-            while queue and throttle_data['count'] < THROTTLE_LIMIT:
-                event_data = queue.popleft()
-                
-                # Check if event is too old (> 5 seconds)
-                if current_time - event_data['queued_at'] > 5.0:
-                    logger.warning(f"⚠️ Dropped stale event {event_data['event']} for {room_key}")
-                    continue
-                
-                # Emit event
-                emit(
-                    event_data['event'],
-                    event_data['data'],
-                    room=event_data['room'],
-                    broadcast=event_data['broadcast']
-                )
-                
-                throttle_data['count'] += 1
-                processed += 1
-            
-            if processed > 0:
-                logger.info(f"✅ Processed {processed} queued events for {room_key}")
+    EmitThrottle.drain()
 
 
 def get_throttle_stats():
@@ -194,17 +132,9 @@ def get_throttle_stats():
     Get throttling statistics for monitoring
     
     Returns:
-        dict: Throttle stats per room
+        dict: Throttle stats per room and totals
     """
-    with queue_lock:
-        stats = {}
-        for room_key in set(list(throttle_counters.keys()) + list(event_queues.keys())):
-            stats[room_key] = {
-                'current_count': throttle_counters[room_key]['count'],
-                'queued_events': len(event_queues[room_key]),
-                'window_start': throttle_counters[room_key]['window_start']
-            }
-        return stats
+    return EmitThrottle.get_stats()
 
 
 @socketio.on('guest_connected')
@@ -0,0 +1,122 @@
+"""
+Buggy Call - Emit Router
+Resolves the tenant-scoped Socket.IO rooms for each event type and emits
+once to all of them; unscoped (all clients) broadcasts are rejected
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Audience -> room (every room is scoped to a hotel, a request or a user)
+AUDIENCE_ROOMS = {
+    'guest': ('request_id', 'request_{request_id}'),
+    'drivers': ('hotel_id', 'hotel_{hotel_id}_drivers'),
+    'admin': ('hotel_id', 'hotel_{hotel_id}_admin'),
+    'user': ('user_id', 'user_{user_id}'),
+}
+
+# Event -> default audiences
+EVENT_AUDIENCES = {
+    'new_request': ('drivers', 'admin'),
+    'request_accepted': ('guest', 'drivers', 'admin'),
+    'request_taken': ('drivers',),
+    'request_completed': ('guest', 'drivers', 'admin'),
+    'request_cancelled': ('guest', 'drivers'),
+    'request_status_changed': ('admin',),
+    'request_timeout': ('guest', 'drivers', 'admin'),
+    'buggy_status_changed': ('admin',),
+    'buggy_status_update': ('admin',),
+    'force_logout': ('user',),
+}
+
+
+class UnscopedEmitError(ValueError):
+    """Emit without a hotel/request/user room (would reach every tenant)"""
+
+
+class EmitRouter:
+    """
+    Central tenant-scoped emitter
+
+    An event goes to the union of the event's audience rooms in a single
+    socketio.emit call: python-socketio encodes the packet once and sends
+    it once per connected client, even if a client is in several of the
+    rooms.
+    """
+
+    @staticmethod
+    def resolve(event_name, hotel_id=None, request_id=None, user_id=None, audiences=None):
+        """
+        Get the rooms an event goes to
+
+        Args:
+            event_name: Event name
+            hotel_id: Hotel scope (drivers/admin rooms)
+            request_id: Request scope (guest room)
+            user_id: User scope (personal room)
+            audiences: Override EVENT_AUDIENCES for this emit
+
+        Returns:
+            list: Room names
+
+        Raises:
+            UnscopedEmitError: Unknown event without audiences, or a required scope id is missing
+        """
+        if audiences is None:
+            audiences = EVENT_AUDIENCES.get(event_name)
+        if not audiences:
+            raise UnscopedEmitError(f"No audiences for '{event_name}' (unscoped broadcasts are not allowed)")
+
+        scope = {'hotel_id': hotel_id, 'request_id': request_id, 'user_id': user_id}
+        rooms = []
+        for audience in audiences:
+            if audience not in AUDIENCE_ROOMS:
+                raise UnscopedEmitError(f"Unknown audience '{audience}' for '{event_name}'")
+            field, template = AUDIENCE_ROOMS[audience]
+            if scope[field] is None:
+                raise UnscopedEmitError(f"'{event_name}' to {audience} needs {field}")
+            room = template.format(**scope)
+            if room not in rooms:
+                rooms.append(room)
+        return rooms
+
+    @staticmethod
+    def emit(event_name, data, hotel_id=None, request_id=None, user_id=None,
+             audiences=None, namespace='/', emitter=None):
+        """
+        Emit an event to its tenant-scoped rooms (one call, one encode)
+
+        Args:
+            event_name: Event name
+            data: Event payload
+            hotel_id / request_id / user_id: Scope ids used by the audiences
+            audiences: Override EVENT_AUDIENCES for this emit
+            namespace: Socket.IO namespace
+            emitter: Callable with socketio.emit's signature (default: app socketio)
+
+        Returns:
+            list: Rooms the event was sent to
+        """
+        rooms = EmitRouter.resolve(event_name, hotel_id, request_id, user_id, audiences)
+        return EmitRouter.emit_to_rooms(event_name, data, rooms, namespace, emitter)
+
+    @staticmethod
+    def emit_to_rooms(event_name, data, rooms, namespace='/', emitter=None):
+        """
+        Emit to explicit rooms in one call (None/empty rooms are rejected)
+
+        Returns:
+            list: Deduplicated rooms the event was sent to
+
+        Raises:
+            UnscopedEmitError: No room given
+        """
+        rooms = [room for room in dict.fromkeys(rooms or []) if room]
+        if not rooms:
+            raise UnscopedEmitError(f"'{event_name}' has no target room (unscoped broadcasts are not allowed)")
+        if emitter is None:
+            from app import socketio
+            emitter = socketio.emit
+        emitter(event_name, data, room=rooms if len(rooms) > 1 else rooms[0], namespace=namespace)
+        logger.debug(f"📡 {event_name} -> {rooms}")
+        return rooms
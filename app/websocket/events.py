@@ -72,12 +72,10 @@ def handle_disconnect():
     # Only audit/notifications go to background thread
     buggy_data = _update_driver_status_sync(user_id)
 
-    # ✅ Background thread only for non-critical tasks (audit, notifications)
+    # ✅ Shared background pool only for non-critical tasks (audit, notifications)
     if buggy_data:
-        from threading import Thread
-        Thread(target=_handle_driver_disconnect_async,
-               args=(user_id, buggy_data),
-               daemon=True).start()
+        from app.services.task_executor import BackgroundTaskExecutor
+        BackgroundTaskExecutor.submit(_handle_driver_disconnect_async, user_id, buggy_data)
         print(f'[DISCONNECT] Notifications queued in background for user {user_id}')
     else:
         print(f'[DISCONNECT] No active buggy for user {user_id}')
@@ -158,58 +156,46 @@ def _handle_driver_disconnect_async(user_id, buggy_data):
     ✅ RACE CONDITION FIX: Background notification and audit only
     Database already updated synchronously in _update_driver_status_sync
     This function only handles non-critical tasks: audit logs and WebSocket notifications
+    Runs on BackgroundTaskExecutor (app context + session cleanup handled there)
     """
     try:
-        from app import create_app
-        app = create_app()
-
-        # ✅ CRITICAL: Ensure proper session cleanup in background thread
-        with app.app_context():
-            # Log audit trail
-            AuditService.log_action(
-                action='driver_disconnected',
-                entity_type='buggy',
-                entity_id=buggy_data['buggy_id'],
-                user_id=user_id,
-                hotel_id=buggy_data['hotel_id'],
-                new_values={
-                    'reason': 'connection_lost',
-                    'buggy_code': buggy_data['buggy_code'],
-                    'driver_name': buggy_data['driver_name'],
-                    'status': 'offline'
-                }
-            )
-
-            # Emit WebSocket event to admin panel
-            from app import socketio
-            room_name = f'hotel_{buggy_data["hotel_id"]}_admin'
-            event_data = {
-                'buggy_id': buggy_data['buggy_id'],
+        # Log audit trail
+        AuditService.log_action(
+            action='driver_disconnected',
+            entity_type='buggy',
+            entity_id=buggy_data['buggy_id'],
+            user_id=user_id,
+            hotel_id=buggy_data['hotel_id'],
+            new_values={
+                'reason': 'connection_lost',
                 'buggy_code': buggy_data['buggy_code'],
-                'buggy_icon': buggy_data['buggy_icon'],
-                'driver_id': None,
-                'driver_name': None,
-                'location_name': None,
-                'status': 'offline',
-                'reason': 'connection_lost'
+                'driver_name': buggy_data['driver_name'],
+                'status': 'offline'
             }
+        )
+
+        # Emit WebSocket event to admin panel
+        room_name = f'hotel_{buggy_data["hotel_id"]}_admin'
+        event_data = {
+            'buggy_id': buggy_data['buggy_id'],
+            'buggy_code': buggy_data['buggy_code'],
+            'buggy_icon': buggy_data['buggy_icon'],
+            'driver_id': None,
+            'driver_name': None,
+            'location_name': None,
+            'status': 'offline',
+            'reason': 'connection_lost'
+        }
 
-            print(f'[DISCONNECT_ASYNC] Emitting buggy_status_changed to room: {room_name}')
-            socketio.emit('buggy_status_changed', event_data, room=room_name, namespace='/')
+        print(f'[DISCONNECT_ASYNC] Emitting buggy_status_changed to room: {room_name}')
+        socketio.emit('buggy_status_changed', event_data, room=room_name, namespace='/')
 
-            print(f'[DISCONNECT_ASYNC] ✅ Notifications sent for Buggy {buggy_data["buggy_code"]}')
+        print(f'[DISCONNECT_ASYNC] ✅ Notifications sent for Buggy {buggy_data["buggy_code"]}')
 
     except Exception as e:
         print(f'[DISCONNECT_ASYNC] Error sending notifications for user {user_id}: {str(e)}')
         import traceback
         traceback.print_exc()
-        # ✅ Session cleanup handled by app context manager
-    finally:
-        # ✅ Explicit cleanup for background thread
-        try:
-            db.session.remove()
-        except:
-            pass
 
 
 # ✅ REMOVED: Duplicate join_hotel handler (using the one in __init__.py instead)
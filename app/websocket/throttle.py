@@ -0,0 +1,351 @@
+"""
+Buggy Call - Socket.IO Emit Throttle
+Per-room token bucket (shared across workers via Redis) with latest-wins
+coalescing of queued events
+"""
+from flask import current_app
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Atomic token bucket: refill by elapsed time (Redis clock, no node skew), take one token
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return allowed
+"""
+
+# Payload fields identifying the entity an event describes (coalescing key)
+COALESCE_FIELDS = ('buggy_id', 'request_id')
+
+
+class LocalTokenBuckets:
+    """Per-process token buckets (single worker, tests, Redis fallback)"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # room -> [tokens, last refill]
+        self._lock = Lock()
+
+    def take(self, room):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(room, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[room] = (tokens, now)
+            return allowed
+
+    def tokens(self, room):
+        with self._lock:
+            state = self._buckets.get(room)
+        return state[0] if state else self.burst
+
+
+class RedisTokenBuckets:
+    """Token buckets in Redis, so the per-room limit holds across workers and nodes"""
+
+    KEY_PREFIX = 'emit_bucket:'
+
+    def __init__(self, url, rate, burst):
+        import redis  # optional dependency, only needed in multi-worker mode
+        self.rate = rate
+        self.burst = burst
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_TOKEN_BUCKET_LUA)
+        self._fallback = LocalTokenBuckets(rate, burst)
+        self._warned = False
+
+    def take(self, room):
+        try:
+            return bool(self._script(keys=[self.KEY_PREFIX + room], args=[self.rate, self.burst]))
+        except Exception as e:
+            # Redis yoksa worker-local limite düş (fail open, emit'ler durmasın)
+            if not self._warned:
+                logger.warning(f"⚠️ Emit throttle: Redis unavailable, using local buckets: {str(e)}")
+                self._warned = True
+            return self._fallback.take(room)
+
+    def tokens(self, room):
+        try:
+            value = self._client.hget(self.KEY_PREFIX + room, 'tokens')
+            return float(value) if value is not None else self.burst
+        except Exception:
+            return self._fallback.tokens(room)
+
+
+class EmitThrottle:
+    """
+    Throttled Socket.IO emits
+
+    Each room has a token bucket (EMIT_THROTTLE_RATE events/s, bursts of
+    EMIT_THROTTLE_BURST). Over the limit, events wait in a per-room queue
+    keyed by (event, entity id): a newer event for the same entity replaces
+    the queued one in place, so a burst of buggy_status_update for one buggy
+    collapses to a single message. Queues are capped per room and in total
+    (oldest dropped first). A drainer task runs only while something is
+    queued and releases events as tokens refill.
+    """
+
+    # Defaults (overridable via app.config)
+    RATE = 10.0  # events per second per room
+    BURST = 10
+    MAX_PER_ROOM = 100
+    MAX_TOTAL = 2000
+    STALE_AFTER = 5.0  # seconds
+
+    _buckets = None
+    _pending = {}  # room -> OrderedDict(key -> event)
+    _lock = Lock()
+    _sequence = count()
+    _drainer_running = False
+    _stats = {'emitted': 0, 'queued': 0, 'coalesced': 0, 'dropped': 0}
+
+    @classmethod
+    def _get_buckets(cls):
+        if cls._buckets is None:
+            with cls._lock:
+                if cls._buckets is None:
+                    config = current_app.config
+                    cls.RATE = float(config.get('EMIT_THROTTLE_RATE', cls.RATE))
+                    cls.BURST = int(config.get('EMIT_THROTTLE_BURST', cls.BURST))
+                    cls.MAX_PER_ROOM = int(config.get('EMIT_QUEUE_MAX_PER_ROOM', cls.MAX_PER_ROOM))
+                    cls.MAX_TOTAL = int(config.get('EMIT_QUEUE_MAX_TOTAL', cls.MAX_TOTAL))
+                    url = config.get('EMIT_THROTTLE_URL')
+                    if url:
+                        cls._buckets = RedisTokenBuckets(url, cls.RATE, cls.BURST)
+                    else:
+                        cls._buckets = LocalTokenBuckets(cls.RATE, cls.BURST)
+        return cls._buckets
+
+    @staticmethod
+    def coalesce_key(event_name, data):
+        """(event, entity id) for events describing one entity, else None"""
+        if isinstance(data, dict):
+            for field in COALESCE_FIELDS:
+                if data.get(field) is not None:
+                    return (event_name, field, data[field])
+        return None
+
+    @classmethod
+    def emit(cls, event_name, data, room=None, namespace='/', key=None, emitter=None):
+        """
+        Emit now if the room has a token and nothing queued, otherwise queue
+        (coalesced)
+
+        While a room has queued events, new ones go through the queue too, so
+        an older queued state can never be delivered after a newer one.
+
+        Args:
+            event_name: Event name
+            data: Event payload
+            room: Room name (None = all clients)
+            namespace: Socket.IO namespace
+            key: Coalescing key (default: coalesce_key(event_name, data))
+            emitter: Callable with socketio.emit's signature (default: app socketio)
+
+        Returns:
+            bool: True if emitted immediately
+        """
+        room_key = room or 'global'
+        buckets = cls._get_buckets()
+        if key is None:
+            key = cls.coalesce_key(event_name, data)
+        if key is None:
+            key = ('unique', next(cls._sequence))  # no entity: never coalesced
+
+        with cls._lock:
+            backlog = bool(cls._pending.get(room_key))
+        if not backlog and buckets.take(room_key):  # token outside the lock (Redis round trip)
+            with cls._lock:
+                queue = cls._pending.get(room_key)
+                raced = bool(queue) and key in queue  # older state for this entity queued meanwhile
+                if raced:
+                    queue[key].update(event=event_name, data=data, room=room,
+                                      namespace=namespace, emitter=emitter)
+                    cls._stats['coalesced'] += 1
+            if raced:
+                return False
+            cls._send(event_name, data, room, namespace, emitter)
+            return True
+
+        start_drainer = False
+        with cls._lock:
+            queue = cls._pending.setdefault(room_key, OrderedDict())
+            entry = {
+                'event': event_name,
+                'data': data,
+                'room': room,
+                'namespace': namespace,
+                'emitter': emitter,
+                'queued_at': time.monotonic()
+            }
+            if key in queue:
+                # Latest wins, keeps its place in line (no starvation)
+                entry['queued_at'] = queue[key]['queued_at']
+                queue[key] = entry
+                cls._stats['coalesced'] += 1
+            else:
+                queue[key] = entry
+                cls._stats['queued'] += 1
+                cls._enforce_caps(room_key)
+            if not cls._drainer_running:
+                cls._drainer_running = True
+                start_drainer = True
+
+        if start_drainer:
+            cls._start_drainer()
+        logger.debug(f"⏳ Queued {event_name} for {room_key} (throttle limit reached)")
+        return False
+
+    @classmethod
+    def _enforce_caps(cls, room_key):
+        """Drop oldest events beyond the per-room and total caps (lock held)"""
+        queue = cls._pending[room_key]
+        while len(queue) > cls.MAX_PER_ROOM:
+            queue.popitem(last=False)
+            cls._stats['dropped'] += 1
+        total = sum(len(q) for q in cls._pending.values())
+        while total > cls.MAX_TOTAL:
+            largest = max(cls._pending.values(), key=len)
+            largest.popitem(last=False)
+            cls._stats['dropped'] += 1
+            total -= 1
+
+    @classmethod
+    def drain(cls):
+        """
+        Release queued events the buckets allow now; drop stale ones
+
+        Returns:
+            int: Events still queued
+        """
+        now = time.monotonic()
+        # 1) Drop stale heads and note queue depths (lock held, no I/O)
+        with cls._lock:
+            depths = {}
+            for room_key, queue in list(cls._pending.items()):
+                while queue:
+                    key, entry = next(iter(queue.items()))
+                    if now - entry['queued_at'] <= cls.STALE_AFTER:
+                        break
+                    queue.popitem(last=False)
+                    cls._stats['dropped'] += 1
+                    logger.warning(f"⚠️ Dropped stale event {entry['event']} for {room_key}")
+                if queue:
+                    depths[room_key] = len(queue)
+                else:
+                    del cls._pending[room_key]
+
+        # 2) Take tokens outside the lock (Redis round trips)
+        granted = {}
+        for room_key, depth in depths.items():
+            tokens = 0
+            while tokens < depth and cls._buckets.take(room_key):
+                tokens += 1
+            if tokens:
+                granted[room_key] = tokens
+
+        # 3) Pop granted events from the front of each queue
+        ready = []
+        with cls._lock:
+            for room_key, tokens in granted.items():
+                queue = cls._pending.get(room_key)
+                while queue and tokens:
+                    ready.append(queue.popitem(last=False)[1])
+                    tokens -= 1
+                if queue is not None and not queue:
+                    del cls._pending[room_key]
+            remaining = sum(len(q) for q in cls._pending.values())
+
+        for entry in ready:
+            cls._send(entry['event'], entry['data'], entry['room'], entry['namespace'], entry['emitter'])
+        if ready:
+            logger.debug(f"✅ Processed {len(ready)} queued events")
+        return remaining
+
+    @classmethod
+    def _start_drainer(cls):
+        from app import socketio
+        try:
+            socketio.start_background_task(cls._drain_loop)
+        except Exception as e:
+            with cls._lock:
+                cls._drainer_running = False
+            logger.error(f"❌ Emit throttle drainer could not start: {str(e)}")
+
+    @classmethod
+    def _drain_loop(cls):
+        from app import socketio
+        interval = 1.0 / cls.RATE if cls.RATE > 0 else 0.1
+        while True:
+            socketio.sleep(interval)
+            try:
+                cls.drain()
+            except Exception as e:
+                logger.error(f"❌ Emit throttle drain error: {str(e)}")
+            with cls._lock:
+                if not cls._pending:
+                    cls._drainer_running = False
+                    return
+
+    @classmethod
+    def _send(cls, event_name, data, room, namespace, emitter=None):
+        if emitter is None:
+            from app import socketio
+            emitter = socketio.emit
+        emitter(event_name, data, room=room, namespace=namespace)
+        cls._stats['emitted'] += 1
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Throttle statistics for monitoring
+
+        Returns:
+            dict: Per-room queue depth/tokens and global counters
+        """
+        with cls._lock:
+            rooms = {room_key: len(queue) for room_key, queue in cls._pending.items()}
+            stats = dict(cls._stats)
+        buckets = cls._buckets
+        return {
+            'rooms': {
+                room_key: {
+                    'queued_events': depth,
+                    'tokens': buckets.tokens(room_key) if buckets else None
+                } for room_key, depth in rooms.items()
+            },
+            'totals': stats,
+            'rate': cls.RATE,
+            'burst': cls.BURST
+        }
+
+    @classmethod
+    def reset(cls):
+        """Forget buckets, queues and stats (tests)"""
+        with cls._lock:
+            cls._buckets = None
+            cls._pending = {}
+            cls._drainer_running = False
+            cls._stats = {'emitted': 0, 'queued': 0, 'coalesced': 0, 'dropped': 0}
@@ -0,0 +1,54 @@
+"""Add outbox_events table for transactional side effects
+
+Revision ID: 004
+Revises: perf_composite_idx_001
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = 'perf_composite_idx_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create outbox_events table"""
+    op.create_table(
+        'outbox_events',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('hotel_id', sa.Integer(), nullable=True),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('aggregate_type', sa.String(length=50), nullable=True),
+        sa.Column('aggregate_id', sa.Integer(), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    
+    op.create_index('ix_outbox_events_hotel_id', 'outbox_events', ['hotel_id'])
+    op.create_index('ix_outbox_events_event_type', 'outbox_events', ['event_type'])
+    op.create_index('ix_outbox_events_aggregate_id', 'outbox_events', ['aggregate_id'])
+    op.create_index('ix_outbox_events_status', 'outbox_events', ['status'])
+    # Used by the dispatcher: WHERE status = 'pending' AND available_at <= now
+    op.create_index('idx_outbox_status_available', 'outbox_events', ['status', 'available_at'])
+
+
+def downgrade():
+    """Drop outbox_events table"""
+    op.drop_index('idx_outbox_status_available', table_name='outbox_events')
+    op.drop_index('ix_outbox_events_status', table_name='outbox_events')
+    op.drop_index('ix_outbox_events_aggregate_id', table_name='outbox_events')
+    op.drop_index('ix_outbox_events_event_type', table_name='outbox_events')
+    op.drop_index('ix_outbox_events_hotel_id', table_name='outbox_events')
+    op.drop_table('outbox_events')
@@ -0,0 +1,67 @@
+"""Add request_hourly_rollups table for report pre-aggregation
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 12:00:00.000000
+
+After upgrading, fill the table once with:
+    python scripts/backfill_request_rollups.py
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+COUNTER_COLUMNS = (
+    'total_count',
+    'pending_count',
+    'accepted_count',
+    'completed_count',
+    'cancelled_count',
+    'unanswered_count',
+    'cancelled_by_driver_count',
+    'cancelled_by_guest_count',
+    'cancelled_by_admin_count',
+    'response_time_count',
+    'completion_time_count',
+)
+
+
+def upgrade():
+    """Create request_hourly_rollups table"""
+    op.create_table(
+        'request_hourly_rollups',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('hotel_id', sa.Integer(), nullable=False),
+        sa.Column('location_id', sa.Integer(), nullable=False),
+        sa.Column('buggy_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('driver_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('hour_start', sa.DateTime(), nullable=False),
+        *[
+            sa.Column(name, sa.Integer(), nullable=False, server_default='0')
+            for name in COUNTER_COLUMNS
+        ],
+        sa.Column('response_time_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('completion_time_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('hotel_id', 'location_id', 'buggy_id', 'driver_id', 'hour_start',
+                            name='uq_request_rollup_key')
+    )
+
+    op.create_index('ix_request_hourly_rollups_location_id', 'request_hourly_rollups', ['location_id'])
+    # Used by reports: WHERE hotel_id = ? AND hour_start BETWEEN ...
+    op.create_index('idx_request_rollup_hotel_hour', 'request_hourly_rollups', ['hotel_id', 'hour_start'])
+
+
+def downgrade():
+    """Drop request_hourly_rollups table"""
+    op.drop_index('idx_request_rollup_hotel_hour', table_name='request_hourly_rollups')
+    op.drop_index('ix_request_hourly_rollups_location_id', table_name='request_hourly_rollups')
+    op.drop_table('request_hourly_rollups')
@@ -0,0 +1,32 @@
+"""Add (hotel_id, requested_at, id) index for keyset pagination
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create keyset pagination index"""
+    # Used by GET /api/requests: WHERE hotel_id = ? AND (requested_at, id) < cursor
+    # ORDER BY requested_at DESC, id DESC LIMIT n
+    op.create_index(
+        'idx_requests_hotel_requested_id',
+        'buggy_requests',
+        ['hotel_id', 'requested_at', 'id'],
+        unique=False
+    )
+
+
+def downgrade():
+    """Drop keyset pagination index"""
+    op.drop_index('idx_requests_hotel_requested_id', table_name='buggy_requests')
@@ -0,0 +1,32 @@
+"""Add guest_fcm_token_expires_at index for the guest token cleanup job
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create guest token expiry index"""
+    # Used by MaintenanceService.expire_guest_tokens:
+    # WHERE guest_fcm_token_expires_at < now ORDER BY id LIMIT n
+    op.create_index(
+        'ix_buggy_requests_guest_fcm_token_expires_at',
+        'buggy_requests',
+        ['guest_fcm_token_expires_at'],
+        unique=False
+    )
+
+
+def downgrade():
+    """Drop guest token expiry index"""
+    op.drop_index('ix_buggy_requests_guest_fcm_token_expires_at', table_name='buggy_requests')
@@ -0,0 +1,61 @@
+"""Add audit_trail_archive table and (hotel_id, created_at, id) audit index
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create archive table and keyset pagination indexes"""
+    # Used by GET /api/audit: WHERE hotel_id = ? AND (created_at, id) < cursor
+    # ORDER BY created_at DESC, id DESC LIMIT n
+    op.create_index(
+        'idx_audit_hotel_created_id',
+        'audit_trail',
+        ['hotel_id', 'created_at', 'id'],
+        unique=False
+    )
+
+    # Entries older than AUDIT_HOT_RETENTION_DAYS are moved here (same ids)
+    op.create_table(
+        'audit_trail_archive',
+        sa.Column('id', sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column('hotel_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('action', sa.String(length=100), nullable=False),
+        sa.Column('entity_type', sa.String(length=50), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=True),
+        sa.Column('old_values', sa.Text(), nullable=True),
+        sa.Column('new_values', sa.Text(), nullable=True),
+        sa.Column('ip_address', sa.String(length=45), nullable=True),
+        sa.Column('user_agent', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_audit_archive_hotel_created_id', 'audit_trail_archive',
+                    ['hotel_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_audit_trail_archive_user_id', 'audit_trail_archive', ['user_id'], unique=False)
+    op.create_index('ix_audit_trail_archive_action', 'audit_trail_archive', ['action'], unique=False)
+    op.create_index('ix_audit_trail_archive_created_at', 'audit_trail_archive', ['created_at'], unique=False)
+
+
+def downgrade():
+    """Drop archive table and keyset pagination index"""
+    op.drop_index('ix_audit_trail_archive_created_at', table_name='audit_trail_archive')
+    op.drop_index('ix_audit_trail_archive_action', table_name='audit_trail_archive')
+    op.drop_index('ix_audit_trail_archive_user_id', table_name='audit_trail_archive')
+    op.drop_index('idx_audit_archive_hotel_created_id', table_name='audit_trail_archive')
+    op.drop_table('audit_trail_archive')
+    op.drop_index('idx_audit_hotel_created_id', table_name='audit_trail')
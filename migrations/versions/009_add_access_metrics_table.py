@@ -0,0 +1,44 @@
+"""Add access_metrics table for read-only endpoint counters
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create access_metrics table"""
+    op.create_table(
+        'access_metrics',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('hotel_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('endpoint', sa.String(length=100), nullable=False),
+        sa.Column('hour_start', sa.DateTime(), nullable=False),
+        sa.Column('request_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_access_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('hotel_id', 'user_id', 'endpoint', 'hour_start', name='uq_access_metric_key')
+    )
+
+    op.create_index('ix_access_metrics_user_id', 'access_metrics', ['user_id'])
+    # Used by AccessMetricsService.summarize: WHERE hotel_id = ? AND hour_start >= ?
+    op.create_index('idx_access_metric_hotel_hour', 'access_metrics', ['hotel_id', 'hour_start'])
+
+
+def downgrade():
+    """Drop access_metrics table"""
+    op.drop_index('idx_access_metric_hotel_hour', table_name='access_metrics')
+    op.drop_index('ix_access_metrics_user_id', table_name='access_metrics')
+    op.drop_table('access_metrics')
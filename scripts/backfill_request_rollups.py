@@ -0,0 +1,56 @@
+"""
+Buggy Call - Request Rollup Backfill
+Rebuilds request_hourly_rollups from buggy_requests (initial fill or repair)
+
+Usage:
+    python scripts/backfill_request_rollups.py
+    python scripts/backfill_request_rollups.py --hotel-id 1 --start 2026-01-01 --end 2026-01-31
+"""
+import sys
+import os
+from datetime import datetime
+
+# Maintenance run: no SocketIO server, no scheduler
+os.environ['SKIP_SOCKETIO'] = '1'
+os.environ['SKIP_BACKGROUND_JOBS'] = '1'
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.services.request_rollup_service import RequestRollupService
+import argparse
+
+
+def parse_date(value, end_of_day=False):
+    """Parse YYYY-MM-DD (end dates cover the whole day)"""
+    parsed = datetime.strptime(value, '%Y-%m-%d')
+    if end_of_day:
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild hourly request rollups')
+    parser.add_argument('--hotel-id', type=int, default=None, help='Only this hotel (default: all)')
+    parser.add_argument('--start', default=None, help='First day, YYYY-MM-DD (default: beginning)')
+    parser.add_argument('--end', default=None, help='Last day, YYYY-MM-DD (default: today)')
+    args = parser.parse_args()
+
+    start_date = parse_date(args.start) if args.start else None
+    end_date = parse_date(args.end, end_of_day=True) if args.end else None
+
+    app = create_app()
+    with app.app_context():
+        print("=" * 60)
+        print("Request Rollup Backfill")
+        print("=" * 60)
+        print(f"Hotel: {args.hotel_id or 'all'}")
+        print(f"Range: {args.start or 'beginning'} → {args.end or 'now'}")
+
+        rows = RequestRollupService.rebuild(args.hotel_id, start_date, end_date)
+
+        print(f"✅ {rows} rollup row(s) written")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Test suite for in-memory access metrics (AccessMetricsService)
+"""
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import SystemUser, UserRole
+from app.models.buggy import Buggy, BuggyStatus
+from app.models.buggy_driver import BuggyDriver
+from app.models.location import Location
+from app.models.hotel import Hotel
+from app.models.request import BuggyRequest, RequestStatus
+from app.models.audit import AuditTrail
+from app.models.access_metric import AccessMetric
+from app.services.access_metrics_service import AccessMetricsService
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        AccessMetricsService.reset()
+
+
+@pytest.fixture
+def driver(app):
+    """Driver with a primary buggy and two pending requests in the hotel"""
+    hotel = Hotel(name='Metrics Hotel', address='Test Address', code=f'AM{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    location = Location(hotel_id=hotel.id, name='Spa', qr_code_data=f'metrics_qr_{uuid.uuid4().hex[:8]}')
+    user = SystemUser(
+        username=f'metrics_driver_{uuid.uuid4().hex[:6]}',
+        full_name='Metrics Driver',
+        role=UserRole.DRIVER,
+        hotel_id=hotel.id
+    )
+    user.set_password('test123')
+    buggy = Buggy(hotel_id=hotel.id, code=f'MB{uuid.uuid4().hex[:4]}', status=BuggyStatus.AVAILABLE)
+    db.session.add_all([location, user, buggy])
+    db.session.commit()
+
+    db.session.add_all([
+        BuggyDriver(buggy_id=buggy.id, driver_id=user.id, is_active=True, is_primary=True),
+        BuggyRequest(hotel_id=hotel.id, location_id=location.id, status=RequestStatus.PENDING),
+        BuggyRequest(hotel_id=hotel.id, location_id=location.id, status=RequestStatus.PENDING),
+    ])
+    db.session.commit()
+    return {'hotel_id': hotel.id, 'user_id': user.id}
+
+
+def count_statements(func):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, statements
+
+
+class TestAccessMetricsService:
+    """Counters live in memory until flushed as hourly rows"""
+
+    def test_record_is_memory_only_and_flush_upserts(self, app, driver):
+        now = datetime(2026, 3, 2, 10, 15, 0)
+        hotel_id, user_id = driver['hotel_id'], driver['user_id']
+
+        _, statements = count_statements(lambda: [
+            AccessMetricsService.record('driver.pending_requests', user_id, hotel_id, items=2,
+                                        now=now + timedelta(seconds=3 * index))
+            for index in range(3)
+        ])
+        assert statements == []
+        assert AccessMetricsService.get_stats()['pending_keys'] == 1
+
+        assert AccessMetricsService.flush() == 1
+        AccessMetricsService.record('driver.pending_requests', user_id, hotel_id, items=1,
+                                    now=now + timedelta(minutes=10))
+        AccessMetricsService.record('driver.pending_requests', user_id, hotel_id, now=now + timedelta(hours=1))
+        assert AccessMetricsService.flush() == 2
+
+        rows = AccessMetric.query.order_by(AccessMetric.hour_start).all()
+        assert [(r.hour_start.hour, r.request_count, r.item_count) for r in rows] == [(10, 4, 7), (11, 1, 0)]
+        assert rows[0].last_access_at == now + timedelta(minutes=10)
+        assert AccessMetricsService.get_stats()['pending_keys'] == 0
+
+    def test_summarize_includes_unflushed_counts(self, app, driver):
+        now = datetime(2026, 3, 2, 10, 15, 0)
+        hotel_id, user_id = driver['hotel_id'], driver['user_id']
+        AccessMetricsService.record('driver.active_request', user_id, hotel_id, now=now)
+        AccessMetricsService.flush()
+        AccessMetricsService.record('driver.active_request', user_id, hotel_id, items=1, now=now)
+
+        summary = AccessMetricsService.summarize(hotel_id, start=now - timedelta(hours=1))
+        assert summary == [{
+            'user_id': user_id,
+            'endpoint': 'driver.active_request',
+            'request_count': 2,
+            'item_count': 1,
+            'last_access_at': now.isoformat()
+        }]
+
+
+class TestDriverPolls:
+    """Driver polls are counted, not audited, and never commit"""
+
+    def test_pending_requests_poll_writes_nothing(self, app, driver):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = driver['user_id']
+            sess['role'] = 'driver'
+
+        def poll():
+            return client.get('/api/driver/pending-requests')
+
+        response, statements = count_statements(poll)
+        assert response.status_code == 200
+        assert response.get_json()['total'] == 2
+        assert not [s for s in statements if s.lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))]
+
+        client.get('/api/driver/active-request')
+        assert AuditTrail.query.count() == 0
+        assert AccessMetric.query.count() == 0
+
+        summary = {row['endpoint']: row for row in AccessMetricsService.summarize(driver['hotel_id'])}
+        assert summary['driver.pending_requests']['request_count'] == 1
+        assert summary['driver.pending_requests']['item_count'] == 2
+        assert summary['driver.active_request']['request_count'] == 1
@@ -0,0 +1,117 @@
+"""
+Test suite for audit trail cursor paging and archival
+"""
+import pytest
+import uuid
+from datetime import timedelta
+from unittest.mock import patch
+from sqlalchemy import event
+from app import create_app, db
+from app.models import get_current_timestamp
+from app.models.hotel import Hotel
+from app.models.audit import AuditTrail, AuditTrailArchive
+from app.services.audit_service import AuditService
+from app.services.maintenance_service import MaintenanceService
+from app.utils.exceptions import ValidationException
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def entries(app):
+    """Hotel with 3 audit entries older than 90 days and 4 recent ones"""
+    hotel = Hotel(name='Audit Archive Hotel', address='Test Address', code=f'AA{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    now = get_current_timestamp().replace(microsecond=0)
+    ages = [timedelta(days=200), timedelta(days=120), timedelta(days=91)] + [timedelta(hours=h) for h in (4, 3, 2, 2)]
+    items = [
+        AuditTrail(hotel_id=hotel.id, action='update', entity_type='buggy', entity_id=index,
+                   created_at=now - age)
+        for index, age in enumerate(ages)
+    ]
+    db.session.add_all(items)
+    db.session.commit()
+    return {'hotel_id': hotel.id, 'ids': [item.id for item in items], 'now': now}
+
+
+def count_statements(func):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, statements
+
+
+class TestAuditCursorPaging:
+    """Pages are keyset seeks on (created_at, id)"""
+
+    def test_pages_cover_entries_newest_first(self, app, entries):
+        seen, cursor = [], None
+        while True:
+            page, statements = count_statements(
+                lambda: AuditService.get_audit_trail(entries['hotel_id'], cursor=cursor, limit=3)
+            )
+            assert len(statements) == 1 and 'count(' not in statements[0].lower()
+            seen.extend(item['id'] for item in page['items'])
+            if not page['has_more']:
+                break
+            cursor = page['next_cursor']
+
+        ids = entries['ids']
+        # Two entries share created_at: the id breaks the tie
+        assert seen == [ids[6], ids[5], ids[4], ids[3], ids[2], ids[1], ids[0]]
+
+    def test_filters_and_bad_cursor(self, app, entries):
+        page = AuditService.get_audit_trail(entries['hotel_id'], filters={'actions': ['login_failed']})
+        assert page['items'] == []
+        assert page['has_more'] is False
+
+        with pytest.raises(ValidationException):
+            AuditService.get_audit_trail(entries['hotel_id'], cursor='not-a-cursor')
+
+
+class TestAuditArchive:
+    """Old entries move to audit_trail_archive with their ids"""
+
+    def test_archive_moves_old_entries_in_chunks(self, app, entries):
+        with patch.object(MaintenanceService, 'BATCH_SIZE', 2):
+            assert AuditService.archive_old_entries(now=entries['now']) == 3
+
+        ids = entries['ids']
+        assert sorted(a.id for a in AuditTrail.query.all()) == ids[3:]
+        archived = AuditTrailArchive.query.order_by(AuditTrailArchive.id).all()
+        assert [a.id for a in archived] == ids[:3]
+        assert archived[0].entity_id == 0
+        assert archived[0].archived_at is not None
+
+        assert AuditService.archive_old_entries(now=entries['now']) == 0
+
+    def test_archive_query_path(self, app, entries):
+        AuditService.archive_old_entries(now=entries['now'])
+
+        hot = AuditService.get_audit_trail(entries['hotel_id'])
+        archive = AuditService.get_audit_trail(entries['hotel_id'], archive=True, limit=2)
+        assert len(hot['items']) == 4
+        assert [item['id'] for item in archive['items']] == [entries['ids'][2], entries['ids'][1]]
+        assert archive['has_more'] is True
+
+        rest = AuditService.get_audit_trail(entries['hotel_id'], archive=True, cursor=archive['next_cursor'])
+        assert [item['id'] for item in rest['items']] == [entries['ids'][0]]
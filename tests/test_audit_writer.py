@@ -0,0 +1,164 @@
+"""
+Test suite for the group-commit audit writer (AuditWriter)
+"""
+import pytest
+import uuid
+from unittest.mock import patch
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import SystemUser, UserRole
+from app.models.hotel import Hotel
+from app.models.audit import AuditTrail
+from app.services.audit_service import AuditService
+from app.services.audit_writer import AuditWriter
+from app.services.outbox_service import OutboxService
+from app.models.outbox import OutboxEvent, OutboxStatus
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        AuditWriter.reset()
+
+
+@pytest.fixture
+def user_data(app):
+    """Hotel with one admin"""
+    hotel = Hotel(name='Audit Hotel', address='Test Address', code=f'A{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    user = SystemUser(
+        username=f'audit_admin_{uuid.uuid4().hex[:6]}',
+        full_name='Audit Admin',
+        role=UserRole.ADMIN,
+        hotel_id=hotel.id
+    )
+    user.set_password('test123')
+    db.session.add(user)
+    db.session.commit()
+    return {'hotel_id': hotel.id, 'user_id': user.id}
+
+
+@pytest.fixture
+def buffered(app):
+    """Buffered mode without the writer thread (tests flush explicitly)"""
+    with patch.object(AuditWriter, '_inline', False), \
+            patch.object(AuditWriter, '_ensure_thread'):
+        yield
+
+
+def count_statements(func):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, statements
+
+
+class TestAuditWriter:
+    """Audit records are buffered and written in batches"""
+
+    def test_inline_mode_writes_immediately(self, app, user_data):
+        AuditService.log_action('login_success', 'user', entity_id=user_data['user_id'],
+                                user_id=user_data['user_id'])
+
+        audit = AuditTrail.query.one()
+        assert audit.hotel_id == user_data['hotel_id']  # resolved from the user
+        assert audit.action == 'login_success'
+        assert audit.created_at is not None
+
+    def test_log_action_does_not_touch_caller_session(self, app, user_data, buffered):
+        _, statements = count_statements(lambda: AuditService.log_action(
+            'driver_fetched_pending_requests', 'request', new_values={'count': 0},
+            user_id=user_data['user_id']
+        ))
+        assert statements == []
+        assert AuditTrail.query.count() == 0
+        assert AuditWriter.get_stats()['buffered'] == 1
+
+    def test_flush_writes_batch_with_one_insert(self, app, user_data, buffered):
+        for index in range(5):
+            AuditService.log_action('update', 'buggy', entity_id=index, user_id=user_data['user_id'])
+        AuditService.log_action('create', 'location', entity_id=9, hotel_id=user_data['hotel_id'])
+
+        written, statements = count_statements(AuditWriter.flush)
+        assert written == 6
+        assert len([s for s in statements if s.lstrip().upper().startswith('INSERT')]) == 1
+        assert len([s for s in statements if s.lstrip().upper().startswith('SELECT')]) == 1  # hotel lookup
+
+        assert AuditTrail.query.filter_by(hotel_id=user_data['hotel_id']).count() == 6
+        stats = AuditWriter.get_stats()
+        assert stats['buffered'] == 0
+        assert stats['written'] == 6
+
+    def test_records_survive_caller_rollback(self, app, user_data, buffered):
+        db.session.add(Hotel(name='Rolled Back', address='X', code=f'R{uuid.uuid4().hex[:6]}'))
+        AuditService.log_action('create', 'hotel', hotel_id=user_data['hotel_id'])
+        db.session.rollback()
+
+        assert AuditWriter.flush() == 1
+        assert AuditTrail.query.count() == 1
+        assert Hotel.query.count() == 1
+
+    def test_full_buffer_is_written_by_caller(self, app, user_data, buffered):
+        with patch.object(AuditWriter, 'MAX_BUFFER', 3):
+            for index in range(3):
+                AuditService.log_action('update', 'buggy', entity_id=index, hotel_id=user_data['hotel_id'])
+
+        assert AuditTrail.query.count() == 3
+        stats = AuditWriter.get_stats()
+        assert stats['caller_flushes'] == 1
+        assert stats['buffered'] == 0
+
+    def test_bad_record_does_not_drop_the_batch(self, app, user_data, buffered):
+        AuditService.log_action('update', 'buggy', entity_id=1, hotel_id=user_data['hotel_id'])
+        AuditService.log_action(None, 'buggy', entity_id=2, hotel_id=user_data['hotel_id'])  # NOT NULL violation
+        AuditService.log_action('update', 'buggy', entity_id=3, hotel_id=user_data['hotel_id'])
+
+        assert AuditWriter.flush() == 2
+        assert sorted(a.entity_id for a in AuditTrail.query.all()) == [1, 3]
+        stats = AuditWriter.get_stats()
+        assert stats['written'] == 2
+        assert stats['failed'] == 1
+
+
+class TestOutboxAuditHandler:
+    """audit.log events are delivered only once the row is stored"""
+
+    def _publish_audit_event(self, user_data):
+        event = OutboxService.enqueue('audit.log', {
+            'action': 'request_accepted', 'entity_type': 'request', 'entity_id': 7,
+            'hotel_id': user_data['hotel_id'], 'user_id': user_data['user_id']
+        }, hotel_id=user_data['hotel_id'])
+        db.session.commit()
+        OutboxService.publish([event])
+        return OutboxEvent.query.get(event.id)
+
+    def test_row_is_written_before_delivery(self, app, user_data, buffered):
+        stored = self._publish_audit_event(user_data)
+
+        assert stored.status == OutboxStatus.DELIVERED
+        assert AuditTrail.query.filter_by(action='request_accepted').count() == 1
+        assert AuditWriter.get_stats()['buffered'] == 0
+
+    def test_write_failure_retries_event(self, app, user_data, buffered):
+        with patch.object(AuditWriter, '_insert', side_effect=RuntimeError('db down')):
+            stored = self._publish_audit_event(user_data)
+
+        assert stored.status == OutboxStatus.PENDING
+        assert 'db down' in stored.last_error
+        assert AuditTrail.query.count() == 0
@@ -0,0 +1,131 @@
+"""
+Test suite for batch buggy serialization (Buggy.to_dict_many)
+"""
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import SystemUser, UserRole
+from app.models.buggy import Buggy, BuggyStatus
+from app.models.buggy_driver import BuggyDriver
+from app.models.location import Location
+from app.models.hotel import Hotel
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def fleet(app):
+    """Hotel with buggies covering every driver association case"""
+    hotel = Hotel(name='Serializer Hotel', address='Test Address', code=f'S{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    location = Location(
+        hotel_id=hotel.id,
+        name='Lobby',
+        qr_code_data=f'serializer_qr_{uuid.uuid4().hex[:8]}',
+        is_active=True
+    )
+    db.session.add(location)
+
+    drivers = []
+    for index in range(4):
+        driver = SystemUser(
+            username=f'serializer_driver_{index}_{uuid.uuid4().hex[:6]}',
+            full_name=f'Driver {index}' if index != 3 else '',  # last one: username fallback
+            role=UserRole.DRIVER,
+            hotel_id=hotel.id,
+            is_active=True
+        )
+        driver.set_password('test123')
+        drivers.append(driver)
+    db.session.add_all(drivers)
+    db.session.commit()
+
+    statuses = [BuggyStatus.AVAILABLE, BuggyStatus.BUSY, BuggyStatus.OFFLINE, BuggyStatus.AVAILABLE, BuggyStatus.AVAILABLE]
+    buggies = []
+    for index, status in enumerate(statuses):
+        buggies.append(Buggy(
+            hotel_id=hotel.id,
+            code=f'SB{index}{uuid.uuid4().hex[:4]}',
+            status=status,
+            current_location_id=location.id if index % 2 == 0 else None
+        ))
+    db.session.add_all(buggies)
+    db.session.commit()
+
+    base = datetime(2026, 3, 2, 8, 0, 0)
+    db.session.add_all([
+        # active + primary
+        BuggyDriver(buggy_id=buggies[0].id, driver_id=drivers[0].id, is_active=True, is_primary=True, assigned_at=base),
+        # active, not primary; older primary-less assignment
+        BuggyDriver(buggy_id=buggies[1].id, driver_id=drivers[1].id, is_active=True, assigned_at=base),
+        BuggyDriver(buggy_id=buggies[1].id, driver_id=drivers[2].id, assigned_at=base + timedelta(hours=1)),
+        # offline buggy with an active flag left behind
+        BuggyDriver(buggy_id=buggies[2].id, driver_id=drivers[2].id, is_active=True, is_primary=True, assigned_at=base),
+        # only an inactive assignment, driver without full name
+        BuggyDriver(buggy_id=buggies[3].id, driver_id=drivers[3].id, assigned_at=base),
+        # buggies[4]: no driver at all
+    ])
+    db.session.commit()
+    return {'hotel_id': hotel.id, 'buggy_ids': [b.id for b in buggies]}
+
+
+def count_statements(func):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, statements
+
+
+class TestBuggyBatchSerialization:
+    """to_dict_many returns to_dict output without per-buggy queries"""
+
+    def test_dicts_match_per_instance_to_dict(self, app, fleet):
+        expected = [Buggy.query.get(buggy_id).to_dict() for buggy_id in fleet['buggy_ids']]
+        db.session.expunge_all()
+
+        buggies = Buggy.query.filter(Buggy.id.in_(fleet['buggy_ids'])).order_by(Buggy.id).all()
+        assert Buggy.to_dict_many(buggies) == expected
+
+        assert expected[1]['driver_name'] == 'Driver 1'  # active wins over newer assignment
+        assert expected[2]['driver_name'] == 'Driver 2'  # offline: assigned driver shown
+        assert expected[3]['driver_name'].startswith('serializer_driver_3_')
+        assert expected[4]['driver_id'] is None
+
+    def test_query_count_is_constant(self, app, fleet):
+        db.session.expunge_all()
+        buggies = Buggy.query.filter_by(hotel_id=fleet['hotel_id']).all()
+
+        result, statements = count_statements(lambda: Buggy.to_dict_many(buggies))
+
+        assert len(result) == 5
+        assert len(statements) == 2  # driver associations + locations
+
+    def test_prefetch_for_nested_request_buggies(self, app, fleet):
+        db.session.expunge_all()
+        buggies = Buggy.query.filter_by(hotel_id=fleet['hotel_id']).all()
+        Buggy.prefetch_related(buggies + buggies + [None])
+
+        _, statements = count_statements(lambda: [b.to_dict() for b in buggies])
+
+        assert statements == []
@@ -0,0 +1,154 @@
+"""
+Test suite for the memoized driver context resolver
+"""
+import pytest
+import uuid
+from sqlalchemy import event
+from app import create_app, db, cache
+from app.models.user import SystemUser, UserRole
+from app.models.buggy import Buggy, BuggyStatus
+from app.models.buggy_driver import BuggyDriver
+from app.models.hotel import Hotel
+from app.utils.driver_context import DriverContextResolver
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def driver(app):
+    """Driver with a primary buggy, plus a spare buggy"""
+    hotel = Hotel(name='Context Hotel', address='Test Address', code=f'DC{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    user = SystemUser(
+        username=f'context_driver_{uuid.uuid4().hex[:6]}',
+        full_name='Context Driver',
+        role=UserRole.DRIVER,
+        hotel_id=hotel.id
+    )
+    user.set_password('test123')
+    buggy = Buggy(hotel_id=hotel.id, code=f'DB{uuid.uuid4().hex[:4]}', status=BuggyStatus.AVAILABLE)
+    spare = Buggy(hotel_id=hotel.id, code=f'DS{uuid.uuid4().hex[:4]}', status=BuggyStatus.AVAILABLE)
+    db.session.add_all([user, buggy, spare])
+    db.session.commit()
+
+    db.session.add(BuggyDriver(buggy_id=buggy.id, driver_id=user.id, is_active=True, is_primary=True))
+    db.session.commit()
+    return {'hotel_id': hotel.id, 'user_id': user.id, 'buggy_id': buggy.id, 'spare_id': spare.id}
+
+
+def count_statements(func):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, statements
+
+
+class TestDriverContextResolver:
+    """User, buggy and association come from one joined query"""
+
+    def test_load_is_one_query(self, app, driver):
+        context, statements = count_statements(lambda: DriverContextResolver.load(driver['user_id']))
+        assert len(statements) == 1
+        assert context.user.id == driver['user_id']
+        assert context.buggy.id == driver['buggy_id']
+        assert context.association.is_primary is True
+
+    def test_buggy_property_is_memoized_per_request(self, app, driver):
+        user = db.session.get(SystemUser, driver['user_id'])
+
+        with app.test_request_context():
+            buggy_ids, statements = count_statements(lambda: [user.buggy.id for _ in range(5)])
+            assert buggy_ids == [driver['buggy_id']] * 5
+            assert len(statements) == 1
+
+            assoc = BuggyDriver.query.filter_by(driver_id=driver['user_id']).one()
+            assoc.buggy_id = driver['spare_id']
+            db.session.commit()  # assignment change clears the memo
+
+            assert user.buggy.id == driver['spare_id']
+
+    def test_non_driver_has_no_buggy(self, app, driver):
+        admin = SystemUser(username=f'context_admin_{uuid.uuid4().hex[:6]}', full_name='Admin',
+                           role=UserRole.ADMIN, hotel_id=driver['hotel_id'])
+        admin.set_password('test123')
+        db.session.add(admin)
+        db.session.commit()
+        db.session.refresh(admin)
+
+        buggy, statements = count_statements(lambda: admin.buggy)
+        assert buggy is None
+        assert statements == []
+
+
+class TestDriverSnapshotCache:
+    """Ids are cached across requests, objects are loaded by primary key"""
+
+    @pytest.fixture(autouse=True)
+    def real_cache(self, app):
+        cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
+        cache.clear()
+        yield
+        cache.clear()
+
+    def test_next_request_loads_by_primary_key(self, app, driver):
+        DriverContextResolver.load(driver['user_id'])  # first request stores the snapshot
+
+        context, statements = count_statements(lambda: DriverContextResolver.load(driver['user_id']))
+        assert context.buggy.id == driver['buggy_id']
+        assert len(statements) == 1
+        assert 'LEFT OUTER JOIN' not in statements[0]  # no joined lookup by driver
+
+    def test_assignment_change_drops_snapshot(self, app, driver):
+        DriverContextResolver.load(driver['user_id'])
+
+        assoc = BuggyDriver.query.filter_by(driver_id=driver['user_id']).one()
+        assoc.buggy_id = driver['spare_id']
+        db.session.commit()
+
+        assert cache.get(f"driver_context_{driver['user_id']}") is None
+        assert DriverContextResolver.load(driver['user_id']).buggy.id == driver['spare_id']
+
+    def test_stale_snapshot_falls_back_to_joined_load(self, app, driver):
+        DriverContextResolver.load(driver['user_id'])
+
+        # Bulk write, bypasses the invalidation listeners
+        BuggyDriver.query.filter_by(driver_id=driver['user_id']).update({'is_primary': False})
+        db.session.commit()
+
+        context = DriverContextResolver.load(driver['user_id'])
+        assert context.user.id == driver['user_id']
+        assert context.buggy is None
+
+
+class TestShuttleInfo:
+    """Driver endpoints resolve the driver once"""
+
+    def test_shuttle_info_single_context_query(self, app, driver):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = driver['user_id']
+            sess['role'] = 'driver'
+
+        response, statements = count_statements(lambda: client.get('/api/driver/shuttle-info'))
+        assert response.status_code == 200
+        assert response.get_json()['buggy']['id'] == driver['buggy_id']
+        assert len([s for s in statements if 'system_users' in s or 'buggy_drivers' in s]) == 1
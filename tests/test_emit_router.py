@@ -0,0 +1,61 @@
+"""
+Test suite for tenant-scoped Socket.IO emit routing
+"""
+import pytest
+from unittest.mock import Mock, patch
+from app.websocket.emit_router import EmitRouter, UnscopedEmitError
+from app.services.outbox_service import _handle_socket_emit
+
+
+class TestEmitRouter:
+    """Events resolve to hotel/request rooms and go out in one emit"""
+
+    def test_request_accepted_rooms(self):
+        rooms = EmitRouter.resolve('request_accepted', hotel_id=1, request_id=5)
+
+        assert rooms == ['request_5', 'hotel_1_drivers', 'hotel_1_admin']
+
+    def test_single_emit_with_room_list(self):
+        emitter = Mock()
+
+        EmitRouter.emit('new_request', {'request_id': 5}, hotel_id=2, emitter=emitter)
+
+        emitter.assert_called_once_with('new_request', {'request_id': 5},
+                                        room=['hotel_2_drivers', 'hotel_2_admin'], namespace='/')
+
+    def test_unscoped_broadcasts_are_rejected(self):
+        emitter = Mock()
+
+        with pytest.raises(UnscopedEmitError):
+            EmitRouter.emit('request_completed', {}, request_id=5, emitter=emitter)  # no hotel
+        with pytest.raises(UnscopedEmitError):
+            EmitRouter.emit('unknown_event', {}, hotel_id=1, emitter=emitter)
+        with pytest.raises(UnscopedEmitError):
+            EmitRouter.emit_to_rooms('request_completed', {}, [None], emitter=emitter)
+        emitter.assert_not_called()
+
+
+class TestOutboxSocketEmit:
+    """Outbox socket.emit rows never reach other hotels"""
+
+    @patch('app.services.outbox_service.socketio')
+    def test_scoped_payload(self, mock_socketio):
+        _handle_socket_emit({
+            'event': 'request_completed',
+            'data': {'request_id': 5, 'hotel_id': 1},
+            'scope': {'hotel_id': 1, 'request_id': 5}
+        })
+
+        mock_socketio.emit.assert_called_once()
+        assert mock_socketio.emit.call_args[1]['room'] == ['request_5', 'hotel_1_drivers', 'hotel_1_admin']
+
+    @patch('app.services.outbox_service.socketio')
+    def test_legacy_none_room_is_scoped_to_hotel(self, mock_socketio):
+        _handle_socket_emit({
+            'event': 'request_accepted',
+            'data': {'request_id': 5, 'hotel_id': 1},
+            'rooms': [None, 'request_5', 'hotel_1_admin']
+        })
+
+        mock_socketio.emit.assert_called_once()
+        assert mock_socketio.emit.call_args[1]['room'] == ['request_5', 'hotel_1_drivers', 'hotel_1_admin']
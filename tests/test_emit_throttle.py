@@ -0,0 +1,95 @@
+"""
+Test suite for Socket.IO emit throttling and coalescing
+"""
+import pytest
+from unittest.mock import Mock
+from app import create_app
+from app.websocket.throttle import EmitThrottle, LocalTokenBuckets
+
+
+@pytest.fixture
+def app():
+    """Create test app with a small bucket (2 tokens, slow refill)"""
+    app = create_app('testing')
+    app.config.update(EMIT_THROTTLE_RATE=0.001, EMIT_THROTTLE_BURST=2, EMIT_QUEUE_MAX_PER_ROOM=3)
+
+    with app.app_context():
+        EmitThrottle.reset()
+        yield app
+        EmitThrottle.reset()
+
+
+@pytest.fixture
+def emitter(monkeypatch):
+    """Record emits; never start the background drainer"""
+    monkeypatch.setattr(EmitThrottle, '_start_drainer', classmethod(lambda cls: None))
+    return Mock()
+
+
+def refill(room, tokens):
+    EmitThrottle._buckets._buckets[room] = (tokens, EmitThrottle._buckets._buckets[room][1])
+
+
+class TestEmitThrottle:
+    """Token bucket per room, latest-wins queue, hard caps"""
+
+    def test_burst_of_same_buggy_collapses(self, app, emitter):
+        for index in range(6):
+            EmitThrottle.emit('buggy_status_update', {'buggy_id': 1, 'seq': index},
+                              room='hotel_1_admin', emitter=emitter)
+
+        assert emitter.call_count == 2  # bucket burst
+        stats = EmitThrottle.get_stats()
+        assert stats['rooms']['hotel_1_admin']['queued_events'] == 1
+        assert stats['totals']['coalesced'] == 3
+
+        refill('hotel_1_admin', 1)
+        assert EmitThrottle.drain() == 0
+        assert emitter.call_args[0][1] == {'buggy_id': 1, 'seq': 5}  # latest wins
+
+    def test_rooms_have_separate_buckets(self, app, emitter):
+        for room in ('hotel_1_admin', 'hotel_2_admin'):
+            for index in range(2):
+                EmitThrottle.emit('buggy_status_update', {'buggy_id': index}, room=room, emitter=emitter)
+
+        assert emitter.call_count == 4
+
+    def test_queue_cap_drops_oldest(self, app, emitter):
+        for index in range(10):
+            EmitThrottle.emit('guest_connected', {'hotel_id': 1, 'seq': index},
+                              room='hotel_1_drivers', emitter=emitter)
+
+        stats = EmitThrottle.get_stats()
+        assert stats['rooms']['hotel_1_drivers']['queued_events'] == 3
+        assert stats['totals']['dropped'] == 5
+
+        refill('hotel_1_drivers', 2)  # bucket holds at most BURST tokens
+        assert EmitThrottle.drain() == 1
+        refill('hotel_1_drivers', 1)
+        assert EmitThrottle.drain() == 0
+        assert [c[0][1]['seq'] for c in emitter.call_args_list[2:]] == [7, 8, 9]
+
+    def test_local_bucket_refills_over_time(self, monkeypatch):
+        clock = [100.0]
+        monkeypatch.setattr('app.websocket.throttle.time.monotonic', lambda: clock[0])
+        buckets = LocalTokenBuckets(rate=10, burst=1)
+
+        assert buckets.take('room') is True
+        assert buckets.take('room') is False
+        clock[0] += 0.15
+        assert buckets.take('room') is True
+
+    def test_refilled_token_does_not_overtake_queued_state(self, app, emitter):
+        def status_update(status):
+            EmitThrottle.emit('buggy_status_update', {'buggy_id': 1, 'status': status},
+                              room='hotel_1_admin', emitter=emitter)
+
+        status_update('busy')
+        refill('hotel_1_admin', 0)
+        status_update('available')  # queued
+        refill('hotel_1_admin', 1)  # token back before the queue drains
+        status_update('offline')  # must replace the queued state, not skip ahead
+
+        refill('hotel_1_admin', 1)
+        assert EmitThrottle.drain() == 0
+        assert [c[0][1]['status'] for c in emitter.call_args_list] == ['busy', 'offline']
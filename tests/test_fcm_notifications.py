@@ -15,6 +15,7 @@ from app.models.location import Location
 from app.models.hotel import Hotel
 from app.models.notification_log import NotificationLog
 from app.services.fcm_notification_service import FCMNotificationService
+from app.utils.retry_scheduler import RetryScheduler, PendingRetry
 
 
 @pytest.fixture
@@ -197,17 +198,13 @@ class TestFCMService:
                 assert success is True
                 assert mock_send.called
     
-    @patch('firebase_admin.messaging.send_multicast')
-    def test_send_to_multiple(self, mock_send_multicast, app, test_driver):
+    @patch('firebase_admin.messaging.send')
+    def test_send_to_multiple(self, mock_send, app, test_driver):
         """Test sending to multiple tokens"""
         with app.app_context():
             # Mock Firebase
             with patch.object(FCMNotificationService, 'initialize', return_value=True):
-                # Mock response
-                mock_response = Mock()
-                mock_response.success_count = 2
-                mock_response.failure_count = 0
-                mock_send_multicast.return_value = mock_response
+                mock_send.return_value = 'message_id'
                 
                 tokens = ['token1', 'token2']
                 
@@ -220,6 +217,117 @@ class TestFCMService:
                 
                 assert result['success'] == 2
                 assert result['failure'] == 0
+                assert [r['token'] for r in result['results']] == tokens
+    
+    @patch('firebase_admin.messaging.send')
+    def test_send_to_multiple_chunks_tokens(self, mock_send, app):
+        """Token sets larger than the chunk size are split"""
+        with app.app_context():
+            with patch.object(FCMNotificationService, 'initialize', return_value=True), \
+                 patch.object(FCMNotificationService, 'MULTICAST_CHUNK_SIZE', 2), \
+                 patch.object(FCMNotificationService, '_submit_chunk',
+                              wraps=FCMNotificationService._submit_chunk) as mock_chunk:
+                mock_send.return_value = 'message_id'
+                
+                result = FCMNotificationService.send_to_multiple(
+                    tokens=['t1', 't2', 't3', 't4', 't5'],
+                    title='Test',
+                    body='Test'
+                )
+                
+                assert mock_chunk.call_count == 3
+                assert result['success'] == 5
+                assert mock_send.call_count == 5
+    
+    @patch('firebase_admin.messaging.send')
+    def test_send_to_multiple_chunks_overlap(self, mock_send, app):
+        """Later chunks are in flight while the first chunk is still sending"""
+        import threading
+        second_chunk_started = threading.Event()
+        overlapped = []
+        
+        def fake_send(message):
+            if message.token == 't3':
+                second_chunk_started.set()
+            if message.token == 't1':
+                # Sequential chunk collection would never start t3 while t1 blocks
+                overlapped.append(second_chunk_started.wait(timeout=2))
+            return 'message_id'
+        
+        mock_send.side_effect = fake_send
+        with app.app_context():
+            with patch.object(FCMNotificationService, 'initialize', return_value=True), \
+                 patch.object(FCMNotificationService, 'MULTICAST_CHUNK_SIZE', 2):
+                result = FCMNotificationService.send_to_multiple(
+                    tokens=['t1', 't2', 't3', 't4'],
+                    title='Test',
+                    body='Test'
+                )
+        
+        assert overlapped == [True]
+        assert result['success'] == 4
+        assert [r['token'] for r in result['results']] == ['t1', 't2', 't3', 't4']
+    
+    @patch('firebase_admin.messaging.send')
+    def test_send_to_multiple_batch_invalid_token_cleanup(self, mock_send, app, test_driver):
+        """Invalid tokens are removed in one batch, transient failures are kept"""
+        from firebase_admin import exceptions as firebase_exceptions
+        from firebase_admin import messaging
+        
+        def fake_send(message):
+            if message.token == test_driver.fcm_token:
+                raise messaging.UnregisteredError('Token unregistered')
+            if message.token == 'transient_token':
+                raise firebase_exceptions.InternalError('Internal error')
+            return 'message_id'
+        
+        mock_send.side_effect = fake_send
+        with app.app_context():
+            with patch.object(FCMNotificationService, 'initialize', return_value=True), \
+                 patch.object(FCMNotificationService, '_remove_invalid_tokens',
+                              wraps=FCMNotificationService._remove_invalid_tokens) as mock_remove:
+                result = FCMNotificationService.send_to_multiple(
+                    tokens=[test_driver.fcm_token, 'transient_token', 'ok_token'],
+                    title='Test',
+                    body='Test'
+                )
+                
+                assert result['success'] == 1
+                assert result['failure'] == 2
+                mock_remove.assert_called_once_with([test_driver.fcm_token])
+                assert SystemUser.query.get(test_driver.id).fcm_token is None
+    
+    @patch('firebase_admin.messaging.send')
+    def test_send_to_multiple_keeps_tokens_on_quota_error(self, mock_send, app, test_driver):
+        """RESOURCE_EXHAUSTED (quota burst) is transient - no token is removed"""
+        from firebase_admin import messaging
+        mock_send.side_effect = messaging.QuotaExceededError('Quota exceeded', cause=None, http_response=None)
+        with app.app_context():
+            with patch.object(FCMNotificationService, 'initialize', return_value=True), \
+                 patch.object(FCMNotificationService, '_remove_invalid_tokens') as mock_remove:
+                result = FCMNotificationService.send_to_multiple(
+                    tokens=[test_driver.fcm_token], title='Test', body='Test'
+                )
+                
+                assert result['results'][0]['error_code'] == 'RESOURCE_EXHAUSTED'
+                mock_remove.assert_not_called()
+                assert SystemUser.query.get(test_driver.id).fcm_token is not None
+    
+    @patch('firebase_admin.messaging.send')
+    def test_send_to_multiple_keeps_tokens_on_apns_auth_error(self, mock_send, app, test_driver):
+        """UNAUTHENTICATED (APNs credential problem) is not a token problem"""
+        from firebase_admin import messaging
+        mock_send.side_effect = messaging.ThirdPartyAuthError('APNs auth error', cause=None, http_response=None)
+        with app.app_context():
+            with patch.object(FCMNotificationService, 'initialize', return_value=True), \
+                 patch.object(FCMNotificationService, '_remove_invalid_tokens') as mock_remove:
+                result = FCMNotificationService.send_to_multiple(
+                    tokens=[test_driver.fcm_token], title='Test', body='Test'
+                )
+                
+                assert result['results'][0]['error_code'] == 'UNAUTHENTICATED'
+                mock_remove.assert_not_called()
+                assert SystemUser.query.get(test_driver.id).fcm_token is not None
     
     @patch('firebase_admin.messaging.send_multicast')
     def test_notify_new_request(self, mock_send_multicast, app, test_driver, test_buggy, test_location):
@@ -792,10 +900,66 @@ class TestRetryLogic:
                     body='Test',
                     retry=True
                 )
+                if isinstance(success, PendingRetry):
+                    success = success.wait(timeout=10)  # retries run on the scheduler
                 
                 assert success is True
                 assert mock_send.call_count == 3
     
+    @patch('firebase_admin.messaging.send')
+    def test_retry_does_not_block_caller(self, mock_send, app, test_driver):
+        """Backoff delay is not slept in the caller's thread"""
+        import time
+        with app.app_context():
+            with patch.object(FCMNotificationService, 'initialize', return_value=True), \
+                 patch.object(RetryScheduler, 'schedule') as mock_schedule:
+                mock_send.side_effect = Exception('Network error')
+                
+                started = time.monotonic()
+                success = FCMNotificationService.send_to_token(
+                    token=test_driver.fcm_token,
+                    title='Test',
+                    body='Test',
+                    retry=True
+                )
+                
+                assert isinstance(success, PendingRetry)
+                assert not success
+                assert time.monotonic() - started < FCMNotificationService.RETRY_DELAY_BASE
+                assert mock_send.call_count == 1
+                delay = mock_schedule.call_args[0][0]
+                assert delay == FCMNotificationService.RETRY_DELAY_BASE
+    
+    @patch('firebase_admin.messaging.send')
+    def test_exhausted_retries_resolve_pending_as_failed(self, mock_send, app, test_driver):
+        """A scheduled retry that never succeeds ends as False"""
+        with app.app_context():
+            with patch.object(FCMNotificationService, 'initialize', return_value=True), \
+                 patch.object(FCMNotificationService, 'RETRY_DELAY_BASE', 0):
+                mock_send.side_effect = Exception('Network error')
+                
+                pending = FCMNotificationService.send_to_token(
+                    token=test_driver.fcm_token,
+                    title='Test',
+                    body='Test',
+                    retry=True
+                )
+                
+                assert isinstance(pending, PendingRetry)
+                assert pending.wait(timeout=5) is False
+                assert mock_send.call_count == FCMNotificationService.MAX_RETRIES
+    
+    def test_test_notification_endpoint_reports_scheduled_retry(self, app, client, test_driver):
+        """A pending retry is answered with 202, not 500"""
+        with client.session_transaction() as sess:
+            sess['user_id'] = test_driver.id
+        
+        with patch.object(FCMNotificationService, 'send_to_token', return_value=PendingRetry('Timeout')):
+            response = client.post('/api/fcm/test-notification', json={'title': 'T', 'body': 'B'})
+        
+        assert response.status_code == 202
+        assert response.get_json()['status'] == 'retry_scheduled'
+    
     @patch('firebase_admin.messaging.send')
     def test_no_retry_on_invalid_token(self, mock_send, app, test_driver):
         """Test no retry on invalid token error"""
@@ -815,5 +979,147 @@ class TestRetryLogic:
                 assert mock_send.call_count == 1  # No retry
 
 
+# ============================================================================
+# Dispatch Roster Tests
+# ============================================================================
+
+class TestDispatchRoster:
+    """Test cached available buggy → active driver → token resolution"""
+    
+    def test_roster_resolves_active_drivers_on_available_buggies(self, app, test_hotel, test_driver):
+        """Only active drivers of available buggies are in the roster"""
+        from app.models.buggy_driver import BuggyDriver
+        with app.app_context():
+            available = Buggy(hotel_id=test_hotel.id, code='R01', status=BuggyStatus.AVAILABLE)
+            offline = Buggy(hotel_id=test_hotel.id, code='R02', status=BuggyStatus.OFFLINE)
+            idle_driver = SystemUser(
+                username='idle_driver', email='idle@test.com', full_name='Idle Driver',
+                role=UserRole.DRIVER, hotel_id=test_hotel.id, is_active=True,
+                fcm_token='test_fcm_token_idle_456'
+            )
+            idle_driver.set_password('test123')
+            db.session.add_all([available, offline, idle_driver])
+            db.session.flush()
+            db.session.add_all([
+                BuggyDriver(buggy_id=available.id, driver_id=test_driver.id, is_active=True),
+                BuggyDriver(buggy_id=offline.id, driver_id=idle_driver.id, is_active=True)
+            ])
+            db.session.commit()
+            
+            roster = FCMNotificationService.get_dispatch_roster(test_hotel.id)
+            
+            assert roster == [{
+                'buggy_id': available.id,
+                'buggy_code': 'R01',
+                'driver_id': test_driver.id,
+                'driver_name': 'Test Driver',
+                'fcm_token': 'test_fcm_token_driver_123'
+            }]
+    
+    def test_roster_served_from_cache(self, app, test_hotel):
+        """Cached roster is returned without querying"""
+        cached = [{'buggy_id': 1, 'buggy_code': 'C01', 'driver_id': 7,
+                   'driver_name': 'Cached', 'fcm_token': 'cached_token'}]
+        with app.app_context():
+            with patch('app.cache.get', return_value=cached) as mock_get, \
+                 patch.object(db.session, 'query') as mock_query:
+                roster = FCMNotificationService.get_dispatch_roster(test_hotel.id)
+            
+            assert roster == cached
+            mock_get.assert_called_once_with(f'dispatch_roster_{test_hotel.id}')
+            assert not mock_query.called
+    
+    def test_token_registration_invalidates_roster(self, app, test_driver):
+        """Registering a token clears the hotel's roster cache"""
+        with app.app_context():
+            with patch('app.cache.delete') as mock_delete:
+                assert FCMNotificationService.register_token(test_driver.id, 'a' * 152)
+            
+            mock_delete.assert_called_with(f'dispatch_roster_{test_driver.hotel_id}')
+    
+    def test_committed_assignment_change_invalidates_roster(self, app, test_hotel, test_driver):
+        """Any committed BuggyDriver change clears the roster, no manual call needed"""
+        from app.models.buggy_driver import BuggyDriver
+        with app.app_context():
+            buggy = Buggy(hotel_id=test_hotel.id, code='R03', status=BuggyStatus.AVAILABLE)
+            db.session.add(buggy)
+            db.session.flush()
+            assignment = BuggyDriver(buggy_id=buggy.id, driver_id=test_driver.id, is_active=False)
+            db.session.add(assignment)
+            db.session.commit()
+            
+            with patch('app.cache.delete') as mock_delete:
+                assignment.is_active = True
+                db.session.commit()
+            
+            mock_delete.assert_any_call(f'dispatch_roster_{test_hotel.id}')
+    
+    def test_rolled_back_change_keeps_roster(self, app, test_hotel, test_buggy):
+        """Flushed but rolled back changes do not clear the roster"""
+        with app.app_context():
+            with patch('app.cache.delete') as mock_delete:
+                test_buggy.status = BuggyStatus.OFFLINE
+                db.session.flush()
+                db.session.rollback()
+                db.session.commit()
+            
+            assert f'dispatch_roster_{test_hotel.id}' not in [c.args[0] for c in mock_delete.call_args_list]
+
+
+# ============================================================================
+# Notification Log Buffer Tests
+# ============================================================================
+
+class TestNotificationLogBuffer:
+    """Test buffered NotificationLog writes"""
+    
+    def test_rows_flushed_in_one_batch_at_size(self, app, test_driver):
+        """Rows stay buffered until the flush size is reached"""
+        from app.services.notification_log_buffer import NotificationLogBuffer
+        with app.app_context():
+            app.config['NOTIFICATION_LOG_FLUSH_SIZE'] = 3
+            
+            for i in range(2):
+                assert NotificationLogBuffer.add(test_driver.fcm_token, f'Title {i}', 'Body', 'sent')
+            assert NotificationLog.query.count() == 0
+            
+            NotificationLogBuffer.add(test_driver.fcm_token, 'Title 2', 'Body', 'failed', error='boom')
+            
+            logs = NotificationLog.query.order_by(NotificationLog.id).all()
+            assert [log.title for log in logs] == ['Title 0', 'Title 1', 'Title 2']
+            assert all(log.user_id == test_driver.id for log in logs)
+            assert logs[2].error_message == 'boom'
+    
+    def test_explicit_flush_writes_pending_rows(self, app, test_driver):
+        """flush() writes whatever is buffered"""
+        from app.services.notification_log_buffer import NotificationLogBuffer
+        with app.app_context():
+            app.config['NOTIFICATION_LOG_FLUSH_SIZE'] = 100
+            NotificationLogBuffer.add(test_driver.fcm_token, 'Pending', 'Body', 'sent')
+            
+            assert NotificationLogBuffer.flush() == 1
+            assert NotificationLog.query.filter_by(title='Pending').count() == 1
+    
+    def test_unknown_token_is_not_logged(self, app, test_driver):
+        """Tokens that belong to no user produce no log row"""
+        from app.services.notification_log_buffer import NotificationLogBuffer
+        with app.app_context():
+            assert NotificationLogBuffer.add('unknown_token', 'Title', 'Body', 'sent') is False
+            assert NotificationLog.query.count() == 0
+    
+    def test_token_index_avoids_user_lookup(self, app, test_driver):
+        """Registered tokens resolve from the in-memory index"""
+        from app.services.notification_log_buffer import NotificationLogBuffer
+        with app.app_context():
+            app.config['NOTIFICATION_LOG_TOKEN_INDEX'] = True
+            NotificationLogBuffer.remember_token('indexed_token', test_driver.id)
+            try:
+                with patch.object(db.session, 'query') as mock_query:
+                    assert NotificationLogBuffer.resolve_user_id('indexed_token') == test_driver.id
+                assert not mock_query.called
+            finally:
+                NotificationLogBuffer.forget_tokens('indexed_token')
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,254 @@
+"""
+Test suite for the in-memory fleet state (FleetStateService)
+"""
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import SystemUser, UserRole
+from app.models.buggy import Buggy, BuggyStatus
+from app.models.buggy_driver import BuggyDriver
+from app.models.location import Location
+from app.models.hotel import Hotel
+from app.models.request import BuggyRequest, RequestStatus
+from app.services.fleet_state_service import FleetStateService
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        FleetStateService.reset()
+
+
+@pytest.fixture
+def fleet(app):
+    """Hotel with an available, a busy and an offline buggy"""
+    hotel = Hotel(name='Fleet Hotel', address='Test Address', code=f'F{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    location = Location(hotel_id=hotel.id, name='Lobby', qr_code_data=f'fleet_qr_{uuid.uuid4().hex[:8]}')
+    drivers = []
+    for index in range(3):
+        driver = SystemUser(
+            username=f'fleet_driver_{index}_{uuid.uuid4().hex[:6]}',
+            full_name=f'Fleet Driver {index}',
+            role=UserRole.DRIVER,
+            hotel_id=hotel.id,
+            fcm_token='token' if index == 0 else None
+        )
+        driver.set_password('test123')
+        drivers.append(driver)
+    db.session.add_all([location] + drivers)
+    db.session.commit()
+
+    statuses = [BuggyStatus.AVAILABLE, BuggyStatus.BUSY, BuggyStatus.OFFLINE]
+    buggies = [
+        Buggy(hotel_id=hotel.id, code=f'FB{index}{uuid.uuid4().hex[:4]}', status=status,
+              current_location_id=location.id if index == 0 else None)
+        for index, status in enumerate(statuses)
+    ]
+    db.session.add_all(buggies)
+    db.session.commit()
+
+    base = datetime(2026, 3, 2, 8, 0, 0)
+    db.session.add_all([
+        BuggyDriver(buggy_id=buggies[0].id, driver_id=drivers[0].id, is_active=True, is_primary=True, assigned_at=base),
+        BuggyDriver(buggy_id=buggies[1].id, driver_id=drivers[1].id, is_active=True, assigned_at=base),
+        BuggyDriver(buggy_id=buggies[2].id, driver_id=drivers[2].id, assigned_at=base + timedelta(hours=1)),
+        BuggyRequest(hotel_id=hotel.id, location_id=location.id, buggy_id=buggies[1].id, status=RequestStatus.ACCEPTED),
+    ])
+    db.session.commit()
+    return {
+        'hotel_id': hotel.id,
+        'location_id': location.id,
+        'buggy_ids': [b.id for b in buggies],
+        'driver_ids': [d.id for d in drivers]
+    }
+
+
+def count_statements(func):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, statements
+
+
+class TestFleetStateReads:
+    """Loaded once, then served without SQL"""
+
+    def test_buggy_dicts_match_to_dict(self, app, fleet):
+        expected = Buggy.to_dict_many(Buggy.query.filter_by(hotel_id=fleet['hotel_id']).order_by(Buggy.id).all())
+
+        result, statements = count_statements(lambda: FleetStateService.buggy_dicts(fleet['hotel_id']))
+        assert result == expected
+        assert len(statements) == 4  # first read loads the hotel
+
+        _, statements = count_statements(lambda: (
+            FleetStateService.buggy_dicts(fleet['hotel_id']),
+            FleetStateService.available_count(fleet['hotel_id']),
+            FleetStateService.active_drivers(fleet['hotel_id']),
+            FleetStateService.live_status(fleet['hotel_id'], fleet['buggy_ids'][0])
+        ))
+        assert statements == []
+
+    def test_active_drivers_and_live_status(self, app, fleet):
+        hotel_id = fleet['hotel_id']
+
+        drivers = FleetStateService.active_drivers(hotel_id)
+        assert [(d['buggy_id'], d['driver_name'], d['has_fcm_token']) for d in drivers] == [
+            (fleet['buggy_ids'][0], 'Fleet Driver 0', True)
+        ]
+        assert FleetStateService.available_count(hotel_id) == 1
+        assert FleetStateService.live_status(hotel_id, fleet['buggy_ids'][0])['location_name'] == 'Lobby'
+        assert FleetStateService.live_status(hotel_id, fleet['buggy_ids'][1])['status'] == 'busy'
+        assert FleetStateService.live_status(hotel_id, fleet['buggy_ids'][2])['status'] == 'offline'
+
+
+class TestFleetStateUpdates:
+    """Committed changes are applied in memory; rollbacks and bulk writes are not"""
+
+    def test_lifecycle_commits_update_state(self, app, fleet):
+        hotel_id = fleet['hotel_id']
+        FleetStateService.available_count(hotel_id)  # load
+
+        busy_id = fleet['buggy_ids'][1]
+        busy = Buggy.query.get(busy_id)
+        busy.status = BuggyStatus.AVAILABLE
+        BuggyRequest.query.filter_by(buggy_id=busy_id).one().status = RequestStatus.COMPLETED
+        offline = Buggy.query.get(fleet['buggy_ids'][2])
+        offline.status = BuggyStatus.AVAILABLE
+        BuggyDriver.query.filter_by(buggy_id=offline.id).one().is_active = True
+        db.session.commit()
+
+        _, statements = count_statements(lambda: (
+            FleetStateService.available_count(hotel_id),
+            FleetStateService.live_status(hotel_id, busy_id),
+            FleetStateService.active_drivers(hotel_id)
+        ))
+        assert statements == []
+        assert FleetStateService.available_count(hotel_id) == 3
+        assert FleetStateService.live_status(hotel_id, busy_id)['status'] == 'available'
+        assert len(FleetStateService.active_drivers(hotel_id)) == 3
+        assert FleetStateService.get_stats()['loads'] == 1
+
+    def test_rollback_is_not_applied(self, app, fleet):
+        hotel_id = fleet['hotel_id']
+        FleetStateService.available_count(hotel_id)
+
+        Buggy.query.get(fleet['buggy_ids'][0]).status = BuggyStatus.OFFLINE
+        db.session.flush()
+        db.session.rollback()
+
+        assert FleetStateService.available_count(hotel_id) == 1
+
+    def test_reconcile_picks_up_bulk_updates(self, app, fleet):
+        hotel_id = fleet['hotel_id']
+        FleetStateService.available_count(hotel_id)
+
+        Buggy.query.filter_by(hotel_id=hotel_id).update({Buggy.status: BuggyStatus.OFFLINE}, synchronize_session=False)
+        db.session.commit()
+        assert FleetStateService.available_count(hotel_id) == 1  # bulk UPDATE bypasses the listeners
+
+        assert FleetStateService.reconcile() == 3  # status and/or updated_at changed
+        assert FleetStateService.available_count(hotel_id) == 0
+
+    def test_create_request_confirms_empty_snapshot_with_db(self, app, fleet):
+        from app.services.request_service import RequestService
+        hotel_id = fleet['hotel_id']
+        Buggy.query.filter_by(hotel_id=hotel_id).update({Buggy.status: BuggyStatus.OFFLINE}, synchronize_session=False)
+        db.session.commit()
+        assert FleetStateService.available_count(hotel_id) == 0
+
+        # Another worker frees a buggy; this process's snapshot still says none
+        Buggy.query.filter_by(id=fleet['buggy_ids'][0]).update({Buggy.status: BuggyStatus.AVAILABLE},
+                                                               synchronize_session=False)
+        db.session.commit()
+        assert FleetStateService.available_count(hotel_id) == 0
+
+        request = RequestService.create_request(fleet['location_id'], room_number='101')
+        assert request.id is not None
+        assert FleetStateService.available_count(hotel_id) == 1  # stale state was reloaded
+
+
+class FakeBroker:
+    """Records publishes; handler stands in for the other workers' listener"""
+
+    def __init__(self):
+        self.published = []
+        self.handler = None
+
+    def publish(self, message):
+        self.published.append(message)
+        return 1
+
+    def subscribe(self, handler):
+        self.handler = handler
+
+
+class TestFleetStateBroadcast:
+    """Committed changes reach the other workers through the broker"""
+
+    @pytest.fixture
+    def broker(self, app, fleet):
+        broker = FakeBroker()
+        FleetStateService._broker = broker
+        yield broker
+        FleetStateService._broker = None
+
+    def test_commit_publishes_touched_hotels(self, app, fleet, broker):
+        # Nothing loaded in this worker: another worker may still hold the hotel
+        Buggy.query.get(fleet['buggy_ids'][0]).status = BuggyStatus.OFFLINE
+        db.session.commit()
+
+        assert broker.published == [{'origin': FleetStateService._origin, 'hotel_ids': [fleet['hotel_id']]}]
+
+    def test_association_change_publishes_buggy_hotel(self, app, fleet, broker):
+        BuggyDriver.query.filter_by(buggy_id=fleet['buggy_ids'][2]).one().is_active = True
+        db.session.commit()
+
+        assert broker.published[-1]['hotel_ids'] == [fleet['hotel_id']]
+
+    def test_rollback_publishes_nothing(self, app, fleet, broker):
+        Buggy.query.get(fleet['buggy_ids'][0]).status = BuggyStatus.OFFLINE
+        db.session.flush()
+        db.session.rollback()
+
+        assert broker.published == []
+
+    def test_other_worker_invalidation_drops_hotel(self, app, fleet, broker):
+        hotel_id = fleet['hotel_id']
+        assert FleetStateService.available_count(hotel_id) == 1
+        assert broker.handler is not None  # listener started on first load
+
+        # Another worker frees a buggy and broadcasts it
+        Buggy.query.filter_by(id=fleet['buggy_ids'][2]).update({Buggy.status: BuggyStatus.AVAILABLE},
+                                                               synchronize_session=False)
+        db.session.commit()
+        broker.handler({'origin': 'other-worker', 'hotel_ids': [hotel_id]})
+
+        assert FleetStateService.available_count(hotel_id) == 2
+        assert FleetStateService.get_stats()['loads'] == 2
+
+    def test_own_broadcast_is_ignored(self, app, fleet, broker):
+        hotel_id = fleet['hotel_id']
+        FleetStateService.available_count(hotel_id)
+
+        broker.handler({'origin': FleetStateService._origin, 'hotel_ids': [hotel_id]})
+
+        assert FleetStateService.get_stats()['loads'] == 1
@@ -0,0 +1,189 @@
+"""
+Test suite for chunked set-based maintenance jobs (MaintenanceService)
+"""
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import SystemUser, UserRole
+from app.models.location import Location
+from app.models.hotel import Hotel
+from app.models.request import BuggyRequest, RequestStatus
+from app.models.notification_log import NotificationLog
+from app.services.maintenance_service import MaintenanceService
+from app.services.background_jobs import BackgroundJobsService
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def hotel_data(app):
+    """Hotel with a location and two drivers (one without FCM token)"""
+    hotel = Hotel(name='Maintenance Hotel', address='Test Address', code=f'M{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    location = Location(hotel_id=hotel.id, name='Beach', qr_code_data=f'maint_qr_{uuid.uuid4().hex[:8]}')
+    drivers = []
+    for index, token in enumerate(['driver-token', None]):
+        driver = SystemUser(
+            username=f'maint_driver_{index}_{uuid.uuid4().hex[:6]}',
+            full_name=f'Maintenance Driver {index}',
+            role=UserRole.DRIVER,
+            hotel_id=hotel.id,
+            fcm_token=token
+        )
+        driver.set_password('test123')
+        drivers.append(driver)
+    db.session.add_all([location] + drivers)
+    db.session.commit()
+    return {'hotel_id': hotel.id, 'location_id': location.id, 'driver_ids': [d.id for d in drivers]}
+
+
+def count_writes(func):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('UPDATE', 'DELETE')):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, statements
+
+
+def make_log(user_id, **kwargs):
+    values = dict(user_id=user_id, notification_type='new_request', priority='high',
+                  title='Test', body='Test body', status='failed', retry_count=0)
+    values.update(kwargs)
+    return NotificationLog(**values)
+
+
+class TestGuestTokenExpiry:
+    """Expired guest tokens are cleared in chunks, valid ones are kept"""
+
+    def test_expired_tokens_cleared_in_chunks(self, app, hotel_data):
+        now = datetime.utcnow()
+        requests = [
+            BuggyRequest(hotel_id=hotel_data['hotel_id'], location_id=hotel_data['location_id'],
+                         status=RequestStatus.COMPLETED, guest_fcm_token=f'guest-{index}',
+                         guest_fcm_token_expires_at=now + timedelta(minutes=-5 if index < 5 else 30))
+            for index in range(6)
+        ]
+        db.session.add_all(requests)
+        db.session.commit()
+        ids = [r.id for r in requests]
+
+        with patch.object(MaintenanceService, 'BATCH_SIZE', 2):
+            count, writes = count_writes(lambda: MaintenanceService.expire_guest_tokens(now))
+        assert count == 5
+        assert len(writes) == 3
+
+        db.session.expire_all()
+        tokens = [db.session.get(BuggyRequest, request_id).guest_fcm_token for request_id in ids]
+        assert tokens == [None] * 5 + ['guest-5']
+
+    def test_pass_is_limited_to_max_rows(self, app, hotel_data):
+        now = datetime.utcnow()
+        db.session.add_all([
+            BuggyRequest(hotel_id=hotel_data['hotel_id'], location_id=hotel_data['location_id'],
+                         guest_fcm_token='guest', guest_fcm_token_expires_at=now - timedelta(hours=1))
+            for _ in range(5)
+        ])
+        db.session.commit()
+
+        with patch.object(MaintenanceService, 'BATCH_SIZE', 2), \
+                patch.object(MaintenanceService, 'MAX_ROWS_PER_PASS', 3):
+            assert MaintenanceService.expire_guest_tokens(now) == 3
+            assert MaintenanceService.expire_guest_tokens(now) == 2
+            assert MaintenanceService.expire_guest_tokens(now) == 0
+
+    def test_register_token_does_no_cleanup(self, app, hotel_data):
+        stale = BuggyRequest(hotel_id=hotel_data['hotel_id'], location_id=hotel_data['location_id'],
+                             guest_fcm_token='stale', guest_fcm_token_expires_at=datetime.utcnow() - timedelta(hours=2))
+        fresh = BuggyRequest(hotel_id=hotel_data['hotel_id'], location_id=hotel_data['location_id'])
+        db.session.add_all([stale, fresh])
+        db.session.commit()
+        stale_id = stale.id
+
+        response = app.test_client().post('/api/guest/register-fcm-token',
+                                          json={'token': 'new-token', 'request_id': fresh.id})
+        assert response.status_code == 200
+
+        db.session.expire_all()
+        assert db.session.get(BuggyRequest, stale_id).guest_fcm_token == 'stale'
+
+
+class TestNotificationMaintenance:
+    """Notification log jobs write with bulk statements"""
+
+    def test_mark_permanently_failed(self, app, hotel_data):
+        driver_id = hotel_data['driver_ids'][0]
+        old = datetime.utcnow() - timedelta(hours=25)
+        logs = [
+            make_log(driver_id, retry_count=3, sent_at=old),
+            make_log(driver_id, retry_count=3, sent_at=old, error_message='Network error'),
+            make_log(driver_id, retry_count=1, sent_at=old),
+        ]
+        db.session.add_all(logs)
+        db.session.commit()
+        ids = [log.id for log in logs]
+
+        count, writes = count_writes(MaintenanceService.mark_permanently_failed)
+        assert count == 2
+        assert len(writes) == 1
+
+        db.session.expire_all()
+        results = [db.session.get(NotificationLog, log_id) for log_id in ids]
+        assert [(log.status, log.error_message) for log in results] == [
+            ('permanently_failed', 'Max retry attempts exceeded'),
+            ('permanently_failed', 'Network error'),
+            ('failed', None),
+        ]
+
+    def test_retry_failed_notifications_bulk_results(self, app, hotel_data):
+        with_token, without_token = hotel_data['driver_ids']
+        now = datetime.utcnow()
+        logs = [
+            make_log(with_token, retry_count=0, sent_at=now - timedelta(minutes=1)),   # due, succeeds
+            make_log(with_token, retry_count=2, sent_at=now - timedelta(minutes=5)),   # due, fails for good
+            make_log(with_token, retry_count=2, sent_at=now - timedelta(seconds=30)),  # backoff not elapsed
+            make_log(without_token, retry_count=0, sent_at=now - timedelta(minutes=1)),
+        ]
+        db.session.add_all(logs)
+        db.session.commit()
+        ids = [log.id for log in logs]
+        BackgroundJobsService.app_instance = app
+
+        try:
+            with patch('app.services.fcm_notification_service.FCMNotificationService.send_to_token',
+                       side_effect=[True, False]) as send:
+                BackgroundJobsService.retry_failed_notifications()
+        finally:
+            BackgroundJobsService.app_instance = None
+        assert send.call_count == 2
+
+        db.session.expire_all()
+        results = [db.session.get(NotificationLog, log_id) for log_id in ids]
+        assert [(log.status, log.retry_count) for log in results] == [
+            ('sent', 1),
+            ('permanently_failed', 3),
+            ('failed', 2),
+            ('permanently_failed', 0),
+        ]
+        assert results[3].error_message == 'No FCM token'
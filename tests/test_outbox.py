@@ -0,0 +1,129 @@
+"""
+Test suite for the transactional outbox
+"""
+import pytest
+from unittest.mock import patch
+from app.models.outbox import OutboxEvent, OutboxStatus
+from app.services.outbox_service import OutboxService
+from app.services.fcm_notification_service import FCMNotificationService
+from app.utils.retry_scheduler import RetryScheduler
+
+
+DELIVERED = []
+
+
+@OutboxService.handler('test.echo')
+def _echo(payload):
+    DELIVERED.append(payload)
+
+
+@OutboxService.handler('test.boom')
+def _boom(payload):
+    raise RuntimeError('boom')
+
+
+class TestOutboxService:
+    """Test outbox enqueue and delivery"""
+
+    def setup_method(self):
+        DELIVERED.clear()
+
+    def test_enqueue_is_part_of_transaction(self, app, db_session):
+        """Rolled back transaction leaves no outbox row"""
+        event = OutboxService.enqueue('test.echo', {'value': 1}, hotel_id=1, aggregate_id=10)
+        db_session.flush()
+        event_id = event.id
+        db_session.rollback()
+
+        assert OutboxEvent.query.get(event_id) is None
+
+    def test_publish_delivers_inline_without_worker(self, app, db_session):
+        """Without a running worker, publish delivers in the caller's thread"""
+        event = OutboxService.enqueue('test.echo', {'value': 42}, hotel_id=1)
+        db_session.commit()
+
+        OutboxService.publish([event])
+
+        assert DELIVERED == [{'value': 42}]
+        stored = OutboxEvent.query.get(event.id)
+        assert stored.status == OutboxStatus.DELIVERED
+        assert stored.attempts == 1
+        assert stored.processed_at is not None
+
+    def test_failed_handler_is_rescheduled(self, app, db_session):
+        """Handler errors put the event back as pending with backoff"""
+        event = OutboxService.enqueue('test.boom', {}, hotel_id=1)
+        db_session.commit()
+
+        OutboxService.publish([event])
+
+        stored = OutboxEvent.query.get(event.id)
+        assert stored.status == OutboxStatus.PENDING
+        assert stored.attempts == 1
+        assert 'boom' in stored.last_error
+        assert stored.available_at > stored.created_at
+
+    def test_failed_handler_gives_up_after_max_attempts(self, app, db_session):
+        """Events exceeding MAX_ATTEMPTS are marked failed"""
+        event = OutboxService.enqueue('test.boom', {}, hotel_id=1)
+        event.attempts = OutboxService.MAX_ATTEMPTS - 1
+        db_session.commit()
+
+        OutboxService.publish([event])
+
+        assert OutboxEvent.query.get(event.id).status == OutboxStatus.FAILED
+
+    def test_unknown_event_type_fails(self, app, db_session):
+        """Events without a handler fail immediately"""
+        event = OutboxService.enqueue('test.unknown', {}, hotel_id=1)
+        db_session.commit()
+
+        OutboxService.publish([event])
+
+        stored = OutboxEvent.query.get(event.id)
+        assert stored.status == OutboxStatus.FAILED
+        assert 'No outbox handler' in stored.last_error
+
+    def test_guest_status_send_failure_is_retried(self, app, db_session):
+        """A failed guest push is rescheduled instead of marked delivered"""
+        event = OutboxService.enqueue('fcm.guest_status', {
+            'request_id': 1, 'status': 'accepted', 'title': 'T', 'body': 'B'
+        }, hotel_id=1)
+        db_session.commit()
+
+        with patch('app.routes.guest_notification_api.get_guest_token', return_value='guest_token'), \
+                patch.object(FCMNotificationService, 'initialize', return_value=True), \
+                patch('firebase_admin.messaging.send', side_effect=Exception('UNAVAILABLE')) as mock_send, \
+                patch.object(RetryScheduler, 'schedule') as mock_schedule:
+            OutboxService.publish([event])
+
+        stored = OutboxEvent.query.get(event.id)
+        assert stored.status == OutboxStatus.PENDING
+        assert stored.attempts == 1
+        # One push per outbox attempt; the sender schedules no retries of its own
+        assert mock_send.call_count == 1
+        assert not mock_schedule.called
+
+    def test_drain_keeps_later_retries_scheduled(self, app, monkeypatch):
+        """Draining one due retry does not forget a later one"""
+        clock = [1000.0]
+        monkeypatch.setattr('app.services.outbox_service.time.monotonic', lambda: clock[0])
+        monkeypatch.setattr(OutboxService, '_retry_due', [])
+        monkeypatch.setattr(OutboxService, '_last_sweep', clock[0])
+
+        with patch.object(OutboxService, '_claim', return_value=[]) as mock_claim:
+            OutboxService._note_retry(5)
+            OutboxService._note_retry(20)
+
+            clock[0] += 6
+            OutboxService.drain()
+            assert mock_claim.call_count == 1
+
+            clock[0] += 4  # nothing due
+            OutboxService.drain()
+            assert mock_claim.call_count == 1
+
+            clock[0] += 11  # second retry due, long before SWEEP_INTERVAL
+            OutboxService.drain()
+            assert mock_claim.call_count == 2
+            assert OutboxService._retry_due == []
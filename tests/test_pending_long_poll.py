@@ -0,0 +1,154 @@
+"""
+Test suite for long-poll driver pending requests (PendingRequestNotifier)
+"""
+import pytest
+import uuid
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import SystemUser, UserRole
+from app.models.buggy import Buggy, BuggyStatus
+from app.models.buggy_driver import BuggyDriver
+from app.models.location import Location
+from app.models.hotel import Hotel
+from app.models.request import BuggyRequest, RequestStatus
+from app.services.pending_request_notifier import PendingRequestNotifier
+from app.services.access_metrics_service import AccessMetricsService
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        PendingRequestNotifier.reset()
+        AccessMetricsService.reset()
+
+
+@pytest.fixture
+def driver(app):
+    """Driver with a primary buggy and one pending request in the hotel"""
+    hotel = Hotel(name='Long Poll Hotel', address='Test Address', code=f'LP{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    location = Location(hotel_id=hotel.id, name='Beach', qr_code_data=f'poll_qr_{uuid.uuid4().hex[:8]}')
+    user = SystemUser(
+        username=f'poll_driver_{uuid.uuid4().hex[:6]}',
+        full_name='Poll Driver',
+        role=UserRole.DRIVER,
+        hotel_id=hotel.id
+    )
+    user.set_password('test123')
+    buggy = Buggy(hotel_id=hotel.id, code=f'LB{uuid.uuid4().hex[:4]}', status=BuggyStatus.AVAILABLE)
+    db.session.add_all([location, user, buggy])
+    db.session.commit()
+
+    db.session.add_all([
+        BuggyDriver(buggy_id=buggy.id, driver_id=user.id, is_active=True, is_primary=True),
+        BuggyRequest(hotel_id=hotel.id, location_id=location.id, status=RequestStatus.PENDING),
+    ])
+    db.session.commit()
+    return {'hotel_id': hotel.id, 'user_id': user.id, 'location_id': location.id}
+
+
+@pytest.fixture
+def client(app, driver):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = driver['user_id']
+        sess['hotel_id'] = driver['hotel_id']
+        sess['role'] = 'driver'
+    return client
+
+
+def count_statements(func):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, statements
+
+
+class TestPendingRequestNotifier:
+    """Versions move only when a hotel's PENDING set changes"""
+
+    def test_commits_bump_only_pending_set_changes(self, app, driver):
+        hotel_id = driver['hotel_id']
+        start = PendingRequestNotifier.version(hotel_id)
+
+        request = BuggyRequest(hotel_id=hotel_id, location_id=driver['location_id'],
+                               status=RequestStatus.PENDING)
+        db.session.add(request)
+        db.session.commit()
+        created = PendingRequestNotifier.version(hotel_id)
+        assert created == start + 1
+
+        request.notes = 'Two guests'
+        db.session.commit()
+        assert PendingRequestNotifier.version(hotel_id) == created
+
+        request.status = RequestStatus.CANCELLED
+        db.session.rollback()
+        assert PendingRequestNotifier.version(hotel_id) == created
+
+        request.status = RequestStatus.ACCEPTED
+        db.session.commit()
+        assert PendingRequestNotifier.version(hotel_id) == created + 1
+
+    def test_wait_returns_immediately_on_stale_version(self, app):
+        current = PendingRequestNotifier.version(1)
+        assert PendingRequestNotifier.wait(1, current - 1, timeout=30) == (current, True)
+
+        PendingRequestNotifier.bump(1)
+        assert PendingRequestNotifier.wait(1, current, timeout=30) == (current + 1, True)
+
+    def test_wait_times_out_unchanged(self, app):
+        current = PendingRequestNotifier.version(1)
+        assert PendingRequestNotifier.wait(1, current, timeout=0) == (current, False)
+        stats = PendingRequestNotifier.get_stats()
+        assert stats['timeouts'] == 1
+        assert stats['parked'] == 0
+
+
+class TestLongPollEndpoint:
+    """pending-requests answers unchanged polls without touching buggy_requests"""
+
+    def test_first_poll_returns_version(self, app, driver, client):
+        data = client.get('/api/driver/pending-requests').get_json()
+        assert data['changed'] is True
+        assert data['total'] == 1
+        assert data['version'] == PendingRequestNotifier.version(driver['hotel_id'])
+
+    def test_unchanged_poll_skips_query(self, app, driver, client):
+        version = client.get('/api/driver/pending-requests').get_json()['version']
+
+        response, statements = count_statements(
+            lambda: client.get(f'/api/driver/pending-requests?since={version}&wait=0')
+        )
+        assert response.get_json() == {'success': True, 'changed': False, 'version': version}
+        assert not [s for s in statements if 'buggy_requests' in s]
+
+        summary = AccessMetricsService.summarize(driver['hotel_id'], endpoint='driver.pending_requests.unchanged')
+        assert summary[0]['request_count'] == 1
+
+    def test_changed_poll_returns_list(self, app, driver, client):
+        version = client.get('/api/driver/pending-requests').get_json()['version']
+        db.session.add(BuggyRequest(hotel_id=driver['hotel_id'], location_id=driver['location_id'],
+                                    status=RequestStatus.PENDING))
+        db.session.commit()
+
+        data = client.get(f'/api/driver/pending-requests?since={version}&wait=0').get_json()
+        assert data['changed'] is True
+        assert data['total'] == 2
+        assert data['version'] == version + 1
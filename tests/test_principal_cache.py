@@ -0,0 +1,125 @@
+"""
+Test suite for the request-scoped and cross-request principal cache
+"""
+import pytest
+import uuid
+from sqlalchemy import event
+from app import create_app, db, cache
+from app.models.user import SystemUser, UserRole
+from app.models.buggy import Buggy, BuggyStatus
+from app.models.buggy_driver import BuggyDriver
+from app.models.hotel import Hotel
+from app.utils.principal import Principal, PrincipalCache
+
+
+@pytest.fixture
+def app():
+    """Create test app with a real (in-process) cache backend"""
+    app = create_app('testing')
+    cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        cache.clear()
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def driver(app):
+    """Driver with a primary buggy"""
+    hotel = Hotel(name='Principal Hotel', address='Test Address', code=f'P{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    user = SystemUser(
+        username=f'principal_driver_{uuid.uuid4().hex[:6]}',
+        full_name='Principal Driver',
+        role=UserRole.DRIVER,
+        hotel_id=hotel.id
+    )
+    user.set_password('test123')
+    buggy = Buggy(hotel_id=hotel.id, code=f'PB{uuid.uuid4().hex[:4]}', status=BuggyStatus.AVAILABLE)
+    spare = Buggy(hotel_id=hotel.id, code=f'PS{uuid.uuid4().hex[:4]}', status=BuggyStatus.AVAILABLE)
+    db.session.add_all([user, buggy, spare])
+    db.session.commit()
+
+    db.session.add(BuggyDriver(buggy_id=buggy.id, driver_id=user.id, is_active=True, is_primary=True))
+    db.session.commit()
+    return {'hotel_id': hotel.id, 'user_id': user.id, 'buggy_id': buggy.id, 'spare_id': spare.id}
+
+
+def count_statements(func):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, statements
+
+
+class TestPrincipalCache:
+    """Snapshots are loaded with one query and dropped on committed changes"""
+
+    def test_snapshot_is_loaded_once(self, app, driver):
+        principal, statements = count_statements(lambda: PrincipalCache.get(driver['user_id']))
+        assert principal == Principal(driver['user_id'], UserRole.DRIVER, driver['hotel_id'], True,
+                                      driver['buggy_id'])
+        assert len(statements) == 1
+
+        db.session.remove()  # no session-bound state in the cached value
+        cached, statements = count_statements(lambda: PrincipalCache.get(driver['user_id']))
+        assert cached == principal
+        assert statements == []
+
+    def test_user_edit_invalidates(self, app, driver):
+        PrincipalCache.get(driver['user_id'])
+
+        user = db.session.get(SystemUser, driver['user_id'])
+        user.is_active = False
+        db.session.commit()
+
+        assert PrincipalCache.get(driver['user_id']).is_active is False
+
+    def test_assignment_change_invalidates(self, app, driver):
+        PrincipalCache.get(driver['user_id'])
+
+        assoc = BuggyDriver.query.filter_by(driver_id=driver['user_id']).one()
+        assoc.buggy_id = driver['spare_id']
+        db.session.commit()
+
+        assert PrincipalCache.get(driver['user_id']).buggy_id == driver['spare_id']
+
+    def test_rollback_keeps_snapshot(self, app, driver):
+        principal = PrincipalCache.get(driver['user_id'])
+
+        user = db.session.get(SystemUser, driver['user_id'])
+        user.role = UserRole.ADMIN
+        db.session.flush()
+        db.session.rollback()
+
+        _, statements = count_statements(lambda: PrincipalCache.get(driver['user_id']))
+        assert statements == []
+        assert PrincipalCache.get(driver['user_id']) == principal
+
+
+class TestDriverPollAuth:
+    """Steady-state polls resolve the driver without touching users or assignments"""
+
+    def test_active_request_poll_skips_user_queries(self, app, driver):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = driver['user_id']
+            sess['role'] = 'driver'
+
+        assert client.get('/api/driver/active-request').status_code == 200
+
+        response, statements = count_statements(lambda: client.get('/api/driver/active-request'))
+        assert response.status_code == 200
+        assert not [s for s in statements if 'system_users' in s or 'buggy_drivers' in s]
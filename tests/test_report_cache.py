@@ -0,0 +1,148 @@
+"""
+Test suite for the versioned report cache
+"""
+import pytest
+import uuid
+from datetime import timedelta
+from unittest.mock import patch
+from app import create_app, db, cache
+from app.models import get_current_timestamp
+from app.models.request import BuggyRequest, RequestStatus
+from app.models.location import Location
+from app.models.hotel import Hotel
+from app.models.user import SystemUser, UserRole
+from app.services.report_cache import ReportCache
+
+
+@pytest.fixture
+def app():
+    """Create test app with a real (in-process) cache backend"""
+    app = create_app('testing')
+    cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        cache.clear()
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def location(app):
+    hotel = Hotel(name='Cache Hotel', address='Test Address', code=f'C{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+    location = Location(
+        hotel_id=hotel.id,
+        name='Lobby',
+        qr_code_data=f'cache_qr_{uuid.uuid4().hex[:8]}',
+        is_active=True
+    )
+    db.session.add(location)
+    db.session.commit()
+    return location
+
+
+def add_request(location, requested_at):
+    request_obj = BuggyRequest(
+        hotel_id=location.hotel_id,
+        location_id=location.id,
+        status=RequestStatus.PENDING,
+        requested_at=requested_at
+    )
+    db.session.add(request_obj)
+    db.session.commit()
+    return request_obj
+
+
+class CountingReport:
+    """compute() stand-in that counts invocations"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, start, end):
+        self.calls += 1
+        return {'calls': self.calls}
+
+
+class TestReportCache:
+    """Results are reused until a request change bumps the hotel version"""
+
+    def test_open_range_invalidated_by_request_commit(self, app, location):
+        hotel_id = location.hotel_id
+        report = CountingReport()
+        now = get_current_timestamp().replace(second=10, microsecond=0)
+
+        ReportCache.get_or_compute(hotel_id, 'test', now - timedelta(days=1), now, report)
+        ReportCache.get_or_compute(hotel_id, 'test', now - timedelta(days=1), now + timedelta(seconds=5), report)
+        assert report.calls == 1  # same normalized minute
+
+        add_request(location, now)
+        ReportCache.get_or_compute(hotel_id, 'test', now - timedelta(days=1), now, report)
+        assert report.calls == 2
+
+    def test_settled_range_survives_new_requests(self, app, location):
+        hotel_id = location.hotel_id
+        report = CountingReport()
+        now = get_current_timestamp()
+        start, end = now - timedelta(days=3), now - timedelta(days=2)
+
+        ReportCache.get_or_compute(hotel_id, 'test', start, end, report)
+        add_request(location, now)  # cannot fall into a past range
+        ReportCache.get_or_compute(hotel_id, 'test', start, end, report)
+        assert report.calls == 1
+
+        old_request = add_request(location, now - timedelta(days=2, hours=12))  # historic change
+        ReportCache.get_or_compute(hotel_id, 'test', start, end, report)
+        assert report.calls == 2
+
+        old_request.status = RequestStatus.UNANSWERED
+        db.session.commit()
+        ReportCache.get_or_compute(hotel_id, 'test', start, end, report)
+        assert report.calls == 3
+
+    def test_rollback_does_not_bump(self, app, location):
+        hotel_id = location.hotel_id
+        version = ReportCache.get_version(hotel_id)
+
+        db.session.add(BuggyRequest(
+            hotel_id=hotel_id,
+            location_id=location.id,
+            status=RequestStatus.PENDING
+        ))
+        db.session.flush()
+        db.session.rollback()
+
+        assert ReportCache.get_version(hotel_id) == version
+
+    def test_recent_range_end_is_not_settled(self, app, location):
+        now = get_current_timestamp()
+        with patch.object(cache, 'set', wraps=cache.set) as spy:
+            ReportCache.get_or_compute(location.hotel_id, 'test', now - timedelta(days=7),
+                                       now - timedelta(minutes=30), CountingReport())
+
+        timeouts = [c.kwargs['timeout'] for c in spy.call_args_list if c.args[0].startswith('report:')]
+        assert timeouts == [ReportCache.OPEN_RANGE_TIMEOUT]
+
+    def test_default_route_range_uses_local_clock(self, app, location):
+        """A rolling "last N days" range is an open range (no permanent per-minute keys)"""
+        admin = SystemUser(username=f'cache_admin_{uuid.uuid4().hex[:6]}', full_name='Admin',
+                           role=UserRole.ADMIN, hotel_id=location.hotel_id)
+        admin.set_password('test123')
+        db.session.add(admin)
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = admin.id
+            sess['role'] = 'admin'
+
+        with patch('app.routes.reports.ReportService.get_advanced_analytics', return_value={}), \
+                patch.object(cache, 'set', wraps=cache.set) as spy:
+            response = client.get('/api/reports/advanced-analytics')
+
+        assert response.status_code == 200
+        timeouts = [c.kwargs['timeout'] for c in spy.call_args_list if c.args[0].startswith('report:')]
+        assert timeouts == [ReportCache.OPEN_RANGE_TIMEOUT]
@@ -0,0 +1,127 @@
+"""
+Test suite for streaming report exports (write-only Excel, chunked CSV)
+"""
+import os
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from openpyxl import load_workbook
+from app import create_app, db
+from app.models.user import SystemUser, UserRole
+from app.models.request import BuggyRequest, RequestStatus
+from app.models.location import Location
+from app.models.hotel import Hotel
+from app.services.report_service import ReportService
+
+
+START = datetime(2026, 3, 2, 8, 0, 0)
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def hotel_with_requests(app):
+    """Hotel with an admin, one location and 25 requests"""
+    hotel = Hotel(name='Export Hotel', address='Test Address', code=f'E{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    location = Location(
+        hotel_id=hotel.id,
+        name='Lobby',
+        qr_code_data=f'export_qr_{uuid.uuid4().hex[:8]}',
+        is_active=True
+    )
+    admin = SystemUser(
+        username=f'export_admin_{uuid.uuid4().hex[:6]}',
+        full_name='Export Admin',
+        role=UserRole.ADMIN,
+        hotel_id=hotel.id,
+        is_active=True
+    )
+    admin.set_password('test123')
+    db.session.add_all([location, admin])
+    db.session.commit()
+
+    for index in range(25):
+        db.session.add(BuggyRequest(
+            hotel_id=hotel.id,
+            location_id=location.id,
+            room_number=str(100 + index),
+            status=RequestStatus.PENDING,
+            requested_at=START + timedelta(minutes=index)
+        ))
+    db.session.commit()
+    return {'hotel_id': hotel.id, 'admin_id': admin.id}
+
+
+class TestStreamingExports:
+    """Exports consume row iterators without materializing them"""
+
+    def test_iter_request_details_streams_in_chunks(self, app, hotel_with_requests, monkeypatch):
+        monkeypatch.setattr(ReportService, 'EXPORT_CHUNK_SIZE', 10)
+
+        rows = ReportService.iter_request_details(hotel_with_requests['hotel_id'])
+
+        assert not isinstance(rows, list)
+        rows = list(rows)
+        assert len(rows) == 25
+        assert rows[0]['room_number'] == '124'  # newest first
+        assert rows[0]['location_name'] == 'Lobby'
+        assert rows[0]['status'] == 'PENDING'
+
+    def test_write_excel_file_uses_write_only_sheet(self, app, hotel_with_requests):
+        rows = ReportService.iter_request_details(hotel_with_requests['hotel_id'])
+
+        path, record_count = ReportService.write_excel_file(rows, sheet_name='Request Details')
+        try:
+            sheet = load_workbook(path, read_only=True)['Request Details']
+            values = list(sheet.values)
+        finally:
+            chunks = list(ReportService.iter_file_chunks(path))
+
+        assert record_count == 25
+        assert values[0][0] == 'id'
+        assert len(values) == 26
+        assert b''.join(chunks)[:2] == b'PK'
+        assert not os.path.exists(path)
+
+    def test_stream_csv_yields_chunks(self, app, monkeypatch):
+        monkeypatch.setattr(ReportService, 'EXPORT_CHUNK_SIZE', 2)
+        rows = ({'id': index, 'room_number': str(index)} for index in range(5))
+
+        chunks = list(ReportService.stream_csv(rows))
+
+        assert chunks[0] == '\ufeff'
+        assert len(chunks) == 4  # BOM + 2 + 2 + 1 rows
+        assert ''.join(chunks).lstrip('\ufeff').splitlines() == ['id,room_number', '0,0', '1,1', '2,2', '3,3', '4,4']
+
+    def test_empty_export_raises_before_streaming(self, app):
+        with pytest.raises(ValueError):
+            ReportService.stream_csv(iter([]))
+        with pytest.raises(ValueError):
+            ReportService.write_excel_file(iter([]))
+
+    def test_csv_endpoint_streams_request_details(self, app, hotel_with_requests):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = hotel_with_requests['admin_id']
+
+        response = client.get('/api/reports/export/csv/request-details')
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'text/csv'
+        lines = response.get_data(as_text=True).lstrip('\ufeff').splitlines()
+        assert lines[0].startswith('id,location_name')
+        assert len(lines) == 26
@@ -0,0 +1,117 @@
+"""
+Test suite for the request timeout timer wheel (RequestExpiryService)
+"""
+import pytest
+import uuid
+from datetime import timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models import get_current_timestamp
+from app.models.location import Location
+from app.models.hotel import Hotel
+from app.models.request import BuggyRequest, RequestStatus
+from app.services.request_expiry_service import RequestExpiryService
+from app.services.request_rollup_service import RequestRollupService
+from app.tasks.timeout_checker import TIMEOUT_DURATION
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        RequestExpiryService.reset()
+
+
+@pytest.fixture
+def requests(app):
+    """Hotel with three PENDING requests created at the same time"""
+    hotel = Hotel(name='Expiry Hotel', address='Test Address', code=f'E{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    location = Location(hotel_id=hotel.id, name='Pool', qr_code_data=f'expiry_qr_{uuid.uuid4().hex[:8]}')
+    db.session.add(location)
+    db.session.commit()
+
+    requested_at = get_current_timestamp().replace(microsecond=0) - timedelta(minutes=5)
+    items = [
+        BuggyRequest(hotel_id=hotel.id, location_id=location.id, status=RequestStatus.PENDING,
+                     requested_at=requested_at)
+        for _ in range(3)
+    ]
+    db.session.add_all(items)
+    db.session.commit()
+    return {
+        'hotel_id': hotel.id,
+        'request_ids': [r.id for r in items],
+        'requested_at': requested_at
+    }
+
+
+def count_statements(func):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, statements
+
+
+class TestRequestExpiryTimers:
+    """Timers follow committed request status"""
+
+    def test_commits_arm_and_disarm(self, app, requests):
+        assert RequestExpiryService.get_stats()['pending_timers'] == 3
+
+        request = db.session.get(BuggyRequest, requests['request_ids'][0])
+        request.status = RequestStatus.ACCEPTED
+        db.session.commit()
+        assert RequestExpiryService.get_stats()['pending_timers'] == 2
+
+    def test_tick_before_deadline_expires_nothing(self, app, requests):
+        now = requests['requested_at'] + TIMEOUT_DURATION - timedelta(seconds=30)
+
+        expired, statements = count_statements(lambda: RequestExpiryService.tick(now))
+        assert expired == 0
+        assert statements == []
+
+    def test_tick_expires_due_requests_in_one_update(self, app, requests):
+        accepted_id = requests['request_ids'][0]
+        db.session.get(BuggyRequest, accepted_id).status = RequestStatus.ACCEPTED
+        db.session.commit()
+
+        now = requests['requested_at'] + TIMEOUT_DURATION + timedelta(seconds=RequestExpiryService.TICK_SECONDS)
+        expired, statements = count_statements(lambda: RequestExpiryService.tick(now))
+        assert expired == 2
+        assert len([s for s in statements if s.lstrip().upper().startswith('UPDATE BUGGY_REQUESTS')]) == 1
+
+        db.session.expire_all()
+        for request_id in requests['request_ids'][1:]:
+            request = db.session.get(BuggyRequest, request_id)
+            assert request.status == RequestStatus.UNANSWERED
+            assert request.timeout_at == now
+            assert request.response_time == int((now - requests['requested_at']).total_seconds())
+        assert db.session.get(BuggyRequest, accepted_id).status == RequestStatus.ACCEPTED
+
+        assert RequestRollupService.approximate_count(requests['hotel_id'], RequestStatus.UNANSWERED) == 2
+        assert RequestRollupService.approximate_count(requests['hotel_id'], RequestStatus.PENDING) == 0
+        assert RequestExpiryService.get_stats()['pending_timers'] == 0
+
+    def test_reconcile_rearms_after_restart(self, app, requests):
+        RequestExpiryService.reset()
+        assert RequestExpiryService.get_stats()['pending_timers'] == 0
+
+        assert RequestExpiryService.reconcile() == 3
+        now = requests['requested_at'] + TIMEOUT_DURATION + timedelta(minutes=5)
+        assert RequestExpiryService.tick(now) == 3
@@ -0,0 +1,115 @@
+"""
+Test suite for keyset pagination on GET /api/requests
+"""
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models.user import SystemUser, UserRole
+from app.models.request import BuggyRequest, RequestStatus
+from app.models.location import Location
+from app.models.hotel import Hotel
+from app.routes import api_requests
+
+
+START = datetime(2026, 3, 2, 8, 0, 0)
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Client logged in as a hotel admin with 7 requests (two share a timestamp)"""
+    hotel = Hotel(name='Paging Hotel', address='Test Address', code=f'P{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    location = Location(
+        hotel_id=hotel.id,
+        name='Lobby',
+        qr_code_data=f'paging_qr_{uuid.uuid4().hex[:8]}',
+        is_active=True
+    )
+    admin = SystemUser(
+        username=f'paging_admin_{uuid.uuid4().hex[:6]}',
+        full_name='Paging Admin',
+        role=UserRole.ADMIN,
+        hotel_id=hotel.id,
+        is_active=True
+    )
+    admin.set_password('test123')
+    db.session.add_all([location, admin])
+    db.session.commit()
+
+    minutes = [0, 10, 20, 20, 30, 40, 50]
+    for index, minute in enumerate(minutes):
+        db.session.add(BuggyRequest(
+            hotel_id=hotel.id,
+            location_id=location.id,
+            room_number=str(100 + index),
+            status=RequestStatus.COMPLETED if index % 2 else RequestStatus.PENDING,
+            requested_at=START + timedelta(minutes=minute)
+        ))
+    db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin.id
+    return client
+
+
+def fetch_all(client, query):
+    """Follow next_cursor until the last page"""
+    pages, cursor = [], None
+    while True:
+        url = f'/api/requests?{query}' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        pages.append(data)
+        cursor = data['next_cursor']
+        if not cursor:
+            return pages
+
+
+class TestRequestKeysetPagination:
+    """Pages are stable, bounded and cover every row exactly once"""
+
+    def test_pages_cover_all_rows_in_order(self, app, client):
+        pages = fetch_all(client, 'limit=3')
+
+        assert [len(page['requests']) for page in pages] == [3, 3, 1]
+        assert [page['has_more'] for page in pages] == [True, True, False]
+        keys = [(r['requested_at'], r['id']) for page in pages for r in page['requests']]
+        assert len(set(keys)) == 7
+        assert keys == sorted(keys, reverse=True)
+
+    def test_page_size_is_server_enforced(self, app, client, monkeypatch):
+        monkeypatch.setattr(api_requests, 'REQUESTS_MAX_PAGE_SIZE', 2)
+
+        data = client.get('/api/requests?limit=1000').get_json()
+
+        assert data['limit'] == 2
+        assert len(data['requests']) == 2
+
+    def test_filters_and_approximate_total(self, app, client):
+        data = client.get(
+            '/api/requests?status=PENDING&include_total=1'
+            f'&start_date={(START + timedelta(minutes=15)).isoformat()}'
+        ).get_json()
+
+        assert data['approx_total'] == 4  # hour granularity: start bound ignored within the hour
+        assert [r['room_number'] for r in data['requests']] == ['106', '104', '102']
+
+    def test_invalid_cursor_is_rejected(self, app, client):
+        response = client.get('/api/requests?cursor=not-a-cursor')
+
+        assert response.status_code == 400
@@ -0,0 +1,284 @@
+"""
+Test suite for hourly request rollups and the reports built on them
+"""
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import SystemUser, UserRole
+from app.models.request import BuggyRequest, RequestStatus
+from app.models.request_rollup import RequestHourlyRollup
+from app.models.buggy import Buggy, BuggyStatus
+from app.models.location import Location
+from app.models.hotel import Hotel
+from app.services.report_service import ReportService
+from app.services.request_rollup_service import RequestRollupService
+
+
+DAY = datetime(2026, 3, 2, 0, 0, 0)  # a Monday
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def fleet(app):
+    """Hotel with one location, one driver and one buggy"""
+    hotel = Hotel(name='Rollup Hotel', address='Test Address', code=f'R{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    location = Location(
+        hotel_id=hotel.id,
+        name='Lobby',
+        qr_code_data=f'rollup_qr_{uuid.uuid4().hex[:8]}',
+        is_active=True
+    )
+    driver = SystemUser(
+        username=f'rollup_driver_{uuid.uuid4().hex[:6]}',
+        full_name='Rollup Driver',
+        role=UserRole.DRIVER,
+        hotel_id=hotel.id,
+        is_active=True
+    )
+    driver.set_password('test123')
+    db.session.add_all([location, driver])
+    db.session.commit()
+
+    buggy = Buggy(hotel_id=hotel.id, code=f'RB{uuid.uuid4().hex[:4]}', status=BuggyStatus.AVAILABLE)
+    db.session.add(buggy)
+    db.session.commit()
+
+    return {'hotel': hotel, 'location': location, 'driver': driver, 'buggy': buggy}
+
+
+def make_request(fleet, requested_at):
+    request_obj = BuggyRequest(
+        hotel_id=fleet['hotel'].id,
+        location_id=fleet['location'].id,
+        room_number='101',
+        status=RequestStatus.PENDING,
+        requested_at=requested_at
+    )
+    db.session.add(request_obj)
+    db.session.commit()
+    return request_obj
+
+
+def complete_request(fleet, request_obj, response_seconds, completion_seconds):
+    request_obj.status = RequestStatus.ACCEPTED
+    request_obj.buggy_id = fleet['buggy'].id
+    request_obj.accepted_by_id = fleet['driver'].id
+    request_obj.accepted_at = request_obj.requested_at + timedelta(seconds=response_seconds)
+    db.session.commit()
+
+    request_obj.status = RequestStatus.COMPLETED
+    request_obj.completed_at = request_obj.requested_at + timedelta(seconds=completion_seconds)
+    db.session.commit()
+
+
+def rollup_snapshot():
+    """Non-empty rollup rows as comparable dicts"""
+    snapshot = {}
+    for row in RequestHourlyRollup.query.all():
+        counters = {name: getattr(row, name) for name in RequestHourlyRollup.COUNTERS if getattr(row, name)}
+        if counters:
+            snapshot[(row.location_id, row.buggy_id, row.driver_id, row.hour_start)] = counters
+    return snapshot
+
+
+class TestRollupMaintenance:
+    """Rollups follow request changes incrementally"""
+
+    def test_new_request_counts_as_pending(self, app, fleet):
+        make_request(fleet, DAY.replace(hour=10, minute=15))
+
+        assert rollup_snapshot() == {
+            (fleet['location'].id, 0, 0, DAY.replace(hour=10)): {'total_count': 1, 'pending_count': 1}
+        }
+
+    def test_lifecycle_moves_contribution(self, app, fleet):
+        request_obj = make_request(fleet, DAY.replace(hour=10, minute=15))
+        complete_request(fleet, request_obj, response_seconds=60, completion_seconds=600)
+
+        assert rollup_snapshot() == {
+            (fleet['location'].id, fleet['buggy'].id, fleet['driver'].id, DAY.replace(hour=10)): {
+                'total_count': 1,
+                'completed_count': 1,
+                'response_time_sum': 60,
+                'response_time_count': 1,
+                'completion_time_sum': 600,
+                'completion_time_count': 1
+            }
+        }
+
+    def test_cancel_after_reload_and_delete(self, app, fleet):
+        location_id = fleet['location'].id
+        request_id = make_request(fleet, DAY.replace(hour=9, minute=5)).id
+        db.session.expunge_all()
+
+        request_obj = BuggyRequest.query.get(request_id)
+        request_obj.status = RequestStatus.CANCELLED
+        request_obj.cancelled_by = 'guest'
+        db.session.commit()
+
+        assert rollup_snapshot() == {
+            (location_id, 0, 0, DAY.replace(hour=9)): {
+                'total_count': 1, 'cancelled_count': 1, 'cancelled_by_guest_count': 1
+            }
+        }
+
+        db.session.delete(request_obj)
+        db.session.commit()
+
+        assert rollup_snapshot() == {}
+
+    def test_rebuild_matches_incremental(self, app, fleet):
+        for minute in (0, 20, 59):
+            make_request(fleet, DAY.replace(hour=8, minute=minute))
+        complete_request(fleet, make_request(fleet, DAY.replace(hour=14, minute=30)), 45, 900)
+        incremental = rollup_snapshot()
+
+        db.session.execute(RequestHourlyRollup.__table__.delete())
+        db.session.commit()
+        written = RequestRollupService.rebuild(fleet['hotel'].id)
+
+        assert written == 2
+        assert rollup_snapshot() == incremental
+
+
+class TestRollupReports:
+    """Reports read rollups and stay exact on partial-hour edges"""
+
+    def test_daily_summary(self, app, fleet):
+        complete_request(fleet, make_request(fleet, DAY.replace(hour=9, minute=10)), 60, 300)
+        complete_request(fleet, make_request(fleet, DAY.replace(hour=11, minute=40)), 180, 900)
+        make_request(fleet, DAY.replace(hour=23, minute=59))
+        make_request(fleet, DAY + timedelta(days=1))  # next day
+
+        report = ReportService.get_daily_summary(fleet['hotel'].id, DAY)
+
+        assert report['total_requests'] == 3
+        assert report['completed_requests'] == 2
+        assert report['PENDING_requests'] == 1
+        assert report['avg_response_time_seconds'] == 120
+        assert report['avg_completion_time_seconds'] == 600
+
+    def test_partial_hour_edges_use_raw_rows(self, app, fleet):
+        make_request(fleet, DAY.replace(hour=10, minute=10))  # before range
+        make_request(fleet, DAY.replace(hour=10, minute=40))  # leading edge
+        make_request(fleet, DAY.replace(hour=12, minute=0))   # whole hour
+        make_request(fleet, DAY.replace(hour=13, minute=15))  # trailing edge (inclusive end)
+        make_request(fleet, DAY.replace(hour=13, minute=16))  # after range
+
+        start = DAY.replace(hour=10, minute=30)
+        end = DAY.replace(hour=13, minute=15)
+        report = ReportService.get_location_analytics(fleet['hotel'].id, start, end)
+
+        assert len(report) == 1
+        assert report[0]['total_requests'] == 3
+        assert report[0]['hourly_distribution']['10:00'] == 1
+        assert report[0]['hourly_distribution']['12:00'] == 1
+        assert report[0]['hourly_distribution']['13:00'] == 1
+
+    def test_buggy_performance_and_advanced_analytics(self, app, fleet):
+        complete_request(fleet, make_request(fleet, DAY.replace(hour=9)), 60, 600)
+        request_obj = make_request(fleet, DAY.replace(hour=15, minute=30))
+        request_obj.status = RequestStatus.UNANSWERED
+        db.session.commit()
+
+        performance = ReportService.get_buggy_performance(
+            fleet['hotel'].id, start_date=DAY, end_date=DAY + timedelta(days=1)
+        )
+        assert performance[0]['total_requests'] == 1
+        assert performance[0]['avg_response_time_minutes'] == 1.0
+
+        analytics = ReportService.get_advanced_analytics(fleet['hotel'].id, DAY, DAY + timedelta(days=1))
+        assert analytics['summary']['total_requests'] == 2
+        assert analytics['summary']['unanswered'] == 1
+        assert analytics['peak_analysis']['daily_distribution']['Monday'] == 2
+        assert analytics['peak_analysis']['hourly_distribution']['15'] == 1
+        assert analytics['location_analysis']['top_locations'][0]['name'] == 'Lobby'
+        assert analytics['performance']['avg_completion_time_seconds'] == 600
+
+    def test_edge_rows_aggregate_in_sql(self, app, fleet):
+        """Edge-hour averages come from SQL conditional aggregates"""
+        complete_request(fleet, make_request(fleet, DAY.replace(hour=10, minute=40)), 90, 600)
+        complete_request(fleet, make_request(fleet, DAY.replace(hour=12, minute=0)), 30, 300)
+
+        report = ReportService.get_location_analytics(
+            fleet['hotel'].id, DAY.replace(hour=10, minute=30), DAY.replace(hour=13)
+        )
+
+        assert report[0]['completed_requests'] == 2
+        assert report[0]['avg_wait_time_minutes'] == 1.0
+
+    def test_location_report_is_one_query(self, app, fleet):
+        """Location analytics issues a single SELECT regardless of location count"""
+        for index in range(5):
+            db.session.add(Location(
+                hotel_id=fleet['hotel'].id,
+                name=f'Pool {index}',
+                qr_code_data=f'rollup_qr_{uuid.uuid4().hex[:8]}',
+                is_active=True
+            ))
+        db.session.commit()
+        make_request(fleet, DAY.replace(hour=10, minute=40))
+        hotel_id = fleet['hotel'].id
+
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            report = ReportService.get_location_analytics(
+                hotel_id, DAY.replace(hour=10, minute=30), DAY.replace(hour=13)
+            )
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        assert len(report) == 6
+        assert len(statements) == 1
+
+    def test_buggy_report_is_one_query(self, app, fleet):
+        """Buggy performance (with driver names) issues a single SELECT regardless of buggy count"""
+        from app.models.buggy_driver import BuggyDriver
+        hotel_id = fleet['hotel'].id
+        for index in range(9):
+            db.session.add(Buggy(hotel_id=hotel_id, code=f'RX{index}{uuid.uuid4().hex[:3]}',
+                                 status=BuggyStatus.AVAILABLE))
+        db.session.add(BuggyDriver(buggy_id=fleet['buggy'].id, driver_id=fleet['driver'].id,
+                                   is_active=True, is_primary=True))
+        db.session.commit()
+        make_request(fleet, DAY.replace(hour=10, minute=40))
+
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            report = ReportService.get_buggy_performance(
+                hotel_id, start_date=DAY.replace(hour=10), end_date=DAY.replace(hour=13)
+            )
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        assert len(report) == 10
+        assert len(statements) == 1
+        names = {row['buggy_id']: row['driver_name'] for row in report}
+        assert names[fleet['buggy'].id] == 'Rollup Driver'
+        assert sum(1 for name in names.values() if name is None) == 9
@@ -0,0 +1,69 @@
+"""
+Test suite for cached timezone formatting and the fast JSON provider
+"""
+import pytest
+import decimal
+import json
+from datetime import datetime, timedelta
+from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+from app import create_app
+from app.models import CYPRUS_TZ, format_cyprus_datetime
+from app.models.request import RequestStatus
+from app.utils.serialization import FastJSONProvider
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    return create_app('testing')
+
+
+class TestCyprusFormatting:
+    """Memoized offsets give the same strings as pytz localize()"""
+
+    @pytest.mark.parametrize('start', [
+        datetime(2026, 3, 29, 0, 0, 0),   # EET -> EEST (03:00 gap)
+        datetime(2026, 10, 25, 0, 0, 0),  # EEST -> EET (03:00 repeated)
+    ])
+    def test_matches_localize_across_dst_transitions(self, start):
+        for minutes in range(0, 6 * 60, 7):
+            dt = start + timedelta(minutes=minutes, seconds=minutes % 60, microseconds=minutes * 11)
+            assert format_cyprus_datetime(dt) == CYPRUS_TZ.localize(dt).isoformat()
+
+    def test_none(self):
+        assert format_cyprus_datetime(None) is None
+
+
+class TestFastJSONProvider:
+    """orjson output is interchangeable with the default provider"""
+
+    def test_registered_on_app(self, app):
+        assert isinstance(app.json, FastJSONProvider)
+
+    def test_matches_default_provider(self, app):
+        payload = {
+            'b': [1, 2.5, None, True],
+            'a': {'when': datetime(2026, 3, 2, 8, 30), 'price': decimal.Decimal('12.50')},
+            'name': 'Şoför'
+        }
+
+        fast = app.json.dumps(payload)
+        default = DefaultJSONProvider(app).dumps(payload)
+
+        assert json.loads(fast) == json.loads(default)
+        assert list(json.loads(fast)) == ['a', 'b', 'name']  # sorted keys
+
+    def test_enum_and_fallbacks(self, app):
+        assert app.json.loads(app.json.dumps({'status': RequestStatus.PENDING})) == {'status': 'PENDING'}
+        assert app.json.dumps(2 ** 70) == str(2 ** 70)  # stdlib fallback
+        with pytest.raises(TypeError):
+            app.json.dumps({'bad': object()})
+
+    def test_jsonify_response(self, app):
+        app.json.compact = True  # testing config runs in debug mode
+        with app.test_request_context():
+            response = jsonify(success=True, total=3)
+
+        assert response.mimetype == 'application/json'
+        assert response.get_data() == b'{"success":true,"total":3}\n'
@@ -0,0 +1,138 @@
+"""
+Test suite for the SSE fan-out broker
+"""
+import pytest
+import json
+import queue
+import uuid
+from app import create_app, db
+from app.models.user import SystemUser, UserRole
+from app.models.buggy import Buggy, BuggyStatus
+from app.models.buggy_driver import BuggyDriver
+from app.models.hotel import Hotel
+from app.routes import sse
+from app.services.sse_broker import SSEBroker, LocalSSEBroker, RedisSSEBroker
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        SSEBroker.reset()
+        yield app
+        SSEBroker.reset()
+        sse.active_connections.clear()
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def drivers(app):
+    """Hotel with one active and one inactive driver"""
+    hotel = Hotel(name='SSE Hotel', address='Test Address', code=f'E{uuid.uuid4().hex[:6]}')
+    db.session.add(hotel)
+    db.session.commit()
+
+    buggy = Buggy(hotel_id=hotel.id, code=f'SSE{uuid.uuid4().hex[:4]}', status=BuggyStatus.AVAILABLE)
+    users = []
+    for index in range(2):
+        user = SystemUser(
+            username=f'sse_driver_{index}_{uuid.uuid4().hex[:6]}',
+            full_name=f'SSE Driver {index}',
+            role=UserRole.DRIVER,
+            hotel_id=hotel.id,
+            is_active=True
+        )
+        user.set_password('test123')
+        users.append(user)
+    db.session.add_all([buggy] + users)
+    db.session.commit()
+
+    db.session.add_all([
+        BuggyDriver(buggy_id=buggy.id, driver_id=users[0].id, is_active=True),
+        BuggyDriver(buggy_id=buggy.id, driver_id=users[1].id, is_active=False),
+    ])
+    db.session.commit()
+    return {'hotel_id': hotel.id, 'active_id': users[0].id, 'inactive_id': users[1].id}
+
+
+class FakePubSub:
+    """Redis pubsub stand-in: yields queued messages, then stops the broker"""
+
+    def __init__(self, broker, messages):
+        self.broker = broker
+        self.messages = list(messages)
+        self.channels = []
+
+    def subscribe(self, channel):
+        self.channels.append(channel)
+
+    def get_message(self, timeout=None):
+        if not self.messages:
+            self.broker._stop.set()
+            return None
+        return {'type': 'message', 'data': self.messages.pop(0)}
+
+    def close(self):
+        pass
+
+
+class FakeRedis:
+    """Records PUBLISH calls; pubsub() replays them to the listener"""
+
+    def __init__(self):
+        self.published = []
+        self.broker = None
+
+    def publish(self, channel, payload):
+        self.published.append((channel, payload))
+        return 2  # two subscribed workers
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self.broker, [payload for _, payload in self.published])
+
+
+class TestSSEFanOut:
+    """Events go through the broker and land on local driver queues"""
+
+    def test_local_broker_delivers_to_active_drivers(self, app, drivers):
+        assert isinstance(SSEBroker.get(), LocalSSEBroker)
+        SSEBroker.get().subscribe(sse.deliver_local)
+        active_queue = sse.get_driver_queue(drivers['active_id'])
+        inactive_queue = sse.get_driver_queue(drivers['inactive_id'])
+
+        sent = sse.send_to_all_drivers(drivers['hotel_id'], 'new_request', {'request_id': 7})
+
+        assert sent == 1
+        assert active_queue.get_nowait()['data'] == {'request_id': 7}
+        with pytest.raises(queue.Empty):
+            inactive_queue.get_nowait()
+
+    def test_send_to_unconnected_driver(self, app, drivers):
+        SSEBroker.get().subscribe(sse.deliver_local)
+
+        assert sse.send_to_driver(drivers['active_id'], 'test', {}) is False
+
+    def test_redis_broker_publishes_once_and_fans_out_locally(self, app, drivers, monkeypatch):
+        fake = FakeRedis()
+        monkeypatch.setattr('redis.from_url', lambda url: fake)
+        broker = RedisSSEBroker('redis://broker', 'test:sse')
+        fake.broker = broker
+        SSEBroker.reset(broker)
+        active_queue = sse.get_driver_queue(drivers['active_id'])
+
+        sent = sse.send_to_all_drivers(drivers['hotel_id'], 'request_taken', {'request_id': 9})
+
+        assert sent == 1  # targeted drivers
+        assert len(fake.published) == 1
+        channel, payload = fake.published[0]
+        assert channel == 'test:sse'
+        assert json.loads(payload)['user_ids'] == [drivers['active_id']]
+
+        # What each worker's listener thread does with the message
+        broker._handler = sse.deliver_local
+        broker._listen()
+        assert active_queue.get_nowait()['event'] == 'request_taken'
@@ -0,0 +1,88 @@
+"""
+Test suite for the shared background task executor
+"""
+import pytest
+from threading import Event
+from unittest.mock import patch
+from flask import current_app
+from app import create_app, db
+from app.services.task_executor import BackgroundTaskExecutor
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        BackgroundTaskExecutor.reset()
+        yield app
+        BackgroundTaskExecutor.reset()
+        BackgroundTaskExecutor.init_app(app)
+        db.session.remove()
+        db.drop_all()
+
+
+class TestBackgroundTaskExecutor:
+    """Bounded pool reusing the submitting app"""
+
+    def test_inline_mode_runs_in_app_context(self, app):
+        seen = []
+
+        queued = BackgroundTaskExecutor.submit(lambda value: seen.append((value, current_app.name)), 7)
+
+        assert queued is False
+        assert seen == [(7, app.name)]
+        assert BackgroundTaskExecutor.get_stats()['completed'] == 1
+
+    def test_pool_runs_tasks_with_metrics(self, app):
+        app.config['BACKGROUND_TASKS_INLINE'] = False
+        BackgroundTaskExecutor.init_app(app)
+        done = Event()
+        apps = []
+
+        def task():
+            apps.append(current_app._get_current_object())
+            done.set()
+
+        assert BackgroundTaskExecutor.submit(task) is True
+        assert done.wait(5)
+        BackgroundTaskExecutor.shutdown()
+
+        stats = BackgroundTaskExecutor.get_stats()
+        assert apps == [app]  # no create_app() per task
+        assert stats['completed'] == 1 and stats['queue_depth'] == 0
+        assert stats['max_depth'] == 1
+
+    def test_full_queue_runs_in_caller(self, app):
+        app.config.update(BACKGROUND_TASKS_INLINE=False, BACKGROUND_TASK_QUEUE_MAX=0)
+        BackgroundTaskExecutor.init_app(app)
+        seen = []
+
+        assert BackgroundTaskExecutor.submit(seen.append, 1) is False
+
+        assert seen == [1]
+        assert BackgroundTaskExecutor.get_stats()['caller_runs'] == 1
+
+    def test_failed_task_is_counted(self, app):
+        def task():
+            raise ValueError('boom')
+
+        BackgroundTaskExecutor.submit(task)
+
+        stats = BackgroundTaskExecutor.get_stats()
+        assert stats['failed'] == 1 and stats['completed'] == 0
+
+    @patch('app.websocket.events.socketio')
+    def test_driver_disconnect_does_not_build_an_app(self, mock_socketio, app):
+        from app.websocket.events import _handle_driver_disconnect_async
+
+        with patch('app.create_app', side_effect=AssertionError('create_app called')):
+            BackgroundTaskExecutor.submit(_handle_driver_disconnect_async, 1, {
+                'buggy_id': 1, 'buggy_code': 'B1', 'buggy_icon': None,
+                'hotel_id': 1, 'driver_name': 'driver'
+            })
+
+        mock_socketio.emit.assert_called_once()
+        assert mock_socketio.emit.call_args[1]['room'] == 'hotel_1_admin'